@@ -34,6 +34,9 @@ python speech_to_text_buffered_infer_ctc.py \
 # NOTE:
     You can use `DEBUG=1 python speech_to_text_buffered_infer_ctc.py ...` to print out the
     predictions of the model, and ground-truth text if presents in manifest.
+
+    The chunks are decoded greedily by default. Add `decoding.strategy=prefix_beam decoding.beam.beam_size=<N>`
+    to decode them with a CTC prefix beam search, which continues the beam of the previous chunks.
 """
 import contextlib
 import copy
@@ -24,7 +24,8 @@ During inference, we perform frame-level prediction by two approaches:
        Image https://raw.githubusercontent.com/NVIDIA/NeMo/main/tutorials/asr/images/vad_post_overlap_diagram.png 
        will help you understand this method.
 
-This script will also help you perform postprocessing and generate speech segments if needed
+This script will also help you perform postprocessing and generate speech segments if needed.
+With in_memory=True, the predictions of each audio file go through all stages in memory and only the speech segments are written.
 
 Usage:
 python vad_infer.py --config-path="../conf/vad" --config-name="vad_inference_postprocessing.yaml" dataset=<Path of json file of evaluation data. Audio files should have unique names>
@@ -38,8 +39,11 @@ import torch
 from nemo.collections.asr.parts.utils.speaker_utils import write_rttm2manifest
 from nemo.collections.asr.parts.utils.vad_utils import (
     generate_overlap_vad_seq,
+    generate_overlap_vad_seq_in_memory,
     generate_vad_frame_pred,
+    generate_vad_frame_pred_in_memory,
     generate_vad_segment_table,
+    generate_vad_segment_table_in_memory,
     init_vad_model,
     prepare_manifest,
 )
@@ -106,11 +110,33 @@ def main(cfg):
 
     if not os.path.exists(cfg.frame_out_dir):
         os.mkdir(cfg.frame_out_dir)
-    else:
+    elif not cfg.get("in_memory", False):
         logging.warning(
             "Note frame_out_dir exists. If new file has same name as file inside existing folder, it will append result to existing file and might cause mistakes for next steps."
         )
 
+    if cfg.get("in_memory", False):
+        table_out_dir = run_vad_in_memory(cfg, vad_model, manifest_vad_input)
+    else:
+        table_out_dir = run_vad(cfg, vad_model, manifest_vad_input)
+
+    if cfg.write_to_manifest:
+        for i in key_meta_map:
+            key_meta_map[i]['rttm_filepath'] = os.path.join(table_out_dir, i + ".txt")
+
+        if not cfg.out_manifest_filepath:
+            out_manifest_filepath = "vad_out.json"
+        else:
+            out_manifest_filepath = cfg.out_manifest_filepath
+        out_manifest_filepath = write_rttm2manifest(key_meta_map, out_manifest_filepath)
+        logging.info(f"Writing VAD output to manifest: {out_manifest_filepath}")
+
+
+def run_vad(cfg, vad_model, manifest_vad_input):
+    """
+    Run each stage of VAD on all the audio files, saving the predictions of each stage to text files.
+    """
+    table_out_dir = None
     logging.info("Generating frame level prediction ")
     pred_dir = generate_vad_frame_pred(
         vad_model=vad_model,
@@ -157,17 +183,51 @@ def main(cfg):
         logging.info(
             f"Finish generating speech semgents table with postprocessing_params: {cfg.vad.parameters.postprocessing}"
         )
+    return table_out_dir
 
-    if cfg.write_to_manifest:
-        for i in key_meta_map:
-            key_meta_map[i]['rttm_filepath'] = os.path.join(table_out_dir, i + ".txt")
 
-        if not cfg.out_manifest_filepath:
-            out_manifest_filepath = "vad_out.json"
-        else:
-            out_manifest_filepath = cfg.out_manifest_filepath
-        out_manifest_filepath = write_rttm2manifest(key_meta_map, out_manifest_filepath)
-        logging.info(f"Writing VAD output to manifest: {out_manifest_filepath}")
+def run_vad_in_memory(cfg, vad_model, manifest_vad_input):
+    """
+    Run all stages of VAD on each audio file in turn, passing the predictions from one stage to the next in memory.
+    Only the speech segment tables are written, and the smoothed predictions as .npy files if smoothing_out_dir is set.
+    """
+    vad_preds = generate_vad_frame_pred_in_memory(
+        vad_model=vad_model,
+        window_length_in_sec=cfg.vad.parameters.window_length_in_sec,
+        shift_length_in_sec=cfg.vad.parameters.shift_length_in_sec,
+        manifest_vad_input=manifest_vad_input,
+    )
+    frame_length_in_sec = cfg.vad.parameters.shift_length_in_sec
+
+    if cfg.vad.parameters.smoothing:
+        vad_preds = generate_overlap_vad_seq_in_memory(
+            frame_preds=vad_preds,
+            smoothing_method=cfg.vad.parameters.smoothing,
+            overlap=cfg.vad.parameters.overlap,
+            window_length_in_sec=cfg.vad.parameters.window_length_in_sec,
+            shift_length_in_sec=cfg.vad.parameters.shift_length_in_sec,
+            out_dir=cfg.smoothing_out_dir,
+        )
+        frame_length_in_sec = 0.01
+
+    table_out_dir = cfg.table_out_dir
+    if not table_out_dir:
+        table_out_dir = "seg_output"
+        for key, value in cfg.vad.parameters.postprocessing.items():
+            table_out_dir = table_out_dir + "-" + str(key) + str(value)
+        table_out_dir = os.path.join(cfg.frame_out_dir, table_out_dir)
+
+    logging.info("Generating speech segments of each audio file in memory")
+    table_out_dir = generate_vad_segment_table_in_memory(
+        vad_preds=vad_preds,
+        postprocessing_params=cfg.vad.parameters.postprocessing,
+        frame_length_in_sec=frame_length_in_sec,
+        out_dir=table_out_dir,
+    )
+    logging.info(
+        f"Finish generating speech semgents table with postprocessing_params: {cfg.vad.parameters.postprocessing}"
+    )
+    return table_out_dir
 
 
 if __name__ == '__main__':
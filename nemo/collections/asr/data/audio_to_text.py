@@ -16,6 +16,8 @@ import json
 import math
 import multiprocessing
 import os
+import random
+from collections import Counter
 from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import braceexpand
@@ -121,6 +123,9 @@ class ASRManifestProcessor:
         bos_id: Id of beginning of sequence symbol to append if not None.
         eos_id: Id of end of sequence symbol to append if not None.
         pad_id: Id of pad symbol. Defaults to 0.
+        index_by_file_id: If True, saves a mapping from filename base (ID) to index in the collection.
+        tokenization_workers: Number of processes used to tokenize the manifest transcripts.
+        tokens_cache_dir: Optional directory to cache tokenized manifest transcripts in.
     """
 
     def __init__(
@@ -134,6 +139,8 @@ class ASRManifestProcessor:
         eos_id: Optional[int] = None,
         pad_id: int = 0,
         index_by_file_id: bool = False,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
     ):
         self.parser = parser
 
@@ -144,6 +151,8 @@ class ASRManifestProcessor:
             max_duration=max_duration,
             max_number=max_utts,
             index_by_file_id=index_by_file_id,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
         )
 
         self.eos_id = eos_id
@@ -411,6 +420,11 @@ class _AudioTextDataset(Dataset):
         eos_id: Id of end of sequence symbol to append if not None
         pad_id: Id of pad symbol. Defaults to 0
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
+        resample_cache_dir (str): optional directory to cache resampled audio in. Defaults to None.
+        decode_cache_mb (float): if positive, size in MB of a per-worker cache of decoded audio files which are not supported by soundfile, so that segments of the same file reuse one decode. Defaults to 0.
         channel_selector (int | Iterable[int] | str): select a single channel or a subset of channels from multi-channel audio. If set to `'average'`, it performs averaging across channels. Disabled if set to `None`. Defaults to `None`. Uses zero-based indexing.
     """
 
@@ -442,6 +456,11 @@ class _AudioTextDataset(Dataset):
         pad_id: int = 0,
         return_sample_id: bool = False,
         channel_selector: Optional[ChannelSelectorType] = None,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
+        resample_cache_dir: Optional[str] = None,
+        decode_cache_mb: float = 0,
     ):
         if type(manifest_filepath) == str:
             manifest_filepath = manifest_filepath.split(",")
@@ -458,8 +477,17 @@ class _AudioTextDataset(Dataset):
             bos_id=bos_id,
             eos_id=eos_id,
             pad_id=pad_id,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
+        )
+        self.featurizer = WaveformFeaturizer(
+            sample_rate=sample_rate,
+            int_values=int_values,
+            augmentor=augmentor,
+            resampler=resampler,
+            resample_cache_dir=resample_cache_dir,
+            decode_cache_mb=decode_cache_mb,
         )
-        self.featurizer = WaveformFeaturizer(sample_rate=sample_rate, int_values=int_values, augmentor=augmentor)
         self.trim = trim
         self.return_sample_id = return_sample_id
         self.channel_selector = channel_selector
@@ -530,6 +558,11 @@ class AudioToCharDataset(_AudioTextDataset):
         bos_id: Id of beginning of sequence symbol to append if not None
         eos_id: Id of end of sequence symbol to append if not None
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
+        resample_cache_dir (str): optional directory to cache resampled audio in. Defaults to None.
+        decode_cache_mb (float): if positive, size in MB of a per-worker cache of decoded audio files which are not supported by soundfile, so that segments of the same file reuse one decode. Defaults to 0.
         channel_selector (int | Iterable[int] | str): select a single channel or a subset of channels from multi-channel audio. If set to `'average'`, it performs averaging across channels. Disabled if set to `None`. Defaults to `None`. Uses zero-based indexing.
     """
 
@@ -565,6 +598,11 @@ class AudioToCharDataset(_AudioTextDataset):
         parser: Union[str, Callable] = 'en',
         return_sample_id: bool = False,
         channel_selector: Optional[ChannelSelectorType] = None,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
+        resample_cache_dir: Optional[str] = None,
+        decode_cache_mb: float = 0,
     ):
         self.labels = labels
 
@@ -587,6 +625,11 @@ class AudioToCharDataset(_AudioTextDataset):
             pad_id=pad_id,
             return_sample_id=return_sample_id,
             channel_selector=channel_selector,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
+            resampler=resampler,
+            resample_cache_dir=resample_cache_dir,
+            decode_cache_mb=decode_cache_mb,
         )
 
 
@@ -624,6 +667,11 @@ class AudioToBPEDataset(_AudioTextDataset):
         use_start_end_token: Boolean which dictates whether to add [BOS] and [EOS]
             tokens to beginning and ending of speech respectively.
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
+        resample_cache_dir (str): optional directory to cache resampled audio in. Defaults to None.
+        decode_cache_mb (float): if positive, size in MB of a per-worker cache of decoded audio files which are not supported by soundfile, so that segments of the same file reuse one decode. Defaults to 0.
         channel_selector (int | Iterable[int] | str): select a single channel or a subset of channels from multi-channel audio. If set to `'average'`, it performs averaging across channels. Disabled if set to `None`. Defaults to `None`. Uses zero-based indexing.
     """
 
@@ -653,6 +701,11 @@ class AudioToBPEDataset(_AudioTextDataset):
         use_start_end_token: bool = True,
         return_sample_id: bool = False,
         channel_selector: Optional[ChannelSelectorType] = None,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
+        resample_cache_dir: Optional[str] = None,
+        decode_cache_mb: float = 0,
     ):
         if use_start_end_token and hasattr(tokenizer, "bos_id") and tokenizer.bos_id > 0:
             bos_id = tokenizer.bos_id
@@ -702,6 +755,11 @@ class AudioToBPEDataset(_AudioTextDataset):
             trim=trim,
             return_sample_id=return_sample_id,
             channel_selector=channel_selector,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
+            resampler=resampler,
+            resample_cache_dir=resample_cache_dir,
+            decode_cache_mb=decode_cache_mb,
         )
 
 
@@ -795,6 +853,9 @@ class _TarredAudioToTextDataset(IterableDataset):
         global_rank (int): Worker rank, used for partitioning shards. Defaults to 0.
         world_size (int): Total number of processes, used for partitioning shards. Defaults to 0.
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
     """
 
     def __init__(
@@ -817,6 +878,9 @@ class _TarredAudioToTextDataset(IterableDataset):
         global_rank: int = 0,
         world_size: int = 0,
         return_sample_id: bool = False,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
     ):
         self.shard_manifests = shard_manifests
 
@@ -842,11 +906,15 @@ class _TarredAudioToTextDataset(IterableDataset):
             eos_id=eos_id,
             pad_id=pad_id,
             index_by_file_id=True,  # Must set this so the manifest lines can be indexed by file ID
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
         )
 
         self.len = self._compute_len()
 
-        self.featurizer = WaveformFeaturizer(sample_rate=sample_rate, int_values=int_values, augmentor=augmentor)
+        self.featurizer = WaveformFeaturizer(
+            sample_rate=sample_rate, int_values=int_values, augmentor=augmentor, resampler=resampler
+        )
         self.trim = trim
         self.eos_id = eos_id
         self.bos_id = bos_id
@@ -1089,6 +1157,9 @@ class TarredAudioToCharDataset(_TarredAudioToTextDataset):
         global_rank (int): Worker rank, used for partitioning shards. Defaults to 0.
         world_size (int): Total number of processes, used for partitioning shards. Defaults to 0.
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
     """
 
     def __init__(
@@ -1115,6 +1186,9 @@ class TarredAudioToCharDataset(_TarredAudioToTextDataset):
         global_rank: int = 0,
         world_size: int = 0,
         return_sample_id: bool = False,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
     ):
         self.labels = labels
 
@@ -1141,6 +1215,9 @@ class TarredAudioToCharDataset(_TarredAudioToTextDataset):
             global_rank=global_rank,
             world_size=world_size,
             return_sample_id=return_sample_id,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
+            resampler=resampler,
         )
 
 
@@ -1222,6 +1299,9 @@ class TarredAudioToBPEDataset(_TarredAudioToTextDataset):
         global_rank (int): Worker rank, used for partitioning shards. Defaults to 0.
         world_size (int): Total number of processes, used for partitioning shards. Defaults to 0.
         return_sample_id (bool): whether to return the sample_id as a part of each sample
+        tokenization_workers (int): number of processes used to tokenize the manifest transcripts. Defaults to 0.
+        tokens_cache_dir (str): optional directory to cache tokenized manifest transcripts in. Defaults to None.
+        resampler (str): resampler used if the audio sample rate differs from `sample_rate`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
     """
 
     def __init__(
@@ -1242,6 +1322,9 @@ class TarredAudioToBPEDataset(_TarredAudioToTextDataset):
         global_rank: int = 0,
         world_size: int = 0,
         return_sample_id: bool = False,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        resampler: Optional[str] = None,
     ):
         if use_start_end_token and hasattr(tokenizer, "bos_id") and tokenizer.bos_id > 0:
             bos_id = tokenizer.bos_id
@@ -1295,6 +1378,9 @@ class TarredAudioToBPEDataset(_TarredAudioToTextDataset):
             global_rank=global_rank,
             world_size=world_size,
             return_sample_id=return_sample_id,
+            tokenization_workers=tokenization_workers,
+            tokens_cache_dir=tokens_cache_dir,
+            resampler=resampler,
         )
 
 
@@ -1348,6 +1434,290 @@ class BucketingIterator:
         return batches
 
 
+class DynamicBatchingStats:
+    """
+    Keeps track of the batches built by dynamic batching, to help with tuning its budget and buffer size.
+    Lengths are measured in the units of the audio lengths returned by the wrapped dataset (i.e. audio samples).
+
+    The counts are kept in shared memory with one row per DataLoader worker, so that the statistics of the
+    batches built by all the workers are seen by the main process and logged by each worker.
+
+    Args:
+        num_workers (int): Number of DataLoader workers building the batches, 0 if they are built in the main process.
+        max_batch_size (int): Upper limit of the number of samples in a batch.
+    """
+
+    def __init__(self, num_workers: int = 0, max_batch_size: int = 256):
+        # Columns: number of batches, of samples, of frames, of padded frames, then the number of batches of each size
+        self._counts = torch.zeros(max(num_workers, 1), 4 + max_batch_size + 1, dtype=torch.int64).share_memory_()
+        # Row of the counts of the process with id _pid, workers are forked from the main process
+        self._row = None
+        self._pid = None
+
+    def _get_row(self) -> torch.Tensor:
+        """Row of the counts updated by the current process."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            worker_info = torch.utils.data.get_worker_info()
+            if worker_info is None:
+                self._row = 0
+            elif worker_info.num_workers == len(self._counts):
+                self._row = worker_info.id
+            else:
+                logging.warning(
+                    f"Dynamic batching statistics were set up for {len(self._counts)} workers, but the DataLoader "
+                    f"has {worker_info.num_workers} workers. The statistics of worker {worker_info.id} are its own."
+                )
+                self._counts = torch.zeros(1, self._counts.shape[1], dtype=torch.int64)
+                self._row = 0
+        return self._counts[self._row]
+
+    def update(self, lengths: List[int]):
+        row = self._get_row()
+        row[0] += 1
+        row[1] += len(lengths)
+        row[2] += sum(lengths)
+        row[3] += max(lengths) * len(lengths)
+        row[4 + len(lengths)] += 1
+
+    def reset(self):
+        """Resets the counts of the current process."""
+        self._get_row().zero_()
+
+    @property
+    def num_batches(self) -> int:
+        return int(self._counts[:, 0].sum())
+
+    @property
+    def num_samples(self) -> int:
+        return int(self._counts[:, 1].sum())
+
+    @property
+    def total_frames(self) -> int:
+        return int(self._counts[:, 2].sum())
+
+    @property
+    def padded_frames(self) -> int:
+        return int(self._counts[:, 3].sum())
+
+    @property
+    def batch_sizes(self) -> Counter:
+        """Number of batches of each size."""
+        counts = self._counts[:, 4:].sum(dim=0).tolist()
+        return Counter({size: count for size, count in enumerate(counts) if count > 0})
+
+    @property
+    def padding_ratio(self) -> float:
+        """Fraction of the padded batches which is padding."""
+        padded_frames = self.padded_frames
+        if padded_frames == 0:
+            return 0.0
+        return 1.0 - self.total_frames / padded_frames
+
+    @property
+    def mean_batch_size(self) -> float:
+        num_batches = self.num_batches
+        if num_batches == 0:
+            return 0.0
+        return self.num_samples / num_batches
+
+    def batch_size_percentiles(self, percentiles: Iterable[float] = (5, 50, 95)) -> List[int]:
+        """Batch sizes at the given percentiles of the batch-size distribution."""
+        batch_sizes = self.batch_sizes
+        num_batches = sum(batch_sizes.values())
+        if num_batches == 0:
+            return [0 for _ in percentiles]
+        sizes = sorted(batch_sizes)
+        counts = np.cumsum([batch_sizes[size] for size in sizes])
+        return [sizes[np.searchsorted(counts, p / 100.0 * num_batches)] for p in percentiles]
+
+    def __str__(self):
+        batch_sizes = self.batch_sizes
+        p5, p50, p95 = self.batch_size_percentiles()
+        return (
+            f"{self.num_batches} batches, {self.num_samples} samples, padding ratio {self.padding_ratio:.3f}, "
+            f"batch size mean {self.mean_batch_size:.1f} (min {min(batch_sizes, default=0)}, p5 {p5}, "
+            f"p50 {p50}, p95 {p95}, max {max(batch_sizes, default=0)})"
+        )
+
+
+class DynamicBatchingDataset(IterableDataset):
+    """
+    A Dataset which wraps another IterableDataset (e.g. a tarred ASR dataset) and assembles batches by a budget of
+    total audio instead of a fixed number of samples. Samples are read into a sorting buffer, sorted by length and
+    cut into batches whose padded size (longest sample times the number of samples) fits into the budget, so that
+    short utterances are batched in large numbers and long ones in small numbers with little padding either way.
+
+    The dataset yields lists of samples and has to be used with batch_size=1 in the DataLoader, as with
+    `BucketingDataset`.
+
+    Args:
+        dataset (IterableDataset): The IterableDataset to get wrapped
+        batch_duration (float): Budget of each batch in seconds of (padded) audio.
+        batch_frames (int): Budget of each batch in (padded) audio frames. Only one of batch_duration and
+            batch_frames can be set.
+        max_batch_size (int): Optional upper limit of the number of samples in a batch.
+        buffer_size (int): Number of samples to be sorted together. Larger buffers reduce padding further,
+            but all samples of the buffer are kept in memory at once.
+        shuffle_batches (bool): Whether to shuffle the order of the batches built from each buffer, so that
+            consecutive batches are not sorted by length.
+        log_every_n_batches (int): If positive, the batching statistics are logged every this many batches.
+            They are always logged at the end of the iteration.
+        num_workers (int): Number of DataLoader workers the dataset is used with. The batching statistics of all
+            the workers are aggregated in `stats`.
+    """
+
+    def __init__(
+        self,
+        dataset: IterableDataset,
+        batch_duration: Optional[float] = None,
+        batch_frames: Optional[int] = None,
+        max_batch_size: Optional[int] = None,
+        buffer_size: int = 256,
+        shuffle_batches: bool = True,
+        log_every_n_batches: int = 0,
+        num_workers: int = 0,
+    ):
+        if (batch_duration is None) == (batch_frames is None):
+            raise ValueError(
+                f"Exactly one of batch_duration and batch_frames should be set "
+                f"(batch_duration={batch_duration}, batch_frames={batch_frames})!"
+            )
+        if buffer_size < 1:
+            raise ValueError(f"buffer_size should be positive (buffer_size={buffer_size})!")
+
+        self.wrapped_dataset = dataset
+        self.sample_rate = dataset.featurizer.sample_rate
+        if batch_frames is None:
+            batch_frames = int(batch_duration * self.sample_rate)
+        self.batch_frames = batch_frames
+        self.max_batch_size = max_batch_size
+        self.buffer_size = buffer_size
+        self.shuffle_batches = shuffle_batches
+        self.log_every_n_batches = log_every_n_batches
+        # a batch has at most the samples of one buffer
+        self.stats = DynamicBatchingStats(
+            num_workers=num_workers, max_batch_size=min(buffer_size, max_batch_size or buffer_size)
+        )
+        self._len = None
+        super().__init__()
+
+    def _collate_fn(self, batch):
+        return self.wrapped_dataset._collate_fn(batch[0])
+
+    def __iter__(self):
+        self.stats.reset()
+        return DynamicBatchingIterator(
+            wrapped_ds=self.wrapped_dataset._dataset,
+            batch_frames=self.batch_frames,
+            max_batch_size=self.max_batch_size,
+            buffer_size=self.buffer_size,
+            shuffle_batches=self.shuffle_batches,
+            stats=self.stats,
+            log_every_n_batches=self.log_every_n_batches,
+        ).__iter__()
+
+    def __len__(self):
+        # The number of batches depends on the lengths of the samples read into each buffer, so the total
+        # amount of audio divided by the budget is used as an estimate.
+        if self._len is None:
+            collection = self.wrapped_dataset.manifest_processor.collection
+            entities = getattr(collection, 'data', collection)
+            if hasattr(entities, 'durations'):
+                # collections loaded from manifest indexes read the durations from the index, entities are not built
+                total_duration = float(np.nansum(entities.durations()))
+            else:
+                total_duration = sum(item.duration for item in collection if item.duration is not None)
+            if (
+                getattr(self.wrapped_dataset, 'shard_manifests', False)
+                and torch.distributed.is_available()
+                and torch.distributed.is_initialized()
+            ):
+                # Each rank only holds its shard of the manifest, so the total is reduced over the ranks,
+                # as in `_compute_len` of the tarred datasets.
+                total_duration = torch.tensor(total_duration, dtype=torch.float64).cuda()
+                torch.distributed.all_reduce(total_duration)
+                total_duration = total_duration.item()
+            self._len = max(1, int(math.ceil(total_duration * self.sample_rate / self.batch_frames)))
+        return self._len
+
+
+class DynamicBatchingIterator:
+    def __init__(
+        self,
+        wrapped_ds,
+        batch_frames: int,
+        max_batch_size: Optional[int] = None,
+        buffer_size: int = 256,
+        shuffle_batches: bool = True,
+        stats: Optional[DynamicBatchingStats] = None,
+        log_every_n_batches: int = 0,
+    ):
+        self.wrapped_ds = wrapped_ds
+        self.wrapped_iter = None
+        self.batch_frames = batch_frames
+        self.max_batch_size = max_batch_size
+        self.buffer_size = buffer_size
+        self.shuffle_batches = shuffle_batches
+        self.stats = stats if stats is not None else DynamicBatchingStats(max_batch_size=buffer_size)
+        self.log_every_n_batches = log_every_n_batches
+        self.pending = []
+        self.batches = []
+        self.exhausted = False
+
+    def __iter__(self):
+        self.wrapped_iter = iter(self.wrapped_ds)
+        self.pending = []
+        self.batches = []
+        self.exhausted = False
+        return self
+
+    def _fill_buffer(self):
+        buffer = self.pending
+        while not self.exhausted and len(buffer) < self.buffer_size:
+            try:
+                buffer.append(next(self.wrapped_iter))
+            except StopIteration:
+                self.exhausted = True
+        buffer.sort(key=lambda sample: int(sample[1]))
+
+        batches, batch = [], []
+        for sample in buffer:
+            # The buffer is sorted, so the current sample is the longest one of the batch
+            num_samples = len(batch) + 1
+            if batch and (
+                int(sample[1]) * num_samples > self.batch_frames
+                or (self.max_batch_size is not None and num_samples > self.max_batch_size)
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(sample)
+
+        # The last batch is usually not full, its samples are batched together with the next buffer
+        self.pending = []
+        if batch and batches and not self.exhausted:
+            self.pending = batch
+        elif batch:
+            batches.append(batch)
+
+        if self.shuffle_batches:
+            random.shuffle(batches)
+        self.batches = batches[::-1]
+
+    def __next__(self):
+        while not self.batches:
+            if self.exhausted and not self.pending:
+                logging.info(f"Dynamic batching: {self.stats}")
+                raise StopIteration
+            self._fill_buffer()
+
+        batch = self.batches.pop()
+        self.stats.update([int(sample[1]) for sample in batch])
+        if self.log_every_n_batches > 0 and self.stats.num_batches % self.log_every_n_batches == 0:
+            logging.info(f"Dynamic batching: {self.stats}")
+        return batch
+
+
 class RandomizedChainDataset(ChainDataset):
     def __init__(self, datasets: Iterable[Dataset], rnd_seed=0) -> None:
         super(RandomizedChainDataset, self).__init__(list(datasets))
@@ -156,6 +156,11 @@ def get_char_dataset(config: dict, augmentor: Optional['AudioAugmentor'] = None)
         parser=config.get('parser', 'en'),
         return_sample_id=config.get('return_sample_id', False),
         channel_selector=config.get('channel_selector', None),
+        tokenization_workers=config.get('tokenization_workers', 0),
+        tokens_cache_dir=config.get('tokens_cache_dir', None),
+        resampler=config.get('resampler', None),
+        resample_cache_dir=config.get('resample_cache_dir', None),
+        decode_cache_mb=config.get('decode_cache_mb', 0),
     )
     return dataset
 
@@ -236,6 +241,11 @@ def get_bpe_dataset(
         use_start_end_token=config.get('use_start_end_token', True),
         return_sample_id=config.get('return_sample_id', False),
         channel_selector=config.get('channel_selector', None),
+        tokenization_workers=config.get('tokenization_workers', 0),
+        tokens_cache_dir=config.get('tokens_cache_dir', None),
+        resampler=config.get('resampler', None),
+        resample_cache_dir=config.get('resample_cache_dir', None),
+        decode_cache_mb=config.get('decode_cache_mb', 0),
     )
     return dataset
 
@@ -374,6 +384,9 @@ def get_tarred_dataset(
                 global_rank=global_rank,
                 world_size=world_size,
                 return_sample_id=config.get('return_sample_id', False),
+                tokenization_workers=config.get('tokenization_workers', 0),
+                tokens_cache_dir=config.get('tokens_cache_dir', None),
+                resampler=config.get('resampler', None),
             )
         else:
             dataset = audio_to_text.TarredAudioToBPEDataset(
@@ -393,12 +406,18 @@ def get_tarred_dataset(
                 global_rank=global_rank,
                 world_size=world_size,
                 return_sample_id=config.get('return_sample_id', False),
+                tokenization_workers=config.get('tokenization_workers', 0),
+                tokens_cache_dir=config.get('tokens_cache_dir', None),
+                resampler=config.get('resampler', None),
             )
         if bucketing_weights:
             [datasets.append(dataset) for _ in range(bucketing_weights[dataset_idx])]
         else:
             datasets.append(dataset)
 
+    if config.get('batch_duration', None) is not None or config.get('batch_frames', None) is not None:
+        datasets = get_dynamic_batching_datasets(datasets=datasets, ds_config=config)
+
     return get_chain_dataset(datasets=datasets, ds_config=config, rank=global_rank)
 
 
@@ -896,7 +915,9 @@ def convert_to_config_list(initial_list):
 
 def get_chain_dataset(datasets, ds_config, rank=0):
     if len(datasets) > 1:
-        if ds_config.get('bucketing_batch_size', None) is not None:
+        if isinstance(datasets[0], audio_to_text.DynamicBatchingDataset):
+            logging.info(f"Batch bucketing is enabled for {len(datasets)} buckets with dynamic batch sizes!")
+        elif ds_config.get('bucketing_batch_size', None) is not None:
             bucketing_batch_sizes = calc_bucketing_batch_sizes(ds_config, len(datasets))
             logging.info(
                 f"Batch bucketing is enabled for {len(datasets)} buckets with adaptive batch sizes of {bucketing_batch_sizes}!"
@@ -925,6 +946,46 @@ def get_chain_dataset(datasets, ds_config, rank=0):
         )
 
 
+def get_dynamic_batching_datasets(datasets, ds_config):
+    """
+    Wraps each of the datasets with a DynamicBatchingDataset which assembles batches by a budget of total audio
+    (`batch_duration` in seconds or `batch_frames` in audio frames) instead of a fixed number of samples.
+
+    Args:
+        datasets: List of tarred datasets, one per bucket.
+        ds_config: Config of the datasets.
+
+    Returns:
+        The list of wrapped datasets.
+    """
+    if ds_config['batch_size'] != 1:
+        raise ValueError(
+            f"batch_size should be set to one when batch_duration or batch_frames is set and dynamic batching is enabled (batch_size={ds_config['batch_size']})!"
+        )
+    if ds_config.get('bucketing_batch_size', None) is not None:
+        raise ValueError("bucketing_batch_size can not be used together with batch_duration or batch_frames!")
+
+    batch_duration = ds_config.get('batch_duration', None)
+    batch_frames = ds_config.get('batch_frames', None)
+    logging.info(
+        f"Dynamic batching is enabled for {len(datasets)} dataset(s) with a budget of "
+        f"{f'{batch_duration} seconds' if batch_duration is not None else f'{batch_frames} frames'} per batch!"
+    )
+    return [
+        audio_to_text.DynamicBatchingDataset(
+            dataset=dataset,
+            batch_duration=batch_duration,
+            batch_frames=batch_frames,
+            max_batch_size=ds_config.get('max_batch_size', None),
+            buffer_size=ds_config.get('dynamic_batching_buffer_size', 256),
+            shuffle_batches=ds_config.get('shuffle', False),
+            log_every_n_batches=ds_config.get('dynamic_batching_log_every_n_batches', 0),
+            num_workers=ds_config.get('num_workers', None) or 0,
+        )
+        for dataset in datasets
+    ]
+
+
 def calc_bucketing_batch_sizes(ds_config, datasets_len):
     bucketing_batch_size = ds_config['bucketing_batch_size']
     bucketing_weights = ds_config.get('bucketing_weights', None)  # To adjust for upsampled buckets
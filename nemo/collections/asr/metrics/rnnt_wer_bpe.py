@@ -15,12 +15,11 @@
 from dataclasses import dataclass
 from typing import List, Union
 
-import editdistance
 import torch
 from torchmetrics import Metric
 
 from nemo.collections.asr.metrics.rnnt_wer import AbstractRNNTDecoding, RNNTDecodingConfig
-from nemo.collections.asr.metrics.wer import move_dimension_to_the_front
+from nemo.collections.asr.metrics.wer import move_dimension_to_the_front, word_error_rate_scores
 from nemo.collections.asr.parts.submodules import rnnt_beam_decoding
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis, NBestHypotheses
 from nemo.collections.common.tokenizers.aggregate_tokenizer import AggregateTokenizer
@@ -380,8 +379,6 @@ class RNNTBPEWER(Metric):
         targets: torch.Tensor,
         target_lengths: torch.Tensor,
     ) -> torch.Tensor:
-        words = 0
-        scores = 0
         references = []
         with torch.no_grad():
             # prediction_cpu_tensor = tensors[0].long().cpu()
@@ -403,16 +400,7 @@ class RNNTBPEWER(Metric):
             logging.info(f"reference :{references[0]}")
             logging.info(f"predicted :{hypotheses[0]}")
 
-        for h, r in zip(hypotheses, references):
-            if self.use_cer:
-                h_list = list(h)
-                r_list = list(r)
-            else:
-                h_list = h.split()
-                r_list = r.split()
-            words += len(r_list)
-            # Compute Levenshtein's distance
-            scores += editdistance.eval(h_list, r_list)
+        scores, words = word_error_rate_scores(hypotheses, references, use_cer=self.use_cer)
 
         del hypotheses
 
@@ -17,22 +17,107 @@ from abc import abstractmethod
 from dataclasses import dataclass, field, is_dataclass
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
-import editdistance
-import jiwer
 import numpy as np
 import torch
 from omegaconf import DictConfig, OmegaConf
 from torchmetrics import Metric
 
 from nemo.collections.asr.parts.submodules import ctc_beam_decoding, ctc_greedy_decoding
+from nemo.collections.asr.parts.utils import edit_distance_utils
 from nemo.collections.asr.parts.utils.asr_confidence_utils import ConfidenceConfig, ConfidenceMixin
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis, NBestHypotheses
 from nemo.utils import logging, logging_mode
 
-__all__ = ['word_error_rate', 'word_error_rate_detail', 'WER', 'move_dimension_to_the_front']
+__all__ = [
+    'word_error_rate',
+    'word_error_rate_detail',
+    'word_error_rate_detail_per_utt',
+    'word_error_rate_scores',
+    'WER',
+    'move_dimension_to_the_front',
+]
 
 
-def word_error_rate(hypotheses: List[str], references: List[str], use_cer=False) -> float:
+def _check_same_length(hypotheses: List[str], references: List[str]):
+    if len(hypotheses) != len(references):
+        raise ValueError(
+            "In word error rate calculation, hypotheses and reference"
+            " lists must have the same number of elements. But I got:"
+            "{0} and {1} correspondingly".format(len(hypotheses), len(references))
+        )
+
+
+def _split_texts(texts: List[str], use_cer: bool) -> List[Union[str, List[str]]]:
+    # Strings are sequences of characters already
+    if use_cer:
+        return texts
+    return [text.split() for text in texts]
+
+
+def _edit_operations_detail(
+    hypotheses: List[str], references: List[str], use_cer: bool, num_workers: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Counts the edit operations of each utterance the same way as `jiwer` does, i.e. on stripped texts for CER.
+
+    Returns:
+        ops (np.ndarray): array of shape [Batch, 3] with the number of substitutions, insertions and deletions.
+        words (np.ndarray): number of words/characters of each reference.
+        ref_lengths (np.ndarray): number of words/characters of each reference after stripping.
+    """
+    ref_lists = _split_texts(references, use_cer)
+    words = np.fromiter(map(len, ref_lists), dtype=np.int64, count=len(ref_lists))
+    if use_cer:
+        # Empty references are not passed to jiwer, all the characters of the hypothesis are insertions then
+        hyp_lists = [h.strip() if len(r) > 0 else h for h, r in zip(hypotheses, references)]
+        ref_lists = [r.strip() for r in references]
+    else:
+        hyp_lists = _split_texts(hypotheses, use_cer)
+    ref_lengths = np.fromiter(map(len, ref_lists), dtype=np.int64, count=len(ref_lists))
+
+    ops = edit_distance_utils.batch_edit_operations(hyp_lists, ref_lists, num_workers=num_workers)
+    return ops, words, ref_lengths
+
+
+def _detail_rates(
+    scores: int, words: int, insertions: int, deletions: int, substitutions: int
+) -> Tuple[float, int, float, float, float]:
+    if words != 0:
+        wer = 1.0 * scores / words
+        ins_rate = 1.0 * insertions / words
+        del_rate = 1.0 * deletions / words
+        sub_rate = 1.0 * substitutions / words
+    else:
+        wer, ins_rate, del_rate, sub_rate = float('inf'), float('inf'), float('inf'), float('inf')
+    return wer, words, ins_rate, del_rate, sub_rate
+
+
+def word_error_rate_scores(
+    hypotheses: List[str], references: List[str], use_cer=False, num_workers: int = 0
+) -> Tuple[int, int]:
+    """
+    Computes the total Levenshtein distance between hypotheses and references, and the total number of
+    words/characters of the references. The distances of all the pairs are computed in one batched call.
+
+    Args:
+        hypotheses (list): list of hypotheses
+        references(list) : list of references
+        use_cer (bool): set True to enable cer
+        num_workers (int): number of processes used to compute the edit distances of large lists
+
+    Returns:
+        scores (int): sum of Levenshtein distances
+        words (int): total number of words/characters of the references
+    """
+    _check_same_length(hypotheses, references)
+    h_lists = _split_texts(hypotheses, use_cer)
+    r_lists = _split_texts(references, use_cer)
+    words = sum(map(len, r_lists))
+    scores = int(edit_distance_utils.batch_edit_operations(h_lists, r_lists, num_workers=num_workers).sum())
+    return scores, words
+
+
+def word_error_rate(hypotheses: List[str], references: List[str], use_cer=False, num_workers: int = 0) -> float:
     """
     Computes Average Word Error rate between two texts represented as
     corresponding lists of string.
@@ -43,29 +128,12 @@ def word_error_rate(hypotheses: List[str], references: List[str], use_cer=False)
         hypotheses (list): list of hypotheses
         references(list) : list of references
         use_cer (bool): set True to enable cer
+        num_workers (int): number of processes used to compute the edit distances of large lists
 
     Returns:
         wer (float): average word error rate
     """
-    scores = 0
-    words = 0
-    if len(hypotheses) != len(references):
-        raise ValueError(
-            "In word error rate calculation, hypotheses and reference"
-            " lists must have the same number of elements. But I got:"
-            "{0} and {1} correspondingly".format(len(hypotheses), len(references))
-        )
-    for h, r in zip(hypotheses, references):
-        if use_cer:
-            h_list = list(h)
-            r_list = list(r)
-        else:
-            h_list = h.split()
-            r_list = r.split()
-        words += len(r_list)
-        # May deprecate using editdistance in future release for here and rest of codebase
-        # once we confirm jiwer is reliable.
-        scores += editdistance.eval(h_list, r_list)
+    scores, words = word_error_rate_scores(hypotheses, references, use_cer=use_cer, num_workers=num_workers)
     if words != 0:
         wer = 1.0 * scores / words
     else:
@@ -74,7 +142,7 @@ def word_error_rate(hypotheses: List[str], references: List[str], use_cer=False)
 
 
 def word_error_rate_detail(
-    hypotheses: List[str], references: List[str], use_cer=False
+    hypotheses: List[str], references: List[str], use_cer=False, num_workers: int = 0
 ) -> Tuple[float, int, float, float, float]:
     """
     Computes Average Word Error Rate with details (insertion rate, deletion rate, substitution rate)
@@ -86,6 +154,7 @@ def word_error_rate_detail(
         hypotheses (list): list of hypotheses
         references(list) : list of references
         use_cer (bool): set True to enable cer
+        num_workers (int): number of processes used to compute the edit distances of large lists
 
     Returns:
         wer (float): average word error rate
@@ -94,58 +163,52 @@ def word_error_rate_detail(
         del_rate (float): average deletion error rate
         sub_rate (float): average substitution error rate
     """
-    scores = 0
-    words = 0
-    ops_count = {'substitutions': 0, 'insertions': 0, 'deletions': 0}
+    _check_same_length(hypotheses, references)
+    ops, words, _ = _edit_operations_detail(hypotheses, references, use_cer, num_workers=num_workers)
+    substitutions, insertions, deletions = ops.sum(axis=0).tolist()
 
-    if len(hypotheses) != len(references):
-        raise ValueError(
-            "In word error rate calculation, hypotheses and reference"
-            " lists must have the same number of elements. But I got:"
-            "{0} and {1} correspondingly".format(len(hypotheses), len(references))
-        )
+    return _detail_rates(
+        substitutions + insertions + deletions, int(words.sum()), insertions, deletions, substitutions
+    )
 
-    for h, r in zip(hypotheses, references):
-        if use_cer:
-            h_list = list(h)
-            r_list = list(r)
-        else:
-            h_list = h.split()
-            r_list = r.split()
-
-        # To get rid of the issue that jiwer does not allow empty string
-        if len(r_list) == 0:
-            if len(h_list) != 0:
-                errors = len(h_list)
-                ops_count['insertions'] += errors
-            else:
-                errors = 0
-        else:
-            if use_cer:
-                measures = jiwer.cer(r, h, return_dict=True)
-            else:
-                measures = jiwer.compute_measures(r, h)
 
-            errors = measures['insertions'] + measures['deletions'] + measures['substitutions']
-            ops_count['insertions'] += measures['insertions']
-            ops_count['deletions'] += measures['deletions']
-            ops_count['substitutions'] += measures['substitutions']
+def word_error_rate_detail_per_utt(
+    hypotheses: List[str], references: List[str], use_cer=False, num_workers: int = 0
+) -> Tuple[List[Tuple[float, int, float, float, float]], Tuple[float, int, float, float, float]]:
+    """
+    Computes Word Error Rate with details (insertion rate, deletion rate, substitution rate) of each utterance
+    and of all the utterances together, in one pass over the texts.
 
-        scores += errors
-        words += len(r_list)
+    Hypotheses and references must have same length.
 
-    if words != 0:
-        wer = 1.0 * scores / words
-        ins_rate = 1.0 * ops_count['insertions'] / words
-        del_rate = 1.0 * ops_count['deletions'] / words
-        sub_rate = 1.0 * ops_count['substitutions'] / words
-    else:
-        wer, ins_rate, del_rate, sub_rate = float('inf'), float('inf'), float('inf'), float('inf')
+    Args:
+        hypotheses (list): list of hypotheses
+        references(list) : list of references
+        use_cer (bool): set True to enable cer
+        num_workers (int): number of processes used to compute the edit distances of large lists
 
-    return wer, words, ins_rate, del_rate, sub_rate
+    Returns:
+        details_per_utt (List[tuple]): for each utterance, the same values as `word_error_rate_detail` would
+            return for this utterance alone
+        details (tuple): the same values as `word_error_rate_detail` would return for all utterances
+    """
+    _check_same_length(hypotheses, references)
+    ops, words, _ = _edit_operations_detail(hypotheses, references, use_cer, num_workers=num_workers)
+
+    details_per_utt = [
+        _detail_rates(substitutions + insertions + deletions, utt_words, insertions, deletions, substitutions)
+        for (substitutions, insertions, deletions), utt_words in zip(ops.tolist(), words.tolist())
+    ]
+    substitutions, insertions, deletions = ops.sum(axis=0).tolist()
+    details = _detail_rates(
+        substitutions + insertions + deletions, int(words.sum()), insertions, deletions, substitutions
+    )
+    return details_per_utt, details
 
 
-def word_error_rate_per_utt(hypotheses: List[str], references: List[str], use_cer=False) -> Tuple[List[float], float]:
+def word_error_rate_per_utt(
+    hypotheses: List[str], references: List[str], use_cer=False, num_workers: int = 0
+) -> Tuple[List[float], float]:
     """
     Computes Word Error Rate per utterance and the average WER
     between two texts represented as corresponding lists of string. 
@@ -156,49 +219,25 @@ def word_error_rate_per_utt(hypotheses: List[str], references: List[str], use_ce
         hypotheses (list): list of hypotheses
         references(list) : list of references
         use_cer (bool): set True to enable cer
+        num_workers (int): number of processes used to compute the edit distances of large lists
 
     Returns:
         wer_per_utt (List[float]): word error rate per utterance
         avg_wer (float): average word error rate
     """
-    scores = 0
-    words = 0
-    wer_per_utt = []
+    _check_same_length(hypotheses, references)
+    ops, words, ref_lengths = _edit_operations_detail(hypotheses, references, use_cer, num_workers=num_workers)
+    errors = ops.sum(axis=1)
 
-    if len(hypotheses) != len(references):
-        raise ValueError(
-            "In word error rate calculation, hypotheses and reference"
-            " lists must have the same number of elements. But I got:"
-            "{0} and {1} correspondingly".format(len(hypotheses), len(references))
-        )
-
-    for h, r in zip(hypotheses, references):
-        if use_cer:
-            h_list = list(h)
-            r_list = list(r)
-        else:
-            h_list = h.split()
-            r_list = r.split()
-
-        # To get rid of the issue that jiwer does not allow empty string
-        if len(r_list) == 0:
-            if len(h_list) != 0:
-                errors = len(h_list)
-                wer_per_utt.append(float('inf'))
+    wer_per_utt = []
+    for utt_errors, ref_length in zip(errors.tolist(), ref_lengths.tolist()):
+        if ref_length != 0:
+            wer_per_utt.append(1.0 * utt_errors / ref_length)
         else:
-            if use_cer:
-                measures = jiwer.cer(r, h, return_dict=True)
-                er = measures['cer']
-            else:
-                measures = jiwer.compute_measures(r, h)
-                er = measures['wer']
-
-            errors = measures['insertions'] + measures['deletions'] + measures['substitutions']
-            wer_per_utt.append(er)
-
-        scores += errors
-        words += len(r_list)
+            wer_per_utt.append(float('inf') if utt_errors != 0 else 0.0)
 
+    scores = int(errors.sum())
+    words = int(words.sum())
     if words != 0:
         avg_wer = 1.0 * scores / words
     else:
@@ -222,6 +261,8 @@ class AbstractCTCDecoding(ConfidenceMixin):
                 Possible values are :
                 -   greedy (for greedy decoding).
                 -   beam (for DeepSpeed KenLM based decoding).
+                -   prefix_beam (for CTC prefix beam search without language model, which also supports
+                    incremental decoding of streamed log probabilities).
 
             compute_timestamps: A bool flag, which determines whether to compute the character/subword, or
                 word based timestamp mapping the output log-probabilities to discrite intervals of timestamps.
@@ -349,7 +390,7 @@ class AbstractCTCDecoding(ConfidenceMixin):
         self.batch_dim_index = self.cfg.get('batch_dim_index', 0)
         self.word_seperator = self.cfg.get('word_seperator', ' ')
 
-        possible_strategies = ['greedy', 'beam', 'pyctcdecode', 'flashlight']
+        possible_strategies = ['greedy', 'beam', 'pyctcdecode', 'flashlight', 'prefix_beam']
         if self.cfg.strategy not in possible_strategies:
             raise ValueError(f"Decoding strategy must be one of {possible_strategies}. Given {self.cfg.strategy}")
 
@@ -442,6 +483,19 @@ class AbstractCTCDecoding(ConfidenceMixin):
 
             self.decoding.override_fold_consecutive_value = False
 
+        elif self.cfg.strategy == 'prefix_beam':
+
+            self.decoding = ctc_beam_decoding.BeamCTCInfer(
+                blank_id=blank_id,
+                beam_size=self.cfg.beam.get('beam_size', 1),
+                search_type='prefix_beam',
+                return_best_hypothesis=self.cfg.beam.get('return_best_hypothesis', True),
+                preserve_alignments=self.preserve_alignments,
+                compute_timestamps=self.compute_timestamps,
+            )
+
+            self.decoding.override_fold_consecutive_value = False
+
         else:
             raise ValueError(
                 f"Incorrect decoding strategy supplied. Must be one of {possible_strategies}\n"
@@ -1001,6 +1055,8 @@ class CTCDecoding(AbstractCTCDecoding):
                 Possible values are :
                 -   greedy (for greedy decoding).
                 -   beam (for DeepSpeed KenLM based decoding).
+                -   prefix_beam (for CTC prefix beam search without language model, which also supports
+                    incremental decoding of streamed log probabilities).
 
             compute_timestamps: A bool flag, which determines whether to compute the character/subword, or
                 word based timestamp mapping the output log-probabilities to discrite intervals of timestamps.
@@ -1232,8 +1288,6 @@ class WER(Metric):
             target_lengths: an integer torch.Tensor of shape ``[Batch]``
             predictions_lengths: an integer torch.Tensor of shape ``[Batch]``
         """
-        words = 0
-        scores = 0
         references = []
         with torch.no_grad():
             # prediction_cpu_tensor = tensors[0].long().cpu()
@@ -1256,16 +1310,7 @@ class WER(Metric):
             logging.info(f"reference:{references[0]}")
             logging.info(f"predicted:{hypotheses[0]}")
 
-        for h, r in zip(hypotheses, references):
-            if self.use_cer:
-                h_list = list(h)
-                r_list = list(r)
-            else:
-                h_list = h.split()
-                r_list = r.split()
-            words += len(r_list)
-            # Compute Levenstein's distance
-            scores += editdistance.eval(h_list, r_list)
+        scores, words = word_error_rate_scores(hypotheses, references, use_cer=self.use_cer)
 
         self.scores = torch.tensor(scores, device=self.scores.device, dtype=self.scores.dtype)
         self.words = torch.tensor(words, device=self.words.device, dtype=self.words.dtype)
@@ -15,11 +15,10 @@
 from dataclasses import dataclass
 from typing import List
 
-import editdistance
 import torch
 from torchmetrics import Metric
 
-from nemo.collections.asr.metrics.wer import AbstractCTCDecoding, CTCDecodingConfig
+from nemo.collections.asr.metrics.wer import AbstractCTCDecoding, CTCDecodingConfig, word_error_rate_scores
 from nemo.collections.asr.parts.submodules import ctc_beam_decoding
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis
 from nemo.collections.common.tokenizers.aggregate_tokenizer import DummyTokenizer
@@ -38,6 +37,8 @@ class CTCBPEDecoding(AbstractCTCDecoding):
                 Possible values are :
                 -   greedy (for greedy decoding).
                 -   beam (for DeepSpeed KenLM based decoding).
+                -   prefix_beam (for CTC prefix beam search without language model, which also supports
+                    incremental decoding of streamed log probabilities).
 
             compute_timestamps: A bool flag, which determines whether to compute the character/subword, or
                 word based timestamp mapping the output log-probabilities to discrite intervals of timestamps.
@@ -279,8 +280,6 @@ class WERBPE(Metric):
             target_lengths: an integer torch.Tensor of shape ``[Batch]``
             predictions_lengths: an integer torch.Tensor of shape ``[Batch]``
         """
-        words = 0
-        scores = 0
         references = []
         with torch.no_grad():
             targets_cpu_tensor = targets.long().cpu()
@@ -302,16 +301,7 @@ class WERBPE(Metric):
             logging.info(f"reference:{references[0]}")
             logging.info(f"predicted:{hypotheses[0]}")
 
-        for h, r in zip(hypotheses, references):
-            if self.use_cer:
-                h_list = list(h)
-                r_list = list(r)
-            else:
-                h_list = h.split()
-                r_list = r.split()
-            words += len(r_list)
-            # Compute Levenstein's distance
-            scores += editdistance.eval(h_list, r_list)
+        scores, words = word_error_rate_scores(hypotheses, references, use_cer=self.use_cer)
 
         self.scores = torch.tensor(scores, device=self.scores.device, dtype=self.scores.dtype)
         self.words = torch.tensor(words, device=self.words.device, dtype=self.words.dtype)
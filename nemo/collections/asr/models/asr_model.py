@@ -17,6 +17,7 @@ from typing import List
 
 import torch
 
+from nemo.collections.asr.parts.preprocessing.batch_perturb import process_batch_augmentations
 from nemo.core.classes import ModelPT
 from nemo.core.classes.common import PretrainedModelInfo
 from nemo.core.classes.exportable import Exportable
@@ -117,6 +118,36 @@ class ASRModel(ModelPT, ABC):
         if "skip_nan_grad" in self._cfg and self._cfg["skip_nan_grad"]:
             self._skip_nan_grad = self._cfg["skip_nan_grad"]
 
+    def setup_batch_augmentor(self, train_data_config):
+        """
+        Utility method that must be explicitly called by the subclass in `setup_training_data` in order to support
+        augmentations of whole training batches, configured in `train_ds.batch_augmentor` with the same structure
+        as `train_ds.augmentor`. The batch augmentations are applied to the padded audio in
+        `on_after_batch_transfer`, on the device of the model, instead of in the data loader workers.
+        """
+        self._batch_augmentor = None
+        if train_data_config is not None and train_data_config.get('batch_augmentor', None):
+            self._batch_augmentor = process_batch_augmentations(
+                train_data_config['batch_augmentor'],
+                sample_rate=train_data_config.get('sample_rate', 16000),
+                global_rank=self.global_rank,
+                world_size=self.world_size,
+            )
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        """
+        Applies the batch augmentations, if any, to the audio of training batches.
+        """
+        batch = super().on_after_batch_transfer(batch, dataloader_idx)
+        if getattr(self, '_batch_augmentor', None) is None or not self.training:
+            return batch
+
+        # only batches of padded audio (audio, audio_len, ...) are augmented
+        if isinstance(batch, (list, tuple)) and len(batch) >= 2 and torch.is_tensor(batch[0]) and batch[0].dim() == 2:
+            signal, signal_len = self._batch_augmentor(batch[0], batch[1])
+            batch = type(batch)([signal, signal_len, *batch[2:]])
+        return batch
+
     def on_after_backward(self):
         """
         zero-out the gradients which any of them is NAN or INF
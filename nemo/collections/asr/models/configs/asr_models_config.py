@@ -57,12 +57,24 @@ class ASRDatasetConfig(nemo.core.classes.dataset.DatasetConfig):
     pad_id: int = 0
     use_start_end_token: bool = False
     return_sample_id: Optional[bool] = False
+    tokenization_workers: int = 0
+    tokens_cache_dir: Optional[str] = None
+    resampler: Optional[str] = None
+    resample_cache_dir: Optional[str] = None
+    decode_cache_mb: float = 0
 
     # bucketing params
     bucketing_strategy: str = "synced_randomized"
     bucketing_batch_size: Optional[Any] = None
     bucketing_weights: Optional[List[int]] = None
 
+    # dynamic batching params
+    batch_duration: Optional[float] = None
+    batch_frames: Optional[int] = None
+    max_batch_size: Optional[int] = None
+    dynamic_batching_buffer_size: int = 256
+    dynamic_batching_log_every_n_batches: int = 0
+
 
 @dataclass
 class EncDecCTCConfig(model_cfg.ModelConfig):
@@ -138,6 +138,12 @@ class ClusteringParams(DiarizerComponentConfig):
     sparse_search_volume: int = 30
     # If True, take a majority vote on multiple p-values to estimate the number of speakers.
     maj_vote_spk_count: bool = False
+    # If True, sessions with more than 512 segments are clustered on a sparse k-nearest-neighbor affinity graph.
+    sparse_affinity: bool = False
+    # Number of short sessions clustered together as one batched job.
+    session_batch_size: int = 1
+    # If True, search p-values from coarse to fine in NME-analysis instead of examining all of them.
+    coarse_to_fine_search: bool = False
 
 
 @dataclass
@@ -465,6 +465,9 @@ class ASRWithTTSModel(ASRModel):
             return
 
         self._update_dataset_config(dataset_name='train', config=train_data_config)
+        if train_data_config.get('batch_augmentor', None):
+            # batches mixing audio and text-only examples are not augmented consistently
+            logging.warning(f'train_ds.batch_augmentor is not supported by {type(self).__name__} and will be ignored.')
         asr_dataset = get_audio_to_text_bpe_dataset_from_config(
             train_data_config,
             local_rank=self.local_rank,
@@ -314,6 +314,7 @@ class EncDecTransfModelBPE(ASRModel, ExportableEncDecModel, ASRBPEMixin):
         # create audio-only data loader
         self._update_dataset_config(dataset_name='train', config=train_data_config)
         self._train_dl = self._setup_dataloader_from_config(config=train_data_config)
+        self.setup_batch_augmentor(train_data_config)
 
         # Need to set this because if using an IterableDataset, the length of the
         # dataloader is the total number of samples rather than the number of batches,
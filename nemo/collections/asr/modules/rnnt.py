@@ -398,6 +398,27 @@ class StatelessTransducerDecoder(rnnt_abstract.AbstractRNNTDecoder, Exportable):
 
         return old_states
 
+    def batch_replace_states_mask(
+        self, src_states: List[torch.Tensor], dst_states: List[torch.Tensor], mask: torch.Tensor,
+    ) -> List[torch.Tensor]:
+        """Replace states in dst_states with states from src_states where mask is True, without synchronization.
+
+        Args:
+            src_states: packed decoder states
+                single element list of (B x C)
+
+            dst_states: packed decoder states, updated in place
+                single element list of (B x C)
+
+            mask: bool tensor of shape [B], where to replace the states.
+
+        Returns:
+            dst_states, with the states of src_states where mask is True.
+                single element list of (B x C)
+        """
+        torch.where(mask.unsqueeze(-1), src_states[0], dst_states[0], out=dst_states[0])
+        return dst_states
+
     def batch_score_hypothesis(
         self, hypotheses: List[rnnt_utils.Hypothesis], cache: Dict[Tuple[int], Any], batch_states: List[torch.Tensor]
     ) -> Tuple[torch.Tensor, List[torch.Tensor], torch.Tensor]:
@@ -1047,6 +1068,29 @@ class RNNTDecoder(rnnt_abstract.AbstractRNNTDecoder, Exportable, AdapterModuleMi
 
         return old_states
 
+    def batch_replace_states_mask(
+        self, src_states: List[torch.Tensor], dst_states: List[torch.Tensor], mask: torch.Tensor,
+    ) -> List[torch.Tensor]:
+        """Replace states in dst_states with states from src_states where mask is True, without synchronization.
+
+        Args:
+            src_states(list): packed decoder states
+                (L x B x H, L x B x H)
+
+            dst_states: packed decoder states, updated in place
+                (L x B x H, L x B x H)
+
+            mask: bool tensor of shape [B], where to replace the states.
+
+        Returns:
+            dst_states, with the states of src_states where mask is True.
+                (L x B x H, L x B x H)
+        """
+        mask = mask.unsqueeze(0).unsqueeze(-1)
+        for state_id in range(len(dst_states)):
+            torch.where(mask, src_states[state_id], dst_states[state_id], out=dst_states[state_id])
+        return dst_states
+
     # Adapter method overrides
     def add_adapter(self, name: str, cfg: DictConfig):
         # Update the config with correct input dim
@@ -277,3 +277,23 @@ class AbstractRNNTDecoder(NeuralModule, ABC):
                 (L x B x H, L x B x H)
         """
         raise NotImplementedError()
+
+    def batch_replace_states_mask(
+        self, src_states: List[torch.Tensor], dst_states: List[torch.Tensor], mask: torch.Tensor,
+    ) -> List[torch.Tensor]:
+        """Replace states in dst_states with states from src_states where mask is True, without synchronization.
+
+        Args:
+            src_states(list): packed decoder states
+                (L x B x H, L x B x H)
+
+            dst_states: packed decoder states, updated in place
+                (L x B x H, L x B x H)
+
+            mask: bool tensor of shape [B], where to replace the states.
+
+        Returns:
+            dst_states, with the states of src_states where mask is True.
+                (L x B x H, L x B x H)
+        """
+        raise NotImplementedError()
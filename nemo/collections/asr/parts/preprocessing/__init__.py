@@ -12,6 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from nemo.collections.asr.parts.preprocessing.batch_perturb import (
+    BatchAudioAugmentor,
+    BatchPerturbation,
+    batch_perturbation_types,
+    process_batch_augmentations,
+    register_batch_perturbation,
+)
 from nemo.collections.asr.parts.preprocessing.feature_loader import ExternalFeatureLoader
 from nemo.collections.asr.parts.preprocessing.features import FeaturizerFactory, FilterbankFeatures, WaveformFeaturizer
 from nemo.collections.asr.parts.preprocessing.perturb import (
@@ -33,4 +40,5 @@ from nemo.collections.asr.parts.preprocessing.perturb import (
     process_augmentations,
     register_perturbation,
 )
+from nemo.collections.asr.parts.preprocessing.resample import Resampler, get_resampler, register_resampler, resamplers
 from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
@@ -0,0 +1,134 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
+from nemo.collections.common.parts.preprocessing import collections
+from nemo.utils import logging
+
+__all__ = ['AudioBank']
+
+
+class AudioBank(object):
+    """
+    Audio files of a manifest, e.g., noise or room impulse responses, decoded once at a sampling rate into a single
+    float32 array [num_samples] or [num_samples, num_channels], with a table of the start and length of each file.
+    `bank[i]` returns the samples of the i-th file as a view of the array, without copying them.
+
+    If `bank_dir` is provided, the array is saved in this directory and memory-mapped, and later banks of the same
+    audio files and sampling rate, e.g., in other processes or runs, are loaded from it without decoding. The pages
+    of the mapped file are shared by all the processes which use the bank, e.g., the workers of a DataLoader.
+    Otherwise, the array is kept in memory, which is shared with DataLoader workers started with fork.
+
+    Args:
+        manifest: collection of the audio files
+        sample_rate: sampling rate the audio files are decoded at
+        bank_dir: optional directory to save the decoded audio in
+    """
+
+    def __init__(self, manifest: collections.ASRAudioText, sample_rate: int, bank_dir: Optional[str] = None):
+        self._sample_rate = sample_rate
+        self._path = None
+        self._rms_db = {}
+
+        if bank_dir is not None:
+            self._path = self._bank_path(manifest, sample_rate, bank_dir)
+            if not os.path.exists(self._path + '.npy'):
+                samples, index = self._decode(manifest, sample_rate)
+                self._save(samples, index)
+            self._load()
+        else:
+            self._samples, self._index = self._decode(manifest, sample_rate)
+
+        logging.info(
+            f"Loaded {len(self)} audio files ({self._samples.shape[0] / sample_rate:.1f} sec) into an audio bank"
+            + (f" at {self._path}" if self._path is not None else "")
+        )
+
+    @staticmethod
+    def _bank_path(manifest: collections.ASRAudioText, sample_rate: int, bank_dir: str) -> str:
+        """Path of the saved bank, keyed by the audio files, their size and modification time, and the sample rate."""
+        key = hashlib.sha1(str(sample_rate).encode())
+        for entry in manifest.data:
+            stat = os.stat(entry.audio_file)
+            key.update(
+                f'|{os.path.abspath(entry.audio_file)}|{stat.st_size}|{stat.st_mtime_ns}'
+                f'|{entry.offset}|{entry.duration}'.encode()
+            )
+        return os.path.join(bank_dir, f'audio_bank_{key.hexdigest()}')
+
+    @staticmethod
+    def _decode(manifest: collections.ASRAudioText, sample_rate: int):
+        segments = []
+        for entry in manifest.data:
+            offset = 0 if entry.offset is None else entry.offset
+            duration = 0 if entry.duration is None else entry.duration
+            segments.append(
+                AudioSegment.from_file(entry.audio_file, target_sr=sample_rate, offset=offset, duration=duration)
+            )
+        if len(set(segment.num_channels for segment in segments)) > 1:
+            raise ValueError("All the audio files of an audio bank must have the same number of channels.")
+
+        lengths = np.array([segment.num_samples for segment in segments], dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        samples = np.concatenate([segment._samples for segment in segments])
+        return samples, np.stack([starts, lengths], axis=1)
+
+    def _save(self, samples: np.ndarray, index: np.ndarray):
+        bank_dir = os.path.dirname(self._path)
+        os.makedirs(bank_dir, exist_ok=True)
+        # write to temporary files first, so that other processes never see partial files
+        for suffix, array in [('_index.npy', index), ('.npy', samples)]:
+            with tempfile.NamedTemporaryFile(dir=bank_dir, suffix='.tmp', delete=False) as f:
+                np.save(f, array)
+            os.replace(f.name, self._path + suffix)
+
+    def _load(self):
+        self._samples = np.load(self._path + '.npy', mmap_mode='r')
+        self._index = np.load(self._path + '_index.npy')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._path is not None:
+            # the memory-mapped file is opened again instead of pickling its content
+            del state['_samples']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._path is not None:
+            self._load()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        start, length = self._index[i]
+        return self._samples[start : start + length]
+
+    @property
+    def sample_rate(self):
+        return self._sample_rate
+
+    def rms_db(self, i: int):
+        """RMS energy in dB of the i-th audio file, per channel for multi-channel audio."""
+        if i not in self._rms_db:
+            mean_square = np.mean(self[i] ** 2, axis=0)
+            self._rms_db[i] = 10 * np.log10(mean_square)
+        return self._rms_db[i]
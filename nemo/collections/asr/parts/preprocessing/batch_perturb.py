@@ -0,0 +1,864 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Augmentations of whole batches of padded audio.
+
+The perturbations in `perturb.py` are applied to one `AudioSegment` at a time inside the data loader workers.
+The batch perturbations here are applied to a padded batch of single-channel audio `[B, T]` and its lengths `[B]`
+after collation, with vectorized torch operations, so that they can run on the device of the model. Each
+perturbation is configured with the same arguments as the corresponding per-sample perturbation, and a batch
+augmentor is created from the same config as `augmentor` (see `process_batch_augmentations`).
+"""
+import copy
+import inspect
+import math
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from nemo.collections.asr.parts.preprocessing.perturb import (
+    AugmentationDataset,
+    NoisePerturbation,
+    _make_audio_bank,
+    read_one_audiosegment,
+)
+from nemo.collections.common.parts.preprocessing import collections, parsers
+from nemo.utils import logging
+
+try:
+    from omegaconf import DictConfig, OmegaConf
+
+    HAVE_OMEGACONF = True
+except ModuleNotFoundError:
+    HAVE_OMEGACONF = False
+
+
+# Parameters of the windowed sinc resampling filters, matching the ones of `resampy`
+_RESAMPLE_FILTERS = {
+    'kaiser_best': dict(lowpass_filter_width=64, rolloff=0.9475937167399596, beta=14.769656459379492),
+    'kaiser_fast': dict(lowpass_filter_width=16, rolloff=0.85, beta=8.555504641634386),
+}
+_RESAMPLE_FILTERS['fft'] = _RESAMPLE_FILTERS['kaiser_best']
+_RESAMPLE_FILTERS['scipy'] = _RESAMPLE_FILTERS['kaiser_best']
+
+
+@lru_cache(maxsize=64)
+def _sinc_resample_kernel(
+    orig_freq: int, new_freq: int, lowpass_filter_width: int, rolloff: float, beta: float
+) -> Tuple[torch.Tensor, int]:
+    """Polyphase filter bank [new_freq, 1, K] of a Kaiser windowed sinc resampler, and its padding."""
+    base_freq = min(orig_freq, new_freq) * rolloff
+    width = math.ceil(lowpass_filter_width * orig_freq / base_freq)
+    idx = torch.arange(-width, width + orig_freq, dtype=torch.float64)[None, None] / orig_freq
+    t = torch.arange(0, -new_freq, -1, dtype=torch.float64)[:, None, None] / new_freq + idx
+    t *= base_freq
+    t = t.clamp_(-lowpass_filter_width, lowpass_filter_width)
+
+    beta = torch.tensor(float(beta), dtype=torch.float64)
+    window = torch.i0(beta * torch.sqrt(1 - (t / lowpass_filter_width) ** 2)) / torch.i0(beta)
+
+    t *= math.pi
+    kernels = torch.where(t == 0, torch.ones_like(t), t.sin() / t)
+    kernels *= window * base_freq / orig_freq
+    return kernels.to(torch.float32), width
+
+
+def resample_batch(audio: torch.Tensor, orig_freq: int, new_freq: int, resample_type: str = 'kaiser_best'):
+    """
+    Resamples a batch of audio `[B, T]` with a windowed sinc filter.
+
+    Returns:
+        Resampled audio `[B, ceil(T * new_freq / orig_freq)]`.
+    """
+    if orig_freq == new_freq:
+        return audio
+    gcd = math.gcd(orig_freq, new_freq)
+    orig_freq, new_freq = orig_freq // gcd, new_freq // gcd
+
+    kernel, width = _sinc_resample_kernel(orig_freq, new_freq, **_RESAMPLE_FILTERS[resample_type])
+    kernel = kernel.to(device=audio.device, dtype=audio.dtype)
+
+    batch_size, length = audio.shape
+    resampled = F.conv1d(F.pad(audio, (width, width + orig_freq)).unsqueeze(1), kernel, stride=orig_freq)
+    resampled = resampled.transpose(1, 2).reshape(batch_size, -1)
+    return resampled[:, : math.ceil(new_freq * length / orig_freq)]
+
+
+def _length_mask(lengths: torch.Tensor, max_length: int) -> torch.Tensor:
+    """Mask [B, max_length] of the valid samples of each utterance."""
+    return torch.arange(max_length, device=lengths.device).unsqueeze(0) < lengths.unsqueeze(1)
+
+
+def _rms_db(audio: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+    """RMS value in decibels of the valid samples of each utterance, same as `AudioSegment.rms_db`."""
+    mean_square = (audio ** 2).sum(dim=1) / lengths.clamp(min=1)
+    return 10 * torch.log10(mean_square.clamp(min=torch.finfo(audio.dtype).tiny))
+
+
+def _shifted(audio: torch.Tensor, source_index: torch.Tensor, valid: torch.Tensor) -> torch.Tensor:
+    """out[b, t] = audio[b, source_index[b, t]] where valid[b, t], 0 elsewhere."""
+    if audio.shape[1] == 0:
+        return audio.new_zeros(source_index.shape)
+    return torch.gather(audio, 1, source_index.clamp(0, audio.shape[1] - 1)) * valid
+
+
+def _collate_segments(
+    load_segment: Callable[[], np.ndarray], mask: torch.Tensor, device, dtype
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Loads one segment per masked utterance and pads them into a batch, other utterances get an empty segment."""
+    segments = [load_segment() if selected else np.zeros(0) for selected in mask.tolist()]
+    lengths = torch.tensor([len(segment) for segment in segments], dtype=torch.long)
+    batch = torch.zeros(len(segments), max(int(lengths.max()), 1), dtype=dtype)
+    for i, segment in enumerate(segments):
+        batch[i, : len(segment)] = torch.as_tensor(segment, dtype=dtype)
+    return batch.to(device), lengths.to(device)
+
+
+class BatchPerturbation(object):
+    """
+    Perturbation of a batch of padded audio.
+
+    Args:
+        rng (int): Random seed. Default is None, in which case the global torch random generator is used.
+    """
+
+    def __init__(self, rng=None):
+        self._generator = torch.Generator().manual_seed(rng) if rng is not None else None
+
+    def _uniform(self, low, high, size) -> torch.Tensor:
+        return low + (high - low) * torch.rand(size, dtype=torch.float64, generator=self._generator)
+
+    def _randint(self, low, high, size) -> torch.Tensor:
+        """Random integers in [low, high), where low and high can be tensors."""
+        return torch.floor(
+            low + (high - low) * torch.rand(size, dtype=torch.float64, generator=self._generator)
+        ).long()
+
+    def max_augmentation_length(self, length):
+        return length
+
+    def perturb(
+        self, audio: torch.Tensor, audio_len: torch.Tensor, mask: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Args:
+            audio: padded audio [B, T], zero beyond the length of each utterance.
+            audio_len: lengths [B].
+            mask: bool tensor [B], utterances to perturb. The other utterances are returned unchanged.
+
+        Returns:
+            Perturbed audio [B, T'] and lengths [B].
+        """
+        raise NotImplementedError
+
+
+class BatchSpeedPerturbation(BatchPerturbation):
+    """
+    Batched version of `SpeedPerturbation`. Utterances with the same speed rate are resampled together with a
+    windowed sinc filter, whose parameters are chosen with `resample_type` ('fft' and 'scipy' use the same filter
+    as 'kaiser_best').
+
+    When sampling the speed rate uniformly (`num_rates <= 0`), the new sampling rate is rounded to a multiple of
+    1% of `sr`, so that the filters stay small and can be reused.
+
+    Args:
+        sr: Original sampling rate.
+        resample_type: Type of resampling filter, one of ('kaiser_best', 'kaiser_fast', 'fft', 'scipy').
+        min_speed_rate: Minimum sampling rate modifier.
+        max_speed_rate: Maximum sampling rate modifier.
+        num_rates: Number of discrete rates to allow, see `SpeedPerturbation`.
+        rng: Random seed. Default is None
+    """
+
+    def __init__(self, sr, resample_type, min_speed_rate=0.9, max_speed_rate=1.1, num_rates=5, rng=None):
+        super().__init__(rng=rng)
+        min_rate = min(min_speed_rate, max_speed_rate)
+        if min_rate < 0.0:
+            raise ValueError("Minimum sampling rate modifier must be > 0.")
+
+        if resample_type not in _RESAMPLE_FILTERS:
+            raise ValueError("Supported `resample_type` values are ('kaiser_best', 'kaiser_fast', 'fft', 'scipy')")
+
+        self._sr = sr
+        self._min_rate = min_speed_rate
+        self._max_rate = max_speed_rate
+        self._num_rates = num_rates
+        if num_rates > 0:
+            self._rates = torch.linspace(self._min_rate, self._max_rate, self._num_rates, dtype=torch.float64)
+        self._res_type = resample_type
+
+    def max_augmentation_length(self, length):
+        return length * self._max_rate
+
+    def perturb(self, audio, audio_len, mask):
+        batch_size = audio.shape[0]
+        if self._num_rates <= 0:
+            step = max(self._sr // 100, 1)
+            new_sr = (
+                self._uniform(self._min_rate, self._max_rate, batch_size) * self._sr / step
+            ).round().long() * step
+        else:
+            rates = self._rates[torch.randint(self._num_rates, (batch_size,), generator=self._generator)]
+            new_sr = (self._sr * rates).long()
+        new_sr[~mask.cpu()] = self._sr
+
+        # Skip perturbation in case of identity speed rate
+        if bool((new_sr == self._sr).all()):
+            return audio, audio_len
+
+        lengths = audio_len.cpu()
+        new_len = torch.where(new_sr == self._sr, lengths, torch.ceil(lengths * new_sr / self._sr).long())
+        out = audio.new_zeros(batch_size, int(new_len.max()))
+        for sr in new_sr.unique().tolist():
+            rows = (new_sr == sr).nonzero(as_tuple=True)[0]
+            max_len = int(lengths[rows].max())
+            resampled = resample_batch(audio[rows.to(audio.device), :max_len], self._sr, sr, self._res_type)
+            out[rows.to(audio.device), : resampled.shape[1]] = resampled
+
+        new_len = new_len.to(audio_len.device, audio_len.dtype)
+        return out * _length_mask(new_len, out.shape[1]), new_len
+
+
+class BatchGainPerturbation(BatchPerturbation):
+    """
+    Batched version of `GainPerturbation`.
+
+    Args:
+        min_gain_dbfs (float): Min gain level in dB
+        max_gain_dbfs (float): Max gain level in dB
+        rng (int): Random seed. Default is None
+    """
+
+    def __init__(self, min_gain_dbfs=-10, max_gain_dbfs=10, rng=None):
+        super().__init__(rng=rng)
+        self._min_gain_dbfs = min_gain_dbfs
+        self._max_gain_dbfs = max_gain_dbfs
+
+    def perturb(self, audio, audio_len, mask):
+        gain = self._uniform(self._min_gain_dbfs, self._max_gain_dbfs, audio.shape[0]).to(audio.device)
+        scale = torch.where(mask, 10.0 ** (gain / 20.0), torch.ones_like(gain))
+        return audio * scale.to(audio.dtype).unsqueeze(1), audio_len
+
+
+class BatchShiftPerturbation(BatchPerturbation):
+    """
+    Batched version of `ShiftPerturbation`.
+
+    Args:
+        min_shift_ms (float): Minimum time in milliseconds by which audio will be shifted
+        max_shift_ms (float): Maximum time in milliseconds by which audio will be shifted
+        sample_rate (int): Sampling rate of the audio
+        rng (int): Random seed. Default is None
+    """
+
+    def __init__(self, min_shift_ms=-5.0, max_shift_ms=5.0, sample_rate=16000, rng=None):
+        super().__init__(rng=rng)
+        self._min_shift_ms = min_shift_ms
+        self._max_shift_ms = max_shift_ms
+        self._sample_rate = sample_rate
+
+    def perturb(self, audio, audio_len, mask):
+        shift_ms = self._uniform(self._min_shift_ms, self._max_shift_ms, audio.shape[0]).to(audio.device)
+        shift_samples = torch.div(shift_ms * self._sample_rate, 1000, rounding_mode='floor').long()
+        # utterances shorter than the shift are left unchanged
+        shift_samples *= mask & (shift_ms.abs() / 1000 <= audio_len / self._sample_rate)
+
+        time = torch.arange(audio.shape[1], device=audio.device).unsqueeze(0)
+        source = time + shift_samples.unsqueeze(1)
+        valid = (source >= 0) & (source < audio_len.unsqueeze(1)) & (time < audio_len.unsqueeze(1))
+        return _shifted(audio, source, valid), audio_len
+
+
+class BatchSilencePerturbation(BatchPerturbation):
+    """
+    Batched version of `SilencePerturbation`.
+
+    Args:
+        min_start_silence_secs (float): Min start silence level in secs
+        max_start_silence_secs (float): Max start silence level in secs
+        min_end_silence_secs (float): Min end silence level in secs
+        max_end_silence_secs (float): Max end silence level in secs
+        rng (int): Random seed. Default is None
+        value: (float): value representing silence to be added to audio array.
+        sample_rate (int): Sampling rate of the audio
+    """
+
+    def __init__(
+        self,
+        min_start_silence_secs: float = 0,
+        max_start_silence_secs: float = 0,
+        min_end_silence_secs: float = 0,
+        max_end_silence_secs: float = 0,
+        rng: int = None,
+        value: float = 0,
+        sample_rate: int = 16000,
+    ):
+        super().__init__(rng=rng)
+        self._min_start_silence_secs = min_start_silence_secs
+        self._max_start_silence_secs = max_start_silence_secs
+        self._min_end_silence_secs = min_end_silence_secs
+        self._max_end_silence_secs = max_end_silence_secs
+        self._value = value
+        self._sample_rate = sample_rate
+
+    def perturb(self, audio, audio_len, mask):
+        batch_size = audio.shape[0]
+        start_len = self._uniform(self._min_start_silence_secs, self._max_start_silence_secs, batch_size)
+        end_len = self._uniform(self._min_end_silence_secs, self._max_end_silence_secs, batch_size)
+        start = (start_len * self._sample_rate).long().to(audio.device) * mask
+        end = (end_len * self._sample_rate).long().to(audio.device) * mask
+
+        new_len = audio_len + start + end
+        time = torch.arange(int(new_len.max()), device=audio.device).unsqueeze(0)
+        source = time - start.unsqueeze(1)
+        valid = (source >= 0) & (source < audio_len.unsqueeze(1))
+        out = _shifted(audio, source, valid)
+        silence = ~valid & _length_mask(new_len, time.shape[1])
+        return out.masked_fill(silence, self._value), new_len
+
+
+class BatchWhiteNoisePerturbation(BatchPerturbation):
+    """
+    Batched version of `WhiteNoisePerturbation`.
+
+    Args:
+        min_level (int): Minimum level in dB at which white noise should be added
+        max_level (int): Maximum level in dB at which white noise should be added
+        rng (int): Random seed. Default is None
+    """
+
+    def __init__(self, min_level=-90, max_level=-46, rng=None):
+        super().__init__(rng=rng)
+        self.min_level = int(min_level)
+        self.max_level = int(max_level)
+
+    def perturb(self, audio, audio_len, mask):
+        noise_level_db = self._randint(self.min_level, self.max_level, audio.shape[0]).to(audio.device)
+        scale = 10.0 ** (noise_level_db / 20.0) * mask
+        noise = torch.randn_like(audio) * scale.to(audio.dtype).unsqueeze(1)
+        return audio + noise * _length_mask(audio_len, audio.shape[1]), audio_len
+
+
+class BatchImpulsePerturbation(BatchPerturbation):
+    """
+    Batched version of `ImpulsePerturbation`. The impulse responses are read as before, and all the utterances
+    are convolved with them at once with an FFT.
+
+    Args:
+        manifest_path (list): Manifest file for RIRs
+        audio_tar_filepaths (list): Tar files, if RIR audio files are tarred
+        shuffle_n (int): Shuffle parameter for shuffling buffered files from the tar files
+        normalize_impulse (bool): Normalize impulse response to zero mean and amplitude 1
+        shift_impulse (bool): Shift impulse response to adjust for delay at the beginning
+        sample_rate (int): Sampling rate of the audio
+        rng (int): Random seed. Default is None
+        bank_sample_rate (int): If equal to sample_rate, the RIRs are decoded once into an `AudioBank`.
+            Default is None
+        bank_dir (str): Directory to save the `AudioBank` in, to memory-map it. Default is None
+    """
+
+    def __init__(
+        self,
+        manifest_path=None,
+        audio_tar_filepaths=None,
+        shuffle_n=128,
+        normalize_impulse=False,
+        shift_impulse=False,
+        sample_rate=16000,
+        rng=None,
+        bank_sample_rate=None,
+        bank_dir=None,
+    ):
+        super().__init__(rng=rng)
+        self._manifest = collections.ASRAudioText(manifest_path, parser=parsers.make_parser([]), index_by_file_id=True)
+        self._tarred_audio = False
+        self._data_iterator = None
+        if audio_tar_filepaths:
+            self._tarred_audio = True
+            self._data_iterator = iter(AugmentationDataset(manifest_path, audio_tar_filepaths, shuffle_n))
+        self._normalize_impulse = normalize_impulse
+        self._shift_impulse = shift_impulse
+        self._sample_rate = sample_rate
+        self._bank = _make_audio_bank(self._manifest, self._tarred_audio, bank_sample_rate, bank_dir)
+
+    def get_one_impulse_sample(self):
+        if self._bank is not None and self._bank.sample_rate == self._sample_rate:
+            return self._bank[int(self._randint(0, len(self._bank), 1))]
+        return read_one_audiosegment(
+            self._manifest, self._sample_rate, tarred_audio=self._tarred_audio, audio_dataset=self._data_iterator
+        ).samples
+
+    def perturb(self, audio, audio_len, mask):
+        impulse, impulse_len = _collate_segments(self.get_one_impulse_sample, mask, audio.device, audio.dtype)
+        impulse_mask = _length_mask(impulse_len, impulse.shape[1])
+        if self._normalize_impulse:
+            # normalize the impulse response to zero mean and amplitude 1
+            impulse = impulse - impulse.sum(dim=1, keepdim=True) / impulse_len.clamp(min=1).unsqueeze(1)
+            impulse = impulse * impulse_mask
+            impulse = impulse / impulse.abs().amax(dim=1, keepdim=True).clamp(min=torch.finfo(audio.dtype).tiny)
+
+        # convolve with the full impulse responses
+        fft_len = 2 ** math.ceil(math.log2(audio.shape[1] + impulse.shape[1] - 1))
+        convolved = torch.fft.irfft(torch.fft.rfft(audio, fft_len) * torch.fft.rfft(impulse, fft_len), fft_len)
+
+        # compensate the dominant path propagation delay, and trim to match the input data length
+        delay = impulse.abs().argmax(dim=1) if self._shift_impulse else torch.zeros_like(impulse_len)
+        time = torch.arange(audio.shape[1], device=audio.device).unsqueeze(0)
+        valid = _length_mask(audio_len, audio.shape[1])
+        convolved = _shifted(convolved, time + delay.unsqueeze(1), valid)
+
+        # normalize data samples to [-1,1] after rir convolution to avoid nans with fp16 training
+        peak = convolved.abs().amax(dim=1, keepdim=True).clamp(min=torch.finfo(audio.dtype).tiny)
+        return torch.where(mask.unsqueeze(1), convolved / peak, audio), audio_len
+
+
+class BatchNoisePerturbation(BatchPerturbation):
+    """
+    Batched version of `NoisePerturbation`. The noise samples are read as before, and mixed with all the utterances
+    at once.
+
+    Args:
+        manifest_path (str): Manifest file with paths to noise files
+        min_snr_db (float): Minimum SNR of audio after noise is added
+        max_snr_db (float): Maximum SNR of audio after noise is added
+        max_gain_db (float): Maximum gain that can be applied on the noise sample
+        audio_tar_filepaths (list) : Tar files, if noise audio files are tarred
+        shuffle_n (int): Shuffle parameter for shuffling buffered files from the tar files
+        orig_sr (int): Original sampling rate of the noise files
+        sample_rate (int): Sampling rate of the audio
+        rng (int): Random seed. Default is None
+        bank_sample_rate (int): If equal to sample_rate, the noise files are decoded once into an `AudioBank`.
+            Default is None
+        bank_dir (str): Directory to save the `AudioBank` in, to memory-map it. Default is None
+    """
+
+    def __init__(
+        self,
+        manifest_path=None,
+        min_snr_db=10,
+        max_snr_db=50,
+        max_gain_db=300.0,
+        rng=None,
+        audio_tar_filepaths=None,
+        shuffle_n=100,
+        orig_sr=16000,
+        sample_rate=16000,
+        bank_sample_rate=None,
+        bank_dir=None,
+    ):
+        super().__init__(rng=rng)
+        self._noise_perturber = NoisePerturbation(
+            manifest_path=manifest_path,
+            min_snr_db=min_snr_db,
+            max_snr_db=max_snr_db,
+            max_gain_db=max_gain_db,
+            rng=rng,
+            audio_tar_filepaths=audio_tar_filepaths,
+            shuffle_n=shuffle_n,
+            orig_sr=orig_sr,
+            bank_sample_rate=bank_sample_rate,
+            bank_dir=bank_dir,
+        )
+        self._min_snr_db = min_snr_db
+        self._max_snr_db = max_snr_db
+        self._max_gain_db = max_gain_db
+        self._sample_rate = sample_rate
+
+    @property
+    def orig_sr(self):
+        return self._noise_perturber.orig_sr
+
+    def get_noise_samples(self, mask, device, dtype) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Reads a noise sample for each utterance in mask, returns the padded noise samples and their lengths."""
+        return _collate_segments(
+            lambda: self._noise_perturber.get_one_noise_sample(self._sample_rate).samples, mask, device, dtype
+        )
+
+    def _noise_scale(self, audio, audio_len, noise, noise_len, data_rms):
+        snr_db = self._uniform(self._min_snr_db, self._max_snr_db, audio.shape[0]).to(audio.device)
+        if data_rms is None:
+            data_rms = _rms_db(audio, audio_len)
+        noise_gain_db = (data_rms - _rms_db(noise, noise_len) - snr_db).clamp(max=self._max_gain_db)
+        return (10.0 ** (noise_gain_db / 20.0)).to(audio.dtype)
+
+    def perturb(self, audio, audio_len, mask):
+        noise, noise_len = self.get_noise_samples(mask, audio.device, audio.dtype)
+        return self.perturb_with_input_noise(audio, audio_len, mask, noise, noise_len)
+
+    def perturb_with_input_noise(self, audio, audio_len, mask, noise, noise_len, data_rms=None):
+        """
+        Adds a random crop of the noise samples to the utterances in mask, or the whole noise sample at a random
+        position if it is shorter than the utterance.
+
+        Args:
+            audio: padded audio [B, T]
+            audio_len: lengths [B]
+            mask: utterances to perturb [B]
+            noise: padded noise samples [B, T_noise]
+            noise_len: lengths of the noise samples [B]
+            data_rms: rms_db of the audio [B], computed from the audio if None
+        """
+        scale = self._noise_scale(audio, audio_len, noise, noise_len, data_rms)
+
+        batch_size = audio.shape[0]
+        crop_len = torch.minimum(noise_len, audio_len)
+        noise_start = self._randint(0, (noise_len - crop_len + 1).cpu(), batch_size).to(audio.device)
+        data_start = self._randint(0, (audio_len - crop_len + 1).cpu(), batch_size).to(audio.device)
+
+        time = torch.arange(audio.shape[1], device=audio.device).unsqueeze(0)
+        position = time - data_start.unsqueeze(1)
+        valid = (position >= 0) & (position < crop_len.unsqueeze(1)) & mask.unsqueeze(1)
+        added = _shifted(noise, position + noise_start.unsqueeze(1), valid)
+        return audio + added * scale.unsqueeze(1), audio_len
+
+    def perturb_with_foreground_noise(
+        self, audio, audio_len, mask, noise, noise_len, data_rms=None, max_noise_dur=2, max_additions=1
+    ):
+        """
+        Adds between 1 and `max_additions` random chunks of the noise samples, of at most `max_noise_dur`
+        seconds, at random positions of the utterances in mask.
+
+        Args:
+            audio: padded audio [B, T]
+            audio_len: lengths [B]
+            mask: utterances to perturb [B]
+            noise: padded noise samples [B, T_noise]
+            noise_len: lengths of the noise samples [B]
+            data_rms: rms_db of the audio [B], computed from the audio if None
+            max_noise_dur: max noise duration
+            max_additions: number of times for adding noise
+        """
+        scale = self._noise_scale(audio, audio_len, noise, noise_len, data_rms)
+
+        batch_size = audio.shape[0]
+        num_additions = self._randint(1, max_additions + 1, batch_size).to(audio.device)
+        time = torch.arange(audio.shape[1], device=audio.device).unsqueeze(0)
+        for i in range(max_additions):
+            noise_dur = self._uniform(0.0, max_noise_dur, batch_size)
+            start_time = self._uniform(0.0, 1.0, batch_size) * noise_len.cpu() / self._sample_rate
+            start = torch.round(start_time * self._sample_rate).long()
+            end = torch.round(
+                torch.minimum(noise_len.cpu() / self._sample_rate, start_time + noise_dur) * self._sample_rate
+            )
+            chunk_len = torch.minimum(end.long() - start, audio_len.cpu())
+            data_start = self._randint(0, audio_len.cpu() - chunk_len + 1, batch_size)
+
+            start, chunk_len, data_start = (
+                start.to(audio.device),
+                chunk_len.to(audio.device),
+                data_start.to(audio.device),
+            )
+            position = time - data_start.unsqueeze(1)
+            active = mask & (i < num_additions)
+            valid = (position >= 0) & (position < chunk_len.unsqueeze(1)) & active.unsqueeze(1)
+            audio = audio + _shifted(noise, position + start.unsqueeze(1), valid) * scale.unsqueeze(1)
+        return audio, audio_len
+
+
+class BatchRirAndNoisePerturbation(BatchPerturbation):
+    """
+    Batched version of `RirAndNoisePerturbation`. The sampling rate of the original audio is not known after
+    collation, so the noise of the highest original sampling rate is used for all the utterances.
+
+    Args:
+        rir_manifest_path: Manifest file for RIRs
+        rir_tar_filepaths: Tar files, if RIR audio files are tarred
+        rir_prob: Probability of applying a RIR
+        noise_manifest_paths: Foreground noise manifest path
+        min_snr_db: Min SNR for foreground noise
+        max_snr_db: Max SNR for background noise,
+        noise_tar_filepaths: Tar files, if noise files are tarred
+        apply_noise_rir: Whether to convolve foreground noise with a a random RIR
+        orig_sample_rate: Original sampling rate of foreground noise audio
+        max_additions: Max number of times foreground noise is added to an utterance,
+        max_duration: Max duration of foreground noise
+        bg_noise_manifest_paths: Background noise manifest path
+        bg_min_snr_db: Min SNR for background noise
+        bg_max_snr_db: Max SNR for background noise
+        bg_noise_tar_filepaths: Tar files, if noise files are tarred
+        bg_orig_sample_rate: Original sampling rate of background noise audio
+        sample_rate: Sampling rate of the audio
+        rng: Random seed. Default is None
+        bank_sample_rate: If equal to sample_rate, the RIRs and noise files are decoded once into audio banks.
+            Default is None
+        bank_dir: Directory to save the audio banks in, to memory-map them. Default is None
+    """
+
+    def __init__(
+        self,
+        rir_manifest_path=None,
+        rir_prob=0.5,
+        noise_manifest_paths=None,
+        noise_prob=1.0,
+        min_snr_db=0,
+        max_snr_db=50,
+        rir_tar_filepaths=None,
+        rir_shuffle_n=100,
+        noise_tar_filepaths=None,
+        apply_noise_rir=False,
+        orig_sample_rate=None,
+        max_additions=5,
+        max_duration=2.0,
+        bg_noise_manifest_paths=None,
+        bg_noise_prob=1.0,
+        bg_min_snr_db=10,
+        bg_max_snr_db=50,
+        bg_noise_tar_filepaths=None,
+        bg_orig_sample_rate=None,
+        sample_rate=16000,
+        rng=None,
+        bank_sample_rate=None,
+        bank_dir=None,
+    ):
+        super().__init__(rng=rng)
+        self._rir_prob = rir_prob
+        self._noise_prob = noise_prob
+        self._bg_noise_prob = bg_noise_prob
+        self._rir_perturber = BatchImpulsePerturbation(
+            manifest_path=rir_manifest_path,
+            audio_tar_filepaths=rir_tar_filepaths,
+            shuffle_n=rir_shuffle_n,
+            shift_impulse=True,
+            sample_rate=sample_rate,
+            bank_sample_rate=bank_sample_rate,
+            bank_dir=bank_dir,
+        )
+        self._fg_noise_perturber = None
+        self._bg_noise_perturber = None
+        if noise_manifest_paths:
+            self._fg_noise_perturber = self._make_noise_perturber(
+                noise_manifest_paths,
+                min_snr_db,
+                max_snr_db,
+                noise_tar_filepaths,
+                orig_sample_rate,
+                sample_rate,
+                bank_sample_rate,
+                bank_dir,
+            )
+        self._max_additions = max_additions
+        self._max_duration = max_duration
+        if bg_noise_manifest_paths:
+            self._bg_noise_perturber = self._make_noise_perturber(
+                bg_noise_manifest_paths,
+                bg_min_snr_db,
+                bg_max_snr_db,
+                bg_noise_tar_filepaths,
+                bg_orig_sample_rate,
+                sample_rate,
+                bank_sample_rate,
+                bank_dir,
+            )
+        self._apply_noise_rir = apply_noise_rir
+
+    @staticmethod
+    def _make_noise_perturber(
+        manifest_paths,
+        min_snr_db,
+        max_snr_db,
+        tar_filepaths,
+        orig_sample_rate,
+        sample_rate,
+        bank_sample_rate,
+        bank_dir,
+    ):
+        # use the noise set of the highest original sampling rate
+        orig_srs = [16000] * len(manifest_paths) if orig_sample_rate is None else orig_sample_rate
+        i = int(np.argmax(orig_srs))
+        return BatchNoisePerturbation(
+            manifest_path=manifest_paths[i],
+            min_snr_db=min_snr_db[i],
+            max_snr_db=max_snr_db[i],
+            audio_tar_filepaths=tar_filepaths[i],
+            orig_sr=orig_srs[i],
+            sample_rate=sample_rate,
+            bank_sample_rate=bank_sample_rate,
+            bank_dir=bank_dir,
+        )
+
+    def _bernoulli(self, prob, mask):
+        return mask & (self._uniform(0.0, 1.0, mask.shape[0]) < prob).to(mask.device)
+
+    def perturb(self, audio, audio_len, mask):
+        rir_mask = self._bernoulli(self._rir_prob, mask)
+        if rir_mask.any():
+            audio, audio_len = self._rir_perturber.perturb(audio, audio_len, rir_mask)
+
+        data_rms = _rms_db(audio, audio_len)
+
+        if self._fg_noise_perturber is not None:
+            fg_mask = self._bernoulli(self._noise_prob, mask)
+            if fg_mask.any():
+                noise, noise_len = self._fg_noise_perturber.get_noise_samples(fg_mask, audio.device, audio.dtype)
+                if self._apply_noise_rir:
+                    noise, noise_len = self._rir_perturber.perturb(noise, noise_len, fg_mask)
+                audio, audio_len = self._fg_noise_perturber.perturb_with_foreground_noise(
+                    audio,
+                    audio_len,
+                    fg_mask,
+                    noise,
+                    noise_len,
+                    data_rms=data_rms,
+                    max_noise_dur=self._max_duration,
+                    max_additions=self._max_additions,
+                )
+
+        if self._bg_noise_perturber is not None:
+            bg_mask = self._bernoulli(self._bg_noise_prob, mask)
+            if bg_mask.any():
+                noise, noise_len = self._bg_noise_perturber.get_noise_samples(bg_mask, audio.device, audio.dtype)
+                audio, audio_len = self._bg_noise_perturber.perturb_with_input_noise(
+                    audio, audio_len, bg_mask, noise, noise_len, data_rms=data_rms
+                )
+        return audio, audio_len
+
+
+batch_perturbation_types = {
+    "speed": BatchSpeedPerturbation,
+    "gain": BatchGainPerturbation,
+    "silence": BatchSilencePerturbation,
+    "impulse": BatchImpulsePerturbation,
+    "shift": BatchShiftPerturbation,
+    "noise": BatchNoisePerturbation,
+    "white_noise": BatchWhiteNoisePerturbation,
+    "rir_noise_aug": BatchRirAndNoisePerturbation,
+}
+
+
+def register_batch_perturbation(name: str, perturbation: BatchPerturbation):
+    if name in batch_perturbation_types.keys():
+        raise KeyError(
+            f"Batch perturbation with the name {name} exists. "
+            f"Type of perturbation : {batch_perturbation_types[name]}."
+        )
+
+    batch_perturbation_types[name] = perturbation
+
+
+class BatchAudioAugmentor(object):
+    """
+    Applies a pipeline of batch perturbations to a padded batch of audio. Each perturbation is applied to each
+    utterance with its probability.
+
+    Args:
+        perturbations: list of (probability, BatchPerturbation) pairs.
+        rng: Random seed. Default is None
+    """
+
+    def __init__(self, perturbations: Optional[List[Tuple[float, BatchPerturbation]]] = None, rng=None):
+        self._generator = torch.Generator().manual_seed(rng) if rng is not None else None
+        self._pipeline = perturbations if perturbations is not None else []
+
+    def __call__(self, audio: torch.Tensor, audio_len: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        return self.perturb(audio, audio_len)
+
+    def perturb(self, audio: torch.Tensor, audio_len: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Args:
+            audio: padded batch of audio [B, T]
+            audio_len: lengths [B]
+
+        Returns:
+            Perturbed audio [B, T'] and lengths [B].
+        """
+        for (prob, p) in self._pipeline:
+            mask = (torch.rand(audio.shape[0], generator=self._generator) < prob).to(audio.device)
+            if mask.any():
+                audio, audio_len = p.perturb(audio, audio_len, mask)
+        return audio, audio_len
+
+    def max_augmentation_length(self, length):
+        newlen = length
+        for (prob, p) in self._pipeline:
+            newlen = p.max_augmentation_length(newlen)
+        return newlen
+
+
+def process_batch_augmentations(
+    augmenter, sample_rate: int = 16000, global_rank: int = 0, world_size: int = 1
+) -> Optional[BatchAudioAugmentor]:
+    """
+    Process list of batch augmentations, which follows the same structure as `augmentor` (see
+    `process_augmentations`):
+
+    ```yaml
+    train_ds:
+        ...
+        batch_augmentor:
+            speed:
+                prob: 0.5
+                sr: 16000
+                resample_type: kaiser_fast
+            white_noise:
+                prob: 1.0
+                min_level: -90
+                max_level: -46
+    ```
+
+    Custom batch perturbations can be added with `register_batch_perturbation`.
+
+    Args:
+        augmenter: BatchAudioAugmentor object or dictionary of str -> kwargs (dict) which is parsed and used
+            to initialize a BatchAudioAugmentor. Each augmentation must have a keyword `prob`.
+        sample_rate: sampling rate of the audio, passed to the augmentations that need it.
+        global_rank: global rank, passed to the augmentations that need it.
+        world_size: world size, passed to the augmentations that need it.
+
+    Returns: BatchAudioAugmentor object
+    """
+    if augmenter is None:
+        return None
+
+    if isinstance(augmenter, BatchAudioAugmentor):
+        return augmenter
+
+    if HAVE_OMEGACONF and isinstance(augmenter, DictConfig):
+        augmenter = OmegaConf.to_container(augmenter, resolve=True)
+
+    if not isinstance(augmenter, dict):
+        raise ValueError("Cannot parse batch augmenter. Must be a dict or a BatchAudioAugmentor object ")
+
+    augmenter = copy.deepcopy(augmenter)
+
+    augmentations = []
+    for augment_name, augment_kwargs in augmenter.items():
+        prob = augment_kwargs.pop('prob', None)
+
+        if prob is None:
+            raise KeyError(
+                f'Augmentation "{augment_name}" will not be applied as '
+                f'keyword argument "prob" was not defined for this augmentation.'
+            )
+
+        if prob < 0.0 or prob > 1.0:
+            raise ValueError("`prob` must be a float value between 0 and 1.")
+
+        if augment_name not in batch_perturbation_types:
+            raise KeyError(f"Invalid batch perturbation name. Allowed values : {batch_perturbation_types.keys()}")
+
+        augmentation_class = batch_perturbation_types[augment_name]
+        parameters = inspect.signature(augmentation_class).parameters
+        if 'sample_rate' in parameters and 'sample_rate' not in augment_kwargs:
+            augment_kwargs['sample_rate'] = sample_rate
+        if 'global_rank' in parameters:
+            augment_kwargs['global_rank'] = global_rank
+        if 'world_size' in parameters:
+            augment_kwargs['world_size'] = world_size
+        augmentations.append([prob, augmentation_class(**augment_kwargs)])
+
+    logging.info(f"Batch augmentations: {[name for name in augmenter.keys()]}")
+    return BatchAudioAugmentor(perturbations=augmentations)
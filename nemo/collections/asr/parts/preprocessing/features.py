@@ -161,10 +161,21 @@ def make_seq_mask_like(
 
 
 class WaveformFeaturizer(object):
-    def __init__(self, sample_rate=16000, int_values=False, augmentor=None):
+    def __init__(
+        self,
+        sample_rate=16000,
+        int_values=False,
+        augmentor=None,
+        resampler=None,
+        resample_cache_dir=None,
+        decode_cache_mb=0,
+    ):
         self.augmentor = augmentor if augmentor is not None else AudioAugmentor()
         self.sample_rate = sample_rate
         self.int_values = int_values
+        self.resampler = resampler
+        self.resample_cache_dir = resample_cache_dir
+        self.decode_cache_mb = decode_cache_mb
 
     def max_augmentation_length(self, length):
         return self.augmentor.max_augmentation_length(length)
@@ -197,6 +208,9 @@ class WaveformFeaturizer(object):
             orig_sr=orig_sr,
             channel_selector=channel_selector,
             normalize_db=normalize_db,
+            resampler=self.resampler,
+            resample_cache_dir=self.resample_cache_dir,
+            decode_cache_mb=self.decode_cache_mb,
         )
         return self.process_segment(audio)
 
@@ -213,8 +227,18 @@ class WaveformFeaturizer(object):
 
         sample_rate = input_config.get("sample_rate", 16000)
         int_values = input_config.get("int_values", False)
-
-        return cls(sample_rate=sample_rate, int_values=int_values, augmentor=aa)
+        resampler = input_config.get("resampler", None)
+        resample_cache_dir = input_config.get("resample_cache_dir", None)
+        decode_cache_mb = input_config.get("decode_cache_mb", 0)
+
+        return cls(
+            sample_rate=sample_rate,
+            int_values=int_values,
+            augmentor=aa,
+            resampler=resampler,
+            resample_cache_dir=resample_cache_dir,
+            decode_cache_mb=decode_cache_mb,
+        )
 
 
 class FeaturizerFactory(object):
@@ -38,7 +38,7 @@ import io
 import os
 import random
 import subprocess
-from tempfile import NamedTemporaryFile
+from functools import lru_cache
 from typing import Any, List, Optional, Union
 
 import librosa
@@ -46,6 +46,8 @@ import numpy as np
 import soundfile as sf
 from scipy import signal
 
+from nemo.collections.asr.parts.preprocessing.audio_bank import AudioBank
+from nemo.collections.asr.parts.preprocessing.resample import get_resampler
 from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.common.parts.preprocessing import collections, parsers
 from nemo.core.classes import IterableDataset
@@ -88,6 +90,15 @@ def read_one_audiosegment(manifest, target_sr, tarred_audio=False, audio_dataset
     return AudioSegment.from_file(audio_file, target_sr=target_sr, offset=offset, duration=duration)
 
 
+def _make_audio_bank(manifest, tarred_audio, bank_sample_rate, bank_dir):
+    if bank_sample_rate is None:
+        return None
+    if tarred_audio:
+        logging.warning("Audio banks are not supported for tarred audio, the audio files will be read from the tars.")
+        return None
+    return AudioBank(manifest, bank_sample_rate, bank_dir=bank_dir)
+
+
 class Perturbation(object):
     def max_augmentation_length(self, length):
         return length
@@ -343,6 +354,9 @@ class ImpulsePerturbation(Perturbation):
         normalize_impulse (bool): Normalize impulse response to zero mean and amplitude 1
         shift_impulse (bool): Shift impulse response to adjust for delay at the beginning
         rng (int): Random seed. Default is None
+        bank_sample_rate (int): If not None, the RIRs are decoded at this sampling rate once, into an `AudioBank`,
+            which is used for audio at this sampling rate. Not supported for tarred RIRs. Default is None
+        bank_dir (str): Directory to save the `AudioBank` in, to memory-map it. Default is None
     """
 
     def __init__(
@@ -353,6 +367,8 @@ class ImpulsePerturbation(Perturbation):
         normalize_impulse=False,
         shift_impulse=False,
         rng=None,
+        bank_sample_rate=None,
+        bank_dir=None,
     ):
         self._manifest = collections.ASRAudioText(manifest_path, parser=parsers.make_parser([]), index_by_file_id=True)
         self._audiodataset = None
@@ -366,21 +382,26 @@ class ImpulsePerturbation(Perturbation):
             self._audiodataset = AugmentationDataset(manifest_path, audio_tar_filepaths, shuffle_n)
             self._data_iterator = iter(self._audiodataset)
 
+        self._bank = _make_audio_bank(self._manifest, self._tarred_audio, bank_sample_rate, bank_dir)
+
         self._rng = rng
         random.seed(self._rng) if rng else None
 
     def perturb(self, data):
-        impulse = read_one_audiosegment(
-            self._manifest, data.sample_rate, tarred_audio=self._tarred_audio, audio_dataset=self._data_iterator,
-        )
+        if self._bank is not None and self._bank.sample_rate == data.sample_rate:
+            impulse_samples = self._bank[random.randrange(len(self._bank))]
+        else:
+            impulse_samples = read_one_audiosegment(
+                self._manifest, data.sample_rate, tarred_audio=self._tarred_audio, audio_dataset=self._data_iterator,
+            ).samples
 
         # normalize if necessary
         if self._normalize_impulse:
             # normalize the impulse response to zero mean and amplitude 1
-            impulse_norm = impulse.samples - np.mean(impulse.samples)
+            impulse_norm = impulse_samples - np.mean(impulse_samples)
             impulse_norm /= max(abs(impulse_norm))
         else:
-            impulse_norm = impulse.samples
+            impulse_norm = impulse_samples
 
         # len of input data samples
         len_data = len(data._samples)
@@ -446,6 +467,10 @@ class NoisePerturbation(Perturbation):
         shuffle_n (int): Shuffle parameter for shuffling buffered files from the tar files
         orig_sr (int): Original sampling rate of the noise files
         rng (int): Random seed. Default is None
+        bank_sample_rate (int): If not None, the noise files are decoded at this sampling rate once, into an
+            `AudioBank`, which is used for audio at this sampling rate. Not supported for tarred noise.
+            Default is None
+        bank_dir (str): Directory to save the `AudioBank` in, to memory-map it. Default is None
     """
 
     def __init__(
@@ -458,6 +483,8 @@ class NoisePerturbation(Perturbation):
         audio_tar_filepaths=None,
         shuffle_n=100,
         orig_sr=16000,
+        bank_sample_rate=None,
+        bank_dir=None,
     ):
         self._manifest = collections.ASRAudioText(manifest_path, parser=parsers.make_parser([]), index_by_file_id=True)
         self._audiodataset = None
@@ -470,6 +497,8 @@ class NoisePerturbation(Perturbation):
             self._audiodataset = AugmentationDataset(manifest_path, audio_tar_filepaths, shuffle_n)
             self._data_iterator = iter(self._audiodataset)
 
+        self._bank = _make_audio_bank(self._manifest, self._tarred_audio, bank_sample_rate, bank_dir)
+
         random.seed(rng) if rng else None
         self._rng = rng
 
@@ -481,7 +510,12 @@ class NoisePerturbation(Perturbation):
     def orig_sr(self):
         return self._orig_sr
 
+    def _use_bank(self, target_sr):
+        return self._bank is not None and self._bank.sample_rate == target_sr
+
     def get_one_noise_sample(self, target_sr):
+        if self._use_bank(target_sr):
+            return AudioSegment(self._bank[random.randrange(len(self._bank))], target_sr)
         return read_one_audiosegment(
             self._manifest, target_sr, tarred_audio=self._tarred_audio, audio_dataset=self._data_iterator
         )
@@ -492,18 +526,33 @@ class NoisePerturbation(Perturbation):
             data (AudioSegment): audio data
             ref_mic (int): reference mic index for scaling multi-channel audios
         """
+        if self._use_bank(data.sample_rate):
+            # only the part of the noise which is used is copied out of the bank
+            noise_idx = random.randrange(len(self._bank))
+            noise_samples = self._bank[noise_idx]
+            noise_duration = noise_samples.shape[0] / data.sample_rate
+            start_time = random.uniform(0.0, noise_duration - data.duration)
+            if noise_duration > (start_time + data.duration):
+                start_sample = int(round(start_time * data.sample_rate))
+                end_sample = int(round((start_time + data.duration) * data.sample_rate))
+                noise_samples = noise_samples[start_sample:end_sample]
+            noise = AudioSegment(noise_samples, data.sample_rate)
+            self.perturb_with_input_noise(data, noise, ref_mic=ref_mic, noise_rms=self._bank.rms_db(noise_idx))
+            return
+
         noise = read_one_audiosegment(
             self._manifest, data.sample_rate, tarred_audio=self._tarred_audio, audio_dataset=self._data_iterator,
         )
         self.perturb_with_input_noise(data, noise, ref_mic=ref_mic)
 
-    def perturb_with_input_noise(self, data, noise, data_rms=None, ref_mic=0):
+    def perturb_with_input_noise(self, data, noise, data_rms=None, ref_mic=0, noise_rms=None):
         """
         Args:
             data (AudioSegment): audio data
             noise (AudioSegment): noise data
             data_rms (Union[float, List[float]): rms_db for data input
             ref_mic (int): reference mic index for scaling multi-channel audios
+            noise_rms (Union[float, List[float]): rms_db for noise input, if noise is cropped from a longer noise
         """
         if data.num_channels != noise.num_channels:
             raise ValueError(
@@ -518,11 +567,13 @@ class NoisePerturbation(Perturbation):
         snr_db = random.uniform(self._min_snr_db, self._max_snr_db)
         if data_rms is None:
             data_rms = data.rms_db
+        if noise_rms is None:
+            noise_rms = noise.rms_db
 
         if data.num_channels > 1:
-            noise_gain_db = data_rms[ref_mic] - noise.rms_db[ref_mic] - snr_db
+            noise_gain_db = data_rms[ref_mic] - noise_rms[ref_mic] - snr_db
         else:
-            noise_gain_db = data_rms - noise.rms_db - snr_db
+            noise_gain_db = data_rms - noise_rms - snr_db
         noise_gain_db = min(noise_gain_db, self._max_gain_db)
 
         # calculate noise segment to use
@@ -855,6 +906,9 @@ class RirAndNoisePerturbation(Perturbation):
             bg_noise_tar_filepaths: Tar files, if noise files are tarred
             bg_orig_sample_rate: Original sampling rate of background noise audio
             rng: Random seed. Default is None
+            bank_sample_rate: If not None, the RIRs and noise files are decoded at this sampling rate once, into
+                audio banks, see `NoisePerturbation`. Default is None
+            bank_dir: Directory to save the audio banks in, to memory-map them. Default is None
 
     """
 
@@ -880,6 +934,8 @@ class RirAndNoisePerturbation(Perturbation):
         bg_noise_tar_filepaths=None,
         bg_orig_sample_rate=None,
         rng=None,
+        bank_sample_rate=None,
+        bank_dir=None,
     ):
 
         self._rir_prob = rir_prob
@@ -891,6 +947,8 @@ class RirAndNoisePerturbation(Perturbation):
             audio_tar_filepaths=rir_tar_filepaths,
             shuffle_n=rir_shuffle_n,
             shift_impulse=True,
+            bank_sample_rate=bank_sample_rate,
+            bank_dir=bank_dir,
         )
         self._fg_noise_perturbers = None
         self._bg_noise_perturbers = None
@@ -907,6 +965,8 @@ class RirAndNoisePerturbation(Perturbation):
                     max_snr_db=max_snr_db[i],
                     audio_tar_filepaths=noise_tar_filepaths[i],
                     orig_sr=orig_sr,
+                    bank_sample_rate=bank_sample_rate,
+                    bank_dir=bank_dir,
                 )
         self._max_additions = max_additions
         self._max_duration = max_duration
@@ -923,6 +983,8 @@ class RirAndNoisePerturbation(Perturbation):
                     max_snr_db=bg_max_snr_db[i],
                     audio_tar_filepaths=bg_noise_tar_filepaths[i],
                     orig_sr=orig_sr,
+                    bank_sample_rate=bank_sample_rate,
+                    bank_dir=bank_dir,
                 )
 
         self._apply_noise_rir = apply_noise_rir
@@ -957,10 +1019,70 @@ class RirAndNoisePerturbation(Perturbation):
             bg_perturber.perturb_with_input_noise(data, noise, data_rms=data_rms)
 
 
+def _g711_alaw_table() -> np.ndarray:
+    """
+    Decoded value of each 12-bit magnitude after G.711 A-law encoding: 8 segments, each quantized with 16 levels,
+    with the step size doubling from one segment to the next starting with the third.
+    """
+    magnitude = np.arange(4096)
+    segment = np.maximum(np.floor(np.log2(np.maximum(magnitude, 1))).astype(int) - 4, 0)
+    mantissa = (magnitude >> np.maximum(segment, 1)) & 15
+    decoded = np.where(
+        segment == 0, (mantissa << 1) + 1, ((mantissa + 16) << segment) + np.left_shift(1, np.maximum(segment - 1, 0)),
+    )
+    return (decoded / 4096).astype(np.float32)
+
+
+_G711_ALAW_TABLE = _g711_alaw_table()
+
+
+def g711_alaw(samples: np.ndarray) -> np.ndarray:
+    """Encodes samples in [-1, 1] with G.711 A-law and decodes them back."""
+    # 13-bit linear code, negative samples are rounded towards -inf as with a two's complement input
+    magnitude = np.where(samples < 0, np.ceil(-samples * 4096) - 1, np.floor(samples * 4096))
+    magnitude = np.clip(magnitude, 0, 4095).astype(np.int64)
+    return np.where(samples < 0, -_G711_ALAW_TABLE[magnitude], _G711_ALAW_TABLE[magnitude])
+
+
+@lru_cache(maxsize=None)
+def _telephone_band_filter(sample_rate: int) -> np.ndarray:
+    """Second-order sections of the 300 Hz - 3400 Hz band-pass, as `sox ... lowpass 3400 highpass 300`."""
+    lowpass = signal.butter(2, 3400, btype='lowpass', fs=sample_rate, output='sos')
+    highpass = signal.butter(2, 300, btype='highpass', fs=sample_rate, output='sos')
+    return np.concatenate([lowpass, highpass])
+
+
+def _sox_transcode(samples: np.ndarray, sample_rate: int, codec: str, compression: int) -> np.ndarray:
+    """Encodes samples [num_samples, num_channels] with a codec of sox and decodes them back, through pipes."""
+    num_channels = 1 if samples.ndim == 1 else samples.shape[1]
+    wav_buffer = io.BytesIO()
+    sf.write(wav_buffer, samples, sample_rate, format='WAV')
+    encoded = subprocess.run(
+        ['sox', '-t', 'wav', '-', '-V0', '-C', str(compression), '-t', codec, '-'],
+        input=wav_buffer.getvalue(),
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    decoded = subprocess.run(
+        ['sox', '-t', codec, '-', '-V0', '-t', 'raw', '-e', 'signed', '-b', '16']
+        + ['-r', str(sample_rate), '-c', str(num_channels), '-'],
+        input=encoded,
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    decoded = np.frombuffer(decoded, dtype=np.int16).astype(np.float32) / 2 ** 15
+    return decoded if samples.ndim == 1 else decoded.reshape(-1, num_channels)
+
+
+HAVE_SF_VORBIS = 'OGG' in sf.available_formats() and 'compression_level' in inspect.signature(sf.write).parameters
+
+
 class TranscodePerturbation(Perturbation):
     """
-        Audio codec augmentation. This implementation uses sox to transcode audio with low rate audio codecs,
-        so users need to make sure that the installed sox version supports the codecs used here (G711 and amr-nb).
+        Audio codec augmentation. G711 (A-law, band-limited to 300-3400 Hz and resampled to 8 kHz) is applied in memory,
+        ogg (vorbis) is encoded and decoded in memory with soundfile if libsndfile supports it. Otherwise, and for
+        amr-nb, sox is used to transcode audio through pipes, so users need to make sure that the installed sox
+        version supports the codecs used here.
 
         Args:
             codecs (List[str]):A list of codecs to be trancoded to. Default is None.
@@ -985,35 +1107,38 @@ class TranscodePerturbation(Perturbation):
             norm_samples = norm_factor * data._samples
         else:
             norm_samples = data._samples
-        orig_f = NamedTemporaryFile(suffix=".wav")
-        sf.write(orig_f.name, norm_samples.transpose(), 16000)
 
         codec_ind = random.randint(0, len(self._codecs) - 1)
         if self._codecs[codec_ind] == "amr-nb":
-            transcoded_f = NamedTemporaryFile(suffix="_amr.wav")
             rates = list(range(0, 4))
             rate = rates[random.randint(0, len(rates) - 1)]
-            _ = subprocess.check_output(
-                f"sox {orig_f.name} -V0 -C {rate} -t amr-nb - | sox -t amr-nb - -V0 -b 16 -r 16000 {transcoded_f.name}",
-                shell=True,
-            )
+            transcoded = _sox_transcode(norm_samples, data.sample_rate, "amr-nb", rate)
         elif self._codecs[codec_ind] == "ogg":
-            transcoded_f = NamedTemporaryFile(suffix="_ogg.wav")
             rates = list(range(-1, 8))
             rate = rates[random.randint(0, len(rates) - 1)]
-            _ = subprocess.check_output(
-                f"sox {orig_f.name} -V0 -C {rate} -t ogg - | sox -t ogg - -V0 -b 16 -r 16000 {transcoded_f.name}",
-                shell=True,
-            )
+            if HAVE_SF_VORBIS:
+                # libsndfile maps the compression level to the vorbis quality 1 - level, sox -C to quality / 10
+                buffer = io.BytesIO()
+                compression_level = min(max(1.0 - rate / 10, 0.0), 1.0)
+                sf.write(
+                    buffer,
+                    norm_samples,
+                    data.sample_rate,
+                    format='OGG',
+                    subtype='VORBIS',
+                    compression_level=compression_level,
+                )
+                buffer.seek(0)
+                transcoded, _ = sf.read(buffer, dtype='float32')
+            else:
+                transcoded = _sox_transcode(norm_samples, data.sample_rate, "ogg", rate)
         elif self._codecs[codec_ind] == "g711":
-            transcoded_f = NamedTemporaryFile(suffix="_g711.wav")
-            _ = subprocess.check_output(
-                f"sox {orig_f.name} -V0  -r 8000 -c 1 -e a-law {transcoded_f.name} lowpass 3400 highpass 300",
-                shell=True,
-            )
+            transcoded = signal.sosfilt(_telephone_band_filter(data.sample_rate), norm_samples, axis=0)
+            transcoded = get_resampler()(transcoded.astype(np.float32), orig_sr=data.sample_rate, target_sr=8000)
+            transcoded = g711_alaw(transcoded)
+            transcoded = get_resampler()(transcoded, orig_sr=8000, target_sr=data.sample_rate)
 
-        new_data = AudioSegment.from_file(transcoded_f.name, target_sr=16000)
-        data._samples = new_data._samples[0 : data._samples.shape[0]]
+        data._samples = transcoded[0 : data._samples.shape[0]].astype(np.float32, copy=False)
         return
 
 
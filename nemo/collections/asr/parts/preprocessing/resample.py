@@ -0,0 +1,217 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Resampling backends for `AudioSegment`, and an on-disk cache of resampled audio.
+
+A resampler is selected by name (see `resamplers`) or passed as an instance of `Resampler`:
+
+- `librosa`: `librosa.resample` with its default filter (the default backend).
+- `soxr`: `soxr.resample` called directly on the [num_samples, num_channels] layout of `AudioSegment`, which gives
+  the same output as the default of `librosa`, without the transposes and checks.
+- `polyphase`: `scipy.signal.resample_poly`, with the anti-aliasing filters designed once per
+  (orig_sr, target_sr) pair and reused across calls.
+
+With a resampled audio cache, audio files which need resampling are decoded and resampled once, and later loads of
+the same file, offset, duration, target sampling rate and resampler read the resampled samples from the cache.
+"""
+import hashlib
+import math
+import os
+import tempfile
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+import librosa
+import numpy as np
+from scipy import signal
+
+from nemo.utils import logging
+
+try:
+    import soxr
+
+    HAVE_SOXR = True
+except (ImportError, ModuleNotFoundError):
+    HAVE_SOXR = False
+
+
+__all__ = [
+    'Resampler',
+    'LibrosaResampler',
+    'SoxrResampler',
+    'PolyphaseResampler',
+    'resamplers',
+    'register_resampler',
+    'get_resampler',
+    'load_resampled_audio',
+    'save_resampled_audio',
+]
+
+
+class Resampler(object):
+    """Resamples audio [num_samples] or [num_samples, num_channels] along the time axis."""
+
+    def __call__(self, samples: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def __repr__(self):
+        params = ', '.join(f'{key}={value!r}' for key, value in sorted(vars(self).items()))
+        return f'{type(self).__name__}({params})'
+
+
+class LibrosaResampler(Resampler):
+    """
+    Resampling with `librosa.resample`.
+
+    Args:
+        res_type: resampling filter, see `librosa.resample`. Defaults to the default of librosa.
+    """
+
+    def __init__(self, res_type: Optional[str] = None):
+        self.res_type = res_type
+
+    def __call__(self, samples, orig_sr, target_sr):
+        kwargs = {} if self.res_type is None else {'res_type': self.res_type}
+        # resample along the temporal dimension (axis=0) will be in librosa 0.10.0 (#1561)
+        return librosa.core.resample(samples.transpose(), orig_sr=orig_sr, target_sr=target_sr, **kwargs).transpose()
+
+
+class SoxrResampler(Resampler):
+    """
+    Resampling with `soxr.resample`.
+
+    Args:
+        quality: quality of the filter, one of 'QQ', 'LQ', 'MQ', 'HQ' and 'VHQ'. 'HQ' is the default of librosa.
+    """
+
+    def __init__(self, quality: str = 'HQ'):
+        if not HAVE_SOXR:
+            raise ModuleNotFoundError("The `soxr` resampler requires `soxr`, install it with `pip install soxr`.")
+        self.quality = quality
+
+    def __call__(self, samples, orig_sr, target_sr):
+        return soxr.resample(samples, orig_sr, target_sr, quality=self.quality)
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up: int, down: int, window: Union[str, Tuple], half_width: int) -> np.ndarray:
+    """Linear-phase low-pass FIR filter of `scipy.signal.resample_poly` for the reduced rates up / down."""
+    max_rate = max(up, down)
+    return signal.firwin(2 * half_width * max_rate + 1, 1.0 / max_rate, window=window).astype(np.float32)
+
+
+class PolyphaseResampler(Resampler):
+    """
+    Polyphase resampling with `scipy.signal.resample_poly`. The anti-aliasing filter of each (orig_sr, target_sr)
+    pair is designed on first use and cached.
+
+    Args:
+        window: window of the FIR filter, see `scipy.signal.firwin`.
+        half_width: half length of the filter, in multiples of max(up, down).
+    """
+
+    def __init__(self, window: Union[str, Tuple] = ('kaiser', 5.0), half_width: int = 10):
+        self.window = tuple(window) if isinstance(window, list) else window
+        self.half_width = half_width
+
+    def __call__(self, samples, orig_sr, target_sr):
+        gcd = math.gcd(orig_sr, target_sr)
+        up, down = target_sr // gcd, orig_sr // gcd
+        h = _polyphase_filter(up, down, self.window, self.half_width)
+        return signal.resample_poly(samples, up, down, axis=0, window=h).astype(samples.dtype, copy=False)
+
+
+resamplers = {
+    'librosa': LibrosaResampler,
+    'soxr': SoxrResampler,
+    'polyphase': PolyphaseResampler,
+}
+
+
+def register_resampler(name: str, resampler: type):
+    if name in resamplers.keys():
+        raise KeyError(f"Resampler with the name {name} exists. Type of resampler : {resamplers[name]}.")
+
+    resamplers[name] = resampler
+
+
+@lru_cache(maxsize=None)
+def _get_resampler_by_name(name: str) -> Resampler:
+    if name not in resamplers:
+        raise KeyError(f"Invalid resampler name {name}. Allowed values : {resamplers.keys()}")
+    return resamplers[name]()
+
+
+def get_resampler(resampler: Union[None, str, Resampler] = None) -> Resampler:
+    """Returns the resampler with the given name (one instance per name), or `librosa` if None."""
+    if resampler is None:
+        resampler = 'librosa'
+    if isinstance(resampler, str):
+        return _get_resampler_by_name(resampler)
+    return resampler
+
+
+def _resampled_audio_path(cache_dir: str, audio_file: str, target_sr: int, resampler: Resampler, **kwargs) -> str:
+    """
+    Cache file of the resampled audio. The key includes the size and modification time of the audio file,
+    so that a modified file is resampled again.
+    """
+    stat = os.stat(audio_file)
+    key = [os.path.abspath(audio_file), stat.st_size, stat.st_mtime_ns, target_sr, repr(resampler)]
+    key += [f'{name}={value!r}' for name, value in sorted(kwargs.items())]
+    digest = hashlib.sha1('|'.join(map(str, key)).encode()).hexdigest()
+    return os.path.join(cache_dir, digest[:2], f'{digest}.npy')
+
+
+def load_resampled_audio(
+    cache_dir: str, audio_file: str, target_sr: int, resampler: Union[None, str, Resampler] = None, **kwargs
+) -> Optional[np.ndarray]:
+    """
+    Loads resampled audio from the cache.
+
+    Args:
+        cache_dir: directory of the cache.
+        audio_file: path of the audio file.
+        target_sr: sampling rate of the resampled audio.
+        resampler: resampler used to resample the audio.
+        kwargs: other arguments used to load the audio, e.g., offset and duration.
+
+    Returns:
+        The resampled samples, or None if the audio is not in the cache.
+    """
+    path = _resampled_audio_path(cache_dir, audio_file, target_sr, get_resampler(resampler), **kwargs)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not load resampled audio of {audio_file} from the cache file {path}: `{e}`.")
+        return None
+
+
+def save_resampled_audio(
+    cache_dir: str,
+    audio_file: str,
+    target_sr: int,
+    samples: np.ndarray,
+    resampler: Union[None, str, Resampler] = None,
+    **kwargs,
+):
+    """Saves resampled audio to the cache, see `load_resampled_audio` for arguments."""
+    path = _resampled_audio_path(cache_dir, audio_file, target_sr, get_resampler(resampler), **kwargs)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to a temporary file first, so that concurrent readers never see a partial file
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+        np.save(f, samples)
+    os.replace(f.name, path)
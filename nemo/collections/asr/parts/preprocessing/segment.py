@@ -33,15 +33,24 @@
 # SOFTWARE.
 # This file contains code artifacts adapted from https://github.com/ryanleary/patter
 
+import io
 import math
 import os
 import random
-from typing import Optional
+import subprocess
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
 
 import librosa
 import numpy as np
 import soundfile as sf
 
+from nemo.collections.asr.parts.preprocessing.resample import (
+    Resampler,
+    get_resampler,
+    load_resampled_audio,
+    save_resampled_audio,
+)
 from nemo.collections.asr.parts.utils.audio_utils import select_channels
 from nemo.utils import logging
 
@@ -56,6 +65,69 @@ except ModuleNotFoundError:
 
 available_formats = sf.available_formats()
 sf_supported_formats = ["." + i.lower() for i in available_formats.keys()]
+if 'OGG' in available_formats and 'OPUS' in sf.available_subtypes('OGG'):
+    # opus files are in an ogg container
+    sf_supported_formats.append('.opus')
+
+
+def _decode_with_ffmpeg(audio_file, offset: float = 0, duration: float = 0) -> Tuple[np.ndarray, int]:
+    """
+    Decodes audio with the ffmpeg found by pydub, to float32 samples. If offset or duration are provided, they are
+    input options of ffmpeg for files, so that it seeks to the offset in the file and decodes only the requested
+    duration. File objects are piped to ffmpeg, which can not seek in them and skips the audio before the offset.
+    """
+    window = []
+    if offset > 0:
+        window += ['-ss', f'{offset:.6f}']
+    if duration > 0:
+        window += ['-t', f'{duration:.6f}']
+    if isinstance(audio_file, str):
+        command = [Audio.converter, '-nostdin', '-v', 'error', *window, '-i', audio_file]
+        input_data = None
+    else:
+        command = [Audio.converter, '-v', 'error', '-i', 'pipe:0', *window]
+        input_data = audio_file.read()
+    command += ['-vn', '-c:a', 'pcm_f32le', '-f', 'wav', 'pipe:1']
+
+    process = subprocess.run(command, input=input_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise CouldntDecodeError(f"ffmpeg returned error code {process.returncode}: {process.stderr.decode()}")
+    # the wav header written to a pipe has no data size, soundfile reads the samples until the end
+    samples, sample_rate = sf.read(io.BytesIO(process.stdout), dtype='float32')
+    return samples, sample_rate
+
+
+class _DecodedAudioCache(object):
+    """
+    LRU cache of audio files decoded with ffmpeg, bounded by the size of the decoded samples. The cache is global
+    to a process, so segments of the same recording loaded by a DataLoader worker share one decode.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._num_bytes = 0
+
+    def decode(self, audio_file: str, max_mb: float) -> Tuple[np.ndarray, int]:
+        stat = os.stat(audio_file)
+        key = (os.path.abspath(audio_file), stat.st_size, stat.st_mtime_ns)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        samples, sample_rate = _decode_with_ffmpeg(audio_file)
+        # cached samples are shared by the segments, they are copied when an AudioSegment is created
+        samples.flags.writeable = False
+        max_bytes = max_mb * 2 ** 20
+        if samples.nbytes <= max_bytes:
+            self._entries[key] = samples, sample_rate
+            self._num_bytes += samples.nbytes
+            while self._num_bytes > max_bytes:
+                evicted_samples, _ = self._entries.popitem(last=False)[1]
+                self._num_bytes -= evicted_samples.nbytes
+        return samples, sample_rate
+
+
+_decoded_audio_cache = _DecodedAudioCache()
 
 
 class AudioSegment(object):
@@ -64,6 +136,9 @@ class AudioSegment(object):
     :type samples: ndarray.float32
     :param sample_rate: Audio sample rate.
     :type sample_rate: int
+    :param resampler: Resampler used if target_sr differs from sample_rate, name of a resampler or an instance of
+        `Resampler`, see `nemo.collections.asr.parts.preprocessing.resample`. Defaults to librosa.
+    :type resampler: str or Resampler
     :raises TypeError: If the sample data type is not float or int.
     """
 
@@ -81,6 +156,7 @@ class AudioSegment(object):
         channel_selector=None,
         normalize_db: Optional[float] = None,
         ref_channel: Optional[int] = None,
+        resampler: Union[None, str, Resampler] = None,
     ):
         """Create audio segment from samples.
         Samples are convert float32 internally, with int scaled to [-1, 1].
@@ -100,10 +176,7 @@ class AudioSegment(object):
             )
 
         if target_sr is not None and target_sr != sample_rate:
-            # resample along the temporal dimension (axis=0) will be in librosa 0.10.0 (#1561)
-            samples = samples.transpose()
-            samples = librosa.core.resample(samples, orig_sr=sample_rate, target_sr=target_sr)
-            samples = samples.transpose()
+            samples = get_resampler(resampler)(samples, orig_sr=sample_rate, target_sr=target_sr)
             sample_rate = target_sr
         if trim:
             # librosa is using channels-first layout (num_channels, num_samples), which is transpose of AudioSegment's layout
@@ -191,6 +264,9 @@ class AudioSegment(object):
         channel_selector=None,
         normalize_db=None,
         ref_channel=None,
+        resampler=None,
+        resample_cache_dir=None,
+        decode_cache_mb=0,
     ):
         """
         Load a file supported by librosa and return as an AudioSegment.
@@ -213,6 +289,13 @@ class AudioSegment(object):
                                  If set to `None`, the original signal will be used.
         :param normalize_db (Optional[float]): if not None, normalize the audio signal to a target RMS value
         :param ref_channel (Optional[int]): channel to use as reference for normalizing multi-channel audio, set None to use max RMS across channels
+        :param resampler: name of the resampler or an instance of `Resampler`, used if target_sr differs from the
+                          sample rate of the file
+        :param resample_cache_dir: if not None, audio which needs to be resampled is cached in this directory
+                                   after resampling, and loaded from the cache on later calls
+        :param decode_cache_mb: if positive, files which are not supported by soundfile are decoded completely and
+                                kept in a per-process LRU cache of this size in MB, so that segments of the same
+                                file reuse one decode. Otherwise, only the requested segment is decoded
         :return: AudioSegment instance
         """
         samples = None
@@ -232,8 +315,31 @@ class AudioSegment(object):
                 channel_selector=channel_selector,
                 normalize_db=normalize_db,
                 ref_channel=ref_channel,
+                resampler=resampler,
+                resample_cache_dir=resample_cache_dir,
+                decode_cache_mb=decode_cache_mb,
             )
 
+        use_resample_cache = resample_cache_dir is not None and isinstance(audio_file, str) and target_sr is not None
+        if use_resample_cache:
+            cache_kwargs = dict(
+                offset=offset, duration=duration, int_values=int_values, channel_selector=channel_selector
+            )
+            cached_samples = load_resampled_audio(resample_cache_dir, audio_file, target_sr, resampler, **cache_kwargs)
+            if cached_samples is not None:
+                return cls(
+                    cached_samples,
+                    target_sr,
+                    trim=trim,
+                    trim_ref=trim_ref,
+                    trim_top_db=trim_top_db,
+                    trim_frame_length=trim_frame_length,
+                    trim_hop_length=trim_hop_length,
+                    orig_sr=orig_sr,
+                    normalize_db=normalize_db,
+                    ref_channel=ref_channel,
+                )
+
         if not isinstance(audio_file, str) or os.path.splitext(audio_file)[-1] in sf_supported_formats:
             try:
                 with sf.SoundFile(audio_file, 'r') as f:
@@ -256,20 +362,13 @@ class AudioSegment(object):
 
         if HAVE_PYDUB and samples is None:
             try:
-                samples = Audio.from_file(audio_file)
-                sample_rate = samples.frame_rate
-                num_channels = samples.channels
-                if offset > 0:
-                    # pydub does things in milliseconds
-                    seconds = offset * 1000
-                    samples = samples[int(seconds) :]
-                if duration > 0:
-                    seconds = duration * 1000
-                    samples = samples[: int(seconds)]
-                samples = np.array(samples.get_array_of_samples())
-                # For multi-channel signals, channels are stacked in a one-dimensional vector
-                if num_channels > 1:
-                    samples = np.reshape(samples, (-1, num_channels))
+                if decode_cache_mb > 0 and isinstance(audio_file, str):
+                    samples, sample_rate = _decoded_audio_cache.decode(audio_file, decode_cache_mb)
+                    start = int(offset * sample_rate)
+                    end = start + int(duration * sample_rate) if duration > 0 else None
+                    samples = samples[start:end]
+                else:
+                    samples, sample_rate = _decode_with_ffmpeg(audio_file, offset=offset, duration=duration)
             except CouldntDecodeError as err:
                 logging.error(f"Loading {audio_file} via pydub raised CouldntDecodeError: `{err}`.")
 
@@ -277,6 +376,15 @@ class AudioSegment(object):
             libs = "soundfile, and pydub" if HAVE_PYDUB else "soundfile"
             raise Exception(f"Your audio file {audio_file} could not be decoded. We tried using {libs}.")
 
+        if use_resample_cache and sample_rate != target_sr:
+            # select channels and resample, as in the constructor, and cache the result
+            samples = cls(
+                samples, sample_rate, target_sr=target_sr, channel_selector=channel_selector, resampler=resampler
+            )._samples
+            save_resampled_audio(resample_cache_dir, audio_file, target_sr, samples, resampler, **cache_kwargs)
+            sample_rate = target_sr
+            channel_selector = None
+
         return cls(
             samples,
             sample_rate,
@@ -290,6 +398,7 @@ class AudioSegment(object):
             channel_selector=channel_selector,
             normalize_db=normalize_db,
             ref_channel=ref_channel,
+            resampler=resampler,
         )
 
     @classmethod
@@ -303,6 +412,8 @@ class AudioSegment(object):
         trim=False,
         channel_selector=None,
         *args,
+        resample_cache_dir=None,
+        decode_cache_mb=0,
         **kwargs,
     ):
         """
@@ -336,6 +447,8 @@ class AudioSegment(object):
                 duration=duration,
                 channel_selector=None,
                 trim=False,  # Do not apply trim to individual files, it will be applied to the concatenated signal
+                resample_cache_dir=resample_cache_dir,
+                decode_cache_mb=decode_cache_mb,
                 *args,
                 **kwargs,
             )
@@ -384,6 +497,7 @@ class AudioSegment(object):
         channel_selector=None,
         offset=None,
         dtype='float32',
+        resampler=None,
     ):
         """Grabs n_segments number of samples from audio_file.
         If offset is not provided, n_segments are selected randomly.
@@ -399,6 +513,8 @@ class AudioSegment(object):
         :param channel selector: select a subset of channels. If set to `None`, the original signal will be used.
         :param offset: fixed offset in seconds
         :param dtype: data type to load audio as.
+        :param resampler: name of the resampler or an instance of `Resampler`, used if target_sr differs from the
+                          sample rate of the file
         :return: numpy array of samples
         """
         is_segmented = False
@@ -435,7 +551,13 @@ class AudioSegment(object):
             raise e
 
         features = cls(
-            samples, sample_rate, target_sr=target_sr, trim=trim, orig_sr=orig_sr, channel_selector=channel_selector
+            samples,
+            sample_rate,
+            target_sr=target_sr,
+            trim=trim,
+            orig_sr=orig_sr,
+            channel_selector=channel_selector,
+            resampler=resampler,
         )
 
         if is_segmented:
@@ -12,10 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import heapq
 import math
 import os
+from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import torch
 
@@ -61,6 +63,59 @@ def _states_to_device(dec_state, device='cpu'):
     return dec_state
 
 
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) of two python floats, faster than numpy for scalars."""
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+@dataclass
+class CTCPrefixBeamState:
+    """
+    State of an incremental CTC prefix beam search, see `BeamCTCInfer.prefix_beam_search_step`.
+
+    Args:
+        beams: Maps each prefix (tuple of token ids) in the beam to the log probabilities of the frames decoded so far,
+            summed over the alignments which end with a blank and over the ones which end with the last token of
+            the prefix.
+        num_frames: Number of frames decoded so far.
+    """
+
+    beams: Dict[Tuple[int, ...], Tuple[float, float]] = field(default_factory=lambda: {(): (0.0, -math.inf)})
+    num_frames: int = 0
+
+    def sorted_prefixes(self) -> List[Tuple[Tuple[int, ...], float]]:
+        """Prefixes in the beam with their log probabilities, from the most to the least likely."""
+        prefixes = [(prefix, _log_add(*log_probs)) for prefix, log_probs in self.beams.items()]
+        return sorted(prefixes, key=lambda x: x[1], reverse=True)
+
+    @property
+    def best_prefix(self) -> Tuple[int, ...]:
+        """Most likely prefix in the beam, i.e. the current partial result."""
+        return self.sorted_prefixes()[0][0]
+
+    @property
+    def stable_prefix(self) -> Tuple[int, ...]:
+        """
+        Longest prefix shared by all the prefixes in the beam.
+        Every prefix found by continuing the search extends a prefix in the current beam, so the stable prefix
+        does not change anymore and can be emitted as a final partial result.
+        """
+        prefixes = list(self.beams)
+        stable = prefixes[0]
+        for prefix in prefixes[1:]:
+            length = 0
+            for a, b in zip(stable, prefix):
+                if a != b:
+                    break
+                length += 1
+            stable = stable[:length]
+        return stable
+
+
 class AbstractBeamCTCInfer(Typing):
     """A beam CTC decoder.
 
@@ -167,9 +222,12 @@ class AbstractBeamCTCInfer(Typing):
 
 
 class BeamCTCInfer(AbstractBeamCTCInfer):
-    """A greedy CTC decoder.
+    """A beam CTC decoder.
+
+    Provides a common abstraction for sample level beam decoding.
 
-    Provides a common abstraction for sample level and batch level greedy decoding.
+    The `prefix_beam` search type is a CTC prefix beam search without language model, which can also decode a stream
+    of log probabilities chunk by chunk - see `prefix_beam_search_step`.
 
     Args:
         blank_index: int index of the blank token. Can be 0 or len(vocabulary).
@@ -214,10 +272,12 @@ class BeamCTCInfer(AbstractBeamCTCInfer):
             self.search_algorithm = self._pyctcdecode_beam_search
         elif search_type == "flashlight":
             self.search_algorithm = self.flashlight_beam_search
+        elif search_type == "prefix_beam":
+            self.search_algorithm = self.prefix_beam_search
         else:
             raise NotImplementedError(
                 f"The search type ({search_type}) supplied is not supported!\n"
-                f"Please use one of : (default, nemo, pyctcdecode)"
+                f"Please use one of : (default, nemo, pyctcdecode, flashlight, prefix_beam)"
             )
 
         # Log the beam search algorithm
@@ -559,6 +619,131 @@ class BeamCTCInfer(AbstractBeamCTCInfer):
 
         return nbest_hypotheses
 
+    @torch.no_grad()
+    def prefix_beam_search(
+        self, x: torch.Tensor, out_len: torch.Tensor
+    ) -> List[Union[rnnt_utils.Hypothesis, rnnt_utils.NBestHypotheses]]:
+        """
+        CTC Prefix Beam Search Algorithm, without language model.
+        Based on https://arxiv.org/abs/1408.2873
+
+        Args:
+            x: Tensor of shape [B, T, V+1], where B is the batch size, T is the maximum sequence length,
+                and V is the vocabulary size. The tensor contains log-probabilities.
+            out_len: Tensor of shape [B], contains lengths of each sequence in the batch.
+
+        Returns:
+            A list of NBestHypotheses objects, one for each sequence in the batch.
+        """
+        if self.compute_timestamps:
+            raise ValueError(
+                f"Beam Search with strategy `{self.search_type}` does not support time stamp calculation!"
+            )
+
+        x = x.to('cpu')
+
+        nbest_hypotheses = []
+        for sample_id in range(len(x)):
+            state = self.prefix_beam_search_step(x[sample_id, : out_len[sample_id], :])
+            hypotheses = self.prefix_beam_state_to_hypotheses(state)
+
+            # If alignment must be preserved, we preserve a view of the output logprobs.
+            # Note this view is shared amongst all beams within the sample.
+            if self.preserve_alignments:
+                for hypothesis in hypotheses.n_best_hypotheses:
+                    hypothesis.alignments = x[sample_id][: out_len[sample_id]]
+
+            nbest_hypotheses.append(hypotheses)
+
+        return nbest_hypotheses
+
+    @torch.no_grad()
+    def prefix_beam_search_step(
+        self, x: torch.Tensor, state: Optional[CTCPrefixBeamState] = None
+    ) -> CTCPrefixBeamState:
+        """
+        Continues a CTC prefix beam search with new frames of log probabilities.
+
+        Decoding the frames of an utterance chunk by chunk, passing the state returned for a chunk to the call
+        for the next one, gives the same beam as decoding all the frames at once. This allows beam search on
+        a stream of log probabilities, without decoding the previous chunks again.
+
+        Args:
+            x: Tensor of shape [T, V+1], the log-probabilities of the new frames.
+            state: State of the search after the previous frames. None to start a new search.
+
+        Returns:
+            The state of the search after the new frames (the given state is updated in place).
+            Use `prefix_beam_state_to_hypotheses` to get the current hypotheses, and
+            `CTCPrefixBeamState.stable_prefix` for the tokens which will not change anymore.
+        """
+        if state is None:
+            state = CTCPrefixBeamState()
+
+        if x.shape[0] == 0:
+            return state
+
+        x = x.to('cpu', dtype=torch.float32)
+
+        # Only the most likely tokens of each frame can extend a prefix in the beam.
+        # The repeated last token of a prefix is always scored, as it does not extend the prefix.
+        num_candidates = min(self.beam_size + 1, x.shape[-1])
+        candidates = x.topk(num_candidates, dim=-1)[1].tolist()
+        log_probs = x.tolist()
+
+        beams = state.beams
+        for frame_log_probs, frame_candidates in zip(log_probs, candidates):
+            blank_log_prob = frame_log_probs[self.blank_id]
+            frame_candidates = [token for token in frame_candidates if token != self.blank_id]
+
+            next_beams = defaultdict(lambda: [-math.inf, -math.inf])
+            for prefix, (prefix_blank, prefix_non_blank) in beams.items():
+                prefix_total = _log_add(prefix_blank, prefix_non_blank)
+
+                # Blank, or repetition of the last token, keep the prefix
+                next_beam = next_beams[prefix]
+                next_beam[0] = _log_add(next_beam[0], prefix_total + blank_log_prob)
+                last_token = prefix[-1] if prefix else None
+                if last_token is not None:
+                    next_beam[1] = _log_add(next_beam[1], prefix_non_blank + frame_log_probs[last_token])
+
+                # New token, extends the prefix. The last token can only be repeated after a blank.
+                for token in frame_candidates:
+                    if token == last_token:
+                        if prefix_blank == -math.inf:
+                            continue
+                        next_beam = next_beams[prefix + (token,)]
+                        next_beam[1] = _log_add(next_beam[1], prefix_blank + frame_log_probs[token])
+                    else:
+                        next_beam = next_beams[prefix + (token,)]
+                        next_beam[1] = _log_add(next_beam[1], prefix_total + frame_log_probs[token])
+
+            best_prefixes = heapq.nlargest(self.beam_size, next_beams.items(), key=lambda x: _log_add(*x[1]))
+            beams = {prefix: tuple(prefix_log_probs) for prefix, prefix_log_probs in best_prefixes}
+
+        state.beams = beams
+        state.num_frames += len(log_probs)
+        return state
+
+    def prefix_beam_state_to_hypotheses(self, state: CTCPrefixBeamState) -> rnnt_utils.NBestHypotheses:
+        """
+        Hypotheses of the current beam of a CTC prefix beam search.
+
+        Args:
+            state: State of the search, returned by `prefix_beam_search_step`.
+
+        Returns:
+            NBestHypotheses object with the prefixes in the beam, from the most to the least likely.
+        """
+        hypotheses = []
+        for prefix, score in state.sorted_prefixes():
+            hypothesis = rnnt_utils.Hypothesis(
+                score=score, y_sequence=list(prefix), dec_state=None, timestep=[], last_token=None
+            )
+            hypotheses.append(hypothesis)
+
+        return rnnt_utils.NBestHypotheses(hypotheses)
+
     def set_decoding_type(self, decoding_type: str):
         super().set_decoding_type(decoding_type)
 
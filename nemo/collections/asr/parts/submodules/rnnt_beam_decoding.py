@@ -36,6 +36,7 @@ from tqdm import tqdm
 
 from nemo.collections.asr.modules import rnnt_abstract
 from nemo.collections.asr.parts.utils.rnnt_utils import (
+    DecoderStateCache,
     HATJointOutput,
     Hypothesis,
     NBestHypotheses,
@@ -196,6 +197,18 @@ class BeamRNNTInfer(Typing):
             Alpha weight of N-gram LM
         tokens_type: str
             Tokenization type ['subword', 'char']
+
+        batched_beam_search: Used for `search_type=default` and `search_type=maes`. When set, the hypotheses of
+            all the utterances in the batch are advanced together - the decoder is called once on the
+            hypotheses of all the utterances and the joint is called once per search step, instead of decoding
+            the utterances one at a time. The n-best hypotheses are the same as the ones of the per-utterance
+            search (up to floating point differences). Partial hypotheses are decoded one utterance at a time.
+
+        decoder_cache_size: Maximum number of label sequences whose decoder output and state are cached during
+            the search. The cache is shared by all the hypotheses (and utterances, unless partial hypotheses
+            are provided) of a call, and the least recently used sequences are discarded when it is full.
+            None for an unbounded cache. The hits and misses of the cache are counted in `decoder_cache`.
+            The same size bounds the cache of n-gram LM scores of (LM state, label) pairs, `ngram_lm_cache`.
     """
 
     @property
@@ -237,6 +250,8 @@ class BeamRNNTInfer(Typing):
         ngram_lm_alpha: float = 0.0,
         hat_subtract_ilm: bool = False,
         hat_ilm_weight: float = 0.0,
+        batched_beam_search: bool = False,
+        decoder_cache_size: Optional[int] = 10000,
     ):
         self.decoder = decoder_model
         self.joint = joint_model
@@ -273,6 +288,19 @@ class BeamRNNTInfer(Typing):
                 f"Please use one of : (default, tsd, alsd, nsc)"
             )
 
+        # Search algorithm which decodes all the utterances of the batch together, if supported
+        self.batched_search_algorithm = None
+        if batched_beam_search and self.beam_size > 1:
+            if search_type == "default":
+                self.batched_search_algorithm = self.batched_default_beam_search
+            elif search_type == "maes":
+                self.batched_search_algorithm = self.batched_modified_adaptive_expansion_search
+            else:
+                raise ValueError(
+                    f"`batched_beam_search` is only supported for search types `default` and `maes`, "
+                    f"but search type was chosen as '{search_type}'."
+                )
+
         if tsd_max_sym_exp_per_step is None:
             tsd_max_sym_exp_per_step = -1
 
@@ -339,6 +367,11 @@ class BeamRNNTInfer(Typing):
         self.hat_subtract_ilm = hat_subtract_ilm
         self.hat_ilm_weight = hat_ilm_weight
 
+        # Decoder outputs and states of label sequences, shared by the hypotheses of a call
+        self.decoder_cache = DecoderStateCache(decoder_cache_size)
+        # N-gram LM scores and next states of (LM state, label) pairs
+        self.ngram_lm_cache = DecoderStateCache(decoder_cache_size)
+
     @typecheck()
     def __call__(
         self,
@@ -375,6 +408,9 @@ class BeamRNNTInfer(Typing):
             self.decoder.eval()
             self.joint.eval()
 
+            # Decoder outputs depend on the current weights, do not reuse the ones of a previous call
+            self.decoder_cache.clear()
+
             hypotheses = []
             with tqdm(
                 range(encoder_output.size(0)),
@@ -390,22 +426,42 @@ class BeamRNNTInfer(Typing):
                     _p = next(self.joint.parameters())
                     dtype = _p.dtype
 
-                    # Decode every sample in the batch independently.
-                    for batch_idx in idx_gen:
-                        inseq = encoder_output[batch_idx : batch_idx + 1, : encoded_lengths[batch_idx], :]  # [1, T, D]
-                        logitlen = encoded_lengths[batch_idx]
+                    if self.batched_search_algorithm is not None and partial_hypotheses is None:
+                        if encoder_output.dtype != dtype:
+                            encoder_output = encoder_output.to(dtype=dtype)
+
+                        # Decode all the samples in the batch together.
+                        batch_nbest_hyps = self.batched_search_algorithm(encoder_output, encoded_lengths)
+                        idx_gen.update(len(batch_nbest_hyps))
 
-                        if inseq.dtype != dtype:
-                            inseq = inseq.to(dtype=dtype)
+                    else:
+                        batch_nbest_hyps = []
+
+                        # Decode every sample in the batch independently.
+                        for batch_idx in idx_gen:
+                            inseq = encoder_output[batch_idx : batch_idx + 1, : encoded_lengths[batch_idx], :]
+                            logitlen = encoded_lengths[batch_idx]
 
-                        # Extract partial hypothesis if exists
-                        partial_hypothesis = partial_hypotheses[batch_idx] if partial_hypotheses is not None else None
+                            if inseq.dtype != dtype:
+                                inseq = inseq.to(dtype=dtype)
+
+                            # Extract partial hypothesis if exists
+                            partial_hypothesis = (
+                                partial_hypotheses[batch_idx] if partial_hypotheses is not None else None
+                            )
 
-                        # Execute the specific search strategy
-                        nbest_hyps = self.search_algorithm(
-                            inseq, logitlen, partial_hypotheses=partial_hypothesis
-                        )  # sorted list of hypothesis
+                            # Decoding resumes from the state of the partial hypothesis, so the decoder outputs
+                            # of the label sequences are specific to the sample
+                            if partial_hypothesis is not None:
+                                self.decoder_cache.clear()
 
+                            # Execute the specific search strategy
+                            nbest_hyps = self.search_algorithm(
+                                inseq, logitlen, partial_hypotheses=partial_hypothesis
+                            )  # sorted list of hypothesis
+                            batch_nbest_hyps.append(nbest_hyps)
+
+                    for nbest_hyps in batch_nbest_hyps:
                         # Prepare the list of hypotheses
                         nbest_hyps = pack_hypotheses(nbest_hyps)
 
@@ -416,6 +472,12 @@ class BeamRNNTInfer(Typing):
                             best_hypothesis = NBestHypotheses(nbest_hyps)  # type: NBestHypotheses
                         hypotheses.append(best_hypothesis)
 
+        logging.debug(f"Beam search decoder cache: {self.decoder_cache}")
+        self.decoder_cache.clear()
+        if self.ngram_lm:
+            logging.debug(f"Beam search n-gram LM cache: {self.ngram_lm_cache}")
+            self.ngram_lm_cache.clear()
+
         self.decoder.train(decoder_training_state)
         self.joint.train(joint_training_state)
         if self.hat_subtract_ilm:
@@ -470,7 +532,7 @@ class BeamRNNTInfer(Typing):
                 hyp.dec_state = partial_hypotheses.dec_state
                 hyp.dec_state = _states_to_device(hyp.dec_state, h.device)
 
-        cache = {}
+        cache = self.decoder_cache
 
         # Initialize state and first token
         y, state, _ = self.decoder.score_hypothesis(hyp, cache)
@@ -559,7 +621,7 @@ class BeamRNNTInfer(Typing):
 
         # Initialize first hypothesis for the beam (blank)
         kept_hyps = [Hypothesis(score=0.0, y_sequence=[self.blank], dec_state=dec_state, timestep=[-1], length=0)]
-        cache = {}
+        cache = self.decoder_cache
 
         if partial_hypotheses is not None:
             if len(partial_hypotheses.y_sequence) > 0:
@@ -665,6 +727,168 @@ class BeamRNNTInfer(Typing):
 
         return self.sort_nbest(kept_hyps)
 
+    def batched_default_beam_search(self, h: torch.Tensor, encoded_lengths: torch.Tensor) -> List[List[Hypothesis]]:
+        """Beam search implementation, advancing the beams of all the utterances in the batch together.
+        Produces the same hypotheses as `default_beam_search` applied to every utterance.
+
+        Args:
+            h: Encoded speech features (B, T_max, D_enc)
+            encoded_lengths: Lengths of the encoder outputs (B)
+
+        Returns:
+            nbest_hyps: N-best decoding results of every utterance
+        """
+        batch_size = h.size(0)
+        lengths = encoded_lengths.tolist()
+
+        # Initialize states
+        beam = min(self.beam_size, self.vocab_size)
+        beam_k = min(beam, (self.vocab_size - 1))
+        blank_tensor = torch.tensor([[self.blank]], device=h.device, dtype=torch.long)
+
+        # Precompute some constants for blank position
+        ids = list(range(self.vocab_size + 1))
+        ids.remove(self.blank)
+
+        # Used when blank token is first vs last token
+        if self.blank == 0:
+            index_incr = 1
+        else:
+            index_incr = 0
+
+        # Initialize zero vector states
+        beam_state = self.decoder.initialize_state(torch.zeros(batch_size, device=h.device, dtype=h.dtype))
+        dec_state = self.decoder.batch_select_state(beam_state, 0)
+
+        # The decoder output only depends on the label sequence, so the cache is shared by all the utterances.
+        # It is seeded with the output for the initial (blank) hypothesis.
+        cache = self.decoder_cache
+        init_hyp = Hypothesis(
+            score=0.0, y_sequence=[self.blank], dec_state=self.decoder.initialize_state(h[:1]), timestep=[-1]
+        )
+        y, state, _ = self.decoder.score_hypothesis(init_hyp, {})
+        if state is None:
+            # Stateless decoders start without context, which is the same as a context of (padding) blanks
+            state = self.decoder.initialize_state(h[:1])
+        init_key = tuple(init_hyp.y_sequence)
+        init_value = (y[0], self.decoder.batch_select_state(state, 0))
+
+        # Initialize first hypothesis for the beam (blank) of every utterance
+        batch_kept_hyps = []
+        for _ in range(batch_size):
+            hyp = Hypothesis(score=0.0, y_sequence=[self.blank], dec_state=dec_state, timestep=[-1], length=0)
+            if self.preserve_alignments:
+                hyp.alignments = [[]]
+            batch_kept_hyps.append([hyp])
+
+        for i in range(max(lengths, default=0)):
+            active = [b for b in range(batch_size) if i < lengths[b]]
+            batch_hyps = {b: batch_kept_hyps[b] for b in active}
+            for b in active:
+                batch_kept_hyps[b] = []
+
+            while active:
+                max_hyps = []
+                for b in active:
+                    max_hyp = max(batch_hyps[b], key=lambda x: x.score)
+                    batch_hyps[b].remove(max_hyp)
+                    max_hyps.append(max_hyp)
+
+                # Keep the initial hypothesis in the cache, it cannot be recomputed by `batch_score_hypothesis`
+                cache[init_key] = init_value
+
+                # update decoder states and get next scores of all the utterances
+                beam_dec_out, beam_state, _ = self.decoder.batch_score_hypothesis(
+                    max_hyps, cache, beam_state
+                )  # [A, 1, D]
+
+                # get next tokens
+                beam_enc_out = h[active, i : i + 1, :]  # [A, 1, D]
+                beam_ytu = torch.log_softmax(
+                    self.joint.joint(beam_enc_out, beam_dec_out) / self.softmax_temperature, dim=-1
+                )  # [A, 1, 1, V + 1]
+                beam_ytu = beam_ytu[:, 0, 0, :]  # [A, V + 1]
+
+                # remove blank token before top k
+                top_k = beam_ytu[:, ids].topk(beam_k, dim=-1)
+
+                # Two possible steps - blank token or non-blank token predicted
+                beam_logp = torch.cat((top_k[0], beam_ytu[:, self.blank : self.blank + 1]), dim=-1).tolist()
+                beam_k_idx = torch.cat((top_k[1] + index_incr, blank_tensor.expand(len(active), 1)), dim=-1).tolist()
+
+                still_active = []
+                for j, b in enumerate(active):
+                    max_hyp = max_hyps[j]
+                    hyps = batch_hyps[b]
+                    kept_hyps = batch_kept_hyps[b]
+                    state = self.decoder.batch_select_state(beam_state, j)
+
+                    # preserve alignments
+                    if self.preserve_alignments:
+                        logprobs = beam_ytu[j].cpu().clone()
+
+                    # for each possible step
+                    for logp, k in zip(beam_logp[j], beam_k_idx[j]):
+                        # construct hypothesis for step
+                        new_hyp = Hypothesis(
+                            score=(max_hyp.score + logp),
+                            y_sequence=max_hyp.y_sequence[:],
+                            dec_state=max_hyp.dec_state,
+                            lm_state=max_hyp.lm_state,
+                            timestep=max_hyp.timestep[:],
+                            length=encoded_lengths[b],
+                        )
+
+                        if self.preserve_alignments:
+                            new_hyp.alignments = copy.deepcopy(max_hyp.alignments)
+
+                        # if current token is blank, dont update sequence, just store the current hypothesis
+                        if k == self.blank:
+                            kept_hyps.append(new_hyp)
+                        else:
+                            # if non-blank token was predicted, update state and sequence and then search more
+                            new_hyp.dec_state = state
+                            new_hyp.y_sequence.append(k)
+                            new_hyp.timestep.append(i)
+
+                            hyps.append(new_hyp)
+
+                        # Determine whether the alignment should be blank or token
+                        if self.preserve_alignments:
+                            new_hyp.alignments[-1].append((logprobs.clone(), torch.tensor(k, dtype=torch.int32)))
+
+                    # keep those hypothesis that have scores greater than next search generation
+                    hyps_max = float(max(hyps, key=lambda x: x.score).score)
+                    kept_most_prob = sorted([hyp for hyp in kept_hyps if hyp.score > hyps_max], key=lambda x: x.score,)
+
+                    # If enough hypothesis have scores greater than next search generation,
+                    # stop beam search for this utterance.
+                    if len(kept_most_prob) >= beam:
+                        if self.preserve_alignments:
+                            # convert Ti-th logits into a torch array
+                            for kept_h in kept_most_prob:
+                                kept_h.alignments.append([])  # blank buffer for next timestep
+
+                        batch_kept_hyps[b] = kept_most_prob
+                    else:
+                        still_active.append(b)
+
+                active = still_active
+
+        nbest_hyps = []
+        for kept_hyps in batch_kept_hyps:
+            for hyp in kept_hyps:
+                # Pack the state of the hypothesis the same way as `default_beam_search`
+                hyp.dec_state = self.decoder.batch_concat_states([hyp.dec_state])
+
+                # Remove trailing empty list of alignments
+                if self.preserve_alignments and len(hyp.alignments[-1]) == 0:
+                    del hyp.alignments[-1]
+
+            nbest_hyps.append(self.sort_nbest(kept_hyps))
+
+        return nbest_hyps
+
     def time_sync_decoding(
         self, h: torch.Tensor, encoded_lengths: torch.Tensor, partial_hypotheses: Optional[Hypothesis] = None
     ) -> List[Hypothesis]:
@@ -706,7 +930,7 @@ class BeamRNNTInfer(Typing):
                 length=0,
             )
         ]
-        cache = {}
+        cache = self.decoder_cache
 
         # Initialize alignments
         if self.preserve_alignments:
@@ -885,7 +1109,7 @@ class BeamRNNTInfer(Typing):
             B[0].alignments = [[]]
 
         final = []
-        cache = {}
+        cache = self.decoder_cache
 
         # ALSD runs for T + U_max steps
         for i in range(h_length + u_max):
@@ -1100,7 +1324,7 @@ class BeamRNNTInfer(Typing):
             )
         ]
 
-        cache = {}
+        cache = self.decoder_cache
 
         # Initialize alignment buffer
         if self.preserve_alignments:
@@ -1189,6 +1413,18 @@ class BeamRNNTInfer(Typing):
                 # List that contains the hypothesis after prefix expansion
                 list_exp = []
                 for i, hyp in enumerate(hyps):  # For all hypothesis
+                    # Setup ngram LM: score all the token expansions of the hypothesis at once
+                    if self.ngram_lm:
+                        ngram_lm_scores = self.compute_ngram_expansion_scores(
+                            hyp,
+                            [
+                                int(k)
+                                for k, _ in k_expansions[i]
+                                if k != self.blank and (hyp.y_sequence + [int(k)]) not in duplication_check
+                            ],
+                            ilm_ytm[i, 0, 0, :] if self.hat_subtract_ilm else None,
+                        )
+
                     for k, new_score in k_expansions[i]:  # for all expansion within these hypothesis
                         new_hyp = Hypothesis(
                             y_sequence=hyp.y_sequence[:],
@@ -1215,15 +1451,8 @@ class BeamRNNTInfer(Typing):
 
                                 # Setup ngram LM:
                                 if self.ngram_lm:
-                                    lm_score, new_hyp.ngram_lm_state = self.compute_ngram_score(
-                                        hyp.ngram_lm_state, int(k)
-                                    )
-                                    if self.hat_subtract_ilm:
-                                        new_hyp.score += self.ngram_lm_alpha * lm_score - float(
-                                            self.hat_ilm_weight * ilm_ytm[i, 0, 0, k]
-                                        )
-                                    else:
-                                        new_hyp.score += self.ngram_lm_alpha * lm_score
+                                    lm_score, new_hyp.ngram_lm_state = ngram_lm_scores[int(k)]
+                                    new_hyp.score += lm_score
 
                                 # TODO: Setup LM
                                 if self.language_model is not None:
@@ -1368,6 +1597,287 @@ class BeamRNNTInfer(Typing):
         # Sort the hypothesis with best scores
         return self.sort_nbest(kept_hyps)
 
+    def batched_modified_adaptive_expansion_search(
+        self, h: torch.Tensor, encoded_lengths: torch.Tensor
+    ) -> List[List[Hypothesis]]:
+        """
+        Modified adaptive expansion search, advancing the beams of all the utterances in the batch together.
+        Produces the same hypotheses as `modified_adaptive_expansion_search` applied to every utterance.
+
+        Args:
+            h: Encoded speech features (B, T_max, D_enc)
+            encoded_lengths: Lengths of the encoder outputs (B)
+
+        Returns:
+            nbest_hyps: N-best decoding results of every utterance
+        """
+        batch_size = h.size(0)
+        lengths = encoded_lengths.tolist()
+
+        # prepare the batched beam states
+        beam = min(self.beam_size, self.vocab_size)
+        beam_state = self.decoder.initialize_state(
+            torch.zeros(beam, device=h.device, dtype=h.dtype)
+        )  # [L, B, H], [L, B, H] for LSTMS
+
+        # Initialize first hypothesis for the beam (blank)
+        init_tokens = [
+            Hypothesis(
+                y_sequence=[self.blank],
+                score=0.0,
+                dec_state=self.decoder.batch_select_state(beam_state, 0),
+                timestep=[-1],
+                length=0,
+            )
+        ]
+
+        # The decoder output only depends on the label sequence, so the cache is shared by all the utterances
+        cache = self.decoder_cache
+
+        # Decode a batch of beam states and scores
+        beam_dec_out, beam_state, _ = self.decoder.batch_score_hypothesis(init_tokens, cache, beam_state)
+        state = self.decoder.batch_select_state(beam_state, 0)
+
+        # Setup ngram LM:
+        if self.ngram_lm:
+            init_lm_state = kenlm.State()
+            self.ngram_lm.BeginSentenceWrite(init_lm_state)
+
+        # TODO: Setup LM
+        if self.language_model is not None:
+            raise NotImplementedError()
+
+        # Initialize first hypothesis for the beam (blank) for kept hypotheses of every utterance
+        batch_kept_hyps = []
+        for _ in range(batch_size):
+            hyp = Hypothesis(
+                y_sequence=[self.blank],
+                score=0.0,
+                dec_state=state,
+                dec_out=[beam_dec_out[0]],
+                lm_state=None,
+                lm_scores=None,
+                timestep=[-1],
+                length=0,
+            )
+            if self.ngram_lm:
+                hyp.ngram_lm_state = init_lm_state
+
+            # Initialize alignment buffer
+            if self.preserve_alignments:
+                hyp.alignments = [[]]
+
+            batch_kept_hyps.append([hyp])
+
+        for t in range(max(lengths, default=0)):
+            active = [b for b in range(batch_size) if t < lengths[b]]
+            enc_out_t = h[:, t : t + 1, :]  # [B, 1, D]
+
+            # Perform prefix search to obtain hypothesis of all the utterances
+            batch_hyps = self.batched_prefix_search(
+                [sorted(batch_kept_hyps[b], key=lambda x: len(x.y_sequence), reverse=True) for b in active],
+                enc_out_t[active],
+                prefix_alpha=self.maes_prefix_alpha,
+            )  # type: List[List[Hypothesis]]
+
+            # Lists that contains the blank token emisions of every utterance
+            batch_list_b = [[] for _ in active]
+            batch_duplication_check = [[hyp.y_sequence for hyp in hyps] for hyps in batch_hyps]
+
+            # Indices (in `active`) of the utterances which are still expanded
+            running = list(range(len(active)))
+
+            # Repeat for number of mAES steps
+            for n in range(self.maes_num_steps):
+                # Pack the encoder and decoder outputs for all current hypothesis of all the utterances
+                beam_enc_ids = [active[a] for a in running for _ in batch_hyps[a]]
+                beam_enc_out = enc_out_t[beam_enc_ids]  # [H, 1, D]
+                beam_dec_out = torch.stack([hyp.dec_out[-1] for a in running for hyp in batch_hyps[a]])  # [H, 1, D]
+
+                # Extract the log probabilities
+                ytm, ilm_ytm = self.resolve_joint_output(beam_enc_out, beam_dec_out)
+                beam_logp, beam_idx = ytm.topk(self.max_candidates, dim=-1)
+
+                beam_logp = beam_logp[:, 0, 0, :]  # [H, V + 1]
+                beam_idx = beam_idx[:, 0, 0, :]  # [H, max_candidates]
+
+                # Convert the candidates once for all the utterances
+                beam_idx_list = beam_idx.tolist()
+                beam_logp_list = beam_logp.tolist()
+
+                # Lists that contains the hypothesis after prefix expansion of every utterance
+                batch_list_exp = {}
+                offset = 0
+                for a in running:
+                    hyps = batch_hyps[a]
+                    list_b = batch_list_b[a]
+                    list_exp = batch_list_exp[a] = []
+
+                    # Compute k expansions for all the current hypotheses
+                    k_expansions = select_k_expansions(
+                        hyps,
+                        beam_idx_list[offset : offset + len(hyps)],
+                        beam_logp_list[offset : offset + len(hyps)],
+                        self.maes_expansion_gamma,
+                        self.maes_expansion_beta,
+                    )
+
+                    for i, hyp in enumerate(hyps):  # For all hypothesis
+                        # Setup ngram LM: score all the token expansions of the hypothesis at once
+                        if self.ngram_lm:
+                            ngram_lm_scores = self.compute_ngram_expansion_scores(
+                                hyp,
+                                [
+                                    int(k)
+                                    for k, _ in k_expansions[i]
+                                    if k != self.blank
+                                    and (hyp.y_sequence + [int(k)]) not in batch_duplication_check[a]
+                                ],
+                                ilm_ytm[offset + i, 0, 0, :] if self.hat_subtract_ilm else None,
+                            )
+
+                        for k, new_score in k_expansions[i]:  # for all expansion within these hypothesis
+                            new_hyp = Hypothesis(
+                                y_sequence=hyp.y_sequence[:],
+                                score=new_score,
+                                dec_out=hyp.dec_out[:],
+                                dec_state=hyp.dec_state,
+                                lm_state=hyp.lm_state,
+                                lm_scores=hyp.lm_scores,
+                                timestep=hyp.timestep[:],
+                                length=t,
+                            )
+                            if self.ngram_lm:
+                                new_hyp.ngram_lm_state = hyp.ngram_lm_state
+
+                            # If the expansion was for blank
+                            if k == self.blank:
+                                list_b.append(new_hyp)
+                            else:
+                                # If the expansion was a token
+                                if (new_hyp.y_sequence + [int(k)]) not in batch_duplication_check[a]:
+                                    new_hyp.y_sequence.append(int(k))
+                                    new_hyp.timestep.append(t)
+
+                                    # Setup ngram LM:
+                                    if self.ngram_lm:
+                                        lm_score, new_hyp.ngram_lm_state = ngram_lm_scores[int(k)]
+                                        new_hyp.score += lm_score
+
+                                    list_exp.append(new_hyp)
+
+                            # Preserve alignments
+                            if self.preserve_alignments:
+                                new_hyp.alignments = copy.deepcopy(hyp.alignments)
+
+                                if k == self.blank:
+                                    new_hyp.alignments[-1].append(
+                                        (
+                                            beam_logp[offset + i].clone().cpu(),
+                                            torch.tensor(self.blank, dtype=torch.int32),
+                                        ),
+                                    )
+                                else:
+                                    new_hyp.alignments[-1].append(
+                                        (
+                                            beam_logp[offset + i].clone().cpu(),
+                                            torch.tensor(new_hyp.y_sequence[-1], dtype=torch.int32),
+                                        ),
+                                    )
+
+                    offset += len(hyps)
+
+                # If there were no token expansions in any of the hypotheses of an utterance,
+                # Early exit for this utterance
+                expanded = []
+                for a in running:
+                    if batch_list_exp[a]:
+                        expanded.append(a)
+                        continue
+
+                    kept_hyps = sorted(batch_list_b[a], key=lambda x: x.score, reverse=True)[:beam]
+                    batch_kept_hyps[active[a]] = kept_hyps
+
+                    # Update aligments with next step
+                    if self.preserve_alignments:
+                        self._next_alignment_step(kept_hyps)
+
+                running = expanded
+                if not running:
+                    break
+
+                list_exp = [hyp for a in running for hyp in batch_list_exp[a]]
+
+                # Decode a batch of beam states and scores for the expansions of all the utterances
+                beam_dec_out, beam_state, _ = self.decoder.batch_score_hypothesis(list_exp, cache, beam_state)
+
+                # If this isnt the last mAES step
+                if n < (self.maes_num_steps - 1):
+                    # For all expanded hypothesis
+                    for i, hyp in enumerate(list_exp):
+                        # Preserve the decoder logits for the current beam
+                        hyp.dec_out.append(beam_dec_out[i])
+                        hyp.dec_state = self.decoder.batch_select_state(beam_state, i)
+
+                    for a in running:
+                        # Copy the expanded hypothesis
+                        batch_hyps[a] = batch_list_exp[a][:]
+
+                        # Update aligments with next step
+                        if self.preserve_alignments:
+                            self._next_alignment_step(batch_hyps[a])
+
+                else:
+                    # Extract the log probabilities
+                    beam_enc_out = enc_out_t[[active[a] for a in running for _ in batch_list_exp[a]]]
+                    beam_logp, _ = self.resolve_joint_output(beam_enc_out, beam_dec_out)
+                    beam_blank_logp = beam_logp[:, 0, 0, self.blank].tolist()
+
+                    # For all expansions, add the score for the blank label
+                    for i, hyp in enumerate(list_exp):
+                        hyp.score += beam_blank_logp[i]
+
+                        # Preserve the decoder's output
+                        hyp.dec_out.append(beam_dec_out[i])
+
+                    list_exp_ids = {id(hyp): i for i, hyp in enumerate(list_exp)}
+                    for a in running:
+                        # Finally, update the kept hypothesis of sorted top Beam candidates
+                        kept_hyps = batch_list_b[a] + batch_list_exp[a]
+                        kept_hyps = sorted(kept_hyps, key=lambda x: x.score, reverse=True)[:beam]
+                        batch_kept_hyps[active[a]] = kept_hyps
+
+                        # Preserve the decoder's state, only for the expansions which are kept
+                        for hyp in kept_hyps:
+                            if id(hyp) in list_exp_ids:
+                                hyp.dec_state = self.decoder.batch_select_state(beam_state, list_exp_ids[id(hyp)])
+
+                        # Update aligments with next step
+                        if self.preserve_alignments:
+                            self._next_alignment_step(kept_hyps)
+
+        nbest_hyps = []
+        for kept_hyps in batch_kept_hyps:
+            # Remove trailing empty list of alignments
+            if self.preserve_alignments:
+                for hyp in kept_hyps:
+                    if len(hyp.alignments[-1]) == 0:
+                        del hyp.alignments[-1]
+
+            # Sort the hypothesis with best scores
+            nbest_hyps.append(self.sort_nbest(kept_hyps))
+
+        return nbest_hyps
+
+    def _next_alignment_step(self, hypotheses: List[Hypothesis]):
+        """Starts the alignments of the next timestep for the hypotheses whose last emitted label was blank."""
+        for hyp in hypotheses:
+            # Check if the last token emitted at last timestep was a blank
+            # If so, move to next timestep
+            logp, label = hyp.alignments[-1][-1]  # The last alignment of this step
+            if int(label) == self.blank:
+                hyp.alignments.append([])  # blank buffer for next timestep
+
     def recombine_hypotheses(self, hypotheses: List[Hypothesis]) -> List[Hypothesis]:
         """Recombine hypotheses with equivalent output sequence.
 
@@ -1456,20 +1966,145 @@ class BeamRNNTInfer(Typing):
 
         return hypotheses
 
+    def batched_prefix_search(
+        self, batch_hypotheses: List[List[Hypothesis]], enc_out: torch.Tensor, prefix_alpha: int
+    ) -> List[List[Hypothesis]]:
+        """
+        Prefix search over the hypotheses of several utterances, with a single joint call.
+        Same as applying `prefix_search` to the hypotheses of every utterance.
+
+        Args:
+            batch_hypotheses: hypotheses of every utterance, sorted by decreasing length.
+            enc_out: encoder output of every utterance at the current timestep (B, 1, D_enc)
+            prefix_alpha: maximum prefix length in prefix search.
+        """
+        # The joint outputs only depend on the decoder outputs, which are not updated by the search.
+        # Gather the ones needed by all the prefix pairs first, then compute the scores.
+        prefix_pairs = []
+        enc_ids = []
+        dec_outs = []
+        for b, hypotheses in enumerate(batch_hypotheses):
+            for j, hyp_j in enumerate(hypotheses[:-1]):
+                for hyp_i in hypotheses[(j + 1) :]:
+                    curr_id = len(hyp_j.y_sequence)
+                    pref_id = len(hyp_i.y_sequence)
+
+                    if is_prefix(hyp_j.y_sequence, hyp_i.y_sequence) and (curr_id - pref_id) <= prefix_alpha:
+                        prefix_pairs.append((hyp_j, hyp_i, len(dec_outs)))
+                        dec_outs.append(hyp_i.dec_out[-1])
+                        dec_outs.extend(hyp_j.dec_out[pref_id : (curr_id - 1)])
+                        enc_ids.extend([b] * (curr_id - pref_id))
+
+        if not prefix_pairs:
+            return batch_hypotheses
+
+        beam_logp, beam_ilm_logp = self.resolve_joint_output(enc_out[enc_ids], torch.stack(dec_outs))
+        beam_logp = beam_logp[:, 0, 0, :]
+        if beam_ilm_logp is not None:
+            beam_ilm_logp = beam_ilm_logp[:, 0, 0, :]
+
+        for hyp_j, hyp_i, row in prefix_pairs:
+            curr_id = len(hyp_j.y_sequence)
+            pref_id = len(hyp_i.y_sequence)
+
+            curr_score = hyp_i.score + float(beam_logp[row, hyp_j.y_sequence[pref_id]])
+            # Setup ngram LM:
+            if self.ngram_lm:
+                lm_score, next_state = self.compute_ngram_score(hyp_i.ngram_lm_state, int(hyp_j.y_sequence[pref_id]))
+                if self.hat_subtract_ilm:
+                    curr_score += self.ngram_lm_alpha * lm_score - self.hat_ilm_weight * float(
+                        beam_ilm_logp[row, hyp_j.y_sequence[pref_id]]
+                    )
+                else:
+                    curr_score += self.ngram_lm_alpha * lm_score
+
+            for k in range(pref_id, (curr_id - 1)):
+                row += 1
+                curr_score += float(beam_logp[row, hyp_j.y_sequence[k + 1]])
+                # Setup ngram LM:
+                if self.ngram_lm:
+                    lm_score, next_state = self.compute_ngram_score(next_state, int(hyp_j.y_sequence[k + 1]))
+                    if self.hat_subtract_ilm:
+                        curr_score += self.ngram_lm_alpha * lm_score - self.hat_ilm_weight * float(
+                            beam_ilm_logp[row, hyp_j.y_sequence[k + 1]]
+                        )
+                    else:
+                        curr_score += self.ngram_lm_alpha * lm_score
+
+            hyp_j.score = np.logaddexp(hyp_j.score, curr_score)
+
+        return batch_hypotheses
+
     def compute_ngram_score(self, current_lm_state: "kenlm.State", label: int) -> Tuple[float, "kenlm.State"]:
         """
         Score computation for kenlm ngram language model.
         """
+        lm_scores, next_states = self.compute_ngram_scores(current_lm_state, [label])
 
-        if self.token_offset:
-            label = chr(label + self.token_offset)
-        else:
-            label = str(label)
-        next_state = kenlm.State()
-        lm_score = self.ngram_lm.BaseScore(current_lm_state, label, next_state)
-        lm_score *= 1.0 / np.log10(np.e)
+        return float(lm_scores[0]), next_states[0]
+
+    def compute_ngram_scores(
+        self, current_lm_state: "kenlm.State", labels: List[int]
+    ) -> Tuple[np.ndarray, List["kenlm.State"]]:
+        """
+        Score computation for kenlm ngram language model, for several labels following the same LM state.
+
+        The scores and next states of (LM state, label) pairs are cached in `ngram_lm_cache`, as the hypotheses
+        of a search (and the prefix search) query the same pairs over and over.
+
+        Args:
+            current_lm_state: LM state of the hypothesis.
+            labels: labels to score after the LM state.
+
+        Returns:
+            A tuple of the natural log probabilities of the labels (np.ndarray of shape [len(labels)]),
+            and the LM states after each label.
+        """
+        lm_scores = np.empty(len(labels), dtype=np.float64)
+        next_states = []
+        for i, label in enumerate(labels):
+            key = (current_lm_state, label)
+            if key in self.ngram_lm_cache:
+                lm_scores[i], next_state = self.ngram_lm_cache[key]
+            else:
+                if self.token_offset:
+                    token = chr(label + self.token_offset)
+                else:
+                    token = str(label)
+                next_state = kenlm.State()
+                lm_scores[i] = self.ngram_lm.BaseScore(current_lm_state, token, next_state)
+                self.ngram_lm_cache[key] = (lm_scores[i], next_state)
+            next_states.append(next_state)
+
+        # kenlm returns log10 probabilities
+        lm_scores *= 1.0 / np.log10(np.e)
+
+        return lm_scores, next_states
+
+    def compute_ngram_expansion_scores(
+        self, hyp: Hypothesis, labels: List[int], ilm_logp: Optional[torch.Tensor] = None
+    ) -> Dict[int, Tuple[float, "kenlm.State"]]:
+        """
+        Shallow fusion scores of the token expansions of a hypothesis.
+
+        Args:
+            hyp: hypothesis to expand.
+            labels: labels of the token expansions.
+            ilm_logp: internal LM log probabilities of the HAT joint for the hypothesis (V + 1),
+                subtracted from the n-gram scores when `hat_subtract_ilm` is set.
+
+        Returns:
+            A dict which maps each label to the score to add to the expansion, and its next LM state.
+        """
+        if not labels:
+            return {}
+
+        lm_scores, next_states = self.compute_ngram_scores(hyp.ngram_lm_state, labels)
+        lm_scores *= self.ngram_lm_alpha
+        if ilm_logp is not None:
+            lm_scores -= self.hat_ilm_weight * ilm_logp[labels].float().cpu().numpy()
 
-        return lm_score, next_state
+        return dict(zip(labels, zip(lm_scores.tolist(), next_states)))
 
     def set_decoding_type(self, decoding_type: str):
 
@@ -1502,3 +2137,5 @@ class BeamRNNTInferConfig:
     ngram_lm_alpha: Optional[float] = 0.0
     hat_subtract_ilm: bool = False
     hat_ilm_weight: float = 0.0
+    batched_beam_search: bool = False
+    decoder_cache_size: Optional[int] = 10000
@@ -534,6 +534,14 @@ class GreedyBatchedRNNTInfer(_GreedyRNNTInfer):
                 Supported values:
                     - 'lin' for using the linear mapping.
                     - 'exp' for using exponential mapping with linear shift.
+
+        loop_labels: Bool flag, whether to decode by looping over labels instead of frames. Each iteration finds
+            the next label of every utterance of the batch: the decoder is called once, and the joint is called
+            until each utterance emits a non-blank label or runs out of frames. Labels, timestamps and scores
+            are stored in preallocated buffers, without host synchronization except for the loop conditions,
+            and the hypotheses are only created at the end. The results are the same as for the frame loop.
+            Requires a decoder with `blank_as_pad`, and is not used when preserving alignments or
+            per-frame confidence.
     """
 
     def __init__(
@@ -545,6 +553,7 @@ class GreedyBatchedRNNTInfer(_GreedyRNNTInfer):
         preserve_alignments: bool = False,
         preserve_frame_confidence: bool = False,
         confidence_method_cfg: Optional[DictConfig] = None,
+        loop_labels: bool = False,
     ):
         super().__init__(
             decoder_model=decoder_model,
@@ -556,11 +565,23 @@ class GreedyBatchedRNNTInfer(_GreedyRNNTInfer):
             confidence_method_cfg=confidence_method_cfg,
         )
 
+        self.loop_labels = loop_labels
+
         # Depending on availability of `blank_as_pad` support
         # switch between more efficient batch decoding technique
         if self.decoder.blank_as_pad:
-            self._greedy_decode = self._greedy_decode_blank_as_pad
+            if loop_labels and not (preserve_alignments or preserve_frame_confidence):
+                self._greedy_decode = self._greedy_decode_blank_as_pad_loop_labels
+            else:
+                if loop_labels:
+                    logging.warning(
+                        "`loop_labels` does not support preserving alignments or frame confidence, "
+                        "decoding by looping over frames instead."
+                    )
+                self._greedy_decode = self._greedy_decode_blank_as_pad
         else:
+            if loop_labels:
+                logging.warning("`loop_labels` requires a decoder with `blank_as_pad`, decoding with masking instead.")
             self._greedy_decode = self._greedy_decode_masked
 
     @typecheck()
@@ -806,6 +827,126 @@ class GreedyBatchedRNNTInfer(_GreedyRNNTInfer):
 
         return hypotheses
 
+    def _greedy_decode_blank_as_pad_loop_labels(
+        self,
+        x: torch.Tensor,
+        out_len: torch.Tensor,
+        device: torch.device,
+        partial_hypotheses: Optional[List[rnnt_utils.Hypothesis]] = None,
+    ) -> List[rnnt_utils.Hypothesis]:
+        """
+        Batched greedy decoding which loops over labels instead of frames.
+
+        Each iteration finds the next label of all the utterances: the decoder is called once on the previous labels,
+        then the utterances which emit a blank move to their next frame and the joint is called again with the same
+        decoder output, until every utterance emits a non-blank label or runs out of frames.
+        Results are stored in preallocated buffers, and converted to Hypothesis objects at the end.
+        """
+        if partial_hypotheses is not None:
+            raise NotImplementedError("`partial_hypotheses` support is not supported")
+
+        with torch.inference_mode():
+            # x: [B, T, D]
+            # out_len: [B]
+            # device: torch.device
+            batch_size, max_time, _ = x.shape
+
+            batched_hyps = rnnt_utils.BatchedHyps(
+                batch_size=batch_size, init_length=max(max_time, 1), device=device, float_dtype=torch.float32
+            )
+
+            out_len = out_len.to(device)
+            last_timestep = out_len - 1
+            batch_indices = torch.arange(batch_size, device=device)
+
+            # Frame of each utterance, and the same index kept within the utterance to gather the encoder output
+            time_indices = torch.zeros(batch_size, dtype=torch.long, device=device)
+            safe_time_indices = torch.minimum(time_indices, last_timestep)
+            # Frame where the current label of each utterance was found
+            time_indices_current_labels = torch.zeros_like(time_indices)
+            # Number of labels emitted on the frame of the last label, to enforce max_symbols
+            last_label_time = torch.full_like(time_indices, -1)
+            symbols_per_step = torch.zeros_like(time_indices)
+
+            labels = torch.full([batch_size], fill_value=self._blank_index, dtype=torch.long, device=device)
+            active_mask = out_len > 0
+
+            hidden = None
+            first_step = True
+            while active_mask.any():
+                # Batch prediction step on the labels found by the previous iteration.
+                # If very first prediction step, submit SOS tag (blank) to pred_step.
+                if first_step:
+                    g, hidden_prime = self._pred_step(self._SOS, None, batch_size=batch_size)
+                    first_step = False
+                else:
+                    g, hidden_prime = self._pred_step(labels.unsqueeze(1), hidden, batch_size=batch_size)
+
+                # Batched joint step - Output = [B, V + 1]
+                f = x[batch_indices, safe_time_indices].unsqueeze(1)  # [B, 1, D]
+                logp = self._joint_step(f, g)[:, 0, 0, :]
+                if logp.dtype != torch.float32:
+                    logp = logp.float()
+                scores, labels = logp.max(1)
+
+                # Utterances which predicted blank move to their next frame.
+                # The decoder output does not change, so only the joint is computed again.
+                blank_mask = labels == self._blank_index
+                time_indices_current_labels.copy_(time_indices)
+                time_indices += blank_mask
+                torch.minimum(time_indices, last_timestep, out=safe_time_indices)
+                active_mask = time_indices <= last_timestep
+                advance_mask = active_mask & blank_mask
+                while advance_mask.any():
+                    torch.where(
+                        advance_mask, time_indices, time_indices_current_labels, out=time_indices_current_labels
+                    )
+                    f = x[batch_indices, safe_time_indices].unsqueeze(1)  # [B, 1, D]
+                    logp = self._joint_step(f, g)[:, 0, 0, :]
+                    if logp.dtype != torch.float32:
+                        logp = logp.float()
+                    more_scores, more_labels = logp.max(1)
+                    torch.where(advance_mask, more_labels, labels, out=labels)
+                    torch.where(advance_mask, more_scores, scores, out=scores)
+
+                    blank_mask = labels == self._blank_index
+                    time_indices += advance_mask & blank_mask
+                    torch.minimum(time_indices, last_timestep, out=safe_time_indices)
+                    active_mask = time_indices <= last_timestep
+                    advance_mask = active_mask & blank_mask
+                del g, logp
+
+                # The active utterances found a non-blank label: keep the decoder state after the previous label
+                if hidden is None:
+                    hidden = hidden_prime
+                else:
+                    hidden = self.decoder.batch_replace_states_mask(
+                        src_states=hidden_prime, dst_states=hidden, mask=active_mask
+                    )
+
+                batched_hyps.add_results_masked_(active_mask, labels, time_indices_current_labels, scores)
+
+                # After max_symbols labels on the same frame, force the utterance to its next frame
+                if self.max_symbols is not None:
+                    same_frame = time_indices_current_labels == last_label_time
+                    torch.where(
+                        same_frame, symbols_per_step + 1, torch.ones_like(symbols_per_step), out=symbols_per_step
+                    )
+                    last_label_time.copy_(time_indices_current_labels)
+
+                    force_blank_mask = active_mask & (symbols_per_step >= self.max_symbols)
+                    time_indices += force_blank_mask
+                    torch.minimum(time_indices, last_timestep, out=safe_time_indices)
+                    active_mask = time_indices <= last_timestep
+
+            hypotheses = batched_hyps.to_hypotheses()
+
+        # Preserve states
+        for batch_idx in range(batch_size):
+            hypotheses[batch_idx].dec_state = self.decoder.batch_select_state(hidden, batch_idx)
+
+        return hypotheses
+
     def _greedy_decode_masked(
         self,
         x: torch.Tensor,
@@ -2207,6 +2348,7 @@ class GreedyBatchedRNNTInferConfig:
     preserve_alignments: bool = False
     preserve_frame_confidence: bool = False
     confidence_method_cfg: Optional[ConfidenceMethodConfig] = field(default_factory=lambda: ConfidenceMethodConfig())
+    loop_labels: bool = False
 
     def __post_init__(self):
         # OmegaConf.structured ensures that post_init check is always executed
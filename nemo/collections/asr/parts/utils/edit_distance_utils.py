@@ -0,0 +1,238 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Batched edit distance between many pairs of token sequences.
+
+Tokens (words or characters) are encoded into integer ids and all pairs are packed into flat buffers, so that the
+dynamic programming over all pairs runs in a single compiled (numba) call instead of one Python call per pair.
+Besides the distance, the number of substitutions, insertions and deletions of each pair is recovered from the
+alignment. Ties between alignments are broken the same way as in `jiwer` (i.e. `rapidfuzz`), so the breakdowns match
+the ones of `jiwer.compute_measures` and `jiwer.cer`.
+"""
+import collections
+import itertools
+import multiprocessing as mp
+from typing import DefaultDict, Hashable, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from numba import jit
+
+    HAVE_NUMBA = True
+except (ImportError, ModuleNotFoundError):
+    HAVE_NUMBA = False
+
+
+__all__ = ['make_vocabulary', 'encode_token_sequences', 'batch_edit_operations']
+
+
+def make_vocabulary() -> DefaultDict[Hashable, int]:
+    """Mapping from token to id which assigns the next id to unseen tokens."""
+    vocabulary = collections.defaultdict()
+    vocabulary.default_factory = vocabulary.__len__
+    return vocabulary
+
+
+def encode_token_sequences(sequences: Sequence[Sequence[Hashable]], vocabulary: DefaultDict[Hashable, int]):
+    """
+    Encodes sequences of tokens into a flat buffer of integer ids and the offsets of each sequence.
+
+    Args:
+        sequences: sequences of hashable tokens (e.g. lists of words, or strings for characters).
+        vocabulary: mapping from token to id, created with `make_vocabulary`. New tokens are added to it.
+
+    Returns:
+        ids (np.ndarray): int32 array with the ids of all the tokens.
+        offsets (np.ndarray): int64 array of size len(sequences) + 1, sequence i is ids[offsets[i]:offsets[i + 1]].
+    """
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences)), out=offsets[1:])
+    tokens = itertools.chain.from_iterable(sequences)
+    ids = np.fromiter(map(vocabulary.__getitem__, tokens), dtype=np.int32, count=offsets[-1])
+    return ids, offsets
+
+
+def _edit_operations_pair(ref: np.ndarray, hyp: np.ndarray, rows: np.ndarray) -> Tuple[int, int, int]:
+    """
+    Substitutions, insertions and deletions to turn ref into hyp.
+    `rows` is a work buffer of shape [2, 4, k] with k larger than len(hyp).
+    """
+    # Common prefix and suffix are matches, and are excluded from the alignment as in rapidfuzz
+    len_ref, len_hyp = len(ref), len(hyp)
+    start = 0
+    while start < len_ref and start < len_hyp and ref[start] == hyp[start]:
+        start += 1
+    while len_ref > start and len_hyp > start and ref[len_ref - 1] == hyp[len_hyp - 1]:
+        len_ref -= 1
+        len_hyp -= 1
+    n, m = len_ref - start, len_hyp - start
+    if n == 0 or m == 0:
+        return 0, m, n
+
+    # Row i of the matrix holds, for each j, the distance between ref[:i] and hyp[:j] and the substitutions,
+    # insertions and deletions along the backtrace from (i, j). The backtrace prefers deletions, then insertions,
+    # then substitutions / matches, and only moves to the previous row or to the left, so two rows are enough.
+    prev, cur = rows[0], rows[1]
+    for j in range(m + 1):
+        prev[0, j] = j
+        prev[1, j] = 0
+        prev[2, j] = j
+        prev[3, j] = 0
+    for i in range(1, n + 1):
+        cur[0, 0] = i
+        cur[1, 0] = 0
+        cur[2, 0] = 0
+        cur[3, 0] = i
+        r = ref[start + i - 1]
+        for j in range(1, m + 1):
+            mismatch = r != hyp[start + j - 1]
+            distance = min(prev[0, j - 1] + mismatch, prev[0, j] + 1, cur[0, j - 1] + 1)
+            cur[0, j] = distance
+            if distance == prev[0, j] + 1:
+                cur[1, j] = prev[1, j]
+                cur[2, j] = prev[2, j]
+                cur[3, j] = prev[3, j] + 1
+            elif j > 1 and cur[0, j - 1] == prev[0, j - 1] - 1:
+                cur[1, j] = cur[1, j - 1]
+                cur[2, j] = cur[2, j - 1] + 1
+                cur[3, j] = cur[3, j - 1]
+            else:
+                cur[1, j] = prev[1, j - 1] + mismatch
+                cur[2, j] = prev[2, j - 1]
+                cur[3, j] = prev[3, j - 1]
+        prev, cur = cur, prev
+    return prev[1, m], prev[2, m], prev[3, m]
+
+
+def _edit_operations_kernel(ref_ids, ref_offsets, hyp_ids, hyp_offsets, out):
+    max_hyp = 0
+    for k in range(len(out)):
+        max_hyp = max(max_hyp, hyp_offsets[k + 1] - hyp_offsets[k])
+    rows = np.empty((2, 4, max_hyp + 1), dtype=np.int32)
+
+    for k in range(len(out)):
+        ref = ref_ids[ref_offsets[k] : ref_offsets[k + 1]]
+        hyp = hyp_ids[hyp_offsets[k] : hyp_offsets[k + 1]]
+        substitutions, insertions, deletions = _edit_operations_pair(ref, hyp, rows)
+        out[k, 0] = substitutions
+        out[k, 1] = insertions
+        out[k, 2] = deletions
+
+
+def _edit_operations_pair_numpy(ref: np.ndarray, hyp: np.ndarray) -> Tuple[int, int, int]:
+    """Same as `_edit_operations_pair`, with the rows of the matrix vectorized with NumPy."""
+    len_ref, len_hyp = len(ref), len(hyp)
+    start = 0
+    while start < len_ref and start < len_hyp and ref[start] == hyp[start]:
+        start += 1
+    while len_ref > start and len_hyp > start and ref[len_ref - 1] == hyp[len_hyp - 1]:
+        len_ref -= 1
+        len_hyp -= 1
+    ref, hyp = ref[start:len_ref], hyp[start:len_hyp]
+    n, m = len(ref), len(hyp)
+    if n == 0 or m == 0:
+        return 0, m, n
+
+    # The dependency on the left neighbour is resolved with a running minimum:
+    # matrix[i, j] = min_k<=j (diag_or_up[k] + j - k)
+    matrix = np.empty((n + 1, m + 1), dtype=np.int64)
+    matrix[0] = np.arange(m + 1)
+    positions = np.arange(m + 1)
+    for i in range(1, n + 1):
+        diag_or_up = np.empty(m + 1, dtype=np.int64)
+        diag_or_up[0] = i
+        diag_or_up[1:] = np.minimum(matrix[i - 1, :-1] + (hyp != ref[i - 1]), matrix[i - 1, 1:] + 1)
+        matrix[i] = np.minimum.accumulate(diag_or_up - positions) + positions
+
+    substitutions, insertions, deletions = 0, 0, 0
+    i, j = n, m
+    while i > 0 and j > 0:
+        if matrix[i, j] == matrix[i - 1, j] + 1:
+            i -= 1
+            deletions += 1
+        else:
+            j -= 1
+            if j > 0 and matrix[i, j] == matrix[i - 1, j] - 1:
+                insertions += 1
+            else:
+                i -= 1
+                if ref[i] != hyp[j]:
+                    substitutions += 1
+    return substitutions, insertions + j, deletions + i
+
+
+if HAVE_NUMBA:
+    _edit_operations_pair = jit(nopython=True, nogil=True)(_edit_operations_pair)
+    _edit_operations_kernel = jit(nopython=True, nogil=True)(_edit_operations_kernel)
+
+
+def _edit_operations_chunk(args) -> np.ndarray:
+    ref_ids, ref_offsets, hyp_ids, hyp_offsets = args
+    out = np.zeros((len(ref_offsets) - 1, 3), dtype=np.int64)
+    if HAVE_NUMBA:
+        _edit_operations_kernel(ref_ids, ref_offsets, hyp_ids, hyp_offsets, out)
+    else:
+        for k in range(len(out)):
+            out[k] = _edit_operations_pair_numpy(
+                ref_ids[ref_offsets[k] : ref_offsets[k + 1]], hyp_ids[hyp_offsets[k] : hyp_offsets[k + 1]]
+            )
+    return out
+
+
+def batch_edit_operations(
+    hypotheses: Sequence[Sequence[Hashable]],
+    references: Sequence[Sequence[Hashable]],
+    num_workers: int = 0,
+    chunk_size: int = 10000,
+) -> np.ndarray:
+    """
+    Computes the edit operations between many pairs of token sequences at once.
+
+    Args:
+        hypotheses: hypotheses as sequences of tokens (e.g. lists of words, or strings for characters).
+        references: references as sequences of tokens, same number as hypotheses.
+        num_workers: number of processes to split the pairs among. With 0 or 1 the pairs are processed
+            in the current process.
+        chunk_size: number of pairs processed by a worker at once.
+
+    Returns:
+        int64 array of shape [len(references), 3] with the number of substitutions, insertions and deletions
+        needed to turn each reference into its hypothesis. The edit distance of each pair is the sum of a row.
+    """
+    if len(hypotheses) != len(references):
+        raise ValueError(
+            f"Number of hypotheses ({len(hypotheses)}) and references ({len(references)}) should be the same."
+        )
+
+    vocabulary = make_vocabulary()
+    ref_ids, ref_offsets = encode_token_sequences(references, vocabulary)
+    hyp_ids, hyp_offsets = encode_token_sequences(hypotheses, vocabulary)
+
+    if num_workers <= 1 or len(references) <= chunk_size:
+        return _edit_operations_chunk((ref_ids, ref_offsets, hyp_ids, hyp_offsets))
+
+    chunks = []
+    for begin in range(0, len(references), chunk_size):
+        end = min(begin + chunk_size, len(references))
+        chunks.append(
+            (
+                ref_ids[ref_offsets[begin] : ref_offsets[end]],
+                ref_offsets[begin : end + 1] - ref_offsets[begin],
+                hyp_ids[hyp_offsets[begin] : hyp_offsets[end]],
+                hyp_offsets[begin : end + 1] - hyp_offsets[begin],
+            )
+        )
+    with mp.get_context('fork').Pool(num_workers) as pool:
+        return np.concatenate(pool.map(_edit_operations_chunk, chunks))
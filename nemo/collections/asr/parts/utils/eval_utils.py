@@ -15,7 +15,7 @@
 import json
 from typing import Tuple
 
-from nemo.collections.asr.metrics.wer import word_error_rate_detail
+from nemo.collections.asr.metrics.wer import word_error_rate_detail_per_utt
 from nemo.utils import logging
 
 
@@ -114,22 +114,19 @@ def cal_write_wer(
             if clean_groundtruth_text:
                 ref = clean_label(ref, langid=langid)
 
-            wer, tokens, ins_rate, del_rate, sub_rate = word_error_rate_detail(
-                hypotheses=[hyp], references=[ref], use_cer=use_cer
-            )
-            sample[eval_metric] = wer  # evaluatin metric, could be word error rate of character error rate
-            sample['tokens'] = tokens  # number of word/characters/tokens
-            sample['ins_rate'] = ins_rate  # insertion error rate
-            sample['del_rate'] = del_rate  # deletion error rate
-            sample['sub_rate'] = sub_rate  # substitution error rate
-
             samples.append(sample)
             hyps.append(hyp)
             refs.append(ref)
 
-    total_wer, total_tokens, total_ins_rate, total_del_rate, total_sub_rate = word_error_rate_detail(
-        hypotheses=hyps, references=refs, use_cer=use_cer
-    )
+    details_per_utt, total_details = word_error_rate_detail_per_utt(hypotheses=hyps, references=refs, use_cer=use_cer)
+    for sample, (wer, tokens, ins_rate, del_rate, sub_rate) in zip(samples, details_per_utt):
+        sample[eval_metric] = wer  # evaluatin metric, could be word error rate of character error rate
+        sample['tokens'] = tokens  # number of word/characters/tokens
+        sample['ins_rate'] = ins_rate  # insertion error rate
+        sample['del_rate'] = del_rate  # deletion error rate
+        sample['sub_rate'] = sub_rate  # substitution error rate
+
+    total_wer, total_tokens, total_ins_rate, total_del_rate, total_sub_rate = total_details
 
     if not output_filename:
         output_manifest_w_wer = pred_manifest
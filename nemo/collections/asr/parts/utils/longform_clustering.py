@@ -16,6 +16,7 @@ from typing import Dict, List, Tuple
 import torch
 from tqdm import tqdm
 from nemo.collections.asr.parts.utils.offline_clustering import (
+    BlockCosAffinity,
     SpeakerClustering,
     get_scale_interpolated_embs,
     getCosAffinityMatrix,
@@ -25,7 +26,13 @@ from nemo.collections.asr.parts.utils.online_clustering import get_merge_quantit
 
 
 class LongFormSpeakerClustering(torch.nn.Module):
-    def __init__(self, cuda: bool = False):
+    def __init__(
+        self,
+        cuda: bool = False,
+        sparse_affinity: bool = False,
+        affinity_block_size: int = 1024,
+        coarse_to_fine_search: bool = False,
+    ):
         """
         Initializes a speaker clustering class tailored for long-form audio, leveraging methods from the `SpeakerClustering` class.
         The clustering algorithm for long-form content is executed via the `forward_infer` function (not shown here). Input embedding 
@@ -38,9 +45,23 @@ class LongFormSpeakerClustering(torch.nn.Module):
         Args:
             cuda (bool):
                 Flag indicating whether CUDA is available for computation.
+            sparse_affinity (bool):
+                If True, chunks and sessions with more than `nme_mat_size` embeddings are clustered on a sparse
+                k-nearest-neighbor affinity graph instead of a dense affinity matrix.
+                See `SpeakerClustering` for the details.
+            affinity_block_size (int):
+                The number of affinity matrix rows calculated at once when building the sparse affinity graph.
+            coarse_to_fine_search (bool):
+                If True, NME-analysis searches p-values from coarse to fine instead of examining all of them.
+                See `NMESC` for the details.
         """
         super().__init__()
-        self.speaker_clustering = SpeakerClustering(cuda=cuda)
+        self.speaker_clustering = SpeakerClustering(
+            cuda=cuda,
+            sparse_affinity=sparse_affinity,
+            affinity_block_size=affinity_block_size,
+            coarse_to_fine_search=coarse_to_fine_search,
+        )
         self.embeddings_in_scales: List[torch.Tensor] = [torch.tensor([0])]
         self.timestamps_in_scales: List[torch.Tensor] = [torch.tensor([0])]
         self.cuda = cuda
@@ -181,6 +202,55 @@ class LongFormSpeakerClustering(torch.nn.Module):
             fixed_thres=fixed_thres,
         )
 
+    def unit_infer(
+        self,
+        emb: torch.Tensor,
+        oracle_num_speakers: int,
+        max_rp_threshold: float,
+        max_num_speakers: int,
+        sparse_search_volume: int,
+        fixed_thres: float,
+    ) -> torch.LongTensor:
+        """
+        Cluster the given single-scale embeddings with `SpeakerClustering.forward_unit_infer`, or with
+        `SpeakerClustering.forward_sparse_unit_infer` if `sparse_affinity` is enabled and there are more than
+        `nme_mat_size` embeddings.
+
+        Args:
+            emb (Tensor):
+                The embedding tensor to be clustered.
+            Please refer to `long_forward_infer` for the other arguments.
+
+        Returns:
+            (LongTensor): Speaker labels for the given embeddings.
+        """
+        sparse_min_size = max(self.speaker_clustering.nme_mat_size, self.speaker_clustering.min_samples_for_nmesc)
+        if self.speaker_clustering.sparse_affinity and emb.shape[0] > sparse_min_size:
+            cos_affinity = BlockCosAffinity(
+                embeddings_in_scales=[emb],
+                segment_index_in_scales=[torch.arange(emb.shape[0])],
+                multiscale_weights=torch.ones(1),
+                block_size=self.speaker_clustering.affinity_block_size,
+                device=self.device,
+            )
+            return self.speaker_clustering.forward_sparse_unit_infer(
+                cos_affinity=cos_affinity,
+                oracle_num_speakers=oracle_num_speakers,
+                max_rp_threshold=max_rp_threshold,
+                max_num_speakers=max_num_speakers,
+                sparse_search_volume=sparse_search_volume,
+                fixed_thres=fixed_thres,
+            )
+        mat = getCosAffinityMatrix(emb)
+        return self.speaker_clustering.forward_unit_infer(
+            mat=mat,
+            oracle_num_speakers=oracle_num_speakers,
+            max_rp_threshold=max_rp_threshold,
+            max_num_speakers=max_num_speakers,
+            sparse_search_volume=sparse_search_volume,
+            fixed_thres=fixed_thres,
+        )
+
     def get_div_ceil_count(self, numer: int, denomin: int) -> int:
         """
         Calculates the ceiling of the division of two integers.
@@ -300,14 +370,14 @@ class LongFormSpeakerClustering(torch.nn.Module):
             if emb_part.shape[0] == 1:
                 Y_part = torch.zeros((1,), dtype=torch.int64)
             else:
-                mat = getCosAffinityMatrix(emb_part)
-                overcluster_count = min(chunk_cluster_count, mat.shape[0])
-                Y_part = self.speaker_clustering.forward_unit_infer(
-                    mat=mat,
+                overcluster_count = min(chunk_cluster_count, emb_part.shape[0])
+                Y_part = self.unit_infer(
+                    emb=emb_part,
                     oracle_num_speakers=overcluster_count,
                     max_rp_threshold=max_rp_threshold,
                     max_num_speakers=chunk_cluster_count,
                     sparse_search_volume=sparse_search_volume,
+                    fixed_thres=-1.0,
                 )
 
             # Step-3: Merge the clusters to form the aggregated clustering labels `Y_aggr`
@@ -341,11 +411,10 @@ class LongFormSpeakerClustering(torch.nn.Module):
 
         # Concatenate the reduced embeddings then perform high-level clustering
         reduced_embs = torch.cat(total_emb)
-        reduced_mat = getCosAffinityMatrix(reduced_embs)
 
         # Step-4: Map the aggregated labels `Y_aggr` back to the original labels for all `org_len` input embeddings: `Y_unpack`
-        Y_aggr = self.speaker_clustering.forward_unit_infer(
-            mat=reduced_mat,
+        Y_aggr = self.unit_infer(
+            emb=reduced_embs,
             oracle_num_speakers=oracle_num_speakers,
             max_rp_threshold=max_rp_threshold,
             max_num_speakers=max_num_speakers,
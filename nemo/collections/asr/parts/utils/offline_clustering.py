@@ -31,7 +31,7 @@
 # https://arxiv.org/pdf/2003.02405.pdf and the implementation from
 # https://github.com/tango4j/Auto-Tuning-Spectral-Clustering.
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import torch
 from torch.linalg import eigh, eigvalsh
@@ -306,7 +306,12 @@ def isGraphFullyConnected(affinity_mat: torch.Tensor, device: torch.device) -> t
     return getTheLargestComponent(affinity_mat, 0, device).sum() == affinity_mat.shape[0]
 
 
-def getKneighborsConnections(affinity_mat: torch.Tensor, p_value: int, mask_method: str = 'binary') -> torch.Tensor:
+def getKneighborsConnections(
+    affinity_mat: torch.Tensor,
+    p_value: int,
+    mask_method: str = 'binary',
+    sorted_neighbor_index: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
     """
     Binarize top-p values for each row from the given affinity matrix.
 
@@ -317,6 +322,9 @@ def getKneighborsConnections(affinity_mat: torch.Tensor, p_value: int, mask_meth
             The number of top values that are selected from each row.
         mask_method (str):
             The method that is used to manipulate the affinity matrix. The default method is 'binary'.
+        sorted_neighbor_index (Tensor, optional):
+            Column indices of each row sorted in descending order of affinity, with at least p_value columns.
+            If given, the affinity matrix is not sorted again, which saves time when many p-values are examined.
 
     Returns:
         binarized_affinity_mat (Tensor):
@@ -324,7 +332,10 @@ def getKneighborsConnections(affinity_mat: torch.Tensor, p_value: int, mask_meth
     """
     dim = affinity_mat.shape
     binarized_affinity_mat = torch.zeros_like(affinity_mat).half()
-    sorted_matrix = torch.argsort(affinity_mat, dim=1, descending=True)[:, :p_value]
+    if sorted_neighbor_index is None:
+        sorted_matrix = torch.argsort(affinity_mat, dim=1, descending=True)[:, :p_value]
+    else:
+        sorted_matrix = sorted_neighbor_index[:, :p_value]
     binarized_affinity_mat[sorted_matrix.T, torch.arange(affinity_mat.shape[0])] = (
         torch.ones(1).to(affinity_mat.device).half()
     )
@@ -343,16 +354,52 @@ def getKneighborsConnections(affinity_mat: torch.Tensor, p_value: int, mask_meth
     return binarized_affinity_mat
 
 
-def getAffinityGraphMat(affinity_mat_raw: torch.Tensor, p_value: int) -> torch.Tensor:
+def getAffinityGraphMat(
+    affinity_mat_raw: torch.Tensor, p_value: int, sorted_neighbor_index: Optional[torch.Tensor] = None
+) -> torch.Tensor:
     """
     Calculate a binarized graph matrix and
     symmetrize the binarized graph matrix.
+    See `getKneighborsConnections` for `sorted_neighbor_index`.
     """
-    X = affinity_mat_raw if p_value <= 0 else getKneighborsConnections(affinity_mat_raw, p_value)
+    X = (
+        affinity_mat_raw
+        if p_value <= 0
+        else getKneighborsConnections(affinity_mat_raw, p_value, sorted_neighbor_index=sorted_neighbor_index)
+    )
     symm_affinity_mat = 0.5 * (X + X.T)
     return symm_affinity_mat
 
 
+def getSparseAffinityGraphMat(kneighbors_index: torch.Tensor, p_value: int) -> torch.Tensor:
+    """
+    Calculate a binarized graph matrix from the top-p neighbors of each node and
+    symmetrize the binarized graph matrix. This is the sparse counterpart of `getAffinityGraphMat`.
+
+    Args:
+        kneighbors_index (Tensor):
+            Indices of the nearest neighbors of each node, sorted in descending order of affinity.
+            Dimension: (Number of nodes) x (Number of neighbors)
+        p_value (int):
+            The number of top neighbors that are connected for each node.
+
+    Returns:
+        symm_affinity_mat (Tensor):
+            Sparse COO tensor containing the symmetrized binary graph matrix.
+    """
+    num_nodes = kneighbors_index.shape[0]
+    neighbors = kneighbors_index[:, :p_value]
+    nodes = torch.arange(num_nodes, device=kneighbors_index.device).unsqueeze(1).expand_as(neighbors)
+    # Merge the connections in both directions with their linear indices, which is faster than `coalesce()`
+    linear_index = torch.cat([(neighbors * num_nodes + nodes).flatten(), (nodes * num_nodes + neighbors).flatten()])
+    linear_index, counts = torch.unique(linear_index, sorted=True, return_counts=True)
+    indices = torch.stack([torch.div(linear_index, num_nodes, rounding_mode='floor'), linear_index % num_nodes])
+    symm_affinity_mat = torch.sparse_coo_tensor(
+        indices, 0.5 * counts.float(), (num_nodes, num_nodes), is_coalesced=True
+    )
+    return symm_affinity_mat
+
+
 def getMinimumConnection(
     mat: torch.Tensor, max_N: torch.Tensor, n_list: torch.Tensor, device: torch.device
 ) -> Tuple[torch.Tensor, torch.Tensor]:
@@ -407,13 +454,42 @@ def get_argmin_mat(timestamps_in_scales: List[torch.Tensor]) -> List[torch.Tenso
     session_scale_mapping_list = []
     for scale_idx in scale_list:
         curr_scale_anchor = segment_anchor_list[scale_idx]
-        curr_mat = torch.tile(curr_scale_anchor, (base_scale_anchor.shape[0], 1))
-        base_mat = torch.tile(base_scale_anchor, (curr_scale_anchor.shape[0], 1)).t()
-        argmin_mat = torch.argmin(torch.abs(curr_mat - base_mat), dim=1)
+        if bool(torch.all(curr_scale_anchor[1:] >= curr_scale_anchor[:-1])):
+            # Avoid the (Number of base segments) x (Number of segments) matrix for long-form audio
+            argmin_mat = get_sorted_argmin(curr_scale_anchor, base_scale_anchor)
+        else:
+            curr_mat = torch.tile(curr_scale_anchor, (base_scale_anchor.shape[0], 1))
+            base_mat = torch.tile(base_scale_anchor, (curr_scale_anchor.shape[0], 1)).t()
+            argmin_mat = torch.argmin(torch.abs(curr_mat - base_mat), dim=1)
         session_scale_mapping_list.append(argmin_mat)
     return session_scale_mapping_list
 
 
+def get_sorted_argmin(sorted_anchor: torch.Tensor, query_anchor: torch.Tensor) -> torch.Tensor:
+    """
+    Find the index of the closest value in `sorted_anchor` for each value in `query_anchor` with a binary search.
+    The result is the same as `torch.argmin(torch.abs(sorted_anchor[None, :] - query_anchor[:, None]), dim=1)`,
+    including the first index being taken among equally close values.
+
+    Args:
+        sorted_anchor (Tensor):
+            Tensor containing values sorted in ascending order.
+        query_anchor (Tensor):
+            Tensor containing the values to be searched.
+
+    Returns:
+        argmin_mat (Tensor):
+            Index of the closest value in `sorted_anchor` for each value in `query_anchor`.
+    """
+    # `searchsorted` gives the first index among equal values
+    right = torch.searchsorted(sorted_anchor, query_anchor).clamp(max=sorted_anchor.shape[0] - 1)
+    right = torch.searchsorted(sorted_anchor, sorted_anchor[right])
+    left = torch.searchsorted(sorted_anchor, sorted_anchor[(right - 1).clamp(min=0)])
+    left_dist = torch.abs(sorted_anchor[left] - query_anchor)
+    right_dist = torch.abs(sorted_anchor[right] - query_anchor)
+    return torch.where(left_dist <= right_dist, left, right)
+
+
 def getCosAffinityMatrix(emb: torch.Tensor) -> torch.Tensor:
     """
     Calculate cosine similarity values among speaker embeddings then min-max normalize
@@ -529,6 +605,159 @@ def getMultiScaleCosAffinityMatrix(
     return fused_sim_d
 
 
+def get_scale_segment_index(
+    embeddings_in_scales: List[torch.Tensor], timestamps_in_scales: List[torch.Tensor]
+) -> List[torch.Tensor]:
+    """
+    Calculate the index of the segment in each scale that is mapped to each base-scale segment.
+    This is the row (and column) index that `getMultiScaleCosAffinityMatrix` uses to repeat the affinity
+    matrix of each scale.
+
+    Args:
+        embeddings_in_scales (list):
+            List containing split embedding tensors by each scale
+        timestamps_in_scales (list):
+            List containing split timestamps tensors by each scale
+
+    Returns:
+        segment_index_in_scales (list):
+            List containing the segment index tensors indexed by scale index.
+            Each tensor has dimensions of (Number of base segments).
+    """
+    session_scale_mapping_list = get_argmin_mat(timestamps_in_scales)
+    segment_index_in_scales: List[torch.Tensor] = []
+    for scale_idx in range(len(timestamps_in_scales)):
+        num_segments = embeddings_in_scales[scale_idx].shape[0]
+        repeat_list = getRepeatedList(session_scale_mapping_list[scale_idx], torch.tensor(num_segments))
+        segment_index = torch.repeat_interleave(torch.arange(num_segments), repeats=repeat_list.cpu())
+        segment_index_in_scales.append(segment_index)
+    return segment_index_in_scales
+
+
+class BlockCosAffinity:
+    """
+    Calculate the (multi-scale) cosine affinity matrix block by block, so that the N by N affinity matrix
+    never has to be stored. Each block has the same values as the corresponding block of the affinity matrix
+    from `getMultiScaleCosAffinityMatrix` (or from `getCosAffinityMatrix` for a single scale).
+
+    This makes it possible to find the top-p neighbors of every segment in a long-form recording with
+    O(N * block_size) memory, and to build a sparse k-nearest-neighbor affinity graph from them.
+    """
+
+    def __init__(
+        self,
+        embeddings_in_scales: List[torch.Tensor],
+        segment_index_in_scales: List[torch.Tensor],
+        multiscale_weights: torch.Tensor,
+        block_size: int = 1024,
+        device: torch.device = torch.device('cpu'),
+    ):
+        """
+        Args:
+            embeddings_in_scales (list):
+                List containing split embedding tensors by each scale.
+                For the multi-scale affinity, the embeddings should be in half precision as in
+                `getMultiScaleCosAffinityMatrix`.
+            segment_index_in_scales (list):
+                List containing the index of the segment in each scale that is mapped to each base-scale segment.
+                See `get_scale_segment_index`.
+            multiscale_weights (Tensor):
+                Tensor containing multiscale weights
+                Dimensions: (Number of scales) x 1
+            block_size (int):
+                The number of rows of the affinity matrix that are calculated at once.
+            device (torch.device):
+                Torch device variable
+        """
+        self.block_size: int = block_size
+        self.device: torch.device = device
+        self.multiscale_weights: torch.Tensor = multiscale_weights.flatten().to(device)
+        self.num_segments: int = segment_index_in_scales[-1].shape[0]
+        self.embeddings_in_scales: List[torch.Tensor] = []
+        self.segment_index_in_scales: List[torch.Tensor] = []
+        self.min_max_in_scales: List[torch.Tensor] = []
+        eps = torch.tensor(3.5e-4)
+        for emb, segment_index in zip(embeddings_in_scales, segment_index_in_scales):
+            emb = emb.float().to(device)
+            emb = emb / (torch.norm(emb, dim=1).unsqueeze(1) + eps.to(device))
+            self.embeddings_in_scales.append(emb)
+            self.segment_index_in_scales.append(segment_index.to(device))
+            self.min_max_in_scales.append(self.getCosSimilarityMinMax(emb))
+
+    def getCosSimilarityMinMax(self, emb: torch.Tensor) -> torch.Tensor:
+        """
+        Calculate the minimum and maximum values of the cosine similarity matrix of the given normalized
+        embeddings, which are used for min-max scaling. The diagonal of the cosine similarity matrix is 1.
+
+        Args:
+            emb (Tensor):
+                Matrix containing normalized embedding vectors.
+
+        Returns:
+            min_max (Tensor):
+                Tensor containing the minimum and maximum values.
+        """
+        if emb.shape[0] == 1:
+            # A single segment is not scaled, see `getCosAffinityMatrix`.
+            return torch.tensor([0.0, 1.0], device=emb.device)
+        v_min = torch.tensor(1.0, device=emb.device)
+        v_max = torch.tensor(1.0, device=emb.device)
+        for start in range(0, emb.shape[0], self.block_size):
+            block = torch.mm(emb[start : start + self.block_size], emb.t())
+            diag_index = torch.arange(block.shape[0], device=emb.device)
+            block[diag_index, diag_index + start] = 1.0
+            v_min = torch.min(v_min, block.min())
+            v_max = torch.max(v_max, block.max())
+        return torch.stack([v_min, v_max])
+
+    def getAffinityBlock(self, row_index: torch.Tensor, col_index: torch.Tensor) -> torch.Tensor:
+        """
+        Calculate the block of the affinity matrix at the given base-scale segment indices.
+
+        Args:
+            row_index (Tensor):
+                Indices of the base-scale segments for the rows of the block.
+            col_index (Tensor):
+                Indices of the base-scale segments for the columns of the block.
+
+        Returns:
+            fused_sim_d (Tensor):
+                Block of the fused affinity matrix.
+                Dimensions: (Number of rows) x (Number of columns)
+        """
+        row_index, col_index = row_index.to(self.device), col_index.to(self.device)
+        fused_sim_d = torch.zeros(row_index.shape[0], col_index.shape[0], device=self.device)
+        for scale_idx, emb in enumerate(self.embeddings_in_scales):
+            row_segments = self.segment_index_in_scales[scale_idx][row_index]
+            col_segments = self.segment_index_in_scales[scale_idx][col_index]
+            sim_d = torch.mm(emb[row_segments], emb.t())
+            sim_d[torch.arange(row_segments.shape[0], device=self.device), row_segments] = 1.0
+            sim_d = sim_d[:, col_segments]
+            v_min, v_max = self.min_max_in_scales[scale_idx][0], self.min_max_in_scales[scale_idx][1]
+            fused_sim_d += self.multiscale_weights[scale_idx] * ((sim_d - v_min) / (v_max - v_min))
+        return fused_sim_d
+
+    def getKneighbors(self, p_value: int) -> torch.Tensor:
+        """
+        Find the top-p neighbors of every base-scale segment without calculating the whole affinity matrix.
+
+        Args:
+            p_value (int):
+                The number of neighbors that are selected for each segment.
+
+        Returns:
+            kneighbors_index (Tensor):
+                Indices of the top-p neighbors, sorted in descending order of affinity.
+                Dimensions: (Number of base segments) x p_value
+        """
+        segment_index = torch.arange(self.num_segments, device=self.device)
+        kneighbors_list: List[torch.Tensor] = []
+        for start in range(0, self.num_segments, self.block_size):
+            block = self.getAffinityBlock(segment_index[start : start + self.block_size], segment_index)
+            kneighbors_list.append(torch.topk(block, k=p_value, dim=1)[1])
+        return torch.cat(kneighbors_list)
+
+
 def getLaplacian(X: torch.Tensor) -> torch.Tensor:
     """
     Calculate a laplacian matrix from an affinity matrix X.
@@ -540,6 +769,25 @@ def getLaplacian(X: torch.Tensor) -> torch.Tensor:
     return L
 
 
+def getSparseLaplacian(X: torch.Tensor) -> torch.Tensor:
+    """
+    Calculate a sparse laplacian matrix from a sparse COO affinity matrix X.
+    """
+    X = X.coalesce()
+    indices, values = X.indices(), X.values()
+    diagonal = indices[0] == indices[1]
+    values = values.masked_fill(diagonal, 0.0)
+    D = torch.zeros(X.shape[0], dtype=values.dtype, device=values.device).index_add_(0, indices[0], torch.abs(values))
+    if int(diagonal.sum().item()) == X.shape[0]:
+        # Every diagonal entry is stored (each node is its own nearest neighbor), so no re-sorting is needed.
+        L = torch.sparse_coo_tensor(indices, torch.where(diagonal, D[indices[0]], -values), X.shape, is_coalesced=True)
+    else:
+        diag_indices = torch.arange(X.shape[0], device=values.device).unsqueeze(0).repeat(2, 1)
+        L = torch.sparse_coo_tensor(torch.cat([diag_indices, indices], dim=1), torch.cat([D, -values]), X.shape)
+        L = L.coalesce()
+    return L
+
+
 def eigDecompose(laplacian: torch.Tensor, cuda: bool, device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
     """
     Calculate eigenvalues and eigenvectors from the Laplacian matrix.
@@ -568,6 +816,107 @@ def eigValueSh(laplacian: torch.Tensor, cuda: bool, device: torch.device) -> tor
     return lambdas
 
 
+def eigDecomposeSparse(
+    laplacian: torch.Tensor, n_eigs: int, cuda: bool, device: torch.device, random_state: int = 0, tol: float = 1e-6,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Calculate the `n_eigs` smallest eigenvalues and the corresponding eigenvectors of a sparse Laplacian matrix
+    with the LOBPCG method. Only sparse matrix products are needed, so the cost grows with the number of
+    connections in the graph instead of the cube of the matrix size. Falls back to `eigh` if the matrix is too
+    small for LOBPCG.
+
+    Args:
+        laplacian (Tensor):
+            Sparse COO Laplacian matrix
+        n_eigs (int):
+            The number of eigenpairs to calculate.
+        cuda (bool):
+            If cuda available eigendecomposition is computed on GPUs.
+        device (torch.device):
+            Torch device variable
+        random_state (int):
+            Seed variable for the initial eigenvectors of LOBPCG.
+        tol (float):
+            Residual tolerance for the convergence of LOBPCG.
+
+    Returns:
+        lambdas (Tensor):
+            The smallest eigenvalues in ascending order.
+        diffusion_map (Tensor):
+            The eigenvectors of the smallest eigenvalues.
+    """
+    if cuda:
+        laplacian = laplacian.double().to(device)
+    else:
+        laplacian = laplacian.double().to(torch.device('cpu'))
+    # CSR layout is much faster than COO for the sparse matrix products in LOBPCG
+    laplacian = laplacian.to_sparse_csr()
+    num_nodes = laplacian.shape[0]
+    if num_nodes < 3 * n_eigs:
+        lambdas, diffusion_map = eigh(laplacian.to_dense())
+    else:
+        torch.manual_seed(random_state)
+        init_eigvecs = torch.randn(num_nodes, n_eigs, dtype=torch.float64).to(laplacian.device)
+        lambdas, diffusion_map = torch.lobpcg(laplacian, X=init_eigvecs, largest=False, tol=tol)
+        lambdas, sorted_index = torch.sort(lambdas)
+        diffusion_map = diffusion_map[:, sorted_index]
+    return lambdas[:n_eigs].float(), diffusion_map[:, :n_eigs].float()
+
+
+def padLaplacians(laplacians: List[torch.Tensor]) -> torch.Tensor:
+    """
+    Stack Laplacian matrices of different sizes into a batch by padding them with a diagonal block.
+    The padded diagonal value is larger than the Gershgorin bound of every eigenvalue of the given matrix,
+    so the eigenvalues of the original matrix are the smallest eigenvalues of the padded matrix and
+    the corresponding eigenvectors are zero in the padded dimensions.
+    """
+    max_size = max([laplacian.shape[0] for laplacian in laplacians])
+    padded_laplacians: List[torch.Tensor] = []
+    for laplacian in laplacians:
+        laplacian = laplacian.float()
+        pad_size = max_size - laplacian.shape[0]
+        if pad_size > 0:
+            pad_value = torch.abs(laplacian).sum(dim=1).max() + 1.0
+            pad_block = pad_value * torch.eye(pad_size, dtype=laplacian.dtype, device=laplacian.device)
+            laplacian = torch.block_diag(laplacian, pad_block)
+        padded_laplacians.append(laplacian)
+    return torch.stack(padded_laplacians)
+
+
+def batchEigDecompose(
+    laplacians: List[torch.Tensor], cuda: bool, device: torch.device
+) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Calculate eigenvalues and eigenvectors of multiple Laplacian matrices with a single batched
+    eigendecomposition. The matrices can have different sizes.
+    """
+    if cuda:
+        if device is None:
+            device = torch.cuda.current_device()
+    else:
+        device = torch.device('cpu')
+    lambdas, diffusion_maps = eigh(padLaplacians(laplacians).to(device))
+    outputs: List[Tuple[torch.Tensor, torch.Tensor]] = []
+    for batch_idx, laplacian in enumerate(laplacians):
+        size = laplacian.shape[0]
+        outputs.append((lambdas[batch_idx, :size], diffusion_maps[batch_idx, :size, :size]))
+    return outputs
+
+
+def batchEigValueSh(laplacians: List[torch.Tensor], cuda: bool, device: torch.device) -> List[torch.Tensor]:
+    """
+    Calculate only eigenvalues of multiple Laplacian matrices with a single batched eigendecomposition.
+    The matrices can have different sizes.
+    """
+    if cuda:
+        if device is None:
+            device = torch.cuda.current_device()
+    else:
+        device = torch.device('cpu')
+    lambdas = eigvalsh(padLaplacians(laplacians).to(device))
+    return [lambdas[batch_idx, : laplacian.shape[0]] for batch_idx, laplacian in enumerate(laplacians)]
+
+
 def getLamdaGaplist(lambdas: torch.Tensor) -> torch.Tensor:
     """
     Calculate the gaps between lambda values.
@@ -740,6 +1089,16 @@ def estimateNumofSpeakers(
     """
     laplacian = getLaplacian(affinity_mat)
     lambdas = eigValueSh(laplacian, cuda=cuda, device=affinity_mat.device)
+    return estimateNumofSpeakersFromLambdas(lambdas, max_num_speakers)
+
+
+def estimateNumofSpeakersFromLambdas(
+    lambdas: torch.Tensor, max_num_speakers: int
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Estimate the number of speakers from the eigenvalues of the Laplacian Matrix.
+    See `estimateNumofSpeakers` for the details.
+    """
     lambdas = torch.sort(lambdas)[0]
     lambda_gap = getLamdaGaplist(lambdas)
     num_of_spk = torch.argmax(lambda_gap[: min(max_num_speakers, lambda_gap.shape[0])]) + 1
@@ -823,6 +1182,25 @@ class SpectralClustering:
 
         """
         spectral_emb = self.getSpectralEmbeddings(affinity, n_spks=self.n_clusters, cuda=cuda)
+        return self.kmeansSpectralEmbeddings(spectral_emb, device=device)
+
+    def kmeansSpectralEmbeddings(
+        self, spectral_emb: torch.Tensor, device: torch.device = torch.device('cpu')
+    ) -> torch.Tensor:
+        """
+        Perform k-means clustering on the given spectral embeddings for (self.n_random_trials) times
+        and take a majority vote.
+
+        Args:
+            spectral_emb (Tensor):
+                Spectral embeddings from `getSpectralEmbeddings`
+            device (torch.device):
+                Torch device variable
+
+        Returns:
+            labels (Tensor):
+                clustering label output
+        """
         labels_set = []
 
         for random_state_seed in range(self.random_state, self.random_state + self.n_random_trials):
@@ -838,10 +1216,11 @@ class SpectralClustering:
     def getSpectralEmbeddings(self, affinity_mat: torch.Tensor, n_spks: int = 8, cuda: bool = False) -> torch.Tensor:
         """
         Calculate eigenvalues and eigenvectors to extract spectral embeddings.
+        If the affinity matrix is a sparse tensor, only the `n_spks` smallest eigenpairs are calculated.
 
         Args:
             affinity (Tensor):
-                Affinity matrix input
+                Affinity matrix input (dense or sparse COO)
             cuda (torch.bool):
                 Use cuda for spectral clustering if cuda=True
             device (torch.device):
@@ -851,8 +1230,20 @@ class SpectralClustering:
             labels (Tensor):
                 clustering label output
         """
-        laplacian = getLaplacian(affinity_mat)
-        _, diffusion_map_ = eigDecompose(laplacian, cuda=cuda, device=affinity_mat.device)
+        if affinity_mat.is_sparse:
+            laplacian = getSparseLaplacian(affinity_mat)
+            _, diffusion_map_ = eigDecomposeSparse(
+                laplacian, n_eigs=n_spks, cuda=cuda, device=affinity_mat.device, random_state=self.random_state
+            )
+        else:
+            laplacian = getLaplacian(affinity_mat)
+            _, diffusion_map_ = eigDecompose(laplacian, cuda=cuda, device=affinity_mat.device)
+        return self.getSpectralEmbeddingsFromDiffusionMap(diffusion_map_, n_spks=n_spks)
+
+    def getSpectralEmbeddingsFromDiffusionMap(self, diffusion_map_: torch.Tensor, n_spks: int = 8) -> torch.Tensor:
+        """
+        Extract spectral embeddings from the eigenvectors sorted in ascending order of eigenvalues.
+        """
         diffusion_map = diffusion_map_[:, :n_spks]
         inv_idx = torch.arange(diffusion_map.size(1) - 1, -1, -1).long()
         embedding = diffusion_map.T[inv_idx, :]
@@ -888,6 +1279,10 @@ class NMESC:
             Subsamples the number of speakers to reduce the computational load
         getPvalueList():
             Generates a list containing p-values that need to be examined.
+        getSearchStrides():
+            Generates the strides for each level of the coarse-to-fine p-value search.
+        getPvalueSearchIndex(stride):
+            Selects the p-values to be examined at the given stride of the search.
         getEigRatio(p_neighbors):
             Calculates g_p, which is a ratio between p_neighbors and the maximum eigengap
         getLamdaGaplist(lambdas):
@@ -910,6 +1305,7 @@ class NMESC:
         parallelism: bool = True,
         cuda: bool = False,
         device: torch.device = torch.device('cpu'),
+        coarse_to_fine_search: bool = False,
     ):
         """
         Args:
@@ -948,6 +1344,11 @@ class NMESC:
                 Use cuda for Eigen decomposition if cuda=True.
             device (torch.device):
                 Torch device variable
+            coarse_to_fine_search (bool):
+                If True, examine every k-th p-value first and then halve the step around the best p-value
+                until it becomes 1, instead of examining all p-values. This needs O(sqrt(P) + log(P))
+                eigendecompositions for P p-values, but it can miss the best p-value if g_p has multiple
+                local minima. Ignored if maj_vote_spk_count is True, since the majority vote needs all p-values.
         """
         self.max_num_speakers: int = max_num_speakers
         self.max_rp_threshold: float = max_rp_threshold
@@ -965,6 +1366,10 @@ class NMESC:
         self.device: torch.device = device
         self.maj_vote_spk_count: bool = maj_vote_spk_count
         self.parallelism: bool = parallelism
+        self.coarse_to_fine_search: bool = coarse_to_fine_search
+        self.sorted_neighbor_index = torch.jit.annotate(Optional[torch.Tensor], None)
+        self.eig_ratio_list: torch.Tensor = torch.zeros(1)
+        self.est_num_of_spk_list: torch.Tensor = torch.zeros(1)
 
     def forward(self) -> Tuple[torch.Tensor, torch.Tensor]:
         """
@@ -976,41 +1381,110 @@ class NMESC:
             p_hat_value (Tensor):
                 Estimated p-value (determines how many neighboring values to be selected)
         """
+        subsample_ratio = self.preparePvalueSearch()
+
+        # Scans p_values and find a p_value that generates the smallest g_p value.
+        for stride in self.getSearchStrides():
+            p_index_list = self.getPvalueSearchIndex(stride)
+            results: List[torch.Tensor] = []
+            if self.parallelism:
+                futures: List[torch.jit.Future[torch.Tensor]] = []
+                for p_idx in p_index_list:
+                    futures.append(torch.jit.fork(self.getEigRatio, self.p_value_list[p_idx]))
+                for future in futures:
+                    results.append(torch.jit.wait(future))
+
+            else:
+                for p_idx in p_index_list:
+                    results.append(self.getEigRatio(self.p_value_list[p_idx]))
+            for p_idx, output in zip(p_index_list, results):
+                self.eig_ratio_list[p_idx], self.est_num_of_spk_list[p_idx] = output[0], output[1]
+        return self.selectPvalue(subsample_ratio)
+
+    def preparePvalueSearch(self) -> torch.Tensor:
+        """
+        Subsample the affinity matrix if `use_subsampling_for_nme` is True and generate the p-values to be searched.
+
+        Returns:
+            subsample_ratio (Tensor):
+                The ratio between nme_mat_size and the original matrix size
+        """
         if self.use_subsampling_for_nme:
             subsample_ratio = self.subsampleAffinityMat(self.nme_mat_size)
         else:
             subsample_ratio = torch.tensor(1)
-
-        # Scans p_values and find a p_value that generates the smallest g_p value.
-        results: List[torch.Tensor] = []
-        est_spk_n_dict: Dict[int, torch.Tensor] = {}
         self.p_value_list = self.getPvalueList()
+        # Sort the neighbors of each row once instead of sorting the affinity matrix for every p-value.
+        self.sorted_neighbor_index = torch.argsort(self.mat, dim=1, descending=True)[:, : int(self.max_N)]
+        # g_p values of the p-values that are not examined stay at infinity.
+        self.eig_ratio_list = torch.full((self.p_value_list.shape[0],), float('inf'))
+        self.est_num_of_spk_list = torch.zeros(self.p_value_list.shape[0])
+        return subsample_ratio
+
+    def getSearchStrides(self) -> List[int]:
+        """
+        Generate the strides for each level of the p-value search. All p-values are examined at once unless
+        `coarse_to_fine_search` is True. For coarse-to-fine search, the first stride is the largest power of 2
+        that is not larger than half the square root of the number of p-values, and it is halved at each level.
+
+        Returns:
+            stride_list (list):
+                List containing the strides in decreasing order. The last stride is always 1.
+        """
+        stride = 1
+        if self.coarse_to_fine_search and not self.maj_vote_spk_count:
+            while 4 * stride * stride <= self.p_value_list.shape[0]:
+                stride *= 2
+        stride_list: List[int] = [stride]
+        while stride > 1:
+            stride = stride // 2
+            stride_list.append(stride)
+        return stride_list
+
+    def getPvalueSearchIndex(self, stride: int) -> List[int]:
+        """
+        Select the indices of the p-values that are examined at the given stride. If no p-value has been examined,
+        every `stride`-th p-value is selected. Otherwise, the p-values at `stride` away from the best p-value so far
+        are selected unless they have been examined already.
+
+        Args:
+            stride (int):
+                The stride of the current level of the p-value search.
+
+        Returns:
+            p_index_list (list):
+                List containing the indices of the p-values in `self.p_value_list` to be examined.
+        """
         p_volume = self.p_value_list.shape[0]
-        eig_ratio_list = torch.zeros(p_volume,)
-        est_num_of_spk_list = torch.zeros(p_volume,)
+        searched = torch.logical_not(torch.isinf(self.eig_ratio_list))
+        if not bool(searched.any()):
+            return list(range(0, p_volume, stride))
+        best_idx = int(torch.argmin(self.eig_ratio_list).item())
+        p_index_list: List[int] = []
+        for p_idx in [best_idx - stride, best_idx + stride]:
+            if 0 <= p_idx < p_volume and not bool(searched[p_idx]):
+                p_index_list.append(p_idx)
+        return p_index_list
+
+    def selectPvalue(self, subsample_ratio: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Select the p-value that generates the smallest g_p value from the eigen analysis results
+        in `self.eig_ratio_list` and `self.est_num_of_spk_list`.
 
-        if self.parallelism:
-            futures: List[torch.jit.Future[torch.Tensor]] = []
-            for p_idx, p_value in enumerate(self.p_value_list):
-                futures.append(torch.jit.fork(self.getEigRatio, p_value))
-            for future in futures:
-                results.append(torch.jit.wait(future))
+        Args:
+            subsample_ratio (Tensor):
+                The ratio between nme_mat_size and the original matrix size
 
-        else:
-            for p_idx, p_value in enumerate(self.p_value_list):
-                results.append(self.getEigRatio(p_value))
-
-        # Retrieve the eigen analysis results
-        for p_idx, p_value in enumerate(self.p_value_list):
-            output = results[p_idx]
-            g_p, est_num_of_spk = output[0], output[1].int()
-            eig_ratio_list[p_idx] = g_p
-            est_spk_n_dict[p_value.item()] = est_num_of_spk
-            est_num_of_spk_list[p_idx] = est_num_of_spk
-
-        index_nn = torch.argmin(eig_ratio_list)
+        Returns:
+            est_num_of_spk (Tensor):
+                Estimated number of speakers from NMESC approach
+            p_hat_value (Tensor):
+                Estimated p-value (determines how many neighboring values to be selected)
+        """
+        est_num_of_spk_list = self.est_num_of_spk_list
+        index_nn = torch.argmin(self.eig_ratio_list)
         rp_p_value = self.p_value_list[index_nn]
-        affinity_mat = getAffinityGraphMat(self.mat, rp_p_value)
+        affinity_mat = getAffinityGraphMat(self.mat, rp_p_value, self.sorted_neighbor_index)
 
         # Checks whether the affinity graph is fully connected.
         # If not, it adds a minimum number of connections to make it fully connected.
@@ -1023,7 +1497,7 @@ class NMESC:
         if self.maj_vote_spk_count:
             est_num_of_spk = torch.mode(torch.tensor(est_num_of_spk_list))[0]
         else:
-            est_num_of_spk = est_spk_n_dict[rp_p_value.item()]
+            est_num_of_spk = est_num_of_spk_list[index_nn].int()
         return est_num_of_spk, p_hat_value
 
     def subsampleAffinityMat(self, nme_mat_size: int) -> torch.Tensor:
@@ -1070,10 +1544,17 @@ class NMESC:
             g_p (float):
                 The ratio between p_neighbors value and the maximum eigen gap value.
         """
-        affinity_mat = getAffinityGraphMat(self.mat, p_neighbors)
-        est_num_of_spk, lambdas, lambda_gap_list = estimateNumofSpeakers(
-            affinity_mat, self.max_num_speakers, self.cuda
-        )
+        affinity_mat = getAffinityGraphMat(self.mat, p_neighbors, self.sorted_neighbor_index)
+        laplacian = getLaplacian(affinity_mat)
+        lambdas = eigValueSh(laplacian, cuda=self.cuda, device=affinity_mat.device)
+        return self.getEigRatioFromLambdas(p_neighbors, lambdas)
+
+    def getEigRatioFromLambdas(self, p_neighbors: int, lambdas: torch.Tensor) -> torch.Tensor:
+        """
+        Calculate g_p from the eigenvalues of the Laplacian matrix of the graph with p_neighbors connections.
+        See `getEigRatio` for the details.
+        """
+        est_num_of_spk, lambdas, lambda_gap_list = estimateNumofSpeakersFromLambdas(lambdas, self.max_num_speakers)
         arg_sorted_idx = torch.argsort(lambda_gap_list[: self.max_num_speakers], descending=True)
         max_key = arg_sorted_idx[0]
         max_eig_gap = lambda_gap_list[max_key] / (torch.max(lambdas).item() + self.eps)
@@ -1130,6 +1611,9 @@ class SpeakerClustering(torch.nn.Module):
         maj_vote_spk_count: bool = False,
         parallelism: bool = False,
         cuda: bool = False,
+        sparse_affinity: bool = False,
+        affinity_block_size: int = 1024,
+        coarse_to_fine_search: bool = False,
     ):
         """
         Clustering method for speaker diarization based on cosine similarity.
@@ -1152,6 +1636,15 @@ class SpeakerClustering(torch.nn.Module):
                 Use dynamic parallelism feature in torch.jit compiler to accelerate the p-value search.
             cuda (bool):
                 Boolean variable for toggling cuda availability.
+            sparse_affinity (bool):
+                If True, sessions with more than `nme_mat_size` segments are clustered on a sparse k-nearest-neighbor
+                affinity graph with a partial eigensolver, instead of the dense N by N affinity matrix.
+                NME-analysis is done on the subsampled affinity matrix as in the dense mode.
+            affinity_block_size (int):
+                The number of affinity matrix rows calculated at once when building the sparse affinity graph.
+            coarse_to_fine_search (bool):
+                If True, NME-analysis searches p-values from coarse to fine instead of examining all of them.
+                See `NMESC` for the details.
         """
         super().__init__()
         self.min_samples_for_nmesc: int = min_samples_for_nmesc
@@ -1160,6 +1653,9 @@ class SpeakerClustering(torch.nn.Module):
         self.parallelism: bool = parallelism
         self.cuda: bool = cuda
         self.maj_vote_spk_count: bool = maj_vote_spk_count
+        self.sparse_affinity: bool = sparse_affinity
+        self.affinity_block_size: int = affinity_block_size
+        self.coarse_to_fine_search: bool = coarse_to_fine_search
         self.embeddings_in_scales: List[torch.Tensor] = [torch.Tensor(0)]
         self.timestamps_in_scales: List[torch.Tensor] = [torch.Tensor(0)]
         self.device = torch.device("cuda") if self.cuda else torch.device("cpu")
@@ -1220,6 +1716,7 @@ class SpeakerClustering(torch.nn.Module):
             parallelism=self.parallelism,
             cuda=self.cuda,
             device=self.device,
+            coarse_to_fine_search=self.coarse_to_fine_search,
         )
         # If there are less than `min_samples_for_nmesc` segments, est_num_of_spk is 1.
         if mat.shape[0] > self.min_samples_for_nmesc:
@@ -1244,6 +1741,69 @@ class SpeakerClustering(torch.nn.Module):
         Y = spectral_model.forward(affinity_mat)
         return Y
 
+    def forward_sparse_unit_infer(
+        self,
+        cos_affinity: BlockCosAffinity,
+        oracle_num_speakers: int = -1,
+        max_num_speakers: int = 8,
+        max_rp_threshold: float = 0.15,
+        sparse_search_volume: int = 30,
+        est_num_of_spk_enhanced: torch.Tensor = torch.tensor(-1),
+        fixed_thres: float = -1.0,
+        kmeans_random_trials: int = 1,
+    ) -> torch.LongTensor:
+        """
+        Sparse counterpart of `forward_unit_infer`, which never calculates the whole N by N affinity matrix.
+
+        NME-analysis is performed on the subsampled affinity matrix, which is calculated only for the subsampled
+        segments. The estimated p-value is then used to build a sparse k-nearest-neighbor affinity graph of all
+        segments, and the spectral embeddings are calculated with a partial eigensolver.
+        The results are the same as `forward_unit_infer` up to the precision of the eigensolver.
+
+        Args:
+            cos_affinity (BlockCosAffinity):
+                Block-wise cosine affinity calculator for the provided speaker embeddings.
+            Please refer to `forward_unit_infer` for the other arguments.
+
+        Returns:
+            Y (LongTensor):
+                Speaker labels (clustering output) in integer format for the segments in the given input embeddings.
+        """
+        num_segments = cos_affinity.num_segments
+        subsample_ratio = max(1, int(num_segments / self.nme_mat_size))
+        subsample_index = torch.arange(0, num_segments, subsample_ratio)
+        mat = cos_affinity.getAffinityBlock(subsample_index, subsample_index)
+        nmesc = NMESC(
+            mat,
+            max_num_speakers=max_num_speakers,
+            max_rp_threshold=max_rp_threshold,
+            sparse_search=self.sparse_search,
+            sparse_search_volume=sparse_search_volume,
+            fixed_thres=fixed_thres,
+            use_subsampling_for_nme=False,
+            maj_vote_spk_count=self.maj_vote_spk_count,
+            parallelism=self.parallelism,
+            cuda=self.cuda,
+            device=self.device,
+            coarse_to_fine_search=self.coarse_to_fine_search,
+        )
+        est_num_of_spk, rp_p_value = nmesc.forward()
+        p_hat_value = subsample_ratio * int(rp_p_value.item())
+        affinity_mat = getSparseAffinityGraphMat(cos_affinity.getKneighbors(p_hat_value), p_hat_value)
+
+        if oracle_num_speakers > 0:
+            n_clusters = int(oracle_num_speakers)
+        elif est_num_of_spk_enhanced > 0:
+            n_clusters = int(est_num_of_spk_enhanced.item())
+        else:
+            n_clusters = int(est_num_of_spk.item())
+
+        spectral_model = SpectralClustering(
+            n_clusters=n_clusters, n_random_trials=kmeans_random_trials, cuda=self.cuda, device=self.device
+        )
+        Y = spectral_model.forward(affinity_mat)
+        return Y
+
     def forward(self, param_dict: Dict[str, torch.Tensor]) -> torch.LongTensor:
         """
         A function wrapper designed for inference in exported script format.
@@ -1368,6 +1928,25 @@ class SpeakerClustering(torch.nn.Module):
         if oracle_num_speakers > 0:
             max_num_speakers = oracle_num_speakers
 
+        if self.sparse_affinity and emb.shape[0] > max(self.nme_mat_size, self.min_samples_for_nmesc):
+            cos_affinity = BlockCosAffinity(
+                embeddings_in_scales=[emb_t.half() for emb_t in self.embeddings_in_scales],
+                segment_index_in_scales=get_scale_segment_index(self.embeddings_in_scales, self.timestamps_in_scales),
+                multiscale_weights=multiscale_weights,
+                block_size=self.affinity_block_size,
+                device=self.device,
+            )
+            return self.forward_sparse_unit_infer(
+                cos_affinity=cos_affinity,
+                oracle_num_speakers=oracle_num_speakers,
+                max_rp_threshold=max_rp_threshold,
+                max_num_speakers=max_num_speakers,
+                sparse_search_volume=sparse_search_volume,
+                est_num_of_spk_enhanced=est_num_of_spk_enhanced,
+                kmeans_random_trials=kmeans_random_trials,
+                fixed_thres=fixed_thres,
+            )
+
         mat = getMultiScaleCosAffinityMatrix(
             multiscale_weights=multiscale_weights,
             embeddings_in_scales=self.embeddings_in_scales,
@@ -1385,3 +1964,160 @@ class SpeakerClustering(torch.nn.Module):
             kmeans_random_trials=kmeans_random_trials,
             fixed_thres=fixed_thres,
         )
+
+    def forward_batch_infer(
+        self,
+        embeddings_in_scales_list: List[torch.Tensor],
+        timestamps_in_scales_list: List[torch.Tensor],
+        multiscale_segment_counts_list: List[torch.LongTensor],
+        multiscale_weights_list: List[torch.Tensor],
+        oracle_num_speakers_list: List[int],
+        max_num_speakers: int = 8,
+        max_rp_threshold: float = 0.15,
+        enhanced_count_thres: int = 40,
+        sparse_search_volume: int = 30,
+        fixed_thres: float = -1.0,
+        kmeans_random_trials: int = 1,
+    ) -> List[torch.LongTensor]:
+        """
+        Cluster multiple sessions as one batched job. The eigendecompositions for the NME-analysis of all sessions
+        and all p-values are calculated with a single batched call, and so are the eigendecompositions for the
+        spectral embeddings of all sessions. This removes most of the per-session overhead when clustering many
+        short sessions, especially on GPU.
+
+        The matrices are padded to the largest session, so the memory usage grows with
+        (Number of sessions) x (Number of p-values) x (Number of segments in the largest session)^2.
+        Sessions of similar lengths should be batched together, and long-form sessions should be clustered
+        with `forward_infer` instead.
+
+        Args:
+            embeddings_in_scales_list (list):
+                List containing `embeddings_in_scales` of each session.
+            timestamps_in_scales_list (list):
+                List containing `timestamps_in_scales` of each session.
+            multiscale_segment_counts_list (list):
+                List containing `multiscale_segment_counts` of each session.
+            multiscale_weights_list (list):
+                List containing `multiscale_weights` of each session.
+            oracle_num_speakers_list (list):
+                List containing the number of speakers of each session as given by the reference transcript,
+                or -1 if the number of speakers should be estimated.
+            Please refer to `forward_infer` for the other arguments.
+
+        Returns:
+            labels_list (list):
+                List containing speaker labels for the segments of each session.
+        """
+        labels_list: List[torch.LongTensor] = []
+        mat_list: List[torch.Tensor] = []
+        est_num_of_spk_enhanced_list: List[torch.Tensor] = []
+        nmesc_list: List[NMESC] = []
+        subsample_ratio_list: List[torch.Tensor] = []
+        session_index_list: List[int] = []
+        for session_idx in range(len(embeddings_in_scales_list)):
+            embeddings_in_scales, timestamps_in_scales = split_input_data(
+                embeddings_in_scales_list[session_idx],
+                timestamps_in_scales_list[session_idx],
+                multiscale_segment_counts_list[session_idx],
+            )
+            emb = embeddings_in_scales[-1]
+            oracle_num_speakers = oracle_num_speakers_list[session_idx]
+            labels_list.append(torch.zeros((1,), dtype=torch.int64))
+            if emb.shape[0] == 1:
+                continue
+            elif emb.shape[0] <= max(enhanced_count_thres, self.min_samples_for_nmesc) and oracle_num_speakers < 0:
+                est_num_of_spk_enhanced = getEnhancedSpeakerCount(emb=emb, cuda=self.cuda)
+            else:
+                est_num_of_spk_enhanced = torch.tensor(-1)
+
+            mat = getMultiScaleCosAffinityMatrix(
+                multiscale_weights=multiscale_weights_list[session_idx],
+                embeddings_in_scales=embeddings_in_scales,
+                timestamps_in_scales=timestamps_in_scales,
+                device=self.device,
+            )
+            nmesc = NMESC(
+                mat,
+                max_num_speakers=oracle_num_speakers if oracle_num_speakers > 0 else max_num_speakers,
+                max_rp_threshold=max_rp_threshold,
+                sparse_search=self.sparse_search,
+                sparse_search_volume=sparse_search_volume,
+                fixed_thres=fixed_thres,
+                nme_mat_size=self.nme_mat_size,
+                maj_vote_spk_count=self.maj_vote_spk_count,
+                parallelism=False,
+                cuda=self.cuda,
+                device=self.device,
+                coarse_to_fine_search=self.coarse_to_fine_search,
+            )
+            # If there are less than `min_samples_for_nmesc` segments, the affinity matrix is not binarized.
+            if mat.shape[0] <= self.min_samples_for_nmesc:
+                nmesc.fixed_thres = max_rp_threshold
+            subsample_ratio_list.append(nmesc.preparePvalueSearch())
+            mat_list.append(mat)
+            nmesc_list.append(nmesc)
+            est_num_of_spk_enhanced_list.append(est_num_of_spk_enhanced)
+            session_index_list.append(session_idx)
+
+        if len(nmesc_list) == 0:
+            return labels_list
+
+        # NME-analysis of all sessions in a single batch for each level of the p-value search
+        stride_lists = [nmesc.getSearchStrides() for nmesc in nmesc_list]
+        for level in range(max([len(stride_list) for stride_list in stride_lists])):
+            laplacians: List[torch.Tensor] = []
+            search_index_list: List[Tuple[int, int]] = []
+            for batch_idx, nmesc in enumerate(nmesc_list):
+                if level >= len(stride_lists[batch_idx]):
+                    continue
+                for p_idx in nmesc.getPvalueSearchIndex(stride_lists[batch_idx][level]):
+                    affinity_mat = getAffinityGraphMat(
+                        nmesc.mat, nmesc.p_value_list[p_idx], nmesc.sorted_neighbor_index
+                    )
+                    laplacians.append(getLaplacian(affinity_mat))
+                    search_index_list.append((batch_idx, p_idx))
+            if len(laplacians) == 0:
+                continue
+            lambdas_list = batchEigValueSh(laplacians, cuda=self.cuda, device=self.device)
+            for (batch_idx, p_idx), lambdas in zip(search_index_list, lambdas_list):
+                nmesc = nmesc_list[batch_idx]
+                output = nmesc.getEigRatioFromLambdas(nmesc.p_value_list[p_idx], lambdas)
+                nmesc.eig_ratio_list[p_idx], nmesc.est_num_of_spk_list[p_idx] = output[0], output[1]
+
+        n_clusters_list: List[int] = []
+        laplacians = []
+        for batch_idx, nmesc in enumerate(nmesc_list):
+            est_num_of_spk, p_hat_value = nmesc.selectPvalue(subsample_ratio_list[batch_idx])
+
+            mat = mat_list[batch_idx]
+            if mat.shape[0] > self.min_samples_for_nmesc:
+                affinity_mat = getAffinityGraphMat(mat, p_hat_value)
+            else:
+                affinity_mat = mat
+            laplacians.append(getLaplacian(affinity_mat))
+
+            session_idx = session_index_list[batch_idx]
+            est_num_of_spk_enhanced = est_num_of_spk_enhanced_list[batch_idx]
+            if oracle_num_speakers_list[session_idx] > 0:
+                n_clusters_list.append(int(oracle_num_speakers_list[session_idx]))
+            elif est_num_of_spk_enhanced > 0:
+                n_clusters_list.append(int(est_num_of_spk_enhanced.item()))
+            else:
+                n_clusters_list.append(int(est_num_of_spk.item()))
+
+        # Spectral embeddings of all sessions in a single batch
+        eig_outputs = batchEigDecompose(laplacians, cuda=self.cuda, device=self.device)
+        for batch_idx, (_, diffusion_map) in enumerate(eig_outputs):
+            spectral_model = SpectralClustering(
+                n_clusters=n_clusters_list[batch_idx],
+                n_random_trials=kmeans_random_trials,
+                cuda=self.cuda,
+                device=self.device,
+            )
+            spectral_emb = spectral_model.getSpectralEmbeddingsFromDiffusionMap(
+                diffusion_map, n_spks=n_clusters_list[batch_idx]
+            )
+            labels_list[session_index_list[batch_idx]] = spectral_model.kmeansSpectralEmbeddings(
+                spectral_emb, device=self.device
+            )
+        return labels_list
@@ -26,6 +26,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -160,6 +161,148 @@ class HATJointOutput:
     ilm_logprobs: Optional[torch.Tensor] = None
 
 
+class DecoderStateCache:
+    """
+    LRU cache of the decoder outputs and states of label sequences, shared by the hypotheses of a beam search.
+
+    Entries are keyed by the label sequence (prefix) of a hypothesis as a tuple of ints, and hold whatever
+    `score_hypothesis` / `batch_score_hypothesis` of the decoder store for it. When the cache is full,
+    the least recently used entry is discarded - it is recomputed by the decoder if it is needed again.
+
+    Lookups are done with `key in cache`, which keeps track of the number of hits and misses.
+
+    Args:
+        max_size: maximum number of cached label sequences. None for an unbounded cache.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        if max_size is not None and max_size < 1:
+            raise ValueError(f"`max_size` of the decoder state cache must be None or positive, got {max_size}")
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __contains__(self, key: Tuple[int, ...]) -> bool:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def __getitem__(self, key: Tuple[int, ...]) -> Any:
+        return self._cache[key]
+
+    def __setitem__(self, key: Tuple[int, ...], value: Any):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+
+        if self.max_size is not None and len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups which were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def clear(self):
+        """Removes all the entries, the hit and miss counts are kept."""
+        self._cache.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self) -> str:
+        return f"{len(self)} cached sequences, {self.hits} hits, {self.misses} misses (hit rate {self.hit_rate:.2%})"
+
+
+class BatchedHyps:
+    """
+    Greedy hypotheses of a batch of utterances, stored in preallocated tensors.
+
+    Results are added for all the utterances at once with `add_results_masked_`, without host synchronization,
+    and are converted to Hypothesis objects only at the end of decoding with `to_hypotheses`.
+
+    Args:
+        batch_size: number of utterances.
+        init_length: initial capacity, in labels per utterance. The buffers are doubled when it is reached.
+        device: device of the buffers.
+        float_dtype: dtype of the scores.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        init_length: int,
+        device: Optional[torch.device] = None,
+        float_dtype: Optional[torch.dtype] = None,
+    ):
+        if init_length <= 0:
+            raise ValueError(f"init_length must be > 0, got {init_length}")
+
+        self._max_length = init_length
+        # Upper bound of the current lengths, known without synchronization: at most one label is added per call
+        self._num_steps = 0
+
+        self.current_lengths = torch.zeros(batch_size, device=device, dtype=torch.long)
+        self.transcript = torch.zeros((batch_size, self._max_length), device=device, dtype=torch.long)
+        self.timesteps = torch.zeros((batch_size, self._max_length), device=device, dtype=torch.long)
+        self.scores = torch.zeros(batch_size, device=device, dtype=float_dtype)
+        self._batch_indices = torch.arange(batch_size, device=device)
+
+    def _allocate_more(self):
+        """Doubles the capacity of the buffers."""
+        self.transcript = torch.cat((self.transcript, torch.zeros_like(self.transcript)), dim=-1)
+        self.timesteps = torch.cat((self.timesteps, torch.zeros_like(self.timesteps)), dim=-1)
+        self._max_length *= 2
+
+    def add_results_masked_(
+        self, active_mask: torch.Tensor, labels: torch.Tensor, time_indices: torch.Tensor, scores: torch.Tensor
+    ):
+        """
+        Adds a label to the hypotheses of the active utterances, in place.
+
+        Args:
+            active_mask: bool tensor [B], whether to add the label to the hypothesis of each utterance.
+            labels: labels to add [B].
+            time_indices: frame indices of the labels [B].
+            scores: scores of the labels [B], added to the scores of the hypotheses.
+        """
+        if self._num_steps >= self._max_length:
+            self._allocate_more()
+        self._num_steps += 1
+
+        # The labels of the inactive utterances are written past the end of their hypotheses, and are ignored
+        self.transcript[self._batch_indices, self.current_lengths] = labels
+        self.timesteps[self._batch_indices, self.current_lengths] = time_indices
+        self.scores += torch.where(active_mask, scores, torch.zeros_like(scores))
+        self.current_lengths += active_mask
+
+    def to_hypotheses(self) -> List[Hypothesis]:
+        """Converts the buffers to a list of Hypothesis, one per utterance."""
+        lengths = self.current_lengths.tolist()
+        transcript = self.transcript.tolist()
+        timesteps = self.timesteps.tolist()
+        scores = self.scores.tolist()
+        return [
+            Hypothesis(
+                score=scores[i],
+                y_sequence=transcript[i][: lengths[i]],
+                timestep=timesteps[i][: lengths[i]],
+                dec_state=None,
+            )
+            for i in range(len(lengths))
+        ]
+
+
 def is_prefix(x: List[int], pref: List[int]) -> bool:
     """
     Obtained from https://github.com/espnet/espnet.
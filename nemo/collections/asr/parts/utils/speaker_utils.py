@@ -430,6 +430,76 @@ def generate_cluster_labels(segment_ranges: List[str], cluster_labels: List[int]
     return diar_hyp, lines
 
 
+def get_oracle_num_speakers(audio_rttm_values, clustering_params) -> int:
+    """
+    Get the oracle number of speakers of a session from AUDIO_RTTM_MAP values if `oracle_num_speakers` is set
+    in clustering parameters, otherwise -1.
+    """
+    if clustering_params.oracle_num_speakers:
+        num_speakers = audio_rttm_values.get('num_speakers', None)
+        if num_speakers is None:
+            raise ValueError("Provided option as oracle num of speakers but num_speakers in manifest is null")
+        return int(num_speakers)
+    return -1
+
+
+def perform_batch_clustering(
+    embs_and_timestamps, AUDIO_RTTM_MAP, clustering_params, speaker_clustering, verbose: bool = True
+) -> Dict[str, torch.Tensor]:
+    """
+    Cluster short sessions in batches of `session_batch_size` sessions with `SpeakerClustering.forward_batch_infer`.
+    Sessions are sorted by the number of segments so that sessions of similar lengths are batched together.
+    Long-form sessions (more than `embeddings_per_chunk` segments) and sessions clustered on the sparse affinity
+    graph are not clustered here.
+
+    Args:
+        embs_and_timestamps (dict): Embeddings, timestamps and segment counts indexed by unique IDs.
+            See `perform_clustering`.
+        AUDIO_RTTM_MAP (dict): AUDIO_RTTM_MAP for mapping unique id with audio file path and rttm path
+        clustering_params (dict): clustering parameters provided through config
+        speaker_clustering (SpeakerClustering): SpeakerClustering instance for clustering the sessions
+        verbose (bool): Enable TQDM progress bar.
+
+    Returns:
+        cluster_labels_dict (dict): Dictionary containing the cluster labels indexed by unique IDs.
+    """
+    embeddings_per_chunk = clustering_params.get('embeddings_per_chunk', None)
+    sparse_min_size = max(speaker_clustering.nme_mat_size, speaker_clustering.min_samples_for_nmesc)
+    uniq_ids = []
+    for uniq_id in AUDIO_RTTM_MAP:
+        multiscale_segment_counts = embs_and_timestamps[uniq_id]['multiscale_segment_counts']
+        if embeddings_per_chunk is not None and torch.max(multiscale_segment_counts) > embeddings_per_chunk:
+            continue
+        if speaker_clustering.sparse_affinity and multiscale_segment_counts[-1] > sparse_min_size:
+            continue
+        uniq_ids.append(uniq_id)
+    uniq_ids.sort(key=lambda uniq_id: int(embs_and_timestamps[uniq_id]['multiscale_segment_counts'][-1]))
+
+    cluster_labels_dict = {}
+    session_batch_size = int(clustering_params.session_batch_size)
+    for start in tqdm(
+        range(0, len(uniq_ids), session_batch_size), desc='batch clustering', leave=True, disable=not verbose
+    ):
+        batch_uniq_ids = uniq_ids[start : start + session_batch_size]
+        cluster_labels_list = speaker_clustering.forward_batch_infer(
+            embeddings_in_scales_list=[embs_and_timestamps[uniq_id]['embeddings'] for uniq_id in batch_uniq_ids],
+            timestamps_in_scales_list=[embs_and_timestamps[uniq_id]['timestamps'] for uniq_id in batch_uniq_ids],
+            multiscale_segment_counts_list=[
+                embs_and_timestamps[uniq_id]['multiscale_segment_counts'] for uniq_id in batch_uniq_ids
+            ],
+            multiscale_weights_list=[embs_and_timestamps[uniq_id]['multiscale_weights'] for uniq_id in batch_uniq_ids],
+            oracle_num_speakers_list=[
+                get_oracle_num_speakers(AUDIO_RTTM_MAP[uniq_id], clustering_params) for uniq_id in batch_uniq_ids
+            ],
+            max_num_speakers=int(clustering_params.max_num_speakers),
+            max_rp_threshold=float(clustering_params.max_rp_threshold),
+            enhanced_count_thres=int(clustering_params.get('enhanced_count_thres', 80)),
+            sparse_search_volume=int(clustering_params.sparse_search_volume),
+        )
+        cluster_labels_dict.update(zip(batch_uniq_ids, cluster_labels_list))
+    return cluster_labels_dict
+
+
 def perform_clustering(
     embs_and_timestamps, AUDIO_RTTM_MAP, out_rttm_dir, clustering_params, device, verbose: bool = True
 ):
@@ -444,7 +514,10 @@ def perform_clustering(
         AUDIO_RTTM_MAP (dict): AUDIO_RTTM_MAP for mapping unique id with audio file path and rttm path
         out_rttm_dir (str): Path to write predicted rttms
         clustering_params (dict): clustering parameters provided through config that contains max_num_speakers (int),
-        oracle_num_speakers (bool), max_rp_threshold(float), sparse_search_volume(int) and enhance_count_threshold (int)
+        oracle_num_speakers (bool), max_rp_threshold(float), sparse_search_volume(int) and enhance_count_threshold (int).
+        If `session_batch_size` is larger than 1, short sessions are clustered in batches (see `perform_batch_clustering`).
+        If `sparse_affinity` is True, long sessions are clustered on a sparse k-nearest-neighbor affinity graph.
+        If `coarse_to_fine_search` is True, NME-analysis searches p-values from coarse to fine.
         use_torch_script (bool): Boolean that determines whether to use torch.jit.script for speaker clustering
         device (torch.device): Device we are running on ('cpu', 'cuda').
         verbose (bool): Enable TQDM progress bar.
@@ -464,7 +537,21 @@ def perform_clustering(
         logging.warning("cuda=False, using CPU for eigen decomposition. This might slow down the clustering process.")
         cuda = False
 
-    speaker_clustering = LongFormSpeakerClustering(cuda=cuda)
+    speaker_clustering = LongFormSpeakerClustering(
+        cuda=cuda,
+        sparse_affinity=clustering_params.get('sparse_affinity', False),
+        coarse_to_fine_search=clustering_params.get('coarse_to_fine_search', False),
+    )
+
+    batch_cluster_labels = {}
+    if clustering_params.get('session_batch_size', 1) > 1:
+        batch_cluster_labels = perform_batch_clustering(
+            embs_and_timestamps,
+            AUDIO_RTTM_MAP,
+            clustering_params,
+            speaker_clustering=speaker_clustering.speaker_clustering,
+            verbose=verbose,
+        )
 
     if clustering_params.get('export_script_module', False):
         speaker_clustering = torch.jit.script(speaker_clustering)
@@ -472,35 +559,37 @@ def perform_clustering(
 
     for uniq_id, audio_rttm_values in tqdm(AUDIO_RTTM_MAP.items(), desc='clustering', leave=True, disable=not verbose):
         uniq_embs_and_timestamps = embs_and_timestamps[uniq_id]
-
-        if clustering_params.oracle_num_speakers:
-            num_speakers = audio_rttm_values.get('num_speakers', None)
-            if num_speakers is None:
-                raise ValueError("Provided option as oracle num of speakers but num_speakers in manifest is null")
-        else:
-            num_speakers = -1
-
         base_scale_idx = uniq_embs_and_timestamps['multiscale_segment_counts'].shape[0] - 1
 
-        cluster_labels = speaker_clustering.forward_infer(
-            embeddings_in_scales=uniq_embs_and_timestamps['embeddings'],
-            timestamps_in_scales=uniq_embs_and_timestamps['timestamps'],
-            multiscale_segment_counts=uniq_embs_and_timestamps['multiscale_segment_counts'],
-            multiscale_weights=uniq_embs_and_timestamps['multiscale_weights'],
-            oracle_num_speakers=int(num_speakers),
-            max_num_speakers=int(clustering_params.max_num_speakers),
-            max_rp_threshold=float(clustering_params.max_rp_threshold),
-            sparse_search_volume=int(clustering_params.sparse_search_volume),
-            chunk_cluster_count=clustering_params.get('chunk_cluster_count', None),
-            embeddings_per_chunk=clustering_params.get('embeddings_per_chunk', None),
-        )
+        if uniq_id in batch_cluster_labels:
+            cluster_labels = batch_cluster_labels[uniq_id]
+            _, timestamps_in_scales = split_input_data(
+                uniq_embs_and_timestamps['embeddings'],
+                uniq_embs_and_timestamps['timestamps'],
+                uniq_embs_and_timestamps['multiscale_segment_counts'],
+            )
+            timestamps = timestamps_in_scales[base_scale_idx]
+        else:
+            cluster_labels = speaker_clustering.forward_infer(
+                embeddings_in_scales=uniq_embs_and_timestamps['embeddings'],
+                timestamps_in_scales=uniq_embs_and_timestamps['timestamps'],
+                multiscale_segment_counts=uniq_embs_and_timestamps['multiscale_segment_counts'],
+                multiscale_weights=uniq_embs_and_timestamps['multiscale_weights'],
+                oracle_num_speakers=get_oracle_num_speakers(audio_rttm_values, clustering_params),
+                max_num_speakers=int(clustering_params.max_num_speakers),
+                max_rp_threshold=float(clustering_params.max_rp_threshold),
+                enhanced_count_thres=int(clustering_params.get('enhanced_count_thres', 80)),
+                sparse_search_volume=int(clustering_params.sparse_search_volume),
+                chunk_cluster_count=clustering_params.get('chunk_cluster_count', None),
+                embeddings_per_chunk=clustering_params.get('embeddings_per_chunk', None),
+            )
+            timestamps = speaker_clustering.timestamps_in_scales[base_scale_idx]
 
         del uniq_embs_and_timestamps
         if cuda:
             torch.cuda.empty_cache()
         else:
             gc.collect()
-        timestamps = speaker_clustering.timestamps_in_scales[base_scale_idx]
 
         cluster_labels = cluster_labels.cpu().numpy()
         if len(cluster_labels) != timestamps.shape[0]:
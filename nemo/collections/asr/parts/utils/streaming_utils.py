@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import copy
 import os
 
@@ -23,7 +24,9 @@ from torch.utils.data import DataLoader
 from nemo.collections.asr.models.ctc_bpe_models import EncDecCTCModelBPE
 from nemo.collections.asr.parts.mixins.streaming import StreamingEncoder
 from nemo.collections.asr.parts.preprocessing.features import normalize_batch
+from nemo.collections.asr.parts.submodules.ctc_beam_decoding import BeamCTCInfer
 from nemo.collections.asr.parts.utils.audio_utils import get_samples
+from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis
 from nemo.core.classes import IterableDataset
 from nemo.core.neural_types import LengthsType, NeuralType
 
@@ -87,6 +90,7 @@ def longest_common_subsequence_merge(X, Y, filepath=None):
         lcs_delay = math.floor(((total_buffer_in_secs - chunk_len_in_sec)) / model_stride_in_secs)
 
     Total cost of the model is O(m_{i-1} * n_{i}) where (m, n) represents the number of subword ids of the buffer.
+    The alignment matrix is computed with one vectorized operation per subword id of the i-1 chunk.
 
     Args:
         X: The subset of the previous chunk i-1, sliced such X = X[-(lcs_delay * max_steps_per_timestep):]
@@ -99,34 +103,38 @@ def longest_common_subsequence_merge(X, Y, filepath=None):
             - i: Start index of alignment along the i-1 chunk.
             - j: Start index of alignment along the ith chunk.
             - slice_len: number of tokens to slice off from the ith chunk.
-        The LCS alignment matrix itself (shape m + 1, n + 1)
+        The LCS alignment matrix itself, a numpy array of shape (m + 1, n + 1)
     """
     # LCSuff is the table with zero
     # value initially in each cell
     m = len(X)
     n = len(Y)
-    LCSuff = [[0 for k in range(n + 1)] for l in range(m + 1)]
-
-    # To store the length of
-    # longest common substring
-    result = 0
-    result_idx = [0, 0, 0]  # Contains (i, j, slice_len)
-
-    # Following steps to build
-    # LCSuff[m+1][n+1] in bottom up fashion
-    for i in range(m + 1):
-        for j in range(n + 1):
-            if i == 0 or j == 0:
-                LCSuff[i][j] = 0
-            elif X[i - 1] == Y[j - 1]:
-                LCSuff[i][j] = LCSuff[i - 1][j - 1] + 1
-
-                if result <= LCSuff[i][j]:
-                    result = LCSuff[i][j]  # max(result, LCSuff[i][j])
-                    result_idx = [i, j, result]
-
-            else:
-                LCSuff[i][j] = 0
+    LCSuff = np.zeros([m + 1, n + 1], dtype=np.int64)
+
+    # Contains (i, j, slice_len)
+    result_idx = [0, 0, 0]
+
+    if m > 0 and n > 0:
+        # LCSuff[i][j] is the length of the common suffix of X[:i] and Y[:j], i.e. the number of matched tokens
+        # along the diagonal ending at (i, j). With an extra column of unmatched cells, the row major table of
+        # width n + 2 is wrapped into rows of width n + 3, where every diagonal becomes a column. The lengths of
+        # all diagonals are then computed at once from the last unmatched cell above each cell.
+        width = n + 3
+        num_rows = -(-(m + 1) * (n + 2) // width)
+        matched = np.zeros([m + 1, n + 2], dtype=bool)
+        matched[1:, 1 : n + 1] = np.asarray(X)[:, None] == np.asarray(Y)[None, :]
+        matched = np.pad(matched.reshape(-1), (0, num_rows * width - matched.size)).reshape(num_rows, width)
+
+        rows = np.arange(num_rows, dtype=np.int32)[:, None]
+        last_unmatched = np.where(matched, np.int32(-1), rows)
+        np.maximum.accumulate(last_unmatched, axis=0, out=last_unmatched)
+        LCSuff = (rows - last_unmatched).reshape(-1)[: (m + 1) * (n + 2)].reshape(m + 1, n + 2)[:, : n + 1]
+
+        # Length of the longest common substring, at its last occurrence in row major order
+        result = LCSuff.max()
+        if result > 0:
+            last_idx = np.flatnonzero(LCSuff == result)[-1]
+            result_idx = [int(last_idx // (n + 1)), int(last_idx % (n + 1)), int(result)]
 
     # Check if perfect alignment was found or not
     # Perfect alignment is found if :
@@ -178,15 +186,17 @@ def longest_common_subsequence_merge(X, Y, filepath=None):
 
         # Select leftmost LCS
         for i_idx in range(m, -1, -1):  # start from last timestep of old buffer
-            for j_idx in range(0, n + 1):  # start from first token from new buffer
-                # Select the longest LCSuff, while minimizing the index of j (token index for new buffer)
-                if LCSuff[i_idx][j_idx] > max_j and j_idx <= max_j_idx:
-                    max_j = LCSuff[i_idx][j_idx]
-                    max_j_idx = j_idx
-
-                    # Update the starting indices of the partial merge
-                    i_partial = i_idx
-                    j_partial = j_idx
+            # Select the longest LCSuff, while minimizing the index of j (token index for new buffer)
+            # i.e. the first token from new buffer which is longer than the current selection
+            longer_j = np.flatnonzero(LCSuff[i_idx, : max_j_idx + 1] > max_j)
+            if len(longer_j) > 0:
+                j_idx = int(longer_j[0])
+                max_j = int(LCSuff[i_idx, j_idx])
+                max_j_idx = j_idx
+
+                # Update the starting indices of the partial merge
+                i_partial = i_idx
+                j_partial = j_idx
 
         # EARLY EXIT (if max subsequence length <= MIN merge length)
         # Important case where there is long silence
@@ -563,10 +573,37 @@ class AudioBuffersDataLayer(IterableDataset):
         return 1
 
 
+def _ring_buffer_write(ring, pos, frame):
+    """
+    Writes the frame into the ring buffer along the last (time) axis, starting at index pos, and overwriting the
+    oldest frames. Returns the index of the oldest frame of the ring buffer after the write.
+    """
+    ring_len = ring.shape[-1]
+    frame_len = frame.shape[-1]
+    if frame_len >= ring_len:
+        ring[...] = frame[..., frame_len - ring_len :]
+        return 0
+
+    first_len = min(frame_len, ring_len - pos)
+    ring[..., pos : pos + first_len] = frame[..., :first_len]
+    ring[..., : frame_len - first_len] = frame[..., first_len:]
+    return (pos + frame_len) % ring_len
+
+
+def _ring_buffer_read(ring, pos):
+    """
+    Returns a copy of the ring buffer with the frames in chronological order, starting from the oldest frame at pos.
+    """
+    return np.concatenate([ring[..., pos:], ring[..., :pos]], axis=-1)
+
+
 class FeatureFrameBufferer:
     """
     Class to append each feature frame to a buffer and return
     an array of buffers.
+
+    The buffers are preallocated ring buffers, so that appending a frame only writes the frame in place of the
+    oldest one, instead of shifting the whole buffer.
     """
 
     def __init__(self, asr_model, frame_len=1.6, batch_size=4, total_buffer=4.0):
@@ -616,6 +653,9 @@ class FeatureFrameBufferer:
         self.feature_buffer = (
             np.ones([self.n_feat, self.feature_buffer_len], dtype=np.float32) * self.ZERO_LEVEL_SPEC_DB_VAL
         )
+        # index of the oldest frame of the ring buffers
+        self.buffer_pos = 0
+        self.feature_buffer_pos = 0
 
     def get_batch_frames(self):
         if self.signal_end:
@@ -633,10 +673,9 @@ class FeatureFrameBufferer:
         # Build buffers for each frame
         self.frame_buffers = []
         for frame in frames:
-            self.buffer[:, : -self.n_frame_len] = self.buffer[:, self.n_frame_len :]
-            self.buffer[:, -self.n_frame_len :] = frame
+            self.buffer_pos = _ring_buffer_write(self.buffer, self.buffer_pos, frame)
             self.buffered_len += frame.shape[1]
-            self.frame_buffers.append(np.copy(self.buffer))
+            self.frame_buffers.append(_ring_buffer_read(self.buffer, self.buffer_pos))
         return self.frame_buffers
 
     def set_frame_reader(self, frame_reader):
@@ -644,8 +683,8 @@ class FeatureFrameBufferer:
         self.signal_end = False
 
     def _update_feature_buffer(self, feat_frame):
-        self.feature_buffer[:, : -feat_frame.shape[1]] = self.feature_buffer[:, feat_frame.shape[1] :]
-        self.feature_buffer[:, -feat_frame.shape[1] :] = feat_frame
+        # the normalization constants do not depend on the order of the frames in the buffer
+        self.feature_buffer_pos = _ring_buffer_write(self.feature_buffer, self.feature_buffer_pos, feat_frame)
         self.buffered_features_size += feat_frame.shape[1]
 
     def get_norm_consts_per_frame(self, batch_frames):
@@ -684,6 +723,10 @@ class FrameBatchASR:
     """
     class for streaming frame-based ASR use reset() method to reset FrameASR's
     state call transcribe(frame) to do ASR on contiguous signal's frames
+
+    If the CTC decoding strategy of the model is `prefix_beam`, the chunks are decoded with a CTC prefix beam
+    search which continues from the beam of the previous chunks, otherwise the greedy predictions of the chunks
+    are merged.
     """
 
     def __init__(
@@ -702,6 +745,16 @@ class FrameBatchASR:
         self.asr_model = asr_model
         self.decoder = asr_model.decoder
 
+        # Hybrid models are decoded with their CTC decoder
+        decoding = (
+            asr_model.ctc_decoding if hasattr(asr_model, 'ctc_decoding') else getattr(asr_model, 'decoding', None)
+        )
+        decoding = getattr(decoding, 'decoding', None)
+        if isinstance(decoding, BeamCTCInfer) and decoding.search_type == 'prefix_beam':
+            self.beam_decoder = decoding
+        else:
+            self.beam_decoder = None
+
         self.batch_size = batch_size
         self.all_logits = []
         self.all_preds = []
@@ -742,6 +795,9 @@ class FrameBatchASR:
         self.toks_unmerged = []
         self.frame_buffers = []
         self.frame_bufferer.reset()
+        # Log probs of the buffers not decoded yet, and state of the prefix beam search over the decoded ones
+        self.undecoded_logits = []
+        self.prefix_beam_state = None
 
     def read_audio_file(self, audio_filepath: str, delay, model_stride_in_secs):
         samples = get_samples(audio_filepath)
@@ -781,10 +837,12 @@ class FrameBatchASR:
             preds = torch.unbind(predictions)
             for pred in preds:
                 self.all_preds.append(pred.cpu().numpy())
-            if keep_logits:
-                log_probs = torch.unbind(log_probs)
-                for log_prob in log_probs:
-                    self.all_logits.append(log_prob.cpu())
+            if keep_logits or self.beam_decoder is not None:
+                log_probs = [log_prob.cpu() for log_prob in torch.unbind(log_probs)]
+                if keep_logits:
+                    self.all_logits += log_probs
+                if self.beam_decoder is not None:
+                    self.undecoded_logits += log_probs
             else:
                 del log_probs
             del encoded_len
@@ -792,11 +850,14 @@ class FrameBatchASR:
 
     def transcribe(self, tokens_per_chunk: int, delay: int, keep_logits=False):
         self.infer_logits(keep_logits)
-        self.unmerged = []
-        for pred in self.all_preds:
-            decoded = pred.tolist()
-            self.unmerged += decoded[len(decoded) - 1 - delay : len(decoded) - 1 - delay + tokens_per_chunk]
-        hypothesis = self.greedy_merge(self.unmerged)
+        if self.beam_decoder is not None:
+            hypothesis = self.beam_merge(tokens_per_chunk, delay)
+        else:
+            self.unmerged = []
+            for pred in self.all_preds:
+                decoded = pred.tolist()
+                self.unmerged += decoded[len(decoded) - 1 - delay : len(decoded) - 1 - delay + tokens_per_chunk]
+            hypothesis = self.greedy_merge(self.unmerged)
         if not keep_logits:
             return hypothesis
 
@@ -818,6 +879,30 @@ class FrameBatchASR:
         hypothesis = self.tokenizer.ids_to_text(decoded_prediction)
         return hypothesis
 
+    def beam_merge(self, tokens_per_chunk: int, delay: int):
+        """
+        Continues the CTC prefix beam search with the chunks of the buffers inferred since the previous call,
+        and returns the text of the best hypothesis. The chunks decoded by previous calls are not decoded again.
+        """
+        for log_prob in self.undecoded_logits:
+            T = log_prob.shape[0]
+            log_prob = log_prob[T - 1 - delay : T - 1 - delay + tokens_per_chunk, :]
+            self.prefix_beam_state = self.beam_decoder.prefix_beam_search_step(log_prob, self.prefix_beam_state)
+        self.undecoded_logits = []
+
+        if self.prefix_beam_state is None:
+            return ''
+        return self.tokenizer.ids_to_text(list(self.prefix_beam_state.best_prefix))
+
+    def get_stable_transcript(self):
+        """
+        Text of the tokens which are shared by all the hypotheses of the CTC prefix beam search, and do not change
+        when decoding the next chunks. Can be emitted as a final partial result while streaming.
+        """
+        if self.prefix_beam_state is None:
+            return ''
+        return self.tokenizer.ids_to_text(list(self.prefix_beam_state.stable_prefix))
+
 
 class BatchedFeatureFrameBufferer(FeatureFrameBufferer):
     """
@@ -863,6 +948,9 @@ class BatchedFeatureFrameBufferer(FeatureFrameBufferer):
         self.signal_end = [False for _ in range(self.batch_size)]
         self.signal_end_index = [None for _ in range(self.batch_size)]
         self.buffer_number = 0
+        # index of the oldest frame of the ring buffers of every sample
+        self.buffer_pos = [0 for _ in range(self.batch_size)]
+        self.feature_buffer_pos = [0 for _ in range(self.batch_size)]
 
     def get_batch_frames(self):
         # Exit if all buffers of all samples have been processed
@@ -900,11 +988,10 @@ class BatchedFeatureFrameBufferer(FeatureFrameBufferer):
             frame = frames[idx]
             # If the sample has a buffer, then process it as usual
             if frame is not None:
-                self.buffer[idx, :, : -self.n_frame_len] = self.buffer[idx, :, self.n_frame_len :]
-                self.buffer[idx, :, -self.n_frame_len :] = frame
+                self.buffer_pos[idx] = _ring_buffer_write(self.buffer[idx], self.buffer_pos[idx], frame)
                 # self.buffered_len += frame.shape[1]
                 # WRAP the buffer at index idx into a outer list
-                self.frame_buffers.append([np.copy(self.buffer[idx])])
+                self.frame_buffers.append([_ring_buffer_read(self.buffer[idx], self.buffer_pos[idx])])
             else:
                 # If the buffer does not exist, the sample has finished processing
                 # set the entire buffer for that sample to 0
@@ -921,8 +1008,9 @@ class BatchedFeatureFrameBufferer(FeatureFrameBufferer):
     def _update_feature_buffer(self, feat_frame, idx):
         # Update the feature buffer for given sample, or reset if the sample has finished processing
         if feat_frame is not None:
-            self.feature_buffer[idx, :, : -feat_frame.shape[1]] = self.feature_buffer[idx, :, feat_frame.shape[1] :]
-            self.feature_buffer[idx, :, -feat_frame.shape[1] :] = feat_frame
+            self.feature_buffer_pos[idx] = _ring_buffer_write(
+                self.feature_buffer[idx], self.feature_buffer_pos[idx], feat_frame
+            )
             # self.buffered_features_size += feat_frame.shape[1]
         else:
             self.feature_buffer[idx, :, :] *= 0.0
@@ -1554,3 +1642,458 @@ class CacheAwareStreamingAudioBuffer:
                 normalize_type=self.model_normalize_type,
             )
         return processed_signal, self.streams_length
+
+
+class _StreamingSession:
+    """
+    State of a live audio stream of a CacheAwareStreamingSessionManager.
+    """
+
+    def __init__(self, stream_id, slot, n_feat, device):
+        self.stream_id = stream_id
+        self.slot = slot
+        # received audio samples which are still needed to extract the next features, from sample samples_start
+        self.samples = np.zeros(0, dtype=np.float32)
+        self.samples_start = 0
+        self.audio_ended = False
+        self.features_ended = False
+        # extracted features which are still needed for the next chunks, from frame features_start
+        self.features = torch.zeros((n_feat, 0), device=device)
+        self.features_start = 0
+        self.num_features = 0
+        # first frame of the next chunk
+        self.buffer_idx = 0
+        self.previous_hypothesis = None
+        self.previous_pred_out = torch.zeros(0, dtype=torch.long, device=device)
+        self.text = ''
+
+
+class CacheAwareStreamingSessionManager:
+    """
+    Cache-aware streaming of live audio streams which can join and leave at any time, e.g., the calls served by a
+    streaming ASR server. At every step, the next chunk of every stream which has received enough audio is processed,
+    and the chunks of all these streams are packed into a single batch with their encoder caches.
+
+    Every stream is assigned a slot of the encoder caches, which are allocated once for `max_streams` streams, and
+    reused by the next streams once the stream is removed. The features of the received audio are extracted
+    incrementally, and are the same as the features of the whole audio. The chunks are the chunks of
+    CacheAwareStreamingAudioBuffer with `pad_and_drop_preencoded=True`, so that the first chunk of a stream has the
+    same shape as the next chunks and can be batched with the chunks of other streams.
+
+    Transducer models need to use the `greedy` decoding strategy, which supports partial hypotheses.
+
+    Args:
+        model: An ASR model with a streaming encoder.
+        max_streams (int): maximum number of concurrent streams
+        online_normalization (bool): whether to normalize the features per chunk. Live audio can not be normalized
+            over the whole audio, so this is required for models with `per_feature` or `all_features` normalization.
+    """
+
+    def __init__(self, model, max_streams=32, online_normalization=False):
+        self.model = model
+        self.max_streams = max_streams
+        self.online_normalization = online_normalization
+
+        # the features are extracted without normalization, and are normalized per chunk if online_normalization
+        streaming_buffer = CacheAwareStreamingAudioBuffer(
+            model, online_normalization=True, pad_and_drop_preencoded=True
+        )
+        self.model_normalize_type = streaming_buffer.model_normalize_type
+        if not online_normalization and self.model_normalize_type in ["per_feature", "all_features"]:
+            raise ValueError(
+                f"Live audio can not be normalized with `{self.model_normalize_type}` normalization over the whole "
+                "audio, please use online_normalization."
+            )
+        self.preprocessor = streaming_buffer.preprocessor
+        self.input_features = streaming_buffer.input_features
+        self.streaming_cfg = streaming_buffer.streaming_cfg
+
+        def _last(value):
+            # size of the chunks after the first one, which is used for all the chunks with pad_and_drop_preencoded
+            return value[1] if isinstance(value, list) else value
+
+        self.chunk_size = _last(self.streaming_cfg.chunk_size)
+        self.shift_size = _last(self.streaming_cfg.shift_size)
+        self.pre_encode_cache_size = _last(self.streaming_cfg.pre_encode_cache_size)
+        self.sampling_frames = _last(streaming_buffer.sampling_frames) if streaming_buffer.sampling_frames else 0
+
+        # frame k of the features is computed from the samples [k * hop_length - pad, k * hop_length - pad + n_fft)
+        featurizer = self.preprocessor.featurizer
+        self.n_fft = featurizer.n_fft
+        self.hop_length = featurizer.hop_length
+        stft_pad_amount = getattr(featurizer, 'stft_pad_amount', None)
+        self.stft_pad = stft_pad_amount if stft_pad_amount is not None else self.n_fft // 2
+        # number of frames of left context of the extracted audio, such that its first sample, which is not
+        # pre-emphasized, and its padding are not used by the features
+        self.context_frames = (self.stft_pad + self.hop_length) // self.hop_length
+
+        self.device = streaming_buffer.get_model_device()
+        (
+            self.cache_last_channel,
+            self.cache_last_time,
+            self.cache_last_channel_len,
+        ) = model.encoder.get_initial_cache_state(batch_size=max_streams, device=self.device)
+        self.sessions = {}
+        self.free_slots = list(range(max_streams))
+        self.next_stream_id = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add_stream(self, stream_id=None):
+        """
+        Adds a new stream, and returns its id.
+        """
+        if len(self.free_slots) == 0:
+            raise ValueError(f"Can not add more than {self.max_streams} streams.")
+        if stream_id is None:
+            stream_id = self.next_stream_id
+        if stream_id in self.sessions:
+            raise ValueError(f"Stream {stream_id} already exists.")
+        self.next_stream_id = max(self.next_stream_id, stream_id + 1)
+
+        # the lowest slots are used first, so that the slots of the active streams are likely a contiguous range
+        slot = min(self.free_slots)
+        self.free_slots.remove(slot)
+        self.cache_last_channel[:, slot] = 0
+        self.cache_last_time[:, slot] = 0
+        self.cache_last_channel_len[slot] = 0
+        self.sessions[stream_id] = _StreamingSession(stream_id, slot, self.input_features, self.device)
+        return stream_id
+
+    def append_audio(self, stream_id, audio):
+        """
+        Appends audio samples to a stream, as a 1D float numpy array at the sample rate of the model.
+        Does nothing if the stream has already been removed.
+        """
+        session = self.sessions.get(stream_id)
+        if session is None:
+            return
+        if session.audio_ended:
+            raise ValueError(f"Audio of stream {stream_id} has already ended.")
+        session.samples = np.concatenate([session.samples, np.asarray(audio, dtype=np.float32)])
+
+    def end_audio(self, stream_id):
+        """
+        Marks the end of the audio of a stream. The stream is removed after its last chunk is processed.
+        Does nothing if the stream has already been removed.
+        """
+        session = self.sessions.get(stream_id)
+        if session is not None:
+            session.audio_ended = True
+
+    def remove_stream(self, stream_id):
+        """
+        Removes a stream, and frees its slot. Does nothing if the stream has already been removed, e.g., by the step
+        which processed its last chunk.
+        """
+        session = self.sessions.pop(stream_id, None)
+        if session is not None:
+            self.free_slots.append(session.slot)
+
+    def step(self):
+        """
+        Processes the next chunk of every stream which has enough audio, in a single batch.
+
+        Returns:
+            A dictionary from the id of every processed stream to its transcription and whether it is final. The
+            streams with final transcriptions are removed.
+        """
+        self._extract_features()
+
+        chunk_sessions = []
+        last_chunk_sessions = []
+        results = {}
+        for session in self.sessions.values():
+            num_remaining = session.num_features - session.buffer_idx
+            if not session.features_ended:
+                if num_remaining >= self.chunk_size:
+                    chunk_sessions.append(session)
+            elif num_remaining < max(self.sampling_frames, 1):
+                # not enough features for one output after downsampling
+                results[session.stream_id] = (session.text, True)
+            elif session.buffer_idx + self.shift_size >= session.num_features:
+                # all the outputs of the last chunk are kept
+                last_chunk_sessions.append(session)
+            else:
+                chunk_sessions.append(session)
+
+        for sessions, keep_all_outputs in [(chunk_sessions, False), (last_chunk_sessions, True)]:
+            if len(sessions) > 0:
+                self._stream_step(sessions, keep_all_outputs)
+                for session in sessions:
+                    results[session.stream_id] = (session.text, keep_all_outputs)
+
+        for stream_id, (_, is_final) in results.items():
+            if is_final:
+                self.remove_stream(stream_id)
+        return results
+
+    def _extract_features(self):
+        """
+        Extracts the features of the received audio of all the streams, in a single batch.
+        """
+        windows = []
+        for session in self.sessions.values():
+            if session.features_ended:
+                continue
+            samples_end = session.samples_start + len(session.samples)
+            if session.audio_ended:
+                # the end of the audio is padded as the end of the whole audio
+                num_features = None
+                session.features_ended = len(session.samples) <= self.stft_pad
+            else:
+                num_features = (samples_end + self.stft_pad - self.n_fft) // self.hop_length + 1
+            if len(session.samples) > self.stft_pad and (num_features is None or num_features > session.num_features):
+                windows.append((session, num_features))
+
+        # the last features of the ended streams are extracted without the zero padding of the batch, as the end of
+        # the whole audio
+        batches = [[window for window in windows if window[1] is not None]]
+        batches += [[window] for window in windows if window[1] is None]
+        for batch in batches:
+            if len(batch) > 0:
+                self._extract_features_batch(batch)
+
+    def _extract_features_batch(self, windows):
+        audio_signal = torch.zeros((len(windows), max(len(session.samples) for session, _ in windows)))
+        audio_signal_len = torch.zeros(len(windows), dtype=torch.long)
+        for idx, (session, _) in enumerate(windows):
+            audio_signal[idx, : len(session.samples)] = torch.from_numpy(session.samples)
+            audio_signal_len[idx] = len(session.samples)
+        with torch.inference_mode():
+            features, features_len = self.preprocessor(
+                input_signal=audio_signal.to(self.device), length=audio_signal_len.to(self.device)
+            )
+
+        for idx, (session, num_features) in enumerate(windows):
+            start_frame = session.samples_start // self.hop_length
+            if num_features is None:
+                num_features = start_frame + int(features_len[idx])
+                session.features_ended = True
+            new_features = features[idx, :, session.num_features - start_frame : num_features - start_frame]
+            session.features = torch.cat([session.features, new_features], dim=-1)
+            session.num_features = num_features
+
+            # only keep the samples needed for the next features, starting at a frame boundary
+            samples_start = max(session.num_features - self.context_frames, 0) * self.hop_length
+            session.samples = session.samples[samples_start - session.samples_start :]
+            session.samples_start = samples_start
+
+    def _stream_step(self, sessions, keep_all_outputs):
+        sessions = sorted(sessions, key=lambda session: session.slot)
+        chunk_len = min(self.chunk_size, max(session.num_features - session.buffer_idx for session in sessions))
+        processed_signal = torch.zeros(
+            (len(sessions), self.input_features, self.pre_encode_cache_size + chunk_len), device=self.device
+        )
+        processed_signal_length = torch.zeros(len(sessions), dtype=torch.long, device=self.device)
+        for idx, session in enumerate(sessions):
+            # the pre-encode cache is padded with zeros before the first chunks
+            start = max(session.buffer_idx - self.pre_encode_cache_size, session.features_start)
+            end = min(session.buffer_idx + chunk_len, session.num_features)
+            offset = self.pre_encode_cache_size - (session.buffer_idx - start)
+            processed_signal[idx, :, offset : offset + end - start] = session.features[
+                :, start - session.features_start : end - session.features_start
+            ]
+            processed_signal_length[idx] = offset + end - start
+
+        if self.online_normalization:
+            processed_signal, _, _ = normalize_batch(
+                x=processed_signal, seq_len=processed_signal_length, normalize_type=self.model_normalize_type,
+            )
+
+        # the caches of a contiguous range of slots are used without copying them
+        slots = [session.slot for session in sessions]
+        if slots == list(range(slots[0], slots[0] + len(slots))):
+            slots = slice(slots[0], slots[0] + len(slots))
+        else:
+            slots = torch.tensor(slots, device=self.device)
+
+        with torch.inference_mode():
+            (
+                greedy_predictions,
+                transcribed_texts,
+                cache_last_channel,
+                cache_last_time,
+                cache_last_channel_len,
+                best_hyp,
+            ) = self.model.conformer_stream_step(
+                processed_signal=processed_signal,
+                processed_signal_length=processed_signal_length,
+                cache_last_channel=self.cache_last_channel[:, slots],
+                cache_last_time=self.cache_last_time[:, slots],
+                cache_last_channel_len=self.cache_last_channel_len[slots],
+                keep_all_outputs=keep_all_outputs,
+                previous_hypotheses=[session.previous_hypothesis for session in sessions],
+                previous_pred_out=[session.previous_pred_out for session in sessions],
+                drop_extra_pre_encoded=self.streaming_cfg.drop_extra_pre_encoded,
+                return_transcription=True,
+            )
+        self.cache_last_channel[:, slots] = cache_last_channel
+        self.cache_last_time[:, slots] = cache_last_time
+        self.cache_last_channel_len[slots] = cache_last_channel_len
+
+        for idx, session in enumerate(sessions):
+            session.previous_pred_out = greedy_predictions[idx]
+            if best_hyp is not None:
+                session.previous_hypothesis = best_hyp[idx]
+            text = transcribed_texts[idx]
+            session.text = text.text if isinstance(text, Hypothesis) else text
+
+            session.buffer_idx += self.shift_size
+            # only keep the features needed for the next chunks
+            features_start = max(session.buffer_idx - self.pre_encode_cache_size, session.features_start)
+            session.features = session.features[:, features_start - session.features_start :]
+            session.features_start = features_start
+
+
+class AsyncCacheAwareStreamingServer:
+    """
+    asyncio API of a CacheAwareStreamingSessionManager, to feed the audio of live streams and receive their partial
+    transcriptions. The steps of the session manager are run in an executor by `serve()`, without blocking the
+    event loop, and the streams which are opened, fed or closed during a step join the next step.
+
+    Example:
+        server = AsyncCacheAwareStreamingServer(CacheAwareStreamingSessionManager(model, max_streams=64))
+        serve_task = asyncio.create_task(server.serve())
+
+        stream_id = server.open_stream()
+        server.feed(stream_id, audio_chunk)
+        ...
+        server.close_stream(stream_id)
+        async for text, is_final in server.results(stream_id):
+            ...
+
+    Args:
+        session_manager (CacheAwareStreamingSessionManager): the session manager which runs the model
+        executor: optional concurrent.futures.Executor to run the steps in, the default executor of the loop if None
+    """
+
+    def __init__(self, session_manager, executor=None):
+        self.session_manager = session_manager
+        self.executor = executor
+        self.pending = []
+        self.queues = {}
+        self.closed_streams = set()
+        self.next_stream_id = session_manager.next_stream_id
+        self.running = False
+        self.wakeup = None
+
+    def open_stream(self):
+        """
+        Opens a new stream, and returns its id.
+        """
+        if len(self.queues) >= self.session_manager.max_streams:
+            raise ValueError(f"Can not open more than {self.session_manager.max_streams} streams.")
+        stream_id = self.next_stream_id
+        self.next_stream_id += 1
+        self.queues[stream_id] = asyncio.Queue()
+        self._add_pending(self.session_manager.add_stream, stream_id)
+        return stream_id
+
+    def feed(self, stream_id, audio):
+        """
+        Feeds audio samples to a stream, as a 1D float numpy array at the sample rate of the model.
+        """
+        self._check_stream(stream_id)
+        if stream_id in self.closed_streams:
+            raise ValueError(f"Stream {stream_id} has already been closed.")
+        self._add_pending(self.session_manager.append_audio, stream_id, audio)
+
+    def close_stream(self, stream_id):
+        """
+        Marks the end of the audio of a stream. Its final transcription is sent once all the audio is processed.
+        """
+        self._check_stream(stream_id)
+        if stream_id not in self.closed_streams:
+            self.closed_streams.add(stream_id)
+            self._add_pending(self.session_manager.end_audio, stream_id)
+
+    def cancel_stream(self, stream_id):
+        """
+        Removes a stream without processing its remaining audio, and ends its results.
+        """
+        self._check_stream(stream_id)
+        self._add_pending(self.session_manager.remove_stream, stream_id)
+        self._end_stream(stream_id, None)
+
+    def results(self, stream_id):
+        """
+        Returns an async iterator over the transcriptions of a stream, as (text, is_final) tuples, until the final
+        transcription. It raises the exception of a failed operation of the stream, e.g., if the stream could not be
+        added. The iterator has to be created while the stream is open, and keeps all the results of the stream
+        even if the iteration starts after the stream has ended.
+        """
+        # the queue is looked up now, since it is removed from self.queues when the stream ends
+        self._check_stream(stream_id)
+        return self._iter_results(self.queues[stream_id])
+
+    async def _iter_results(self, queue):
+        while True:
+            result = await queue.get()
+            if result is None:
+                return
+            if isinstance(result, Exception):
+                raise result
+            yield result
+            if result[1]:
+                return
+
+    async def serve(self):
+        """
+        Runs the steps of the session manager while there are chunks to process, until `stop()` is called.
+        """
+        loop = asyncio.get_running_loop()
+        if self.wakeup is None:
+            self.wakeup = asyncio.Event()
+        self.running = True
+        while self.running:
+            self.wakeup.clear()
+            for fn, stream_id, args in self.pending:
+                try:
+                    fn(stream_id, *args)
+                except Exception as e:
+                    # only the stream of the failed operation is ended, the other streams keep being served
+                    if fn != self.session_manager.add_stream:
+                        self.session_manager.remove_stream(stream_id)
+                    if stream_id in self.queues:
+                        self._end_stream(stream_id, e)
+            self.pending = []
+
+            results = {}
+            if len(self.session_manager) > 0:
+                results = await loop.run_in_executor(self.executor, self.session_manager.step)
+            for stream_id, (text, is_final) in results.items():
+                queue = self.queues.get(stream_id)
+                if queue is None:
+                    # cancelled during the step
+                    continue
+                if is_final:
+                    self._end_stream(stream_id, (text, is_final))
+                else:
+                    queue.put_nowait((text, is_final))
+
+            if len(results) == 0 and len(self.pending) == 0:
+                await self.wakeup.wait()
+
+    def stop(self):
+        """
+        Stops `serve()` after the current step.
+        """
+        self.running = False
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def _check_stream(self, stream_id):
+        if stream_id not in self.queues:
+            raise ValueError(f"Stream {stream_id} is not open.")
+
+    def _end_stream(self, stream_id, last_result):
+        self.closed_streams.discard(stream_id)
+        self.queues.pop(stream_id).put_nowait(last_result)
+
+    def _add_pending(self, fn, stream_id, *args):
+        # the session manager is only modified by serve() between the steps
+        self.pending.append((fn, stream_id, args))
+        if self.wakeup is not None:
+            self.wakeup.set()
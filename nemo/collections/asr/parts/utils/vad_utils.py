@@ -17,11 +17,10 @@ import json
 import math
 import multiprocessing
 import os
-import shutil
 from itertools import repeat
 from math import ceil, floor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import IPython.display as ipd
 import librosa
@@ -235,14 +234,17 @@ def get_vad_stream_status(data: list) -> list:
 
 def load_tensor_from_file(filepath: str) -> Tuple[torch.Tensor, str]:
     """
-    Load torch.Tensor and the name from file
+    Load torch.Tensor and the name from file, either a text file with a value per line or a .npy file
     """
+    name = Path(filepath).stem
+    if filepath.endswith(".npy"):
+        return torch.from_numpy(np.load(filepath)), name
+
     frame = []
     with open(filepath, "r", encoding='utf-8') as f:
         for line in f.readlines():
             frame.append(float(line))
 
-    name = Path(filepath).stem
     return torch.tensor(frame), name
 
 
@@ -308,6 +310,43 @@ def generate_overlap_vad_seq(
     return overlap_out_dir
 
 
+def generate_overlap_vad_seq_in_memory(
+    frame_preds: Iterable[Tuple[str, torch.Tensor]],
+    smoothing_method: str,
+    overlap: float,
+    window_length_in_sec: float,
+    shift_length_in_sec: float,
+    out_dir: str = None,
+) -> Iterator[Tuple[str, torch.Tensor]]:
+    """
+    In-memory version of generate_overlap_vad_seq. Smooth the frame level predictions of each recording as they come,
+    without reading or writing text files.
+    Args:
+        frame_preds (iterable): name and frame level prediction of each recording, e.g. from generate_vad_frame_pred_in_memory.
+        smoothing_method (str): median or mean smoothing filter.
+        overlap (float): amounts of overlap of adjacent windows.
+        window_length_in_sec (float): length of window for generating the frame.
+        shift_length_in_sec (float): amount of shift of window for generating the frame.
+        out_dir (str): if given, the smoothed predictions are also saved to out_dir as <name>.npy.
+    Yields:
+        name (str): name of the recording.
+        preds (torch.Tensor): smoothed predictions of the recording.
+    """
+    if out_dir and not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    per_args: Dict[str, float] = {
+        "overlap": float(overlap),
+        "window_length_in_sec": float(window_length_in_sec),
+        "shift_length_in_sec": float(shift_length_in_sec),
+    }
+    for name, frame in frame_preds:
+        preds = generate_overlap_vad_seq_per_tensor(frame, per_args, smoothing_method)
+        if out_dir:
+            np.save(os.path.join(out_dir, name + ".npy"), preds.cpu().numpy())
+        yield name, preds
+
+
 def generate_overlap_vad_seq_per_file_star(args):
     """
     A workaround for tqdm with starmap of multiprocessing
@@ -324,8 +363,6 @@ def generate_overlap_vad_seq_per_tensor(
     See description in generate_overlap_vad_seq.
     Use this for single instance pipeline. 
     """
-    # This function will be refactor for vectorization but this is okay for now
-
     overlap = per_args['overlap']
     window_length_in_sec = per_args['window_length_in_sec']
     shift_length_in_sec = per_args['shift_length_in_sec']
@@ -348,42 +385,48 @@ def generate_overlap_vad_seq_per_tensor(
 
     target_len = int(len(frame) * shift)
 
+    # Windows start at every jump_on_frame-th frame, and window k covers the target units [k * window_shift, k * window_shift + seg).
+    # The windows covering a target unit are thus a contiguous range [first, last] of them.
+    window_preds = frame[::jump_on_frame]
+    window_shift = jump_on_frame * shift
+    target = torch.arange(target_len, device=frame.device)
+    last = torch.div(target, window_shift, rounding_mode='floor').clamp(max=len(window_preds) - 1)
+    first = (torch.div(target - seg, window_shift, rounding_mode='floor') + 1).clamp(min=0)
+    pred_count = last - first + 1
+    covered = pred_count > 0
+
     if smoothing_method == 'mean':
-        preds = torch.zeros(target_len)
-        pred_count = torch.zeros(target_len)
+        # Sliding window sums from the cumulative sum of the window predictions
+        window_cumsum = torch.nn.functional.pad(torch.cumsum(window_preds.double(), 0), [1, 0])
+        preds = ((window_cumsum[last + 1] - window_cumsum[first]) / pred_count).to(frame.dtype)
 
-        for i, og_pred in enumerate(frame):
-            if i % jump_on_frame != 0:
-                continue
-            start = i * shift
-            end = start + seg
-            preds[start:end] = preds[start:end] + og_pred
-            pred_count[start:end] = pred_count[start:end] + 1
+    elif smoothing_method == 'median':
+        # Target units covered by the same windows share the median, which is computed once for each run of them
+        _, run_index, run_count = torch.unique_consecutive(
+            first * len(window_preds) + last, return_inverse=True, return_counts=True
+        )
+        run_start = torch.cumsum(run_count, 0) - run_count
+        run_first = first[run_start]
+        run_pred_count = pred_count[run_start].clamp(min=0)
 
-        preds = preds / pred_count
-        last_non_zero_pred = preds[pred_count != 0][-1]
-        preds[pred_count == 0] = last_non_zero_pred
+        offsets = torch.arange(int(run_pred_count.max()), device=frame.device)
+        in_window = offsets.unsqueeze(0) < run_pred_count.unsqueeze(1)
+        window_index = (run_first.unsqueeze(1) + offsets.unsqueeze(0)).clamp(max=len(window_preds) - 1)
+        sorted_preds = window_preds[window_index].masked_fill(~in_window, float('inf')).sort(dim=1)[0]
 
-    elif smoothing_method == 'median':
-        preds = [torch.empty(0) for _ in range(target_len)]
-        for i, og_pred in enumerate(frame):
-            if i % jump_on_frame != 0:
-                continue
-
-            start = i * shift
-            end = start + seg
-            for j in range(start, end):
-                if j <= target_len - 1:
-                    preds[j] = torch.cat((preds[j], og_pred.unsqueeze(0)), 0)
-
-        preds = torch.stack([torch.nanquantile(l, q=0.5) for l in preds])
-        nan_idx = torch.isnan(preds)
-        last_non_nan_pred = preds[~nan_idx][-1]
-        preds[nan_idx] = last_non_nan_pred
+        # Same linear interpolation between the two middle predictions as torch.nanquantile(q=0.5)
+        rank = 0.5 * (run_pred_count - 1).clamp(min=0).to(frame.dtype)
+        below = sorted_preds.gather(1, rank.long().unsqueeze(1)).squeeze(1)
+        above = sorted_preds.gather(1, rank.ceil().long().unsqueeze(1)).squeeze(1)
+        preds = torch.lerp(below, above, rank - rank.floor())[run_index]
 
     else:
         raise ValueError("smoothing_method should be either mean or median")
 
+    # Units after the last window keep its prediction
+    last_covered_pred = preds[covered][-1]
+    preds[~covered] = last_covered_pred
+
     return preds
 
 
@@ -425,7 +468,8 @@ def merge_overlap_segment(segments: torch.Tensor) -> torch.Tensor:
     ):
         return segments
 
-    segments = segments[segments[:, 0].sort()[1]]
+    # stable sort keeps segments clamped to the same start due to padding in order of their ends
+    segments = segments[segments[:, 0].sort(stable=True)[1]]
     merge_boundary = segments[:-1, 1] >= segments[1:, 0]
     head_padded = torch.nn.functional.pad(merge_boundary, [1, 0], mode='constant', value=0.0)
     head = segments[~head_padded, 0]
@@ -681,7 +725,14 @@ def generate_vad_segment_table_per_file(pred_filepath: str, per_args: dict) -> s
     A wrapper for generate_vad_segment_table_per_tensor
     """
     sequence, name = load_tensor_from_file(pred_filepath)
-    out_dir, per_args_float = prepare_gen_segment_table(sequence, per_args)
+    return write_vad_segment_table_per_tensor(sequence, name, per_args)
+
+
+def write_vad_segment_table_per_tensor(sequence: torch.Tensor, name: str, per_args: dict) -> str:
+    """
+    Generate the speech segments of the predictions of a recording and write them to an rttm-like table in per_args['out_dir'].
+    """
+    out_dir, per_args_float = prepare_gen_segment_table(sequence, dict(per_args))
 
     preds = generate_vad_segment_table_per_tensor(sequence, per_args_float)
     ext = ".rttm" if per_args.get("use_rttm", False) else ".txt"
@@ -766,6 +817,40 @@ def generate_vad_segment_table(
     return out_dir
 
 
+def generate_vad_segment_table_in_memory(
+    vad_preds: Iterable[Tuple[str, torch.Tensor]],
+    postprocessing_params: dict,
+    frame_length_in_sec: float,
+    out_dir: str,
+    use_rttm: bool = False,
+) -> str:
+    """
+    In-memory version of generate_vad_segment_table. Convert the predictions of each recording as they come to speech
+    segments in start and end times format, without reading prediction files.
+    Args:
+        vad_preds (iterable): name and prediction of each recording, e.g. from generate_vad_frame_pred_in_memory or generate_overlap_vad_seq_in_memory.
+        postprocessing_params (dict): dictionary of thresholds for prediction score. See details in binarization and filtering.
+        frame_length_in_sec (float): frame length.
+        out_dir (str): output dir of generated table/csv file.
+        use_rttm (bool): whether to write the tables in rttm format.
+    Returns:
+        out_dir(str): directory of the generated table.
+    """
+    if not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    per_args = {
+        "frame_length_in_sec": frame_length_in_sec,
+        "out_dir": out_dir,
+        "use_rttm": use_rttm,
+    }
+    per_args = {**per_args, **postprocessing_params}
+    for name, sequence in tqdm(vad_preds, desc='creating speech segments', leave=True):
+        write_vad_segment_table_per_tensor(sequence.cpu(), name, per_args)
+
+    return out_dir
+
+
 def generate_vad_segment_table_per_file_star(args):
     """
     A workaround for tqdm with starmap of multiprocessing
@@ -820,6 +905,241 @@ def get_parameter_grid(params: dict) -> list:
     return params_grid
 
 
+def load_vad_pred_packed(vad_pred_filepath_list: List[str]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Load frame level predictions of several files once and pack them into a single tensor.
+    Args:
+        vad_pred_filepath_list (list): paths of frame level prediction files.
+    Returns:
+        frames (torch.Tensor): predictions of all files concatenated along the time axis.
+        num_frames (torch.Tensor): number of frames of each file.
+    """
+    sequences = [load_tensor_from_file(filepath)[0] for filepath in vad_pred_filepath_list]
+    num_frames = torch.tensor([len(sequence) for sequence in sequences], dtype=torch.long)
+    frames = torch.cat(sequences) if sequences else torch.empty(0)
+    return frames, num_frames
+
+
+def load_speech_segments_packed(rttm_filepath_list: List[str]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Load merged speech segments of several rttm files and pack them into a single tensor.
+    Args:
+        rttm_filepath_list (list): paths of rttm files.
+    Returns:
+        speech_segments (torch.Tensor): speech segments of all files in torch.Tensor([[start1, end1], [start2, end2]]) format, ordered by file and start time.
+        file_index (torch.Tensor): index of the file of each speech segment.
+    """
+    segments_list = [
+        torch.tensor(load_speech_segments_from_rttm(filepath), dtype=torch.float64).reshape(-1, 2)
+        for filepath in rttm_filepath_list
+    ]
+    file_index = torch.repeat_interleave(
+        torch.arange(len(segments_list)), torch.tensor([len(segments) for segments in segments_list], dtype=torch.long)
+    )
+    speech_segments = torch.cat(segments_list) if segments_list else torch.empty(0, 2, dtype=torch.float64)
+    return speech_segments, file_index
+
+
+def cal_vad_onset_offset_packed(
+    scale: str, onset: float, offset: float, frames: torch.Tensor, num_frames: torch.Tensor
+) -> Tuple[Union[float, torch.Tensor], Union[float, torch.Tensor]]:
+    """
+    Calculate onset and offset thresholds of packed predictions given different scale.
+    Absolute thresholds are shared by all files, otherwise a tensor with the thresholds of each file is returned.
+    """
+    if scale == "absolute":
+        return cal_vad_onset_offset(scale, onset, offset)
+
+    # files without frames have no segments whatever the thresholds are
+    thresholds = [
+        cal_vad_onset_offset(scale, onset, offset, sequence) if len(sequence) else (onset, offset)
+        for sequence in torch.split(frames, num_frames.tolist())
+    ]
+    return torch.tensor([x[0] for x in thresholds]), torch.tensor([x[1] for x in thresholds])
+
+
+def merge_segments_packed(
+    segments: torch.Tensor, file_index: torch.Tensor, merge_boundary: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Merge each segment with the next one where merge_boundary is True.
+    Segments have to be ordered by file and start time.
+    """
+    head_padded = torch.nn.functional.pad(merge_boundary, [1, 0], mode='constant', value=0.0)
+    tail_padded = torch.nn.functional.pad(merge_boundary, [0, 1], mode='constant', value=0.0)
+    merged = torch.stack((segments[~head_padded, 0], segments[~tail_padded, 1]), dim=1)
+    return merged, file_index[~head_padded]
+
+
+def merge_overlap_segment_packed(
+    segments: torch.Tensor, file_index: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Merge the overlapped segments of several files at once, see merge_overlap_segment.
+    Segments have to be ordered by file and start time.
+    """
+    if segments.shape[0] < 2:
+        return segments, file_index
+    merge_boundary = (segments[:-1, 1] >= segments[1:, 0]) & (file_index[:-1] == file_index[1:])
+    return merge_segments_packed(segments, file_index, merge_boundary)
+
+
+def binarization_packed(
+    frames: torch.Tensor, num_frames: torch.Tensor, per_args: dict
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Binarize the packed predictions of several files to speech and non-speech at once.
+    Gives the same speech segments as running binarization on the predictions of each file, without looping over frames.
+
+    Args:
+        frames (torch.Tensor): predictions of all files concatenated along the time axis.
+        num_frames (torch.Tensor): number of frames of each file.
+        per_args: see binarization. onset and offset are either floats or tensors with a threshold for each file.
+
+    Returns:
+        speech_segments (torch.Tensor): speech segments of all files in torch.Tensor([[start1, end1], [start2, end2]]) format, ordered by file and start time.
+        file_index (torch.Tensor): index of the file of each speech segment.
+    """
+    frame_length_in_sec = per_args.get('frame_length_in_sec', 0.01)
+
+    onset = per_args.get('onset', 0.5)
+    offset = per_args.get('offset', 0.5)
+    pad_onset = per_args.get('pad_onset', 0.0)
+    pad_offset = per_args.get('pad_offset', 0.0)
+
+    if frames.shape[0] == 0:
+        return torch.empty(0, 2), torch.empty(0, dtype=torch.long)
+
+    frame_file_index = torch.repeat_interleave(torch.arange(num_frames.shape[0]), num_frames)
+    file_start = torch.cumsum(num_frames, 0) - num_frames
+    frame_start = file_start[frame_file_index]
+    frame_range = torch.arange(frames.shape[0])
+    if isinstance(onset, torch.Tensor):
+        onset = onset[frame_file_index]
+    if isinstance(offset, torch.Tensor):
+        offset = offset[frame_file_index]
+
+    # A frame above onset switches non-speech to speech, and a frame below offset switches speech to non-speech.
+    # Frames doing only one of them set the state, frames doing both toggle it and the other frames keep it.
+    # The state of a frame is the one set by the last setting frame of the file, toggled by the frames since then.
+    above_onset = frames > onset
+    below_offset = frames < offset
+    last_set = torch.cummax(torch.where(above_onset != below_offset, frame_range, -1), 0)[0]
+    last_set = torch.maximum(last_set, frame_start - 1)
+    speech = above_onset[last_set.clamp(min=0)] & (last_set >= frame_start)
+    toggle_count = torch.nn.functional.pad(torch.cumsum(above_onset & below_offset, 0), [1, 0])
+    speech ^= (toggle_count[frame_range + 1] - toggle_count[last_set + 1]) % 2 == 1
+
+    # Runs of speech frames become speech segments
+    is_first = frame_range == frame_start
+    is_last = frame_range == frame_start + num_frames[frame_file_index] - 1
+    prev_speech = torch.nn.functional.pad(speech[:-1], [1, 0], mode='constant', value=0.0)
+    next_speech = torch.nn.functional.pad(speech[1:], [0, 1], mode='constant', value=0.0)
+    run_start = speech & (is_first | ~prev_speech)
+    run_end = speech & (is_last | ~next_speech)
+
+    # Speech switches to non-speech at the frame after the run, unless the run reaches the end of the file
+    end_of_file = is_last[run_end]
+    start_frame = frame_range[run_start] - frame_start[run_start]
+    end_frame = frame_range[run_end] - frame_start[run_end] + (~end_of_file).long()
+    start = (start_frame.double() * frame_length_in_sec - pad_onset).clamp(min=0)
+    end = end_frame.double() * frame_length_in_sec + pad_offset
+    keep = end_of_file | (end > start)
+
+    speech_segments = torch.stack((start, end), dim=1).float()[keep]
+    file_index = frame_file_index[run_start][keep]
+
+    # Merge the overlapped speech segments due to padding
+    return merge_overlap_segment_packed(speech_segments, file_index)
+
+
+def filtering_packed(
+    speech_segments: torch.Tensor, file_index: torch.Tensor, per_args: dict
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Filter out short non_speech and speech segments of several files at once, see filtering.
+
+    Args:
+        speech_segments (torch.Tensor): speech segments of all files in torch.Tensor([[start1, end1], [start2, end2]]) format, ordered by file and start time.
+        file_index (torch.Tensor): index of the file of each speech segment.
+        per_args: see filtering.
+
+    Returns:
+        speech_segments (torch.Tensor): filtered speech segments of all files, ordered by file and start time.
+        file_index (torch.Tensor): index of the file of each filtered speech segment.
+    """
+    min_duration_on = per_args.get('min_duration_on', 0.0)
+    min_duration_off = per_args.get('min_duration_off', 0.0)
+    filter_speech_first = per_args.get('filter_speech_first', 1.0)
+
+    def filter_speech(speech_segments, file_index):
+        keep = speech_segments[:, 1] - speech_segments[:, 0] >= min_duration_on
+        return speech_segments[keep], file_index[keep]
+
+    def fill_non_speech(speech_segments, file_index):
+        # Short non-speech segments between two speech segments of the same file become speech
+        long_non_speech = speech_segments[1:, 0] - speech_segments[:-1, 1] >= min_duration_off
+        merge_boundary = ~long_non_speech & (file_index[:-1] == file_index[1:])
+        return merge_segments_packed(speech_segments, file_index, merge_boundary)
+
+    if filter_speech_first:
+        if min_duration_on > 0.0:
+            speech_segments, file_index = filter_speech(speech_segments, file_index)
+        if min_duration_off > 0.0 and speech_segments.shape[0] > 1:
+            speech_segments, file_index = fill_non_speech(speech_segments, file_index)
+    else:
+        if min_duration_off > 0.0 and speech_segments.shape[0] > 1:
+            speech_segments, file_index = fill_non_speech(speech_segments, file_index)
+        if min_duration_on > 0.0:
+            speech_segments, file_index = filter_speech(speech_segments, file_index)
+
+    return speech_segments, file_index
+
+
+def get_detection_error_packed(
+    hyp_segments: torch.Tensor, hyp_file_index: torch.Tensor, ref_segments: torch.Tensor, ref_file_index: torch.Tensor
+) -> Tuple[float, float, float]:
+    """
+    Calculate the durations of false alarm, miss and reference speech summed over several files,
+    as accumulated by pyannote.metrics.detection.DetectionErrorRate.
+    Args:
+        hyp_segments (torch.Tensor): predicted speech segments, not overlapping and ordered by file and start time.
+        hyp_file_index (torch.Tensor): index of the file of each predicted speech segment.
+        ref_segments (torch.Tensor): groundtruth speech segments, not overlapping and ordered by file and start time.
+        ref_file_index (torch.Tensor): index of the file of each groundtruth speech segment.
+    Returns:
+        false_alarm (float): duration of predicted speech outside of groundtruth speech.
+        miss (float): duration of groundtruth speech outside of predicted speech.
+        total (float): duration of groundtruth speech.
+    """
+    hyp_segments = hyp_segments.double()
+    ref_segments = ref_segments.double()
+    ref_start = ref_segments[:, 0]
+    ref_dur = ref_segments[:, 1] - ref_segments[:, 0]
+    ref_covered = torch.nn.functional.pad(torch.cumsum(ref_dur, 0), [1, 0])
+
+    # Files are laid out one after another for searching the last groundtruth segment starting before a time
+    times = torch.cat((hyp_segments.flatten(), ref_segments.flatten()))
+    shift = 2 * times.abs().max().item() + 1 if times.numel() else 1.0
+    ref_key = ref_file_index.double() * shift + ref_start
+
+    def covered_until(time, file_index):
+        """Duration of groundtruth speech of all files before the given time of the given file."""
+        last = torch.searchsorted(ref_key, file_index.double() * shift + time, right=True) - 1
+        last_clamped = last.clamp(min=0)
+        in_file = (last >= 0) & (ref_file_index[last_clamped] == file_index)
+        partial = (time - ref_start[last_clamped]).clamp(min=0).minimum(ref_dur[last_clamped])
+        return torch.where(in_file, ref_covered[last_clamped] + partial, ref_covered[last + 1])
+
+    intersection = (
+        covered_until(hyp_segments[:, 1], hyp_file_index) - covered_until(hyp_segments[:, 0], hyp_file_index)
+    ).sum()
+    total = ref_dur.sum()
+    false_alarm = (hyp_segments[:, 1] - hyp_segments[:, 0]).sum() - intersection
+    miss = total - intersection
+    return false_alarm.item(), miss.item(), total.item()
+
+
 def vad_tune_threshold_on_dev(
     params: dict,
     vad_pred: str,
@@ -828,20 +1148,30 @@ def vad_tune_threshold_on_dev(
     vad_pred_method: str = "frame",
     focus_metric: str = "DetER",
     frame_length_in_sec: float = 0.01,
-    num_workers: int = 20,
+    num_workers: Optional[int] = None,
 ) -> Tuple[dict, dict]:
     """
     Tune thresholds on dev set. Return best thresholds which gives the lowest detection error rate (DetER) in thresholds.
+    The predictions and the groundtruth are loaded once, and all parameter combinations are evaluated in memory
+    with binarization_packed and filtering_packed.
     Args:
         params (dict): dictionary of parameters to be tuned on.
         vad_pred_method (str): suffix of prediction file. Use to locate file. Should be either in "frame", "mean" or "median".
         groundtruth_RTTM_dir (str): directory of ground-truth rttm files or a file contains the paths of them.
         focus_metric (str): metrics we care most when tuning threshold. Should be either in "DetER", "FA", "MISS"
         frame_length_in_sec (float): frame length.
-        num_workers (int): number of workers.
+        num_workers (int): deprecated and ignored, parameter combinations are evaluated in a single process.
     Returns:
         best_threshold (float): threshold that gives lowest DetER.
     """
+    UNIT_FRAME_LEN = 0.01
+
+    if num_workers is not None:
+        logging.warning(
+            "num_workers of vad_tune_threshold_on_dev is deprecated and ignored, "
+            "parameter combinations are evaluated in a single process."
+        )
+
     min_score = 100
     all_perf = {}
     try:
@@ -849,62 +1179,87 @@ def vad_tune_threshold_on_dev(
     except:
         raise ValueError("Please check if the parameters are valid")
 
+    assert (
+        focus_metric == "DetER" or focus_metric == "FA" or focus_metric == "MISS"
+    ), "Metric we care most should be only in 'DetER', 'FA' or 'MISS'!"
+
     paired_filenames, groundtruth_RTTM_dict, vad_pred_dict = pred_rttm_map(vad_pred, groundtruth_RTTM, vad_pred_method)
-    metric = detection.DetectionErrorRate()
+    paired_filenames = sorted(paired_filenames)
+    frames, num_frames = load_vad_pred_packed([vad_pred_dict[filename] for filename in paired_filenames])
+    ref_segments, ref_file_index = load_speech_segments_packed(
+        [groundtruth_RTTM_dict[filename] for filename in paired_filenames]
+    )
+    if not (ref_segments[:, 1] - ref_segments[:, 0]).sum() > 0:
+        raise ValueError(
+            f"Groundtruth RTTM {groundtruth_RTTM} has no speech for the predictions, "
+            "the detection error rates cannot be computed."
+        )
     params_grid = get_parameter_grid(params)
 
-    for param in params_grid:
+    # Group the parameter combinations sharing the same binarization, so that it is done once for each group
+    binarization_groups = {}
+    for param_index, param in enumerate(params_grid):
         for i in param:
             if type(param[i]) == np.float64 or type(param[i]) == np.int64:
                 param[i] = float(param[i])
+        binarization_key = tuple(param.get(i) for i in ('onset', 'offset', 'pad_onset', 'pad_offset', 'scale'))
+        binarization_groups.setdefault(binarization_key, []).append(param_index)
+
+    scores = [None] * len(params_grid)
+    for param_indices in tqdm(binarization_groups.values(), desc='tuning thresholds', leave=True):
+        param = params_grid[param_indices[0]]
+        per_args = {"frame_length_in_sec": frame_length_in_sec, **param}
+        per_args['onset'], per_args['offset'] = cal_vad_onset_offset_packed(
+            param.get('scale', 'absolute'), param['onset'], param['offset'], frames, num_frames
+        )
         try:
-            # Generate speech segments by performing binarization on the VAD prediction according to param.
-            # Filter speech segments according to param and write the result to rttm-like table.
-            vad_table_dir = generate_vad_segment_table(
-                vad_pred, param, frame_length_in_sec=frame_length_in_sec, num_workers=num_workers
-            )
-            # add reference and hypothesis to metrics
-            for filename in paired_filenames:
-                groundtruth_RTTM_file = groundtruth_RTTM_dict[filename]
-                vad_table_filepath = os.path.join(vad_table_dir, filename + ".txt")
-                reference, hypothesis = vad_construct_pyannote_object_per_file(
-                    vad_table_filepath, groundtruth_RTTM_file
-                )
-                metric(reference, hypothesis)  # accumulation
+            speech_segments, file_index = binarization_packed(frames, num_frames, per_args)
+        except RuntimeError as e:
+            for param_index in param_indices:
+                scores[param_index] = e
+            continue
 
-            # delete tmp table files
-            shutil.rmtree(vad_table_dir, ignore_errors=True)
+        for param_index in param_indices:
+            try:
+                hyp_segments, hyp_file_index = filtering_packed(speech_segments, file_index, params_grid[param_index])
 
-            report = metric.report(display=False)
-            DetER = report.iloc[[-1]][('detection error rate', '%')].item()
-            FA = report.iloc[[-1]][('false alarm', '%')].item()
-            MISS = report.iloc[[-1]][('miss', '%')].item()
+                # Evaluate the segments as written to the rttm-like table by generate_vad_segment_table,
+                # with start and duration rounded to 4 decimals and one unit frame added to the duration.
+                hyp_dur = hyp_segments[:, 1] - hyp_segments[:, 0] + UNIT_FRAME_LEN
+                hyp_start = torch.round(hyp_segments[:, 0].double(), decimals=4)
+                hyp_segments = torch.stack((hyp_start, hyp_start + torch.round(hyp_dur.double(), decimals=4)), dim=1)
+                hyp_segments, hyp_file_index = merge_overlap_segment_packed(hyp_segments, hyp_file_index)
+
+                scores[param_index] = get_detection_error_packed(
+                    hyp_segments, hyp_file_index, ref_segments, ref_file_index
+                )
+            except RuntimeError as e:
+                scores[param_index] = e
 
-            assert (
-                focus_metric == "DetER" or focus_metric == "FA" or focus_metric == "MISS"
-            ), "Metric we care most should be only in 'DetER', 'FA' or 'MISS'!"
-            all_perf[str(param)] = {'DetER (%)': DetER, 'FA (%)': FA, 'MISS (%)': MISS}
-            logging.info(f"parameter {param}, {all_perf[str(param)] }")
+    for param, score in zip(params_grid, scores):
+        if isinstance(score, RuntimeError):
+            print(f"Pass {param}, with error {score}")
+            continue
 
-            score = all_perf[str(param)][focus_metric + ' (%)']
+        false_alarm, miss, total = score
+        DetER = 100 * (false_alarm + miss) / total
+        FA = 100 * false_alarm / total
+        MISS = 100 * miss / total
 
-            del report
-            metric.reset()  # reset internal accumulator
+        all_perf[str(param)] = {'DetER (%)': DetER, 'FA (%)': FA, 'MISS (%)': MISS}
+        logging.info(f"parameter {param}, {all_perf[str(param)] }")
 
-            # save results for analysis
-            with open(result_file + ".txt", "a", encoding='utf-8') as fp:
-                fp.write(f"{param}, {all_perf[str(param)] }\n")
+        score = all_perf[str(param)][focus_metric + ' (%)']
 
-            if score < min_score:
-                best_threshold = param
-                optimal_scores = all_perf[str(param)]
-                min_score = score
-            print("Current best", best_threshold, optimal_scores)
+        # save results for analysis
+        with open(result_file + ".txt", "a", encoding='utf-8') as fp:
+            fp.write(f"{param}, {all_perf[str(param)] }\n")
 
-        except RuntimeError as e:
-            print(f"Pass {param}, with error {e}")
-        except pd.errors.EmptyDataError as e1:
-            print(f"Pass {param}, with error {e1}")
+        if score < min_score:
+            best_threshold = param
+            optimal_scores = all_perf[str(param)]
+            min_score = score
+        print("Current best", best_threshold, optimal_scores)
 
     return best_threshold, optimal_scores
 
@@ -1113,10 +1468,32 @@ def generate_vad_frame_pred(
     """
     Generate VAD frame level prediction and write to out_dir
     """
+    for name, pred in generate_vad_frame_pred_in_memory(
+        vad_model, window_length_in_sec, shift_length_in_sec, manifest_vad_input, use_feat
+    ):
+        outpath = os.path.join(out_dir, name + ".frame")
+        with open(outpath, "a", encoding='utf-8') as fout:
+            for p in pred.tolist():
+                fout.write('{0:0.4f}\n'.format(p))
+    return out_dir
+
+
+def generate_vad_frame_pred_in_memory(
+    vad_model,
+    window_length_in_sec: float,
+    shift_length_in_sec: float,
+    manifest_vad_input: str,
+    use_feat: bool = False,
+) -> Iterator[Tuple[str, torch.Tensor]]:
+    """
+    Generate VAD frame level prediction and yield it for each recording once all of its snippets are inferred.
+    Yields:
+        name (str): name of the recording.
+        pred (torch.Tensor): frame level prediction of the recording.
+    """
     time_unit = int(window_length_in_sec / shift_length_in_sec)
     trunc = int(time_unit / 2)
     trunc_l = time_unit - trunc
-    all_len = 0
 
     data = []
     with open(manifest_vad_input, 'r', encoding='utf-8') as f:
@@ -1126,6 +1503,7 @@ def generate_vad_frame_pred(
     logging.info(f"Inference on {len(data)} audio files/json lines!")
 
     status = get_vad_stream_status(data)
+    preds = []
     for i, test_batch in enumerate(tqdm(vad_model.test_dataloader(), total=len(vad_model.test_dataloader()))):
         test_batch = [x.to(vad_model.device) for x in test_batch]
         with autocast():
@@ -1150,18 +1528,14 @@ def generate_vad_frame_pred(
             else:
                 to_save = pred
 
-            to_save = to_save.cpu().tolist()
-            all_len += len(to_save)
-            outpath = os.path.join(out_dir, data[i] + ".frame")
-            with open(outpath, "a", encoding='utf-8') as fout:
-                for f in range(len(to_save)):
-                    fout.write('{0:0.4f}\n'.format(to_save[f]))
+            preds.append(to_save.float().cpu())
 
         del test_batch
         if status[i] == 'end' or status[i] == 'single':
-            logging.debug(f"Overall length of prediction of {data[i]} is {all_len}!")
-            all_len = 0
-    return out_dir
+            pred = torch.cat(preds)
+            preds = []
+            logging.debug(f"Overall length of prediction of {data[i]} is {len(pred)}!")
+            yield data[i], pred
 
 
 def init_vad_model(model_path: str):
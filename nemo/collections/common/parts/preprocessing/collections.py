@@ -18,9 +18,10 @@ import os
 from itertools import combinations
 from typing import Any, Dict, Iterable, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 
-from nemo.collections.common.parts.preprocessing import manifest, parsers
+from nemo.collections.common.parts.preprocessing import manifest, manifest_index, parsers
 from nemo.utils import logging
 
 
@@ -29,6 +30,148 @@ class _Collection(collections.UserList):
 
     OUTPUT_TYPE = None  # Single element output type.
 
+    def _init_packed(self, data: List[Any]):
+        """Instantiates the collection with ``data`` stored column-wise, see `manifest_index.PackedEntities`.
+
+        Entities are read-only and materialized on access, which keeps the collection memory shared between
+        forked DataLoader workers.
+
+        Args:
+            data: List of `OUTPUT_TYPE` entities.
+        """
+        super().__init__()
+        self.data = manifest_index.PackedEntities(self.OUTPUT_TYPE, data)
+
+    def _init_from_manifest_indexes(
+        self,
+        indexes: List[manifest_index.ManifestIndex],
+        file_field: str,
+        parser: parsers.CharParser,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        max_number: Optional[int] = None,
+        do_sort_by_duration: bool = False,
+        index_by_file_id: bool = False,
+        manifests_files: Union[str, List[str], None] = None,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+    ):
+        """Instantiates the collection from compiled manifest indexes, see `manifest_index.compile_manifest_index`.
+
+        Accepts the same filtering arguments as the list-based constructors of `AudioText`, `VideoText` and
+        `FeatureText`, but applies them as vectorized operations over the index. Entities are materialized lazily
+        on access.
+
+        Args:
+            indexes: Compiled indexes, one per manifest file.
+            file_field: Index field used to build the `mapping` when `index_by_file_id` is set.
+            parser: Instance of `CharParser` to convert string to tokens. Token ids stored in the index are
+                reused if they were produced by an equivalent parser.
+            min_duration: Minimum duration to keep entry with (default: None).
+            max_duration: Maximum duration to keep entry with (default: None).
+            max_number: Maximum number of samples to collect.
+            do_sort_by_duration: True if sort samples list by duration. Not compatible with index_by_file_id.
+            index_by_file_id: If True, saves a mapping from filename base (ID) to index in data.
+            manifests_files: Manifests the indexes were compiled from, which key the token ids cache.
+            tokenization_workers: Number of processes used to tokenize all transcripts before filtering, if the
+                token ids stored in the index are not reused.
+            tokens_cache_dir: Optional directory to cache token ids in, if the token ids stored in the index are
+                not reused.
+        """
+        fingerprint = manifest_index.parser_fingerprint(parser)
+        reuse_tokens = fingerprint is not None and all(index.parser_fingerprint == fingerprint for index in indexes)
+
+        token_labels = None
+        if not reuse_tokens and (tokenization_workers > 1 or tokens_cache_dir is not None):
+            texts, langs, token_labels = [], [], []
+            for index in indexes:
+                for row in range(len(index)):
+                    texts.append(index.get('text', row))
+                    langs.append(index.get('lang', row))
+                    token_labels.append(index.text_tokens[row] if index.has_token_labels[row] else None)
+            token_labels = manifest_index.pretokenize_texts(
+                manifests_files,
+                texts,
+                langs,
+                token_labels,
+                parser,
+                num_workers=tokenization_workers,
+                cache_dir=tokens_cache_dir,
+            )
+
+        rows, text_tokens, base = [], [], 0
+        num_kept, num_filtered, duration_filtered = 0, 0, 0.0
+        num_truncated, duration_truncated = 0, 0.0
+        for index in indexes:
+            mask = index.select(min_duration=min_duration, max_duration=max_duration)
+            if max_number and num_kept >= max_number:
+                index_rows = np.zeros(0, dtype=np.int64)
+            elif reuse_tokens:
+                # Transcripts rejected by the parser are stored as null token sequences.
+                if index.text_tokens.nulls is not None:
+                    mask &= ~index.text_tokens.nulls
+                index_rows = np.flatnonzero(mask)
+                if max_number:
+                    index_rows = index_rows[: max_number - num_kept]
+            else:
+                index_rows = []
+                for row in np.flatnonzero(mask):
+                    if token_labels is not None and token_labels[base + row] is not None:
+                        tokens = token_labels[base + row]
+                        if tokens is manifest_index.REJECTED_TOKENS:
+                            tokens = None
+                    elif index.has_token_labels[row]:
+                        tokens = index.text_tokens[row]
+                    else:
+                        tokens = manifest_index.tokenize_text(parser, index.get('text', row), index.get('lang', row))
+                    if tokens is None:
+                        mask[row] = False
+                        continue
+                    index_rows.append(row)
+                    text_tokens.append(tokens)
+                    if max_number and num_kept + len(index_rows) >= max_number:
+                        break
+                index_rows = np.asarray(index_rows, dtype=np.int64)
+
+            num_filtered += int((~mask).sum())
+            duration_filtered += float(index.duration[~mask].sum())
+            # Entries passing the filters after the first max_number ones
+            truncated = mask.copy()
+            truncated[index_rows] = False
+            num_truncated += int(truncated.sum())
+            duration_truncated += float(index.duration[truncated].sum())
+            rows.append(index_rows + base)
+            num_kept += len(index_rows)
+            base += len(index)
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        text_tokens = None if reuse_tokens else manifest_index.PackedSequences.from_list(text_tokens)
+        data = manifest_index.ManifestIndexEntities(self.OUTPUT_TYPE, indexes, rows, text_tokens=text_tokens)
+
+        if index_by_file_id:
+            self.mapping = {}
+            for i in range(len(data)):
+                file_id, _ = os.path.splitext(os.path.basename(data.get(file_field, i)))
+                if file_id not in self.mapping:
+                    self.mapping[file_id] = []
+                self.mapping[file_id].append(i)
+
+        if do_sort_by_duration:
+            if index_by_file_id:
+                logging.warning("Tried to sort dataset by duration, but cannot since index_by_file_id is set.")
+            else:
+                data = data.sorted_by_duration()
+
+        logging.info("Dataset loaded with %d files totalling %.2f hours", len(data), data.total_duration() / 3600)
+        logging.info("%d files were filtered totalling %.2f hours", num_filtered, duration_filtered / 3600)
+        if num_truncated > 0:
+            logging.info(
+                "%d files were left out by max_number totalling %.2f hours", num_truncated, duration_truncated / 3600
+            )
+
+        super().__init__()
+        self.data = data
+
 
 class Text(_Collection):
     """Simple list of preprocessed text entries, result in list of tokens."""
@@ -152,6 +295,12 @@ class AudioText(_Collection):
                 num_filtered += 1
                 continue
 
+            if token_labels is manifest_index.REJECTED_TOKENS:
+                # Transcripts rejected by the parser in `manifest_index.pretokenize_texts`.
+                duration_filtered += duration
+                num_filtered += 1
+                continue
+
             if token_labels is not None:
                 text_tokens = token_labels
             else:
@@ -196,7 +345,7 @@ class AudioText(_Collection):
         logging.info("Dataset loaded with %d files totalling %.2f hours", len(data), total_duration / 3600)
         logging.info("%d files were filtered totalling %.2f hours", num_filtered, duration_filtered / 3600)
 
-        super().__init__(data)
+        self._init_packed(data)
 
 
 class VideoText(_Collection):
@@ -263,6 +412,12 @@ class VideoText(_Collection):
                 num_filtered += 1
                 continue
 
+            if token_labels is manifest_index.REJECTED_TOKENS:
+                # Transcripts rejected by the parser in `manifest_index.pretokenize_texts`.
+                duration_filtered += duration
+                num_filtered += 1
+                continue
+
             if token_labels is not None:
                 text_tokens = token_labels
             else:
@@ -304,22 +459,45 @@ class VideoText(_Collection):
         logging.info("Dataset loaded with %d files totalling %.2f hours", len(data), total_duration / 3600)
         logging.info("%d files were filtered totalling %.2f hours", num_filtered, duration_filtered / 3600)
 
-        super().__init__(data)
+        self._init_packed(data)
 
 
 class ASRAudioText(AudioText):
     """`AudioText` collector from asr structured json files."""
 
-    def __init__(self, manifests_files: Union[str, List[str]], *args, **kwargs):
+    def __init__(
+        self,
+        manifests_files: Union[str, List[str]],
+        *args,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        **kwargs,
+    ):
         """Parse lists of audio files, durations and transcripts texts.
 
         Args:
             manifests_files: Either single string file or list of such -
                 manifests to yield items from.
             *args: Args to pass to `AudioText` constructor.
+            tokenization_workers: Number of processes used to tokenize all transcripts before filtering.
+                If <= 1, transcripts are tokenized one by one while filtering, unless `tokens_cache_dir` is set.
+            tokens_cache_dir: Optional directory to cache token ids in, keyed by the manifests and the parser.
             **kwargs: Kwargs to pass to `AudioText` constructor.
         """
 
+        indexes = manifest_index.load_manifest_indexes(manifests_files)
+        if indexes is not None:
+            self._init_from_manifest_indexes(
+                indexes,
+                'audio_file',
+                *args,
+                manifests_files=manifests_files,
+                tokenization_workers=tokenization_workers,
+                tokens_cache_dir=tokens_cache_dir,
+                **kwargs,
+            )
+            return
+
         ids, audio_files, durations, texts, offsets, = (
             [],
             [],
@@ -338,6 +516,19 @@ class ASRAudioText(AudioText):
             orig_srs.append(item['orig_sr'])
             token_labels.append(item['token_labels'])
             langs.append(item['lang'])
+
+        if tokenization_workers > 1 or tokens_cache_dir is not None:
+            parser = kwargs['parser'] if 'parser' in kwargs else args[0]
+            token_labels = manifest_index.pretokenize_texts(
+                manifests_files,
+                texts,
+                langs,
+                token_labels,
+                parser,
+                num_workers=tokenization_workers,
+                cache_dir=tokens_cache_dir,
+            )
+
         super().__init__(
             ids, audio_files, durations, texts, offsets, speakers, orig_srs, token_labels, langs, *args, **kwargs
         )
@@ -346,16 +537,39 @@ class ASRAudioText(AudioText):
 class ASRVideoText(VideoText):
     """`VideoText` collector from cv structured json files."""
 
-    def __init__(self, manifests_files: Union[str, List[str]], *args, **kwargs):
+    def __init__(
+        self,
+        manifests_files: Union[str, List[str]],
+        *args,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        **kwargs,
+    ):
         """Parse lists of video files, durations and transcripts texts.
 
         Args:
             manifests_files: Either single string file or list of such -
                 manifests to yield items from.
             *args: Args to pass to `VideoText` constructor.
+            tokenization_workers: Number of processes used to tokenize all transcripts before filtering.
+                If <= 1, transcripts are tokenized one by one while filtering, unless `tokens_cache_dir` is set.
+            tokens_cache_dir: Optional directory to cache token ids in, keyed by the manifests and the parser.
             **kwargs: Kwargs to pass to `VideoText` constructor.
         """
 
+        indexes = manifest_index.load_manifest_indexes(manifests_files)
+        if indexes is not None:
+            self._init_from_manifest_indexes(
+                indexes,
+                'video_file',
+                *args,
+                manifests_files=manifests_files,
+                tokenization_workers=tokenization_workers,
+                tokens_cache_dir=tokens_cache_dir,
+                **kwargs,
+            )
+            return
+
         ids, video_files, durations, texts, offsets, = (
             [],
             [],
@@ -374,6 +588,19 @@ class ASRVideoText(VideoText):
             orig_srs.append(item['orig_sr'])
             token_labels.append(item['token_labels'])
             langs.append(item['lang'])
+
+        if tokenization_workers > 1 or tokens_cache_dir is not None:
+            parser = kwargs['parser'] if 'parser' in kwargs else args[0]
+            token_labels = manifest_index.pretokenize_texts(
+                manifests_files,
+                texts,
+                langs,
+                token_labels,
+                parser,
+                num_workers=tokenization_workers,
+                cache_dir=tokens_cache_dir,
+            )
+
         super().__init__(
             ids, video_files, durations, texts, offsets, speakers, orig_srs, token_labels, langs, *args, **kwargs
         )
@@ -1324,6 +1551,12 @@ class FeatureText(_Collection):
                 num_filtered += 1
                 continue
 
+            if token_labels is manifest_index.REJECTED_TOKENS:
+                # Transcripts rejected by the parser in `manifest_index.pretokenize_texts`.
+                duration_filtered += duration
+                num_filtered += 1
+                continue
+
             if token_labels is not None:
                 text_tokens = token_labels
             else:
@@ -1367,22 +1600,45 @@ class FeatureText(_Collection):
         logging.info("Dataset loaded with %d files totalling %.2f hours", len(data), total_duration / 3600)
         logging.info("%d files were filtered totalling %.2f hours", num_filtered, duration_filtered / 3600)
 
-        super().__init__(data)
+        self._init_packed(data)
 
 
 class ASRFeatureText(FeatureText):
     """`FeatureText` collector from asr structured json files."""
 
-    def __init__(self, manifests_files: Union[str, List[str]], *args, **kwargs):
+    def __init__(
+        self,
+        manifests_files: Union[str, List[str]],
+        *args,
+        tokenization_workers: int = 0,
+        tokens_cache_dir: Optional[str] = None,
+        **kwargs,
+    ):
         """Parse lists of audio files, durations and transcripts texts.
 
         Args:
             manifests_files: Either single string file or list of such -
                 manifests to yield items from.
             *args: Args to pass to `AudioText` constructor.
+            tokenization_workers: Number of processes used to tokenize all transcripts before filtering.
+                If <= 1, transcripts are tokenized one by one while filtering, unless `tokens_cache_dir` is set.
+            tokens_cache_dir: Optional directory to cache token ids in, keyed by the manifests and the parser.
             **kwargs: Kwargs to pass to `AudioText` constructor.
         """
 
+        indexes = manifest_index.load_manifest_indexes(manifests_files)
+        if indexes is not None:
+            self._init_from_manifest_indexes(
+                indexes,
+                'feature_file',
+                *args,
+                manifests_files=manifests_files,
+                tokenization_workers=tokenization_workers,
+                tokens_cache_dir=tokens_cache_dir,
+                **kwargs,
+            )
+            return
+
         ids, feature_files, rttm_files, durations, texts, offsets, = (
             [],
             [],
@@ -1404,6 +1660,18 @@ class ASRFeatureText(FeatureText):
             token_labels.append(item['token_labels'])
             langs.append(item['lang'])
 
+        if tokenization_workers > 1 or tokens_cache_dir is not None:
+            parser = kwargs['parser'] if 'parser' in kwargs else args[0]
+            token_labels = manifest_index.pretokenize_texts(
+                manifests_files,
+                texts,
+                langs,
+                token_labels,
+                parser,
+                num_workers=tokenization_workers,
+                cache_dir=tokens_cache_dir,
+            )
+
         super().__init__(
             ids,
             feature_files,
@@ -0,0 +1,670 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar storage of collection entities and compiled manifest indexes.
+
+`PackedEntities` stores the entities of a collection column-wise in a few NumPy buffers instead of a list of
+namedtuples, which keeps its memory shared between forked DataLoader workers.
+
+Parsing a multi-million line JSON manifest (and tokenizing every transcript) on every job start is slow.
+`compile_manifest_index` runs that work once and stores the result next to the manifest as a directory of
+``.npy`` columns, which `ManifestIndex` opens with ``mmap_mode='r'``. Opening is O(1), filtering by duration is a
+vectorized NumPy operation, and the pages are shared read-only by all DataLoader workers.
+
+Layout of ``<manifest>.index/``::
+
+    info.json                   version, source manifest stats, parser fingerprint
+    duration.npy                float64[N]
+    offset.npy                  float64[N], NaN for missing offsets
+    orig_sr.npy                 int64[N], -1 for missing sampling rates
+    <string field>.npy          uint8[...] packed UTF-8 values (+ .offsets.npy, .nulls.npy)
+    text_tokens.npy             int32[...] packed token ids (+ .offsets.npy, .nulls.npy)
+    has_token_labels.npy        bool[N], True where `token_labels` came from the manifest
+"""
+
+import collections.abc
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import pickle
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from nemo.collections.common.parts.preprocessing import manifest, parsers
+from nemo.utils import logging
+from nemo.utils.data_utils import DataStoreObject
+
+__all__ = [
+    'PackedStrings',
+    'PackedSequences',
+    'PackedScalars',
+    'PackedEntities',
+    'ManifestIndex',
+    'ManifestIndexEntities',
+    'compile_manifest_index',
+    'load_manifest_index',
+    'load_manifest_indexes',
+    'manifest_index_path',
+    'parser_fingerprint',
+    'pretokenize_texts',
+    'tokenize_texts',
+    'REJECTED_TOKENS',
+]
+__idx_version__ = "0.1"  # index format version
+__idx_suffix__ = "index"  # index directory suffix
+
+# Fields of `manifest.item_iter` items stored as packed strings.
+STRING_FIELDS = ('audio_file', 'video_file', 'feature_file', 'rttm_file', 'text', 'speaker', 'lang')
+
+
+class PackedStrings:
+    """Sequence of optional strings stored in a single UTF-8 buffer with row offsets.
+
+    Values that are not strings (e.g. integer speaker ids, or transcripts given as a list of language spans)
+    are stored JSON-encoded, which is recorded per column by ``is_json``.
+    """
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray, nulls: Optional[np.ndarray] = None, is_json=False):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.nulls = nulls
+        self.is_json = is_json
+
+    @classmethod
+    def from_list(cls, values: Sequence[Any]) -> 'PackedStrings':
+        is_json = any(v is not None and not isinstance(v, str) for v in values)
+        encoded = [b'' if v is None else (json.dumps(v) if is_json else v).encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        nulls = np.array([v is None for v in values], dtype=bool)
+        return cls(buffer, offsets, nulls if nulls.any() else None, is_json)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> Any:
+        if self.nulls is not None and self.nulls[idx]:
+            return None
+        value = self.buffer[self.offsets[idx] : self.offsets[idx + 1]].tobytes().decode('utf-8')
+        return json.loads(value) if self.is_json else value
+
+    def save(self, path: str, name: str):
+        np.save(os.path.join(path, f'{name}.npy'), self.buffer)
+        np.save(os.path.join(path, f'{name}.offsets.npy'), self.offsets)
+        if self.nulls is not None:
+            np.save(os.path.join(path, f'{name}.nulls.npy'), self.nulls)
+
+    @classmethod
+    def load(cls, path: str, name: str, is_json: bool = False, mmap_mode: Optional[str] = 'r') -> 'PackedStrings':
+        nulls_fn = os.path.join(path, f'{name}.nulls.npy')
+        return cls(
+            buffer=np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode),
+            offsets=np.load(os.path.join(path, f'{name}.offsets.npy'), mmap_mode=mmap_mode),
+            nulls=np.load(nulls_fn, mmap_mode=mmap_mode) if os.path.exists(nulls_fn) else None,
+            is_json=is_json,
+        )
+
+
+class PackedSequences(PackedStrings):
+    """Sequence of optional integer lists (e.g. token ids) stored as a flat int32 buffer with row offsets."""
+
+    @classmethod
+    def from_list(cls, values: Sequence[Optional[Sequence[int]]]) -> 'PackedSequences':
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([0 if v is None else len(v) for v in values], out=offsets[1:])
+        buffer = np.fromiter((t for v in values if v is not None for t in v), dtype=np.int32, count=int(offsets[-1]))
+        nulls = np.array([v is None for v in values], dtype=bool)
+        return cls(buffer, offsets, nulls if nulls.any() else None)
+
+    def __getitem__(self, idx: int) -> Optional[List[int]]:
+        if self.nulls is not None and self.nulls[idx]:
+            return None
+        return self.buffer[self.offsets[idx] : self.offsets[idx + 1]].tolist()
+
+    @classmethod
+    def load(cls, path: str, name: str, is_json: bool = False, mmap_mode: Optional[str] = 'r') -> 'PackedSequences':
+        return super().load(path, name, is_json=False, mmap_mode=mmap_mode)
+
+
+class PackedScalars:
+    """Sequence of optional numbers stored in a NumPy array, with a mask of missing values."""
+
+    def __init__(self, values: np.ndarray, nulls: Optional[np.ndarray] = None):
+        self.values = values
+        self.nulls = nulls
+
+    @classmethod
+    def from_list(cls, values: Sequence[Optional[Union[int, float]]], dtype: type) -> 'PackedScalars':
+        nulls = np.array([v is None for v in values], dtype=bool)
+        packed = np.array([0 if v is None else v for v in values], dtype=dtype)
+        return cls(packed, nulls if nulls.any() else None)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, idx: int) -> Optional[Union[int, float]]:
+        if self.nulls is not None and self.nulls[idx]:
+            return None
+        return self.values[idx].item()
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+def _is_number(value: Any) -> bool:
+    return _is_int(value) or isinstance(value, (float, np.floating))
+
+
+def pack_column(values: List[Any]) -> Sequence[Any]:
+    """Packs a column of entity values into the most compact representation that preserves them.
+
+    Strings are packed into `PackedStrings`, numbers into `PackedScalars` and lists of integers (e.g. token ids)
+    into `PackedSequences`. Columns with any other values are kept as a list.
+    """
+    non_null = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in non_null):
+        return PackedStrings.from_list(values)
+    if all(_is_int(v) for v in non_null):
+        return PackedScalars.from_list(values, dtype=np.int64)
+    if all(_is_number(v) for v in non_null):
+        return PackedScalars.from_list(values, dtype=np.float64)
+    if all(isinstance(v, list) and all(_is_int(t) for t in v) for v in non_null):
+        return PackedSequences.from_list(values)
+    return values
+
+
+class PackedEntities(collections.abc.Sequence):
+    """Immutable sequence of namedtuple entities stored column-wise.
+
+    A list of namedtuples holds several Python objects per entity. When DataLoader workers are forked, reference
+    count updates on these objects gradually copy every memory page into each worker. Storing the fields in a few
+    NumPy buffers keeps the pages shared, and entities are materialized on access instead.
+
+    Args:
+        output_type: namedtuple type of the entities.
+        entities: entities to pack.
+    """
+
+    def __init__(self, output_type: type, entities: List[Any]):
+        self.output_type = output_type
+        self._len = len(entities)
+        self.columns = [pack_column([entity[i] for entity in entities]) for i in range(len(output_type._fields))]
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx: int):
+        if isinstance(idx, slice):
+            raise TypeError(f"{type(self).__name__} does not support slicing")
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Index {idx} is out of range for {len(self)} entities")
+        return self.output_type(*(column[idx] for column in self.columns))
+
+
+def parser_fingerprint(parser: Optional[Callable]) -> Optional[str]:
+    """Returns a hash identifying the token ids produced by ``parser``, or None if it cannot be identified.
+
+    Tokenizer wrappers (objects with a ``_tokenizer`` attribute, as used by the BPE datasets) are identified by
+    the tokenizer class and vocabulary, character parsers by their class and configuration. Arbitrary callables
+    cannot be identified, so token ids produced by them are never reused.
+    """
+    tokenizer = getattr(parser, '_tokenizer', None)
+    if tokenizer is not None:
+        try:
+            vocab = tokenizer.vocab
+        except Exception:
+            return None
+        state = [type(tokenizer).__name__, vocab]
+    elif isinstance(parser, parsers.CharParser):
+        state = [type(parser).__name__]
+        for key, value in sorted(vars(parser).items()):
+            if isinstance(value, (str, int, float, bool, list, tuple, dict, set, type(None))):
+                state.append([key, value])
+    else:
+        return None
+
+    encoded = json.dumps(state, sort_keys=True, default=lambda o: sorted(o) if isinstance(o, set) else repr(o))
+    return hashlib.md5(encoded.encode('utf-8')).hexdigest()
+
+
+def tokenize_text(parser: Callable, text: Union[str, List[Dict[str, str]]], lang: Optional[str]):
+    """Tokenizes a single transcript the way `collections.AudioText` does."""
+    if text == '':
+        return []
+    if hasattr(parser, "is_aggregate") and parser.is_aggregate and isinstance(text, str):
+        if lang is not None:
+            return parser(text, lang)
+        raise ValueError("lang required in manifest when using aggregate tokenizers")
+    return parser(text)
+
+
+# Token ids returned by `pretokenize_texts` for transcripts rejected by the parser, so that collections filter
+# them out instead of parsing them again.
+REJECTED_TOKENS = object()
+
+# Parser of the tokenization workers, set by `_init_tokenization_worker`.
+_TOKENIZATION_PARSER = None
+
+
+def _init_tokenization_worker(parser):
+    global _TOKENIZATION_PARSER
+    _TOKENIZATION_PARSER = parser
+
+
+def _tokenize_chunk(chunk):
+    texts, langs = chunk
+    return [tokenize_text(_TOKENIZATION_PARSER, text, lang) for text, lang in zip(texts, langs)]
+
+
+def tokenize_texts(
+    parser: Callable, texts: List[Any], langs: List[Optional[str]], num_workers: int = 0, chunk_size: int = 10000
+) -> List[Optional[List[int]]]:
+    """Tokenizes transcripts with `tokenize_text`, optionally in a pool of worker processes.
+
+    Workers are started with forkserver (or spawn) rather than forked, since forking a process whose threads
+    are running (e.g. torch intra-op threads) can deadlock the workers. The parser is pickled to the workers,
+    transcripts are tokenized in the current process if it cannot be pickled.
+
+    Args:
+        parser: callable converting a transcript into token ids.
+        texts: transcripts to tokenize.
+        langs: language of each transcript, or None.
+        num_workers: number of worker processes. Tokenization runs in the current process if <= 1.
+        chunk_size: number of transcripts sent to a worker at a time.
+
+    Returns:
+        Token ids of each transcript, or None if the parser rejected it.
+    """
+    if num_workers is None or num_workers <= 1 or len(texts) <= chunk_size:
+        return [tokenize_text(parser, text, lang) for text, lang in zip(texts, langs)]
+
+    try:
+        pickle.dumps(parser)
+    except Exception:
+        logging.warning(f"Parser of type {type(parser)} cannot be pickled, tokenizing transcripts in one process.")
+        return [tokenize_text(parser, text, lang) for text, lang in zip(texts, langs)]
+
+    chunks = [(texts[i : i + chunk_size], langs[i : i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    logging.info(f"Tokenizing {len(texts)} transcripts using {num_workers} workers")
+    ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    with ctx.Pool(num_workers, initializer=_init_tokenization_worker, initargs=(parser,)) as p:
+        results = p.map(_tokenize_chunk, chunks)
+
+    return [tokens for chunk_tokens in results for tokens in chunk_tokens]
+
+
+def pretokenize_texts(
+    manifests_files: Union[str, List[str]],
+    texts: List[Any],
+    langs: List[Optional[str]],
+    token_labels: List[Optional[List[int]]],
+    parser: Callable,
+    num_workers: int = 0,
+    cache_dir: Optional[str] = None,
+) -> List[Optional[List[int]]]:
+    """Tokenizes all transcripts of the manifests up front and fills them into ``token_labels``.
+
+    Collections use ``token_labels`` instead of calling the parser, so this moves tokenization out of the
+    per-item loop of the collection constructors. Results can be cached on disk, keyed by the manifests
+    (path, size and modification time) and the `parser_fingerprint`, so that later runs skip tokenization.
+
+    Args:
+        manifests_files: manifests the items were read from.
+        texts: transcript of each item.
+        langs: language of each item, or None.
+        token_labels: token ids provided by the manifest for each item, or None.
+        parser: parser converting a transcript into token ids.
+        num_workers: number of worker processes used for tokenization.
+        cache_dir: optional directory to cache token ids in.
+
+    Returns:
+        ``token_labels`` with missing entries replaced by the parsed transcripts, or by `REJECTED_TOKENS` if the
+        parser rejected them.
+    """
+    if isinstance(manifests_files, str):
+        manifests_files = [manifests_files]
+
+    cache_path = None
+    if cache_dir is not None:
+        fingerprint = parser_fingerprint(parser)
+        if fingerprint is None:
+            logging.warning(f"Cannot identify parser of type {type(parser)}, token ids will not be cached.")
+        else:
+            local_manifests = [DataStoreObject(manifest_file).get() for manifest_file in manifests_files]
+            key = [__idx_version__, fingerprint, [[m, _manifest_stats(m)] for m in local_manifests]]
+            key = hashlib.md5(json.dumps(key).encode('utf-8')).hexdigest()
+            cache_path = os.path.join(cache_dir, f'tokens_{key}')
+
+    if cache_path is not None and os.path.isdir(cache_path):
+        logging.info(f"Loading token ids from cache {cache_path}")
+        tokens = PackedSequences.load(cache_path, 'text_tokens')
+        if len(tokens) != len(texts):
+            raise RuntimeError(f"Cached token ids in {cache_path} do not match the manifests, please remove them.")
+    else:
+        missing = [i for i, labels in enumerate(token_labels) if labels is None]
+        missing_tokens = tokenize_texts(
+            parser, [texts[i] for i in missing], [langs[i] for i in missing], num_workers=num_workers
+        )
+        if any(t is not None and not isinstance(t, list) for t in missing_tokens):
+            # e.g. parsers without tokenization return text
+            logging.warning("Parser does not return lists of token ids, transcripts will be parsed per item.")
+            return token_labels
+
+        tokens = [None] * len(texts)
+        for i, item_tokens in zip(missing, missing_tokens):
+            tokens[i] = item_tokens
+
+        if cache_path is not None:
+            tmp_path = f'{cache_path}.tmp{os.getpid()}'
+            os.makedirs(tmp_path, exist_ok=True)
+            PackedSequences.from_list(tokens).save(tmp_path, 'text_tokens')
+            try:
+                os.replace(tmp_path, cache_path)
+                logging.info(f"Saved token ids to cache {cache_path}")
+            except OSError:
+                # Another process has written the cache in the meantime.
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    # Only the missing entries are tokenized, so a None token sequence is a transcript rejected by the parser.
+    return [
+        labels if labels is not None else tokens[i] if tokens[i] is not None else REJECTED_TOKENS
+        for i, labels in enumerate(token_labels)
+    ]
+
+
+def manifest_index_path(manifest_file: str) -> str:
+    """Returns the path of the compiled index directory of a (locally cached) manifest file."""
+    return f'{manifest_file}.{__idx_suffix__}'
+
+
+def _manifest_stats(manifest_file: str) -> Dict[str, Any]:
+    stat = os.stat(manifest_file)
+    return dict(size=stat.st_size, mtime=stat.st_mtime)
+
+
+def compile_manifest_index(
+    manifest_file: str, parser: Optional[Callable] = None, index_path: Optional[str] = None, overwrite: bool = False
+) -> str:
+    """Parses a manifest once and writes its columnar index.
+
+    Args:
+        manifest_file: path to a JSON lines manifest (local or on a data store).
+        parser: optional parser used to pre-tokenize transcripts. Token ids are only reused by datasets whose
+            parser has the same `parser_fingerprint`.
+        index_path: directory to write the index to. Defaults to `manifest_index_path` of the local manifest.
+        overwrite: rebuild the index even if an up-to-date one exists.
+
+    Returns:
+        Path to the index directory.
+    """
+    local_manifest = DataStoreObject(manifest_file).get()
+    if index_path is None:
+        index_path = manifest_index_path(local_manifest)
+    fingerprint = parser_fingerprint(parser) if parser is not None else None
+
+    if not overwrite and os.path.isdir(index_path):
+        existing = ManifestIndex(index_path)
+        if existing.is_up_to_date(local_manifest) and existing.parser_fingerprint == fingerprint:
+            logging.info(f"Manifest index {index_path} is up to date")
+            return index_path
+
+    logging.info(f"Compiling manifest index for {manifest_file}")
+    columns = {name: [] for name in STRING_FIELDS}
+    durations, offsets, orig_srs, tokens, has_token_labels = [], [], [], [], []
+    for item in manifest.item_iter(manifest_file):
+        for name in STRING_FIELDS:
+            columns[name].append(item[name])
+        durations.append(item['duration'])
+        offsets.append(np.nan if item['offset'] is None else item['offset'])
+        orig_srs.append(-1 if item['orig_sr'] is None else item['orig_sr'])
+        has_token_labels.append(item['token_labels'] is not None)
+        if item['token_labels'] is not None:
+            tokens.append(item['token_labels'])
+        elif parser is not None:
+            tokens.append(tokenize_text(parser, item['text'], item['lang']))
+        else:
+            tokens.append(None)
+
+    if parser is not None and any(t is not None and not isinstance(t, list) for t in tokens):
+        logging.warning("Parser does not return lists of token ids, transcripts will not be pre-tokenized.")
+        fingerprint = None
+        tokens = [t if h else None for t, h in zip(tokens, has_token_labels)]
+
+    # Write to a temporary directory first, so that concurrent readers never see a partial index.
+    tmp_path = f'{index_path}.tmp{os.getpid()}'
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, 'duration.npy'), np.asarray(durations, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'offset.npy'), np.asarray(offsets, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'orig_sr.npy'), np.asarray(orig_srs, dtype=np.int64))
+    np.save(os.path.join(tmp_path, 'has_token_labels.npy'), np.asarray(has_token_labels, dtype=bool))
+    json_fields = []
+    for name, values in columns.items():
+        column = PackedStrings.from_list(values)
+        column.save(tmp_path, name)
+        if column.is_json:
+            json_fields.append(name)
+    PackedSequences.from_list(tokens).save(tmp_path, 'text_tokens')
+
+    info = dict(
+        version=__idx_version__,
+        manifest=_manifest_stats(local_manifest),
+        num_items=len(durations),
+        parser_fingerprint=fingerprint,
+        json_fields=json_fields,
+    )
+    with open(os.path.join(tmp_path, 'info.json'), 'w') as f:
+        json.dump(info, f)
+
+    if os.path.isdir(index_path):
+        shutil.rmtree(index_path)
+    os.replace(tmp_path, index_path)
+    logging.info(f"Saved manifest index with {len(durations)} items to {index_path}")
+    return index_path
+
+
+class ManifestIndex:
+    """Read-only, memory-mapped view of a compiled manifest.
+
+    Args:
+        index_path: directory written by `compile_manifest_index`.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(os.path.join(index_path, 'info.json'), 'r') as f:
+            self.info = json.load(f)
+
+        if self.info.get('version') != __idx_version__:
+            raise RuntimeError(
+                f"Version mismatch: Please recompile manifest index {index_path}. "
+                f"Expected version = {__idx_version__}, but index version = {self.info.get('version')}."
+            )
+
+        self.duration = np.load(os.path.join(index_path, 'duration.npy'), mmap_mode='r')
+        self.offset = np.load(os.path.join(index_path, 'offset.npy'), mmap_mode='r')
+        self.orig_sr = np.load(os.path.join(index_path, 'orig_sr.npy'), mmap_mode='r')
+        self.has_token_labels = np.load(os.path.join(index_path, 'has_token_labels.npy'), mmap_mode='r')
+        self.strings = {
+            name: PackedStrings.load(index_path, name, is_json=name in self.info['json_fields'])
+            for name in STRING_FIELDS
+        }
+        self.text_tokens = PackedSequences.load(index_path, 'text_tokens')
+
+    def __len__(self):
+        return self.info['num_items']
+
+    @property
+    def parser_fingerprint(self) -> Optional[str]:
+        return self.info['parser_fingerprint']
+
+    def is_up_to_date(self, manifest_file: str) -> bool:
+        """Checks that the manifest has not been modified since the index was compiled."""
+        return self.info['manifest'] == _manifest_stats(manifest_file)
+
+    def select(
+        self,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        valid: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Returns a boolean mask of items passing the duration filters and the optional ``valid`` mask."""
+        mask = np.ones(len(self), dtype=bool)
+        if min_duration is not None:
+            mask &= self.duration >= min_duration
+        if max_duration is not None:
+            mask &= self.duration <= max_duration
+        if valid is not None:
+            mask &= valid
+        return mask
+
+    def get(self, field: str, idx: int) -> Any:
+        """Returns a single field of item ``idx`` in the format produced by `manifest.item_iter`."""
+        if field in self.strings:
+            return self.strings[field][idx]
+        if field == 'duration':
+            return float(self.duration[idx])
+        if field == 'offset':
+            offset = float(self.offset[idx])
+            return None if np.isnan(offset) else offset
+        if field == 'orig_sr':
+            orig_sr = int(self.orig_sr[idx])
+            return None if orig_sr < 0 else orig_sr
+        if field == 'text_tokens':
+            return self.text_tokens[idx]
+        raise KeyError(f"Unknown manifest index field: {field}")
+
+
+def load_manifest_index(manifest_file: str) -> Optional[ManifestIndex]:
+    """Opens the compiled index of a manifest if it exists and is up to date, otherwise returns None."""
+    local_manifest = DataStoreObject(manifest_file).get()
+    index_path = manifest_index_path(local_manifest)
+    if not os.path.isdir(index_path):
+        return None
+
+    index = ManifestIndex(index_path)
+    if not index.is_up_to_date(local_manifest):
+        logging.warning(f"Manifest index {index_path} is outdated and will be ignored, please recompile it.")
+        return None
+    return index
+
+
+def load_manifest_indexes(manifests_files: Union[str, List[str]]) -> Optional[List[ManifestIndex]]:
+    """Opens the compiled indexes of all manifests, or returns None unless every manifest has an up-to-date index."""
+    if isinstance(manifests_files, str):
+        manifests_files = [manifests_files]
+
+    indexes = []
+    for manifest_file in manifests_files:
+        index = load_manifest_index(manifest_file)
+        if index is None:
+            return None
+        indexes.append(index)
+
+    logging.info(f"Using compiled manifest indexes for {len(indexes)} manifest files")
+    return indexes
+
+
+class ManifestIndexEntities(collections.abc.Sequence):
+    """Sequence of collection entities materialized on access from compiled manifest indexes.
+
+    Args:
+        output_type: namedtuple type of the entities, e.g. `collections.AudioText.OUTPUT_TYPE`.
+        indexes: compiled indexes of the manifest files, in order.
+        rows: global row of each entity, counting rows over all indexes. This is also the entity ``id``.
+        text_tokens: optional token ids of each entity, overriding the ones stored in the indexes.
+    """
+
+    # Entity fields named differently from the index fields.
+    FIELD_NAMES = {'text_raw': 'text'}
+
+    def __init__(
+        self,
+        output_type: type,
+        indexes: List[ManifestIndex],
+        rows: np.ndarray,
+        text_tokens: Optional[PackedSequences] = None,
+    ):
+        self.output_type = output_type
+        self.indexes = indexes
+        self.rows = rows
+        self.text_tokens = text_tokens
+        self.fields = [self.FIELD_NAMES.get(field, field) for field in output_type._fields]
+        self._bins = np.cumsum([len(index) for index in indexes])
+        self._durations = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _locate(self, idx: int):
+        row = int(self.rows[idx])
+        file_idx = int(np.searchsorted(self._bins, row, side='right'))
+        base = int(self._bins[file_idx - 1]) if file_idx > 0 else 0
+        return row, self.indexes[file_idx], row - base
+
+    def get(self, field: str, idx: int) -> Any:
+        """Returns a single index field of entity ``idx``."""
+        row, index, local_row = self._locate(idx)
+        if field == 'id':
+            return row
+        if field == 'text_tokens' and self.text_tokens is not None:
+            return self.text_tokens[idx]
+        return index.get(field, local_row)
+
+    def __getitem__(self, idx: int):
+        if isinstance(idx, slice):
+            raise TypeError(f"{type(self).__name__} does not support slicing")
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Index {idx} is out of range for {len(self)} entities")
+
+        row, index, local_row = self._locate(idx)
+        values = []
+        for field in self.fields:
+            if field == 'id':
+                values.append(row)
+            elif field == 'text_tokens' and self.text_tokens is not None:
+                values.append(self.text_tokens[idx])
+            else:
+                values.append(index.get(field, local_row))
+        return self.output_type(*values)
+
+    def durations(self) -> np.ndarray:
+        """Returns the durations of all entities, gathered from the indexes on the first call."""
+        if self._durations is None:
+            self._durations = np.concatenate([index.duration for index in self.indexes])[self.rows]
+        return self._durations
+
+    def total_duration(self) -> float:
+        return float(self.durations().sum())
+
+    def sorted_by_duration(self) -> 'ManifestIndexEntities':
+        """Returns a copy of this sequence with entities sorted by duration."""
+        order = np.argsort(self.durations(), kind='stable')
+        text_tokens = None
+        if self.text_tokens is not None:
+            text_tokens = PackedSequences.from_list([self.text_tokens[i] for i in order])
+        sorted_entities = ManifestIndexEntities(
+            self.output_type, self.indexes, self.rows[order], text_tokens=text_tokens
+        )
+        sorted_entities._durations = self.durations()[order]
+        return sorted_entities
@@ -14,7 +14,11 @@
 
 """Blendable dataset."""
 
+import hashlib
+import os
 import time
+from collections import OrderedDict
+from typing import Optional
 
 import numpy as np
 import torch
@@ -22,58 +26,220 @@ import torch
 from nemo.utils import logging
 from nemo.utils.app_state import AppState
 
+__blending_segment_size__ = 2 ** 24  # samples blended at once by the NumPy implementation
+__max_cached_segments__ = 8  # lazily built segments of blending indices kept by each dataset
 
-class BlendableDataset(torch.utils.data.Dataset):
-    def __init__(self, datasets, weights, size):
 
+def _count_blending_keys(weights, key, inclusive=False):
+    """
+    Count the samples of each dataset with a blending key lower than key, or lower than or equal to key if inclusive.
+    The blending key of the k-th sample of a dataset with weight w is (k + 0.5) / w.
+    """
+    compare = np.less_equal if inclusive else np.less
+    with np.errstate(divide='ignore'):
+        counts = np.maximum(np.ceil(key * weights - 0.5), 0).astype(np.int64)
+        # correct the rounding errors of the estimate, keys increase with k
+        while True:
+            too_many = (counts > 0) & ~compare((counts - 0.5) / weights, key)
+            too_few = compare((counts + 0.5) / weights, key)
+            if not too_many.any() and not too_few.any():
+                return counts
+            counts += too_few.astype(np.int64) - too_many.astype(np.int64)
+
+
+def _get_blending_key(weights, rank):
+    """Return the blending key of the sample at position rank of the blended dataset."""
+    # positive float64 values are ordered like their int64 bit patterns
+    low = 0
+    high = int(np.float64((rank + 2) / weights.max()).view(np.int64))
+    while low < high:
+        mid = (low + high) // 2
+        if _count_blending_keys(weights, np.int64(mid).view(np.float64), inclusive=True).sum() > rank:
+            high = mid
+        else:
+            low = mid + 1
+    return np.int64(low).view(np.float64)
+
+
+def _build_blending_indices_segment(weights, start, end):
+    """
+    Build dataset_index and dataset_sample_index of the samples [start, end) of the blended dataset without the
+    C++ helpers. Samples of all datasets are merged in the order of their blending keys (k + 0.5) / w, ties are
+    broken by dataset index. Like helpers.build_blending_indices, this keeps the number of samples of each dataset
+    within two samples of its share in every prefix of the blended dataset, but the order of the samples differs.
+    Any segment of the indices is built in O(end - start) without the samples before it.
+    """
+    first_key = _get_blending_key(weights, start)
+    last_key = _get_blending_key(weights, end - 1)
+    first = _count_blending_keys(weights, first_key)
+    last = _count_blending_keys(weights, last_key, inclusive=True)
+
+    num_samples = last - first
+    dataset_index = np.repeat(np.arange(len(weights), dtype=np.uint8), num_samples)
+    dataset_sample_index = np.arange(num_samples.sum(), dtype=np.int64)
+    dataset_sample_index += np.repeat(first - (np.cumsum(num_samples) - num_samples), num_samples)
+    keys = (dataset_sample_index + 0.5) / weights[dataset_index]
+    order = np.lexsort((dataset_index, keys))
+
+    # the samples with the first key can precede start
+    offset = start - first.sum()
+    order = order[offset : offset + end - start]
+    return dataset_index[order], dataset_sample_index[order]
+
+
+def _build_blending_indices(weights, size):
+    """
+    Build dataset_index and dataset_sample_index of a blended dataset of size samples with NumPy.
+    See _build_blending_indices_segment.
+    """
+    dataset_index = np.zeros(size, dtype=np.uint8)
+    dataset_sample_index = np.zeros(size, dtype=np.int64)
+    for start in range(0, size, __blending_segment_size__):
+        end = min(start + __blending_segment_size__, size)
+        dataset_index[start:end], dataset_sample_index[start:end] = _build_blending_indices_segment(
+            weights, start, end
+        )
+    return dataset_index, dataset_sample_index
+
+
+def _import_helpers():
+    """
+    Compile the C++ helpers on local rank 0 and import them on all ranks.
+    Returns None if they cannot be compiled or imported.
+    """
+    is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+    try:
+        if not is_distributed or AppState().local_rank == 0:
+            from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import compile_helper
+
+            compile_helper()
+    except SystemExit:
+        # compile_helper exits when make fails, e.g. without a C++ compiler
+        pass
+    if is_distributed:
+        torch.distributed.barrier()
+
+    try:
+        from nemo.collections.nlp.data.language_modeling.megatron import helpers
+    except ImportError:
+        logging.warning('Could not compile megatron dataset C++ helper functions, using the NumPy implementation.')
+        return None
+    return helpers
+
+
+class BlendableDataset(torch.utils.data.Dataset):
+    def __init__(
+        self,
+        datasets,
+        weights,
+        size,
+        index_mapping_dir: Optional[str] = None,
+        lazy_segment_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            datasets: datasets to blend.
+            weights: sampling weights of the datasets.
+            size: number of samples of the blended dataset.
+            index_mapping_dir: directory to save the blending indices to, keyed by the weights, size and builder
+                (C++ helpers or NumPy, whose sample orders differ).
+                Indices are built once on each node and memory-mapped by all ranks and later jobs.
+                If None, the indices are built on every rank and not saved.
+            lazy_segment_size: if set, the blending indices are built with NumPy in segments of this many samples
+                when they are accessed instead of for all samples at once, for blended datasets too large to index.
+        """
         self.datasets = datasets
         num_datasets = len(datasets)
         assert num_datasets == len(weights)
 
         self.size = size
+        self.lazy_segment_size = lazy_segment_size
 
         # Normalize weights.
         weights = np.array(weights, dtype=np.float64)
         sum_weights = np.sum(weights)
         assert sum_weights > 0.0
         weights /= sum_weights
+        self.weights = weights
+
+        assert num_datasets < 255
+        if lazy_segment_size is not None:
+            self._indices_segments = OrderedDict()
+            return
 
         # Build indecies.
         start_time = time.time()
-        assert num_datasets < 255
-        self.dataset_index = np.zeros(self.size, dtype=np.uint8)
-        self.dataset_sample_index = np.zeros(self.size, dtype=np.int64)
-        app_state = AppState()
-        try:
-            if app_state.local_rank == 0:
-                from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import compile_helper
-
-                compile_helper()
-            torch.distributed.barrier()
-            from nemo.collections.nlp.data.language_modeling.megatron import helpers
-        except ImportError:
-            raise ImportError(
-                f'Could not compile megatron dataset C++ helper functions and therefore cannot import helpers python file.'
-            )
+        helpers = _import_helpers()
+        if index_mapping_dir is not None:
+            weights_hash = hashlib.md5(weights.tobytes()).hexdigest()
+            builder = 'numpy' if helpers is None else 'cpp'
+            indices_prefix = os.path.join(index_mapping_dir, f'blendable_dataset_{weights_hash}_{size}s_{builder}')
+            filenames = [f'{indices_prefix}_dataset_index.npy', f'{indices_prefix}_dataset_sample_index.npy']
+            is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+            if (not is_distributed or AppState().local_rank == 0) and not all(
+                os.path.isfile(filename) for filename in filenames
+            ):
+                # Each node builds the indices once in case index_mapping_dir is not on a shared filesystem.
+                for filename, indices in zip(filenames, self._build_indices(helpers)):
+                    tmp_filename = f'{filename}.tmp{os.getpid()}'
+                    with open(tmp_filename, 'wb') as f:
+                        np.save(f, indices)
+                    os.replace(tmp_filename, filename)
+            if is_distributed:
+                torch.distributed.barrier()
+            self.dataset_index = np.load(filenames[0], mmap_mode='r')
+            self.dataset_sample_index = np.load(filenames[1], mmap_mode='r')
+        else:
+            self.dataset_index, self.dataset_sample_index = self._build_indices(helpers)
+        logging.info(
+            '> elapsed time for building blendable dataset indices: ' '{:.2f} (sec)'.format(time.time() - start_time)
+        )
+
+    def _build_indices(self, helpers):
+        """Build the blending indices with the C++ helpers, or with NumPy if helpers is None."""
+        if helpers is None:
+            return _build_blending_indices(self.weights, self.size)
 
+        dataset_index = np.zeros(self.size, dtype=np.uint8)
+        dataset_sample_index = np.zeros(self.size, dtype=np.int64)
+        is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
         helpers.build_blending_indices(
-            self.dataset_index,
-            self.dataset_sample_index,
-            weights,
-            num_datasets,
+            dataset_index,
+            dataset_sample_index,
+            self.weights,
+            len(self.datasets),
             self.size,
-            torch.distributed.get_rank() == 0,
-        )
-        logging.info(
-            '> elapsed time for building blendable dataset indices: ' '{:.2f} (sec)'.format(time.time() - start_time)
+            not is_distributed or torch.distributed.get_rank() == 0,
         )
+        return dataset_index, dataset_sample_index
+
+    def _get_indices_segment(self, segment_idx):
+        """Return the blending indices of a segment, the most recently used segments are kept."""
+        if segment_idx in self._indices_segments:
+            self._indices_segments.move_to_end(segment_idx)
+            return self._indices_segments[segment_idx]
+
+        start = segment_idx * self.lazy_segment_size
+        end = min(start + self.lazy_segment_size, self.size)
+        segment = _build_blending_indices_segment(self.weights, start, end)
+        self._indices_segments[segment_idx] = segment
+        if len(self._indices_segments) > __max_cached_segments__:
+            self._indices_segments.popitem(last=False)
+        return segment
 
     def __len__(self):
         return self.size
 
     def __getitem__(self, idx):
-        dataset_idx = self.dataset_index[idx]
-        sample_idx = self.dataset_sample_index[idx]
+        if self.lazy_segment_size is not None:
+            if idx < 0:
+                idx += self.size
+            dataset_index, dataset_sample_index = self._get_indices_segment(idx // self.lazy_segment_size)
+            idx %= self.lazy_segment_size
+        else:
+            dataset_index, dataset_sample_index = self.dataset_index, self.dataset_sample_index
+        dataset_idx = dataset_index[idx]
+        sample_idx = dataset_sample_index[idx]
         return self.datasets[dataset_idx][sample_idx]
 
     def create_data_mmap(self):
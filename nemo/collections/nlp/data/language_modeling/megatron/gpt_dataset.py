@@ -41,6 +41,14 @@ except (ImportError, ModuleNotFoundError):
     HAVE_MEGATRON_CORE = False
 
 
+def _get_blendable_dataset_kwargs(cfg, prefixes):
+    """Save blending indices to index_mapping_dir, or next to the first dataset like its index mappings."""
+    return dict(
+        index_mapping_dir=cfg.data.get('index_mapping_dir', None) or os.path.dirname(prefixes[0]),
+        lazy_segment_size=cfg.data.get('blend_lazy_segment_size', None),
+    )
+
+
 def build_dataset(cfg, trainer, data_prefix, data_impl, num_samples, seq_length, seed, skip_warmup, tokenizer, name):
     def _build_dataset(current_data_prefix, current_num_samples):
         delay_data_mmap = cfg.data.get('delay_data_mmap', False)
@@ -77,7 +85,7 @@ def build_dataset(cfg, trainer, data_prefix, data_impl, num_samples, seq_length,
         for i in range(len(prefixes)):
             dataset = _build_dataset(prefixes[i], datasets_num_samples[i])
             datasets.append(dataset)
-        return BlendableDataset(datasets, weights, num_samples)
+        return BlendableDataset(datasets, weights, num_samples, **_get_blendable_dataset_kwargs(cfg, prefixes))
 
 
 def build_train_valid_test_datasets(
@@ -199,15 +207,16 @@ def build_train_valid_test_datasets(
         train_n, valid_n, test_n = map(sum, zip(*datasets_train_valid_test_num_samples))
 
         # Blend.
+        blendable_dataset_kwargs = _get_blendable_dataset_kwargs(cfg, prefixes)
         blending_train_dataset = None
         if train_datasets:
-            blending_train_dataset = BlendableDataset(train_datasets, weights, train_n)
+            blending_train_dataset = BlendableDataset(train_datasets, weights, train_n, **blendable_dataset_kwargs)
         blending_valid_dataset = None
         if valid_datasets:
-            blending_valid_dataset = BlendableDataset(valid_datasets, weights, valid_n)
+            blending_valid_dataset = BlendableDataset(valid_datasets, weights, valid_n, **blendable_dataset_kwargs)
         blending_test_dataset = None
         if test_datasets:
-            blending_test_dataset = BlendableDataset(test_datasets, weights, test_n)
+            blending_test_dataset = BlendableDataset(test_datasets, weights, test_n, **blendable_dataset_kwargs)
 
         return (blending_train_dataset, blending_valid_dataset, blending_test_dataset)
 
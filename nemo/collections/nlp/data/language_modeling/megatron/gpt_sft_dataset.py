@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
+import os
 import re
+import time
 from typing import List, Mapping, Optional
 
 import datasets
@@ -25,12 +29,50 @@ from datasets import load_dataset
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
 from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import get_samples_mapping
+from nemo.collections.nlp.data.language_modeling.megatron.indexed_dataset import (
+    MMapIndexedDataset,
+    data_file_path,
+    index_file_path,
+    make_builder,
+)
 from nemo.collections.nlp.data.language_modeling.text_memmap_dataset import JSONLMemMapDataset
 from nemo.core.classes import Dataset
-from nemo.utils import logging
+from nemo.utils import AppState, logging
 
 __all__ = ['GPTSFTDataset']
 
+# text tokenized to tell tokenizers apart in the key of the tokenized cache
+_TOKENIZER_PROBE_TEXT = (
+    "Hello, World!\n\tThe quick brown fox jumps over the lazy dog. 0123456789 Àéîõü ñ 你好 <extra_id_0>"
+)
+
+
+def _first_fit_decreasing(lengths, capacity):
+    """
+    Assign items to bins of a capacity with the first-fit-decreasing heuristic.
+    Each item, from the longest to the shortest, goes into the first bin with room for it.
+
+    Returns a 1D array with the bin of each item.
+    """
+    num_leaves = 1 << max(len(lengths) - 1, 0).bit_length()
+    # max segment tree over the room left in the bins, unused bins are empty
+    tree = [capacity] * (2 * num_leaves)
+    bin_idx = np.empty(len(lengths), dtype=np.int64)
+    for item in np.argsort(-lengths, kind='stable').tolist():
+        length = int(lengths[item])
+        if length > capacity:
+            raise ValueError(f'Item of length {length} does not fit into bins of capacity {capacity}')
+        node = 1
+        while node < num_leaves:
+            node = 2 * node if tree[2 * node] >= length else 2 * node + 1
+        bin_idx[item] = node - num_leaves
+        tree[node] -= length
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    return bin_idx
+
 
 class GPTSFTDataset(Dataset):
     def __init__(
@@ -57,6 +99,8 @@ class GPTSFTDataset(Dataset):
         hf_dataset: bool = False,
         truncation_method: str = 'right',
         special_tokens: Optional[Mapping[str, str]] = None,  # special tokens, a dictory of {token_type: token}
+        tokenized_cache: bool = False,
+        pack_sequences: bool = False,
     ):
         """
         file_path: Path to a JSONL GPT supervised fine-tuning dataset. Data is formatted as multiple JSON lines with each line formatted as follows. {'input': 'John von Neumann\nVon Neumann made fundamental contributions .... Q: What did the math of artificial viscosity do?', 'output': 'smoothed the shock transition without sacrificing basic physics'}
@@ -79,6 +123,8 @@ class GPTSFTDataset(Dataset):
         hf_dataset: Whether to load the json file with the HuggingFace dataset. otherwise, will load the jsonl file with the JSONLMemMapDataset.
         truncation_method: Truncation from which position. Options: ['left', 'right']
         special_tokens: special tokens for the chat prompts, a dictionary of {token_type: token}. Default: {'system_turn_start': '<extra_id_0>', 'turn_start': '<extra_id_1>', 'label_start': '<extra_id_2>', 'end_of_turn': '\n', "end_of_name": "\n"}
+        tokenized_cache: Whether to tokenize the dataset once and store the token ids of the prompt_template pieces of each example in a binary file next to the index files. The cache is keyed by the tokenizer, the prompt_template and the file size and modification time, and examples are read from it instead of being tokenized on every access.
+        pack_sequences: Whether to pack multiple examples into each row of max_seq_length tokens. Rows are planned once with first-fit-decreasing over the example lengths, and the plan is saved next to the index files. Each row has per-example position ids, loss masks and attention masks, so the model has to use the explicit attention mask (get_attention_mask_from_fusion=False).
         """
         self.tokenizer = tokenizer
         self.file_path = file_path
@@ -126,9 +172,25 @@ class GPTSFTDataset(Dataset):
         # Validate prompt template
         self._maybe_validate_prompt_template()
 
+        # Will be None if `tokenized_cache` is False
+        self.tokenized_dataset = None
+        if tokenized_cache:
+            if type(self)._process_example is not GPTSFTDataset._process_example:
+                logging.warning(f'tokenized_cache is not supported by {type(self).__name__} and will be ignored.')
+            else:
+                self._build_tokenized_cache()
+
         # Will be None after this call if `max_num_samples` is None
         self._build_samples_mapping()
 
+        # Will be None if `pack_sequences` is False
+        self.packing_row_offsets = None
+        if pack_sequences:
+            if type(self).collate_fn is not GPTSFTDataset.collate_fn:
+                logging.warning(f'pack_sequences is not supported by {type(self).__name__} and will be ignored.')
+            else:
+                self._build_packing_plan()
+
     def _maybe_validate_prompt_template(self):
         assert (
             self.prompt_template is not None
@@ -167,7 +229,175 @@ class GPTSFTDataset(Dataset):
         else:
             self.samples_mapping = None
 
+    def _get_cache_prefix(self, name, **cache_key):
+        """
+        Return the prefix of the cache files called name.
+        The prefix is keyed by the tokenizer, the prompt template, the file size and modification time,
+        and the extra cache_key items.
+        """
+        file_stat = os.stat(self.file_path)
+        cache_key.update(
+            {
+                'prompt_template': self.prompt_template,
+                'tokenizer': type(self.tokenizer).__name__,
+                'vocab_size': getattr(self.tokenizer, 'vocab_size', None),
+                'space_sensitive': getattr(self.tokenizer, 'space_sensitive', False),
+                'probe_ids': self.tokenizer.text_to_ids(_TOKENIZER_PROBE_TEXT),
+                'file_size': file_stat.st_size,
+                'file_mtime': file_stat.st_mtime_ns,
+            }
+        )
+        cache_hash = hashlib.md5(json.dumps(cache_key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+        if self.index_mapping_dir is not None:
+            prefix = os.path.join(self.index_mapping_dir, os.path.basename(self.file_path))
+        else:
+            prefix = self.file_path
+        return f'{prefix}_{cache_hash}_{name}'
+
+    def _build_on_rank_zero(self, build_fn, *args):
+        """Call build_fn on global rank 0 while the other ranks wait."""
+        is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+
+        if not is_distributed or torch.distributed.get_rank() == 0:
+            build_fn(*args)
+
+        if is_distributed:
+            torch.distributed.barrier()
+
+        if is_distributed and AppState().local_rank == 0:
+            # Files created on global rank 0 are not available on the other nodes without a shared filesystem.
+            build_fn(*args)
+
+        if is_distributed:
+            torch.distributed.barrier()
+
+    def _build_tokenized_cache(self):
+        """Build the tokenized cache on rank 0 if it does not exist and load it."""
+        prefix = self._get_cache_prefix('tokenized')
+        self._build_on_rank_zero(self._maybe_compile_tokenized_cache, prefix)
+
+        self.tokenized_dataset = MMapIndexedDataset(prefix, skip_warmup=True)
+        self.has_metadata = np.load(f'{prefix}_metadata.npy', mmap_mode='r')
+        # keys of the prompt_template pieces do not depend on the values filled in
+        _, self.template_strings_keys = self._separate_template([''] * len(self.prompt_template_keys))
+        assert len(self.has_metadata) == len(self.indexed_dataset), f'Tokenized cache {prefix} is out of date'
+
+    def _maybe_compile_tokenized_cache(self, prefix):
+        """
+        Tokenize every example into the tokenized cache if it does not exist.
+        Each example is a document of the cache with one item per prompt_template piece.
+        Whether an example has keys other than prompt_template_keys is stored as well,
+        so that JSON lines are only parsed for examples with metadata.
+        """
+        metadata_fn = f'{prefix}_metadata.npy'
+        if MMapIndexedDataset.exists(prefix) and os.path.exists(metadata_fn):
+            return
+
+        logging.info(f'Building tokenized cache {prefix} of {self.file_path}')
+        start_time = time.time()
+        # write to temporary files first so that an interrupted build is never loaded
+        tmp_prefix = f'{prefix}.tmp{os.getpid()}'
+        builder = make_builder(
+            data_file_path(tmp_prefix), impl='mmap', vocab_size=getattr(self.tokenizer, 'vocab_size', None)
+        )
+        has_metadata = np.zeros(len(self.indexed_dataset), dtype=bool)
+        for idx in range(len(self.indexed_dataset)):
+            example = self.indexed_dataset[idx]
+            template_ids, _ = self._tokenize_example(example)
+            for ids in template_ids:
+                builder.add_item(torch.tensor(ids, dtype=torch.int64))
+            builder.end_document()
+            has_metadata[idx] = any(k not in self.prompt_template_keys for k in example)
+        builder.finalize(index_file_path(tmp_prefix))
+        with open(f'{tmp_prefix}_metadata.npy', 'wb') as f:
+            np.save(f, has_metadata)
+
+        os.replace(f'{tmp_prefix}_metadata.npy', metadata_fn)
+        os.replace(data_file_path(tmp_prefix), data_file_path(prefix))
+        os.replace(index_file_path(tmp_prefix), index_file_path(prefix))
+        logging.info(
+            f'Time building tokenized cache of {len(has_metadata)} examples: {time.time() - start_time:.2f} s'
+        )
+
+    def _build_packing_plan(self):
+        """Build the packing plan on rank 0 if it does not exist and load it."""
+        plan_fn = self._get_cache_prefix(
+            'packing_plan',
+            max_seq_length=self.max_seq_length,
+            add_bos=self.add_bos,
+            add_eos=self.add_eos,
+            add_sep=self.add_sep,
+            sep_id=self.sep_id,
+            virtual_tokens=self.virtual_tokens,
+            tokens_to_generate=self.tokens_to_generate,
+            truncation_fields=self.truncation_fields,
+            truncation_method=self.truncation_method,
+            max_num_samples=self.max_num_samples,
+            seed=self.seed,
+        )
+        plan_fn += '.npz'
+        self._build_on_rank_zero(self._maybe_compile_packing_plan, plan_fn)
+
+        plan = np.load(plan_fn)
+        self.packing_example_idx = plan['example_idx']
+        self.packing_row_offsets = plan['row_offsets']
+        num_tokens = int(plan['num_tokens'])
+        num_rows = len(self.packing_row_offsets) - 1
+        logging.info(
+            f'Packed {len(self.packing_example_idx)} examples of {self.file_path} into {num_rows} rows: '
+            f'{len(self.packing_example_idx) / num_rows:.2f} examples per row, '
+            f'packing efficiency {num_tokens / (num_rows * self.max_seq_length):.2%}'
+        )
+
+    def _maybe_compile_packing_plan(self, plan_fn):
+        """
+        Pack all examples into rows of max_seq_length tokens if the packing plan does not exist.
+        The plan stores the example indices of all rows, concatenated, and the offsets of the rows in them.
+        The examples of each epoch of samples_mapping are packed separately, so that a row never repeats an example,
+        and the rows of each epoch are shuffled, since first-fit-decreasing sorts them by their longest example.
+        """
+        if os.path.exists(plan_fn):
+            return
+
+        logging.info(f'Building packing plan {plan_fn} of {self.file_path}')
+        start_time = time.time()
+        if self.samples_mapping is not None:
+            example_idx = self.samples_mapping[:, 0].astype(np.int64)
+        else:
+            example_idx = np.arange(len(self.indexed_dataset), dtype=np.int64)
+        # tokens and labels of an example are its input_ids shifted by one
+        lengths = np.array(
+            [len(self._fetch_example(idx)['input_ids']) - 1 for idx in example_idx.tolist()], dtype=np.int64
+        )
+
+        # the k-th copy of an example in samples_mapping belongs to epoch k
+        order = np.argsort(example_idx, kind='stable')
+        epochs = np.empty(len(example_idx), dtype=np.int64)
+        epochs[order] = np.arange(len(order)) - np.searchsorted(example_idx[order], example_idx[order])
+
+        rng = np.random.RandomState(self.seed)
+        rows = []
+        for epoch in range(epochs.max() + 1 if len(epochs) > 0 else 0):
+            items = np.flatnonzero(epochs == epoch)
+            bin_idx = _first_fit_decreasing(lengths[items], self.max_seq_length)
+            # keep the examples of a row in decreasing length order
+            item_order = np.argsort(-lengths[items], kind='stable')
+            item_order = item_order[np.argsort(bin_idx[item_order], kind='stable')]
+            epoch_rows = np.split(items[item_order], np.cumsum(np.bincount(bin_idx))[:-1])
+            rows.extend(epoch_rows[i] for i in rng.permutation(len(epoch_rows)))
+        row_offsets = np.concatenate([[0], np.cumsum([len(row) for row in rows], dtype=np.int64)])
+        order = np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=np.int64)
+
+        tmp_fn = f'{plan_fn}.tmp{os.getpid()}'
+        with open(tmp_fn, 'wb') as f:
+            np.savez(f, example_idx=example_idx[order], row_offsets=row_offsets, num_tokens=lengths.sum())
+        os.replace(tmp_fn, plan_fn)
+        logging.info(f'Time building packing plan of {len(lengths)} examples: {time.time() - start_time:.2f} s')
+
     def __len__(self):
+        if self.packing_row_offsets is not None:
+            return len(self.packing_row_offsets) - 1
         if self.max_num_samples is None:
             return len(self.indexed_dataset)
         else:
@@ -177,6 +407,9 @@ class GPTSFTDataset(Dataset):
         if isinstance(idx, np.int64):
             idx = idx.item()
 
+        if self.packing_row_offsets is not None:
+            return self._get_packed_row(idx)
+
         if self.samples_mapping is not None:
             assert idx < len(self.samples_mapping)
             idx, _, _ = self.samples_mapping[idx]
@@ -190,6 +423,14 @@ class GPTSFTDataset(Dataset):
             auto_gen_idx = True
         else:
             auto_gen_idx = False
+
+        return self._fetch_example(idx, auto_gen_idx)
+
+    def _fetch_example(self, idx, auto_gen_idx=False):
+        """Load the example at idx of indexed_dataset and process it."""
+        if self.tokenized_dataset is not None:
+            return self._process_cached_example(idx, auto_gen_idx)
+
         try:
             example = self.indexed_dataset[idx]
             if auto_gen_idx:
@@ -199,6 +440,37 @@ class GPTSFTDataset(Dataset):
             raise e
         return self._process_example(example)
 
+    def _get_packed_row(self, idx):
+        """
+        Concatenate the examples of a row of the packing plan.
+        Position ids restart at 0 for each example and the loss mask of each example is kept.
+        """
+        # idx may < 0 because we pad_samples_to_global_batch_size, e.g. id = -1
+        auto_gen_idx = idx < 0
+        # rows are revisited when more samples are requested than there are rows, e.g. by BlendableDataset
+        idx = idx % len(self)
+        start, end = self.packing_row_offsets[idx], self.packing_row_offsets[idx + 1]
+        examples = [self._fetch_example(i, auto_gen_idx) for i in self.packing_example_idx[start:end].tolist()]
+
+        input_ids, labels, loss_mask, position_ids, seq_boundaries = [], [], [], [], [0]
+        for example in examples:
+            input_ids.extend(example['input_ids'][:-1])
+            labels.extend(example['input_ids'][1:])
+            loss_mask.extend(self._build_loss_mask(example)[1:])
+            position_ids.extend(range(len(example['input_ids']) - 1))
+            seq_boundaries.append(len(input_ids))
+
+        packed_row = {
+            'input_ids': input_ids,
+            'labels': labels,
+            'loss_mask': loss_mask,
+            'position_ids': position_ids,
+            'seq_boundaries': seq_boundaries,
+            'metadata': [example['metadata'] for example in examples],
+        }
+
+        return packed_row
+
     def _separate_template(self, prompt_template_values: List[str]):
         """
         Combine contexts and label based on prompt_template into a list of strings and a list of keys.
@@ -311,16 +583,59 @@ class GPTSFTDataset(Dataset):
         label_ids = template_ids[-1]
         return context_ids, label_ids
 
+    def _tokenize_example(self, example):
+        """
+        Tokenize the prompt_template pieces of an example.
+
+        Returns:
+            template_ids (List[List[int]]): the list of separate prompt_template ids.
+            template_strings_keys (List[str]): strings point to placeholder keys or <template>
+        """
+        prompt_template_values = [example[c].strip(' ') for c in self.prompt_template_keys]
+
+        template_strings, template_strings_keys = self._separate_template(prompt_template_values)
+        template_ids = [self.tokenizer.text_to_ids(s) for s in template_strings]
+        return template_ids, template_strings_keys
+
     def _process_example(self, example):
         """
         Create an example by concatenating text and answer.
         Truncation is carried out when needed, but it is performed only on the prompt side.
         BOS, EOS, and SEP, are added if specified.
         """
-        prompt_template_values = [example[c].strip(' ') for c in self.prompt_template_keys]
+        template_ids, template_strings_keys = self._tokenize_example(example)
 
-        template_strings, template_strings_keys = self._separate_template(prompt_template_values)
-        template_ids = [self.tokenizer.text_to_ids(s) for s in template_strings]
+        # store metadata in dataset, in case user may have keys required in the prediction json files
+        metadata = {k: v for k, v in example.items() if k not in self.prompt_template_keys}
+
+        return self._process_template_ids(template_ids, template_strings_keys, metadata)
+
+    def _process_cached_example(self, idx, auto_gen_idx):
+        """
+        Create an example from the token ids in the tokenized cache.
+        The JSON line is only loaded for the metadata of examples that have it.
+        """
+        try:
+            doc_idx = self.tokenized_dataset.doc_idx
+            template_ids = [ids.tolist() for ids in self.tokenized_dataset[doc_idx[idx] : doc_idx[idx + 1]]]
+
+            if self.has_metadata[idx]:
+                example = self.indexed_dataset[idx]
+                metadata = {k: v for k, v in example.items() if k not in self.prompt_template_keys}
+            else:
+                metadata = {}
+        except Exception as e:
+            logging.error(f"Error while loading example {idx} from dataset {self.file_path}")
+            raise e
+        if auto_gen_idx:
+            metadata['__AUTOGENERATED__'] = True
+
+        return self._process_template_ids(template_ids, self.template_strings_keys, metadata)
+
+    def _process_template_ids(self, template_ids, template_strings_keys, metadata):
+        """
+        Truncate the tokenized prompt_template pieces and add the BOS, EOS and SEP tokens.
+        """
         context_ids, answer_ids = self._multiple_truncation(template_ids, template_strings_keys)
 
         if self.virtual_tokens:
@@ -354,9 +669,6 @@ class GPTSFTDataset(Dataset):
             input_ids = input_ids[: self.max_seq_length]
             answer_ids = input_ids[answer_start_idx:]
 
-        # store metadata in dataset, in case user may have keys required in the prediction json files
-        metadata = {k: v for k, v in example.items() if k not in self.prompt_template_keys}
-
         processed_example = {
             'input_ids': input_ids,
             'answer_start_idx': answer_start_idx,
@@ -406,7 +718,53 @@ class GPTSFTDataset(Dataset):
         attention_mask = attention_mask < 0.5
         return attention_mask
 
+    @torch.no_grad()
+    def _create_packed_attention_mask(self, seq_boundaries, max_length):
+        """Create a causal `attention_mask` of shape [1, max_length, max_length] within each packed example."""
+        # padding after the last example is a segment of its own
+        segment_ids = torch.bucketize(torch.arange(max_length), torch.LongTensor(seq_boundaries[1:]), right=True)
+        attention_mask = torch.tril(torch.ones((max_length, max_length), dtype=torch.bool))
+        attention_mask &= segment_ids.unsqueeze(0) == segment_ids.unsqueeze(1)
+        return ~attention_mask.unsqueeze(0)
+
+    def _collate_packed_fn(self, batch):
+        input_ids = [item['input_ids'] for item in batch]
+        labels = [item['labels'] for item in batch]
+        loss_mask = [item['loss_mask'] for item in batch]
+        position_ids = [item['position_ids'] for item in batch]
+        seq_boundaries = [item['seq_boundaries'] for item in batch]
+        metadata = [item['metadata'] for item in batch]
+
+        if self.pad_to_max_length:
+            max_length = self.max_seq_length
+        else:
+            max_length = min(self.max_seq_length, self._ceil_to_nearest(max([len(x) for x in input_ids]), 16))
+        assert max_length <= self.max_seq_length
+
+        attention_mask = [self._create_packed_attention_mask(x, max_length) for x in seq_boundaries]
+        attention_mask = torch.stack(attention_mask)
+        input_ids = torch.LongTensor(
+            self._collate_item(input_ids, max_length=max_length, pad_id=self.tokenizer.eos_id)
+        )
+        labels = torch.LongTensor(self._collate_item(labels, max_length=max_length, pad_id=self.tokenizer.eos_id))
+        loss_mask = torch.LongTensor(self._collate_item(loss_mask, max_length=max_length, pad_id=0))
+        position_ids = torch.LongTensor(self._collate_item(position_ids, max_length=max_length, pad_id=0))
+
+        processed_batch = {
+            'tokens': input_ids,
+            'labels': labels,
+            'attention_mask': attention_mask,
+            'loss_mask': loss_mask,
+            'position_ids': position_ids,
+            'metadata': metadata,
+        }
+
+        return processed_batch
+
     def collate_fn(self, batch):
+        if self.packing_row_offsets is not None:
+            return self._collate_packed_fn(batch)
+
         input_ids = [item['input_ids'][:-1] for item in batch]
         labels = [item['input_ids'][1:] for item in batch]
         contexts = [item['context_ids'] for item in batch]
@@ -30,35 +30,77 @@ from nemo.utils import AppState, logging
 __all__ = ["TextMemMapDataset", "CSVMemMapDataset", "build_index_files"]
 __idx_version__ = "0.2"  # index file version
 __idx_suffix__ = "idx"  # index file suffix
+__idx_chunk_size__ = 2 ** 28  # bytes of a file searched for newlines by a worker at once
+__idx_block_size__ = 2 ** 24  # bytes compared with newline_int at once
 
 
-def _build_index_from_memdata(fn, newline_int):
+def _find_newlines(fn, newline_int, start, end):
     """
-    Build index of delimiter positions between samples in memmap.
-    Can be provided externally.
+    Find the positions of newline_int in the byte range [start, end) of a file.
 
-    Returns a 1D array of ints.
+    Returns a 1D array of int64.
     """
-    # use memmap to read file
     mdata = np.memmap(fn, dtype=np.uint8, mode="r")
-    # find newline positions
-    midx = np.where(mdata == newline_int)[0]
-    midx_dtype = midx.dtype
-    # make sure to account for all data
-    midx = midx.tolist()
-    # add last item in case there is no new-line at the end of the file
-    if (len(midx) == 0) or (midx[-1] + 1 != len(mdata)):
-        midx = midx + [len(mdata) + 1]
-
-    # remove empty lines from end of file
-    while len(midx) > 1 and (midx[-1] - midx[-2]) < 2:
-        midx.pop(-1)
-    midx = np.asarray(midx, dtype=midx_dtype)
+    midx = [
+        np.flatnonzero(mdata[i : min(i + __idx_block_size__, end)] == newline_int) + i
+        for i in range(start, end, __idx_block_size__)
+    ]
 
     # free memmap
     mdata._mmap.close()
     del mdata
 
+    return np.concatenate(midx) if midx else np.empty(0, dtype=np.int64)
+
+
+def _find_newlines_star(args):
+    """Helper function to unpack the arguments of _find_newlines in multiprocessing.Pool.imap"""
+    return _find_newlines(*args)
+
+
+def _count_trailing_newlines(fn, newline_int, file_size=None):
+    """
+    Count the newlines at the end of a file, which are the empty lines at the end of it and the last newline.
+    If file_size is given, only the first file_size bytes of the file are considered.
+    """
+    mdata = np.memmap(fn, dtype=np.uint8, mode="r")
+    if file_size is not None:
+        mdata = mdata[:file_size]
+    end = len(mdata)
+    while end > 0:
+        start = max(0, end - __idx_block_size__)
+        others = np.flatnonzero(mdata[start:end] != newline_int)
+        if len(others):
+            end = start + others[-1] + 1
+            break
+        end = start
+    num_trailing_newlines = len(mdata) - end
+
+    # free memmap
+    mdata._mmap.close()
+    del mdata
+
+    return num_trailing_newlines
+
+
+def _build_index_from_memdata(fn, newline_int):
+    """
+    Build index of delimiter positions between samples in memmap.
+    Can be provided externally.
+
+    Returns a 1D array of ints.
+    """
+    file_size = os.path.getsize(fn)
+    # find newline positions
+    midx = _find_newlines(fn, newline_int, 0, file_size)
+    num_trailing_newlines = _count_trailing_newlines(fn, newline_int)
+    if num_trailing_newlines == 0:
+        # add last item in case there is no new-line at the end of the file
+        midx = np.append(midx, file_size + 1)
+    else:
+        # remove empty lines from end of file
+        midx = midx[: len(midx) - num_trailing_newlines + 1]
+
     return midx
 
 
@@ -512,10 +554,134 @@ def _build_memmap_index_files(newline_int, build_index_fn, fn, index_mapping_dir
         return True
 
 
+def _get_index_resume_position(fn, idx_fn, newline_int, file_size):
+    """
+    Helper function to find where to resume building the index file of a text file of file_size bytes.
+
+    Returns a tuple (number of index entries to keep, byte position to resume the search for newlines from),
+    or None if the index file is up to date.
+    """
+    if not _index_file_exists(idx_fn):
+        return 0, 0
+
+    idx_info_dict = pickle.load(open(idx_fn + ".info", "rb"))
+    if (
+        idx_info_dict.get("version") != __idx_version__
+        or idx_info_dict.get("newline_int") != newline_int
+        or "file_size" not in idx_info_dict
+    ):
+        # leave it to load_file to report the mismatch
+        return None
+
+    indexed_size = idx_info_dict["file_size"]
+    if file_size == indexed_size:
+        return None
+    if file_size < indexed_size:
+        logging.warning(f"{fn} is smaller than when it was indexed, rebuilding the index")
+        return 0, 0
+
+    # The file grew, keep the newlines found before its previous end.
+    # The newlines ending the file were removed from the index except the first one, search them again after it.
+    midx = np.load(idx_fn + ".npy", mmap_mode="r")
+    num_entries = int(np.searchsorted(midx, indexed_size))
+    resume_position = int(midx[num_entries - 1]) + 1 if num_entries > 0 else 0
+    return num_entries, resume_position
+
+
+def _write_index_header(fp, num_entries):
+    """Write the header of a .npy index file of num_entries int64, which has the same size for any num_entries"""
+    fp.seek(0)
+    np.lib.format.write_array_header_1_0(
+        fp,
+        {"descr": np.lib.format.dtype_to_descr(np.dtype(np.int64)), "fortran_order": False, "shape": (num_entries,)},
+    )
+
+
+def _build_chunked_index_files(dataset_paths, newline_int, workers, index_mapping_dir, chunk_size):
+    """
+    Helper function to build the index files of multiple text files, or extend them if the files grew.
+
+    Every file is split into byte ranges of chunk_size which are searched for newlines in parallel,
+    and the newline positions are appended to the index file in order as they are found.
+    """
+    jobs = []
+    for fn in dict.fromkeys(dataset_paths):
+        idx_fn = _index_fn(fn, index_mapping_dir)
+        # the size is read once, so that the tasks and the index match even if the file grows while it is indexed
+        file_size = os.path.getsize(fn)
+        resume = _get_index_resume_position(fn, idx_fn, newline_int, file_size)
+        if resume is not None:
+            jobs.append((fn, idx_fn, file_size) + resume)
+
+    tasks = [
+        (fn, newline_int, start, min(start + chunk_size, file_size))
+        for fn, _, file_size, _, resume_position in jobs
+        for start in range(resume_position, file_size, chunk_size)
+    ]
+
+    build_status = {fn: False for fn in dataset_paths}
+    ctx = mp.get_context("fork")
+    with ctx.Pool(workers) as p:
+        midx_chunks = p.imap(_find_newlines_star, tasks)
+        for fn, idx_fn, file_size, num_entries, resume_position in jobs:
+            logging.info(f"Building indexing for fn = {fn} from byte {resume_position}")
+            if num_entries > 0:
+                # the index is invalid until it is extended
+                os.remove(idx_fn + ".info")
+                fp = open(idx_fn + ".npy", "r+b")
+                np.lib.format.read_magic(fp)
+                np.lib.format.read_array_header_1_0(fp)
+            else:
+                fp = open(idx_fn + ".npy", "wb")
+                _write_index_header(fp, 0)
+            header_size = fp.tell()
+            fp.seek(header_size + num_entries * np.dtype(np.int64).itemsize)
+            fp.truncate()
+
+            for _ in range(resume_position, file_size, chunk_size):
+                midx = next(midx_chunks)
+                fp.write(midx.astype(np.int64).tobytes())
+                num_entries += len(midx)
+
+            num_trailing_newlines = _count_trailing_newlines(fn, newline_int, file_size)
+            if num_trailing_newlines == 0:
+                # add last item in case there is no new-line at the end of the file
+                fp.write(np.array([file_size + 1], dtype=np.int64).tobytes())
+                num_entries += 1
+            else:
+                # remove empty lines from end of file
+                num_entries -= num_trailing_newlines - 1
+                fp.seek(header_size + num_entries * np.dtype(np.int64).itemsize)
+                fp.truncate()
+
+            _write_index_header(fp, num_entries)
+            if fp.tell() != header_size:
+                raise RuntimeError(f"Unexpected size of the header of index file {idx_fn}.npy")
+            fp.close()
+
+            # create e metadata file
+            data = dict(newline_int=newline_int, version=__idx_version__, file_size=file_size)
+            logging.info(f"Saving metadata file = {idx_fn}.info")
+            pickle.dump(data, open(idx_fn + ".info", "wb"))
+            build_status[fn] = True
+
+    return [build_status[fn] for fn in dataset_paths]
+
+
 def build_index_files(
-    dataset_paths, newline_int, workers=None, build_index_fn=_build_index_from_memdata, index_mapping_dir: str = None,
+    dataset_paths,
+    newline_int,
+    workers=None,
+    build_index_fn=_build_index_from_memdata,
+    index_mapping_dir: str = None,
+    chunk_size: int = __idx_chunk_size__,
 ):
-    """Auxiliary method to build multiple index files"""
+    """
+    Auxiliary method to build multiple index files.
+
+    With the default build_index_fn, every file is indexed in byte ranges of chunk_size in parallel,
+    and the index files of files which grew since they were indexed are extended.
+    """
     if len(dataset_paths) < 1:
         raise ValueError("files_list must contain at leat one file name")
 
@@ -525,12 +691,15 @@ def build_index_files(
     logging.info(f"Processing {len(dataset_paths)} data files using {workers} workers")
     # load all files into memmap
     start_time = time.time()
-    ctx = mp.get_context("fork")
-    with ctx.Pool(workers) as p:
-        build_status = p.map(
-            partial(_build_memmap_index_files, newline_int, build_index_fn, index_mapping_dir=index_mapping_dir,),
-            dataset_paths,
-        )
+    if build_index_fn is _build_index_from_memdata:
+        build_status = _build_chunked_index_files(dataset_paths, newline_int, workers, index_mapping_dir, chunk_size)
+    else:
+        ctx = mp.get_context("fork")
+        with ctx.Pool(workers) as p:
+            build_status = p.map(
+                partial(_build_memmap_index_files, newline_int, build_index_fn, index_mapping_dir=index_mapping_dir,),
+                dataset_paths,
+            )
 
     logging.info(
         f"Time building {sum(build_status)} / {len(build_status)} mem-mapped files: {datetime.timedelta(seconds=time.time() - start_time)}"
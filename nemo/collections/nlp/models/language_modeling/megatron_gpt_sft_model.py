@@ -260,6 +260,12 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
             )
             data_cfg.max_seq_length = self.cfg.max_position_embeddings
 
+        if is_train and data_cfg.get('pack_sequences', False) and self.get_attention_mask_from_fusion:
+            raise ValueError(
+                'pack_sequences requires get_attention_mask_from_fusion=False, otherwise the attention mask of the '
+                'packed examples is ignored and they attend to each other.'
+            )
+
         for file_path, num_samples in zip(data_cfg.file_names, num_train_samples_per_dataset):
             if self.cfg.data.get("chat", False):
                 dataset_cls = GPTSFTChatDataset
@@ -298,6 +304,10 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
                 special_tokens=self.cfg.data.get(
                     'chat_prompt_tokens', None
                 ),  # special tokens for the chat prompts, a dictionary of {token_type: token}. Default: {'system_turn_start': '<extra_id_0>', 'turn_start': '<extra_id_1>', 'label_start': '<extra_id_2>', 'end_of_turn': '\n', "end_of_name": "\n"}
+                tokenized_cache=data_cfg.get(
+                    'tokenized_cache', False
+                ),  # Whether to read the token ids of the examples from a binary cache built once.
+                pack_sequences=is_train and data_cfg.get('pack_sequences', False),
             )
             datasets.append(dataset)
         if is_train:
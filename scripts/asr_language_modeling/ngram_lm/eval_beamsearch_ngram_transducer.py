@@ -40,6 +40,7 @@ python eval_beamsearch_ngram_transducer.py nemo_model_file=<path to the .nemo fi
            maes_expansion_gamma=[<list of the maes expansion gammas, separated with commas>] \
            hat_subtract_ilm=<in case of HAT model: subtract internal LM or not> \
            hat_ilm_weight=[<in case of HAT model: list of the HAT internal LM weights, separated with commas>] \
+           benchmark_rtf=<optional: also decode without the N-gram model, and log the RTF of both decodings> \
            ...
 
 
@@ -61,6 +62,7 @@ import json
 import os
 import pickle
 import tempfile
+import time
 from dataclasses import dataclass, field, is_dataclass
 from pathlib import Path
 from typing import List, Optional
@@ -115,6 +117,10 @@ class EvalBeamSearchNGramConfig:
     hat_subtract_ilm: bool = False
     hat_ilm_weight: List[float] = field(default_factory=lambda: [0.0])
 
+    # Also decode without the N-gram model, and log the real time factor (RTF) of the decoding with and without fusion.
+    # The RTF is computed from the 'duration' field of the manifest.
+    benchmark_rtf: bool = False
+
     decoding: rnnt_beam_decoding.BeamRNNTInferConfig = field(default_factory=lambda: rnnt_beam_decoding.BeamRNNTInferConfig(beam_size=128))
 
 
@@ -129,6 +135,7 @@ def decoding_step(
     preds_output_file: str = None,
     beam_batch_size: int = 128,
     progress_bar: bool = True,
+    audio_duration: Optional[float] = None,
 ):
     level = logging.getEffectiveLevel()
     logging.setLevel(logging.CRITICAL)
@@ -165,6 +172,7 @@ def decoding_step(
         it = tqdm(range(int(np.ceil(len(all_probs) / beam_batch_size))), desc=description, ncols=120)
     else:
         it = range(int(np.ceil(len(all_probs) / beam_batch_size)))
+    decoding_time = 0.0
     for batch_idx in it:
         # disabling type checking
         probs_batch = all_probs[batch_idx * beam_batch_size : (batch_idx + 1) * beam_batch_size]
@@ -176,9 +184,11 @@ def decoding_step(
                 packed_batch[prob_index, :, : probs_lens[prob_index]] = torch.tensor(
                     probs_batch[prob_index].unsqueeze(0), device=packed_batch.device, dtype=packed_batch.dtype
                 )
+            start_time = time.perf_counter()
             best_hyp_batch, beams_batch = model.decoding.rnnt_decoder_predictions_tensor(
                 packed_batch, probs_lens, return_hypotheses=True,
             )
+            decoding_time += time.perf_counter() - start_time
         if cfg.decoding_strategy == "greedy_batch":
             beams_batch = [[x] for x in best_hyp_batch]
 
@@ -211,6 +221,12 @@ def decoding_step(
             cer_dist_best += cer_dist_min
         sample_idx += len(probs_batch)
 
+    if audio_duration:
+        logging.info(
+            f"Decoding time of {cfg.decoding_strategy} decoding = {decoding_time:.2f}s, "
+            f"RTF = {decoding_time / audio_duration:.4f}"
+        )
+
     if cfg.decoding_strategy == "greedy_batch":
         return wer_dist_first / words_count, cer_dist_first / chars_count
 
@@ -275,14 +291,23 @@ def main(cfg: EvalBeamSearchNGramConfig):
     manifest_dir = Path(cfg.input_manifest).parent
     with open(cfg.input_manifest, 'r', encoding='utf_8') as manifest_file:
         audio_file_paths = []
+        durations = []
         for line in tqdm(manifest_file, desc=f"Reading Manifest {cfg.input_manifest} ...", ncols=120):
             data = json.loads(line)
             audio_file = Path(data['audio_filepath'])
             if not audio_file.is_file() and not audio_file.is_absolute():
                 audio_file = manifest_dir / audio_file
             target_transcripts.append(data['text'])
+            durations.append(data.get('duration'))
             audio_file_paths.append(str(audio_file.absolute()))
 
+    if None in durations:
+        if cfg.benchmark_rtf:
+            logging.warning("The RTF can not be computed, some entries of the manifest have no 'duration' field.")
+        audio_duration = None
+    else:
+        audio_duration = sum(durations)
+
     if cfg.probs_cache_file and os.path.exists(cfg.probs_cache_file):
         logging.info(f"Found a pickle file of probabilities at '{cfg.probs_cache_file}'.")
         logging.info(f"Loading the cached pickle file of probabilities from '{cfg.probs_cache_file}' ...")
@@ -355,6 +380,7 @@ def main(cfg: EvalBeamSearchNGramConfig):
             target_transcripts=target_transcripts,
             beam_batch_size=cfg.beam_batch_size,
             progress_bar=True,
+            audio_duration=audio_duration,
         )
         logging.info(f"Greedy batch WER/CER = {candidate_wer:.2%}/{candidate_cer:.2%}")
 
@@ -414,8 +440,25 @@ def main(cfg: EvalBeamSearchNGramConfig):
                 preds_output_file=preds_output_file,
                 beam_batch_size=cfg.beam_batch_size,
                 progress_bar=True,
+                audio_duration=audio_duration,
             )
 
+            if cfg.benchmark_rtf and cfg.kenlm_model_file:
+                # Decode again without shallow fusion, to compare the RTF
+                kenlm_model_file, hat_subtract_ilm = cfg.kenlm_model_file, cfg.hat_subtract_ilm
+                cfg.kenlm_model_file, cfg.hat_subtract_ilm = None, False
+                logging.info(f"Decoding without the N-gram model for RTF comparison...")
+                decoding_step(
+                    asr_model,
+                    cfg,
+                    all_probs=all_probs,
+                    target_transcripts=target_transcripts,
+                    beam_batch_size=cfg.beam_batch_size,
+                    progress_bar=True,
+                    audio_duration=audio_duration,
+                )
+                cfg.kenlm_model_file, cfg.hat_subtract_ilm = kenlm_model_file, hat_subtract_ilm
+
             if candidate_cer < best_cer:
                 best_cer_beam_size = hp["beam_width"]
                 best_cer_alpha = hp["beam_alpha"]
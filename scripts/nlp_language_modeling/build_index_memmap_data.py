@@ -35,6 +35,12 @@ def main():
         default=None,
         help='Number of workers to parse files in parallel (default: max(cpu num // 2, 1)',
     )
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=2 ** 28,
+        help='Size in bytes of the file ranges scanned by each worker (default: 256 MiB)',
+    )
     args = parser.parse_args()
 
     # expand all dataset_paths
@@ -44,7 +50,7 @@ def main():
 
     # build index files in parallel
     build_index_files(
-        dataset_paths=dataset_paths, newline_int=args.newline_int, workers=args.workers,
+        dataset_paths=dataset_paths, newline_int=args.newline_int, workers=args.workers, chunk_size=args.chunk_size,
     )
 
 
@@ -0,0 +1,182 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+# This script measures the latency and the accuracy of offline speaker clustering on synthetic speaker embeddings.
+
+# 1) Long sessions of increasing numbers of segments are clustered with the dense affinity matrix and with the sparse
+#    k-nearest-neighbor affinity graph (`sparse_affinity=True`).
+# 2) Many short sessions are clustered one by one with `forward_infer` and as one batched job with
+#    `forward_batch_infer`.
+
+# Synthetic embeddings are drawn around a random center for each speaker, and speaker turns have random lengths.
+# Accuracy is the ratio of segments with the correct speaker label after the best permutation of the labels.
+# On GPU, the peak allocated memory is reported as well.
+
+# Usage:
+python benchmark_clustering.py \
+    --num_segments 1000 2000 4000 8000 16000 \
+    --max_dense_segments=8000 \
+    --num_sessions=200 \
+    --cuda
+"""
+import argparse
+import time
+
+import torch
+from scipy.optimize import linear_sum_assignment
+
+from nemo.collections.asr.parts.utils.offline_clustering import SpeakerClustering
+from nemo.utils import logging
+
+parser = argparse.ArgumentParser(description="Benchmark offline speaker clustering on synthetic embeddings")
+parser.add_argument("--num_segments", type=int, nargs="+", default=[1000, 2000, 4000, 8000, 16000])
+parser.add_argument("--max_dense_segments", type=int, default=8000, help="Largest session clustered densely.")
+parser.add_argument("--num_speakers", type=int, default=4, help="Number of speakers in each session.")
+parser.add_argument("--emb_dim", type=int, default=192, help="Dimension of the speaker embeddings.")
+parser.add_argument("--sigma", type=float, default=1.0, help="Standard deviation of the embedding noise.")
+parser.add_argument("--num_sessions", type=int, default=200, help="Number of short sessions.")
+parser.add_argument("--short_segments", type=int, nargs=2, default=[20, 200], help="Range of short session sizes.")
+parser.add_argument("--session_batch_size", type=int, default=50, help="Number of short sessions in each batch.")
+parser.add_argument("--sparse_search_volume", type=int, default=30)
+parser.add_argument("--cuda", action="store_true", help="Cluster on GPU.")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+def generate_session(num_segments, num_speakers, generator):
+    """Generate single-scale embeddings, timestamps and labels of a synthetic session."""
+    centers = torch.randn(num_speakers, args.emb_dim, generator=generator)
+    labels = torch.zeros(num_segments, dtype=torch.long)
+    start = 0
+    while start < num_segments:
+        turn_length = int(torch.randint(5, 50, (1,), generator=generator))
+        labels[start : start + turn_length] = torch.randint(num_speakers, (1,), generator=generator)
+        start += turn_length
+    embs = centers[labels] + args.sigma * torch.randn(num_segments, args.emb_dim, generator=generator)
+    timestamps = torch.stack([torch.arange(num_segments) * 0.5, torch.arange(num_segments) * 0.5 + 1.0], dim=1)
+    return {
+        'embeddings': embs,
+        'timestamps': timestamps,
+        'multiscale_segment_counts': torch.tensor([num_segments]),
+        'multiscale_weights': torch.ones(1, 1),
+        'labels': labels,
+    }
+
+
+def get_accuracy(labels, pred_labels):
+    """Ratio of correctly labeled segments after the best one-to-one mapping of the predicted labels."""
+    pred_labels = pred_labels.cpu()
+    confusion = torch.zeros(int(labels.max()) + 1, int(pred_labels.max()) + 1)
+    confusion.index_put_((labels, pred_labels), torch.ones(labels.shape[0]), accumulate=True)
+    row_index, col_index = linear_sum_assignment(confusion.numpy(), maximize=True)
+    return confusion[row_index, col_index].sum().item() / labels.shape[0]
+
+
+def reset_peak_memory():
+    if args.cuda:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+
+
+def get_peak_memory():
+    if args.cuda:
+        torch.cuda.synchronize()
+        return f"{torch.cuda.max_memory_allocated() / 2 ** 20:.1f} MB"
+    return "n/a"
+
+
+def benchmark_long_sessions(generator):
+    logging.info("Long sessions: dense affinity matrix vs. sparse affinity graph")
+    for num_segments in args.num_segments:
+        session = generate_session(num_segments, args.num_speakers, generator)
+        for sparse_affinity in [False, True]:
+            if not sparse_affinity and num_segments > args.max_dense_segments:
+                continue
+            speaker_clustering = SpeakerClustering(cuda=args.cuda, sparse_affinity=sparse_affinity)
+            reset_peak_memory()
+            start = time.perf_counter()
+            pred_labels = speaker_clustering.forward_infer(
+                embeddings_in_scales=session['embeddings'],
+                timestamps_in_scales=session['timestamps'],
+                multiscale_segment_counts=session['multiscale_segment_counts'],
+                multiscale_weights=session['multiscale_weights'],
+                sparse_search_volume=args.sparse_search_volume,
+            )
+            latency = time.perf_counter() - start
+            logging.info(
+                f"segments={num_segments:6d} affinity={'sparse' if sparse_affinity else 'dense':6s} "
+                f"latency={latency:8.2f} s accuracy={get_accuracy(session['labels'], pred_labels):.4f} "
+                f"peak memory={get_peak_memory()}"
+            )
+
+
+def benchmark_short_sessions(generator):
+    logging.info("Short sessions: one by one vs. batched")
+    sessions = []
+    for _ in range(args.num_sessions):
+        num_segments = int(
+            torch.randint(args.short_segments[0], args.short_segments[1] + 1, (1,), generator=generator)
+        )
+        num_speakers = int(torch.randint(1, args.num_speakers + 1, (1,), generator=generator))
+        sessions.append(generate_session(num_segments, num_speakers, generator))
+    sessions.sort(key=lambda session: session['labels'].shape[0])
+    speaker_clustering = SpeakerClustering(cuda=args.cuda)
+
+    reset_peak_memory()
+    start = time.perf_counter()
+    pred_labels_list = []
+    for session in sessions:
+        pred_labels_list.append(
+            speaker_clustering.forward_infer(
+                embeddings_in_scales=session['embeddings'],
+                timestamps_in_scales=session['timestamps'],
+                multiscale_segment_counts=session['multiscale_segment_counts'],
+                multiscale_weights=session['multiscale_weights'],
+                sparse_search_volume=args.sparse_search_volume,
+            )
+        )
+    latency = time.perf_counter() - start
+    accuracy = sum(get_accuracy(s['labels'], p) for s, p in zip(sessions, pred_labels_list)) / len(sessions)
+    logging.info(
+        f"sessions={len(sessions)} mode=single  latency={latency:8.2f} s accuracy={accuracy:.4f} "
+        f"peak memory={get_peak_memory()}"
+    )
+
+    reset_peak_memory()
+    start = time.perf_counter()
+    pred_labels_list = []
+    for batch_start in range(0, len(sessions), args.session_batch_size):
+        batch = sessions[batch_start : batch_start + args.session_batch_size]
+        pred_labels_list.extend(
+            speaker_clustering.forward_batch_infer(
+                embeddings_in_scales_list=[session['embeddings'] for session in batch],
+                timestamps_in_scales_list=[session['timestamps'] for session in batch],
+                multiscale_segment_counts_list=[session['multiscale_segment_counts'] for session in batch],
+                multiscale_weights_list=[session['multiscale_weights'] for session in batch],
+                oracle_num_speakers_list=[-1] * len(batch),
+                sparse_search_volume=args.sparse_search_volume,
+            )
+        )
+    latency = time.perf_counter() - start
+    accuracy = sum(get_accuracy(s['labels'], p) for s, p in zip(sessions, pred_labels_list)) / len(sessions)
+    logging.info(
+        f"sessions={len(sessions)} mode=batched latency={latency:8.2f} s accuracy={accuracy:.4f} "
+        f"peak memory={get_peak_memory()}"
+    )
+
+
+if __name__ == '__main__':
+    generator = torch.Generator().manual_seed(args.seed)
+    benchmark_long_sessions(generator)
+    benchmark_short_sessions(generator)
@@ -0,0 +1,118 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+# This script measures the latency and the peak memory of loading resampled audio with `AudioSegment.from_file`,
+# for each resampler backend, without and with the resampled audio cache.
+
+# The audio files are taken from a manifest if one is provided, otherwise white noise files are generated at each of
+# the original sample rates. Peak memory is the peak of the memory allocated by Python and numpy (`tracemalloc`).
+
+# Usage:
+1) With the audio files of a manifest
+
+python benchmark_resampling.py \
+    --manifest=<path to manifest> \
+    --target_sr=16000 \
+    --resamplers librosa soxr polyphase
+
+2) With generated audio files
+
+python benchmark_resampling.py \
+    --orig_sr 8000 22050 44100 48000 \
+    --duration=10
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
+from nemo.utils import logging
+
+parser = argparse.ArgumentParser(description="Benchmark resampling of audio loaded with AudioSegment")
+parser.add_argument("--manifest", type=str, default=None, help="Manifest with the audio files to load.")
+parser.add_argument("--max_files", type=int, default=100, help="Maximum number of audio files of the manifest.")
+parser.add_argument(
+    "--orig_sr", type=int, nargs="+", default=[8000, 22050, 44100, 48000], help="Sample rates of generated files."
+)
+parser.add_argument("--duration", type=float, default=10.0, help="Duration of generated files in seconds.")
+parser.add_argument("--num_files", type=int, default=10, help="Number of generated files per sample rate.")
+parser.add_argument("--target_sr", type=int, default=16000, help="Target sample rate.")
+parser.add_argument("--resamplers", type=str, nargs="+", default=["librosa", "soxr", "polyphase"])
+parser.add_argument("--num_repeats", type=int, default=3, help="Number of times each file is loaded.")
+args = parser.parse_args()
+
+
+def load_files(audio_files, resampler, resample_cache_dir=None):
+    """Loads all files num_repeats times, returns the mean latency per file and the peak memory."""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for _ in range(args.num_repeats):
+        for audio_file in audio_files:
+            AudioSegment.from_file(
+                audio_file, target_sr=args.target_sr, resampler=resampler, resample_cache_dir=resample_cache_dir
+            )
+    latency = (time.perf_counter() - start_time) / (args.num_repeats * len(audio_files))
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, peak_memory
+
+
+def benchmark(name, audio_files):
+    for resampler in args.resamplers:
+        # warmup, e.g., filter design
+        AudioSegment.from_file(audio_files[0], target_sr=args.target_sr, resampler=resampler)
+        latency, peak_memory = load_files(audio_files, resampler)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_files(audio_files, resampler, resample_cache_dir=cache_dir)
+            cached_latency, cached_peak_memory = load_files(audio_files, resampler, resample_cache_dir=cache_dir)
+        logging.info(
+            f"{name}, {resampler}: {latency * 1000:.2f} ms per file, peak memory {peak_memory / 2 ** 20:.1f} MB; "
+            f"cached: {cached_latency * 1000:.2f} ms per file, peak memory {cached_peak_memory / 2 ** 20:.1f} MB"
+        )
+
+
+def main():
+    if args.manifest is not None:
+        manifest_dir = os.path.dirname(args.manifest)
+        audio_files = []
+        with open(args.manifest, 'r') as f:
+            for line in f:
+                audio_file = json.loads(line)['audio_filepath']
+                if not os.path.isabs(audio_file):
+                    audio_file = os.path.join(manifest_dir, audio_file)
+                audio_files.append(audio_file)
+                if len(audio_files) == args.max_files:
+                    break
+        benchmark(os.path.basename(args.manifest), audio_files)
+        return
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        for orig_sr in args.orig_sr:
+            audio_files = []
+            for i in range(args.num_files):
+                audio_file = os.path.join(audio_dir, f'{orig_sr}_{i}.wav')
+                sf.write(audio_file, rng.uniform(-0.5, 0.5, int(args.duration * orig_sr)), orig_sr)
+                audio_files.append(audio_file)
+            benchmark(f'{orig_sr} Hz to {args.target_sr} Hz', audio_files)
+
+
+if __name__ == '__main__':
+    main()
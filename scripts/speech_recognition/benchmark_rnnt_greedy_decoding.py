@@ -0,0 +1,138 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+# This script measures the speed of batched greedy RNNT decoding (`greedy_batch` strategy) on synthetic encoder
+# outputs, looping over frames (default) and looping over labels (`loop_labels=True`).
+
+# The decoder and joint are taken from a trained RNNT model if one is provided, otherwise randomly initialized
+# modules of the requested size are used. Since the encoder outputs are random, only the speed is meaningful,
+# the hypotheses of both modes are checked to be the same.
+
+# Usage:
+1) With the decoder and joint of a trained model
+
+python benchmark_rnnt_greedy_decoding.py \
+    --pretrained_name=stt_en_conformer_transducer_small \
+    --batch_size=32 \
+    --num_frames=500 \
+    --device=cuda
+
+2) With randomly initialized modules
+
+python benchmark_rnnt_greedy_decoding.py \
+    --vocab_size=1024 \
+    --encoder_hidden=512 \
+    --pred_hidden=640 \
+    --joint_hidden=640
+"""
+import argparse
+import time
+
+import torch
+
+from nemo.collections.asr.models import ASRModel
+from nemo.collections.asr.modules import RNNTDecoder, RNNTJoint
+from nemo.collections.asr.parts.submodules import rnnt_greedy_decoding
+from nemo.utils import logging
+
+parser = argparse.ArgumentParser(description="Benchmark batched greedy RNNT decoding on synthetic encoder outputs")
+parser.add_argument("--model_path", type=str, default=None, help="Path to a .nemo RNNT model.")
+parser.add_argument("--pretrained_name", type=str, default=None, help="Name of a pretrained RNNT model.")
+parser.add_argument("--vocab_size", type=int, default=1024, help="Vocabulary size of the random modules.")
+parser.add_argument("--encoder_hidden", type=int, default=512, help="Encoder output size of the random modules.")
+parser.add_argument("--pred_hidden", type=int, default=640, help="Prediction network size of the random modules.")
+parser.add_argument("--joint_hidden", type=int, default=640, help="Joint network size of the random modules.")
+parser.add_argument("--batch_size", type=int, default=32, help="Number of utterances per batch.")
+parser.add_argument("--num_frames", type=int, default=500, help="Maximum number of encoder frames per utterance.")
+parser.add_argument("--num_batches", type=int, default=10, help="Number of batches to decode.")
+parser.add_argument("--max_symbols", type=int, default=10, help="Maximum number of symbols per frame.")
+parser.add_argument("--frame_duration", type=float, default=0.04, help="Duration of an encoder frame in seconds.")
+parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+def get_decoder_and_joint():
+    if args.model_path is not None:
+        model = ASRModel.restore_from(args.model_path, map_location="cpu")
+    elif args.pretrained_name is not None:
+        model = ASRModel.from_pretrained(args.pretrained_name, map_location="cpu")
+    else:
+        decoder = RNNTDecoder({'pred_hidden': args.pred_hidden, 'pred_rnn_layers': 1}, args.vocab_size)
+        joint = RNNTJoint(
+            {
+                'encoder_hidden': args.encoder_hidden,
+                'pred_hidden': args.pred_hidden,
+                'joint_hidden': args.joint_hidden,
+                'activation': 'relu',
+            },
+            args.vocab_size,
+        )
+        return decoder, joint, args.encoder_hidden
+    return model.decoder, model.joint, model.joint.encoder_hidden
+
+
+def main():
+    torch.manual_seed(args.seed)
+    device = torch.device(args.device)
+    decoder, joint, encoder_hidden = get_decoder_and_joint()
+    decoder = decoder.to(device).eval()
+    joint = joint.to(device).eval()
+
+    batches = []
+    for _ in range(args.num_batches):
+        encoder_output = torch.randn(args.batch_size, encoder_hidden, args.num_frames, device=device)
+        encoded_lengths = torch.randint(args.num_frames // 2, args.num_frames + 1, [args.batch_size], device=device)
+        batches.append((encoder_output, encoded_lengths))
+    audio_duration = sum(lengths.sum().item() for _, lengths in batches) * args.frame_duration
+
+    hypotheses = {}
+    for loop_labels in [False, True]:
+        decoding = rnnt_greedy_decoding.GreedyBatchedRNNTInfer(
+            decoder,
+            joint,
+            blank_index=joint.num_classes_with_blank - 1,
+            max_symbols_per_step=args.max_symbols,
+            loop_labels=loop_labels,
+        )
+        hypotheses[loop_labels] = []
+        with torch.inference_mode():
+            # warmup
+            decoding(encoder_output=batches[0][0], encoded_lengths=batches[0][1])
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+
+            start_time = time.perf_counter()
+            for encoder_output, encoded_lengths in batches:
+                (hyps,) = decoding(encoder_output=encoder_output, encoded_lengths=encoded_lengths)
+                hypotheses[loop_labels].extend(hyps)
+            if device.type == "cuda":
+                torch.cuda.synchronize(device)
+            decoding_time = time.perf_counter() - start_time
+
+        logging.info(
+            f"loop_labels={loop_labels}: {decoding_time:.3f}s for {audio_duration:.1f}s of audio, "
+            f"RTF {decoding_time / audio_duration:.6f}"
+        )
+
+    num_mismatches = sum(
+        hyp_frames.y_sequence.tolist() != hyp_labels.y_sequence.tolist()
+        for hyp_frames, hyp_labels in zip(hypotheses[False], hypotheses[True])
+    )
+    if num_mismatches > 0:
+        logging.warning(f"{num_mismatches} hypotheses differ between looping over frames and over labels")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+# This script compiles ASR manifests into columnar, memory-mapped indexes that are stored next to each manifest
+# as `<manifest>.index/`. Datasets built on `ASRAudioText`, `ASRVideoText` or `ASRFeatureText` pick the indexes
+# up automatically as long as every manifest of the dataset has an up-to-date index.
+
+# Transcripts can optionally be pre-tokenized. Pre-tokenized ids are reused only by datasets using an equivalent
+# tokenizer (same class and vocabulary) or character parser (same labels and options), otherwise transcripts are
+# tokenized when the dataset is created, as before.
+
+# Usage:
+1) Paths and durations only
+
+python compile_manifest_index.py --manifest_path=<path to manifest> [<path to manifest> ...]
+
+2) Pre-tokenized with a SentencePiece tokenizer (BPE models)
+
+python compile_manifest_index.py \
+    --manifest_path=<path to manifest> \
+    --tokenizer_model=<path to tokenizer.model>
+
+3) Pre-tokenized with a character parser (char models)
+
+python compile_manifest_index.py \
+    --manifest_path=<path to manifest> \
+    --labels " " a b c ... "'" \
+    --parser=en
+"""
+import argparse
+
+from nemo.collections.common import tokenizers
+from nemo.collections.common.parts.preprocessing import parsers
+from nemo.collections.common.parts.preprocessing.manifest_index import compile_manifest_index
+
+parser = argparse.ArgumentParser(description="Compile ASR manifests into memory-mapped indexes")
+parser.add_argument("--manifest_path", type=str, nargs="+", required=True, help="Path(s) to manifest file(s).")
+parser.add_argument("--tokenizer_model", type=str, default=None, help="Path to a SentencePiece tokenizer model.")
+parser.add_argument("--labels", type=str, nargs="+", default=None, help="Vocabulary of a character model.")
+parser.add_argument("--parser", type=str, default="en", help="Name of the character parser.")
+parser.add_argument("--unk_index", type=int, default=-1, help="Unknown label index of the character parser.")
+parser.add_argument("--blank_index", type=int, default=-1, help="Blank label index of the character parser.")
+parser.add_argument("--no_normalize", action="store_true", help="Disable transcript normalization.")
+parser.add_argument("--overwrite", action="store_true", help="Rebuild indexes even if they are up to date.")
+args = parser.parse_args()
+
+
+class TokenizerParser:
+    """Tokenizes transcripts the same way as the tokenizer wrapper of `AudioToBPEDataset`."""
+
+    is_aggregate = False
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+
+    def __call__(self, text):
+        return self._tokenizer.text_to_ids(text)
+
+
+def main():
+    if args.tokenizer_model is not None and args.labels is not None:
+        raise ValueError("Only one of --tokenizer_model and --labels can be provided.")
+
+    if args.tokenizer_model is not None:
+        text_parser = TokenizerParser(tokenizers.SentencePieceTokenizer(model_path=args.tokenizer_model))
+    elif args.labels is not None:
+        text_parser = parsers.make_parser(
+            labels=args.labels,
+            name=args.parser,
+            unk_id=args.unk_index,
+            blank_id=args.blank_index,
+            do_normalize=not args.no_normalize,
+        )
+    else:
+        text_parser = None
+
+    for manifest_path in args.manifest_path:
+        compile_manifest_index(manifest_path, parser=text_parser, overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
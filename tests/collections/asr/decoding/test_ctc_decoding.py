@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+import math
 import os
 from functools import lru_cache
 
@@ -22,7 +24,8 @@ from omegaconf import DictConfig, OmegaConf
 from nemo.collections.asr.metrics.wer import CTCDecoding, CTCDecodingConfig
 from nemo.collections.asr.metrics.wer_bpe import CTCBPEDecoding, CTCBPEDecodingConfig
 from nemo.collections.asr.parts.mixins import mixins
-from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis
+from nemo.collections.asr.parts.submodules.ctc_beam_decoding import BeamCTCInfer
+from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis, NBestHypotheses
 
 
 def char_vocabulary():
@@ -187,3 +190,83 @@ class TestCTCDecoding:
                 # timestamps check
                 if timestamps:
                     check_subword_timestamps(hyp, decoding)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('return_best_hypothesis', [False, True])
+    def test_char_decoding_prefix_beam_forward_hypotheses(self, return_best_hypothesis):
+        cfg = CTCDecodingConfig(strategy='prefix_beam')
+        cfg.beam.return_best_hypothesis = return_best_hypothesis
+        vocab = char_vocabulary()
+        decoding = CTCDecoding(decoding_cfg=cfg, vocabulary=vocab)
+
+        B, T = 4, 20
+        V = len(char_vocabulary()) + 1
+        input_signal = torch.randn(size=(B, T, V)).log_softmax(dim=-1)
+        length = torch.randint(low=1, high=T, size=[B])
+
+        with torch.no_grad():
+            hyps, all_hyps = decoding.ctc_decoder_predictions_tensor(
+                input_signal, length, fold_consecutive=True, return_hypotheses=True
+            )
+
+            for idx, hyp in enumerate(hyps):
+                assert isinstance(hyp, Hypothesis)
+                assert torch.is_tensor(hyp.y_sequence)
+                assert isinstance(hyp.text, str)
+
+            if not return_best_hypothesis:
+                for nbest in all_hyps:
+                    assert 1 <= len(nbest) <= cfg.beam.beam_size
+                    scores = [hyp.score for hyp in nbest]
+                    assert scores == sorted(scores, reverse=True)
+
+    @pytest.mark.unit
+    def test_prefix_beam_search_streaming(self):
+        V = len(char_vocabulary()) + 1
+        decoding = BeamCTCInfer(blank_id=V - 1, beam_size=4, search_type='prefix_beam')
+
+        torch.manual_seed(0)
+        log_probs = torch.randn(size=(50, V)).log_softmax(dim=-1)
+        state = decoding.prefix_beam_search_step(log_probs)
+
+        # Decoding chunk by chunk gives the same beam as decoding all the frames at once
+        chunked_state = None
+        for chunk in log_probs.split(7):
+            chunked_state = decoding.prefix_beam_search_step(chunk, chunked_state)
+            stable_prefix = chunked_state.stable_prefix
+            for prefix in chunked_state.beams:
+                assert prefix[: len(stable_prefix)] == stable_prefix
+
+        assert chunked_state.num_frames == 50
+        assert chunked_state.beams.keys() == state.beams.keys()
+        for prefix, (log_prob_blank, log_prob_non_blank) in state.beams.items():
+            assert chunked_state.beams[prefix][0] == pytest.approx(log_prob_blank)
+            assert chunked_state.beams[prefix][1] == pytest.approx(log_prob_non_blank)
+
+        hyps = decoding.prefix_beam_state_to_hypotheses(chunked_state)
+        assert isinstance(hyps, NBestHypotheses)
+        assert tuple(hyps.n_best_hypotheses[0].y_sequence) == chunked_state.best_prefix
+
+    @pytest.mark.unit
+    def test_prefix_beam_search_exact(self):
+        # With a beam large enough to keep all the prefixes, the scores are the exact CTC probabilities
+        V = 3
+        decoding = BeamCTCInfer(blank_id=V - 1, beam_size=1000, search_type='prefix_beam')
+
+        torch.manual_seed(0)
+        log_probs = torch.randn(size=(5, V)).log_softmax(dim=-1)
+
+        expected = {}
+        for path in itertools.product(range(V), repeat=len(log_probs)):
+            path_log_prob = sum(float(log_probs[t, token]) for t, token in enumerate(path))
+            prefix = tuple(
+                token for t, token in enumerate(path) if token != V - 1 and (t == 0 or token != path[t - 1])
+            )
+            expected[prefix] = torch.logaddexp(
+                torch.tensor(expected.get(prefix, -math.inf)), torch.tensor(path_log_prob)
+            )
+
+        state = decoding.prefix_beam_search_step(log_probs)
+        assert len(state.beams) == len(expected)
+        for prefix, log_prob in state.sorted_prefixes():
+            assert log_prob == pytest.approx(float(expected[prefix]), abs=1e-5)
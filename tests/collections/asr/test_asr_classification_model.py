@@ -174,6 +174,26 @@ class TestEncDecClassificationModel:
         # fully connected + bias
         assert asr_model.num_weights == nw1 + 3 * (asr_model.decoder._feat_in + 1)
 
+    @pytest.mark.unit
+    def test_batch_augmentor(self, speech_classification_model):
+        asr_model = speech_classification_model
+        asr_model.setup_training_data(
+            {
+                'manifest_filepath': None,
+                'sample_rate': 16000,
+                'labels': asr_model._cfg.labels,
+                'batch_size': 4,
+                'batch_augmentor': {'gain': {'prob': 1.0, 'min_gain_dbfs': 6, 'max_gain_dbfs': 6}},
+            }
+        )
+        signal = torch.randn(size=(4, 512))
+        batch = (signal, torch.full([4], 512), torch.randint(0, 30, size=(4,)), torch.ones(4))
+
+        asr_model.train()
+        augmented = asr_model.on_after_batch_transfer(batch, dataloader_idx=0)
+        assert torch.allclose(augmented[0], signal * 10 ** (6 / 20))
+        assert augmented[2] is batch[2]
+
     @pytest.mark.unit
     def test_transcription(self, speech_classification_model, test_data_dir):
         # Ground truth labels = ["yes", "no"]
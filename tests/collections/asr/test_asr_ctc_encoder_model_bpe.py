@@ -303,6 +303,11 @@ class TestEncDecCTCModel:
             'bucketing_batch_size',
             'bucketing_strategy',
             'bucketing_weights',
+            'batch_duration',
+            'batch_frames',
+            'max_batch_size',
+            'dynamic_batching_buffer_size',
+            'dynamic_batching_log_every_n_batches',
             'channel_selector',
         ]
 
@@ -339,7 +344,14 @@ class TestEncDecCTCModel:
             'bucketing_batch_size',
             'bucketing_strategy',
             'bucketing_weights',
+            'batch_duration',
+            'batch_frames',
+            'max_batch_size',
+            'dynamic_batching_buffer_size',
+            'dynamic_batching_log_every_n_batches',
             'max_utts',
+            'resample_cache_dir',
+            'decode_cache_mb',
         ]
 
         REMAP_ARGS = {
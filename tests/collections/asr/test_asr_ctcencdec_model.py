@@ -131,6 +131,24 @@ class TestEncDecCTCModel:
         diff = torch.max(torch.abs(logprobs_instance - logprobs_batch))
         assert diff <= 1e-6
 
+    @pytest.mark.unit
+    def test_batch_augmentor(self, asr_model):
+        asr_model.setup_batch_augmentor(
+            {'sample_rate': 16000, 'batch_augmentor': {'gain': {'prob': 1.0, 'min_gain_dbfs': 6, 'max_gain_dbfs': 6}}}
+        )
+        signal = torch.randn(size=(4, 512))
+        batch = (signal, torch.full([4], 512), torch.randint(0, 10, size=(4, 5)), torch.full([4], 5))
+
+        asr_model.train()
+        augmented = asr_model.on_after_batch_transfer(batch, dataloader_idx=0)
+        assert isinstance(augmented, tuple) and len(augmented) == len(batch)
+        assert torch.allclose(augmented[0], signal * 10 ** (6 / 20))
+        assert augmented[2] is batch[2]
+
+        # batches are only augmented during training
+        asr_model.eval()
+        assert asr_model.on_after_batch_transfer(batch, dataloader_idx=0)[0] is signal
+
     @pytest.mark.unit
     def test_vocab_change(self, asr_model):
         old_vocab = copy.deepcopy(asr_model.decoder.vocabulary)
@@ -273,6 +291,11 @@ class TestEncDecCTCModel:
             'bucketing_batch_size',
             'bucketing_strategy',
             'bucketing_weights',
+            'batch_duration',
+            'batch_frames',
+            'max_batch_size',
+            'dynamic_batching_buffer_size',
+            'dynamic_batching_log_every_n_batches',
             'channel_selector',
         ]
 
@@ -303,7 +326,14 @@ class TestEncDecCTCModel:
             'bucketing_batch_size',
             'bucketing_strategy',
             'bucketing_weights',
+            'batch_duration',
+            'batch_frames',
+            'max_batch_size',
+            'dynamic_batching_buffer_size',
+            'dynamic_batching_log_every_n_batches',
             'max_utts',
+            'resample_cache_dir',
+            'decode_cache_mb',
         ]
 
         REMAP_ARGS = {
@@ -36,8 +36,10 @@ from nemo.collections.asr.data.audio_to_audio import (
 )
 from nemo.collections.asr.data.audio_to_text import (
     DataStoreObject,
+    DynamicBatchingDataset,
     TarredAudioToBPEDataset,
     TarredAudioToCharDataset,
+    _speech_collate_fn,
     cache_datastore_manifests,
 )
 from nemo.collections.asr.data.audio_to_text_dali import (
@@ -136,6 +138,102 @@ class TestASRDatasets:
             count += 1
         assert count == 32
 
+    @pytest.mark.unit
+    def test_tarred_dataset_dynamic_batching(self, test_data_dir):
+        config = {
+            'manifest_filepath': os.path.abspath(
+                os.path.join(test_data_dir, 'asr/tarred_an4/tarred_audio_manifest.json')
+            ),
+            'tarred_audio_filepaths': os.path.abspath(os.path.join(test_data_dir, 'asr/tarred_an4/audio_{0..1}.tar')),
+            'labels': self.labels,
+            'sample_rate': 16000,
+            'batch_size': 1,
+            'batch_duration': 20.0,
+            'dynamic_batching_buffer_size': 16,
+        }
+        dataset = audio_to_text_dataset.get_tarred_dataset(config, shuffle_n=0, global_rank=0, world_size=1)
+        assert isinstance(dataset, DynamicBatchingDataset)
+
+        dataloader = DataLoader(dataset, batch_size=1, collate_fn=dataset._collate_fn)
+        count = 0
+        for audio, audio_len, _, _ in dataloader:
+            assert audio_len.max() * len(audio_len) <= 20.0 * 16000 or len(audio_len) == 1
+            count += len(audio_len)
+        assert count == 32
+        assert dataset.stats.num_samples == 32
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('max_batch_size', [None, 3])
+    def test_dynamic_batching(self, max_batch_size):
+        lengths = [100, 2000, 350, 40, 1200, 800, 60, 3000, 90, 500, 700, 10, 1500, 250, 20]
+        samples = [
+            (torch.ones(length), torch.tensor(length), torch.tensor([1, 2]), torch.tensor(2)) for length in lengths
+        ]
+        wrapped = mock.Mock(_dataset=samples, featurizer=mock.Mock(sample_rate=1000))
+        wrapped._collate_fn = lambda batch: _speech_collate_fn(batch, pad_id=0)
+
+        dataset = DynamicBatchingDataset(
+            wrapped, batch_duration=2.5, max_batch_size=max_batch_size, buffer_size=6, shuffle_batches=True
+        )
+        batch_lengths = []
+        for batch in dataset:
+            audio, audio_len, _, _ = dataset._collate_fn([batch])
+            assert audio.shape == (len(batch), audio_len.max())
+            assert audio_len.max() * len(batch) <= 2500 or len(batch) == 1
+            if max_batch_size is not None:
+                assert len(batch) <= max_batch_size
+            batch_lengths.extend(audio_len.tolist())
+        assert sorted(batch_lengths) == sorted(lengths)
+
+        stats = dataset.stats
+        assert stats.num_samples == len(lengths)
+        assert sum(size * count for size, count in stats.batch_sizes.items()) == len(lengths)
+        assert stats.total_frames == sum(lengths)
+        assert 0.0 <= stats.padding_ratio < 0.5
+
+    @pytest.mark.unit
+    def test_dynamic_batching_stats_workers(self):
+        lengths = [100, 2000, 350, 40, 1200, 800, 60, 3000, 90, 500, 700, 10, 1500, 250, 20]
+        samples = [
+            (torch.ones(length), torch.tensor(length), torch.tensor([1, 2]), torch.tensor(2)) for length in lengths
+        ]
+        wrapped = mock.Mock(_dataset=samples, featurizer=mock.Mock(sample_rate=1000))
+        wrapped._collate_fn = lambda batch: _speech_collate_fn(batch, pad_id=0)
+        dataset = DynamicBatchingDataset(wrapped, batch_duration=2.5, buffer_size=6, num_workers=2)
+
+        # each worker iterates over all the samples, the statistics of both are seen by the main process
+        dataloader = DataLoader(dataset, batch_size=1, collate_fn=dataset._collate_fn, num_workers=2)
+        num_batches = sum(1 for _ in dataloader)
+        assert dataset.stats.num_batches == num_batches
+        assert dataset.stats.num_samples == 2 * len(lengths)
+        assert dataset.stats.total_frames == 2 * sum(lengths)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('shard_manifests', [False, True])
+    @pytest.mark.parametrize('manifest_index', [False, True])
+    def test_dynamic_batching_len(self, shard_manifests, manifest_index):
+        world_size = 4
+        durations = [1.5, 3.0, 0.5, None, 2.0]
+        if manifest_index:
+            # durations are read from the index, missing durations are NaN
+            collection = mock.Mock()
+            collection.data.durations.return_value = np.array(durations, dtype=np.float64)
+        else:
+            collection = [mock.Mock(duration=duration) for duration in durations]
+        wrapped = mock.Mock(featurizer=mock.Mock(sample_rate=1000), shard_manifests=shard_manifests)
+        wrapped.manifest_processor.collection = collection
+        dataset = DynamicBatchingDataset(wrapped, batch_duration=2.0)
+
+        def all_reduce(tensor):
+            # every rank holds a shard of the same total duration
+            tensor *= world_size
+
+        with mock.patch.object(torch.distributed, 'is_initialized', return_value=True), mock.patch.object(
+            torch.distributed, 'all_reduce', side_effect=all_reduce
+        ), mock.patch.object(torch.Tensor, 'cuda', lambda tensor: tensor):
+            # 7 s of audio in batches of 2 s, with sharded manifests 7 s on each rank
+            assert len(dataset) == (14 if shard_manifests else 4)
+
     @pytest.mark.unit
     def test_mismatch_in_model_dataloader_config(self, caplog):
         logging._logger.propagate = True
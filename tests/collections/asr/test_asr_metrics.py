@@ -19,6 +19,9 @@ from copy import deepcopy
 from typing import List
 from unittest.mock import Mock, patch
 
+import editdistance
+import jiwer
+import numpy as np
 import pytest
 import torch
 from torchmetrics.audio.snr import SignalNoiseRatio
@@ -32,9 +35,11 @@ from nemo.collections.asr.metrics.wer import (
     CTCDecodingConfig,
     word_error_rate,
     word_error_rate_detail,
+    word_error_rate_detail_per_utt,
     word_error_rate_per_utt,
 )
 from nemo.collections.asr.metrics.wer_bpe import WERBPE, CTCBPEDecoding, CTCBPEDecodingConfig
+from nemo.collections.asr.parts.utils import edit_distance_utils
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis
 from nemo.collections.common.tokenizers import CharTokenizer
 from nemo.utils.config_utils import assert_dataclass_signature_match
@@ -146,6 +151,54 @@ class TestWordErrorRate:
             hypotheses=['ducuti motorcycle', 'G P U'], references=['ducati motorcycle', 'GPU'], use_cer=True
         ) == ([1 / 17, 2 / 3], 0.15)
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("use_cer", [False, True])
+    def test_wer_function_batched(self, use_cer):
+        """Batched edit distances should match per-pair editdistance and jiwer results."""
+        words = ['a', 'b', 'cd', 'ef', 'g']
+        references, hypotheses = [], []
+        for _ in range(300):
+            references.append(' '.join(random.choice(words) for _ in range(random.randint(0, 12))))
+            hypotheses.append(' '.join(random.choice(words) for _ in range(random.randint(0, 12))))
+
+        if use_cer:
+            scores = sum(editdistance.eval(list(h), list(r)) for h, r in zip(hypotheses, references))
+            words_count = sum(len(r) for r in references)
+        else:
+            scores = sum(editdistance.eval(h.split(), r.split()) for h, r in zip(hypotheses, references))
+            words_count = sum(len(r.split()) for r in references)
+        assert word_error_rate(hypotheses, references, use_cer=use_cer) == scores / words_count
+
+        details_per_utt, details = word_error_rate_detail_per_utt(hypotheses, references, use_cer=use_cer)
+        for h, r, utt_details in zip(hypotheses, references, details_per_utt):
+            assert word_error_rate_detail([h], [r], use_cer=use_cer) == utt_details
+            if r:
+                measures = jiwer.cer(r, h, return_dict=True) if use_cer else jiwer.compute_measures(r, h)
+                _, tokens, ins_rate, del_rate, sub_rate = utt_details
+                assert round(ins_rate * tokens) == measures['insertions']
+                assert round(del_rate * tokens) == measures['deletions']
+                assert round(sub_rate * tokens) == measures['substitutions']
+        assert word_error_rate_detail(hypotheses, references, use_cer=use_cer) == details
+
+        with pytest.raises(ValueError):
+            word_error_rate_detail_per_utt(hypotheses, references[:-1], use_cer=use_cer)
+
+    @pytest.mark.unit
+    def test_batch_edit_operations(self):
+        sequences = [[random.randint(0, 3) for _ in range(random.randint(0, 30))] for _ in range(400)]
+        hypotheses, references = sequences[:200], sequences[200:]
+
+        ops = edit_distance_utils.batch_edit_operations(hypotheses, references)
+        assert ops.shape == (200, 3)
+        assert ops.sum(axis=1).tolist() == [editdistance.eval(h, r) for h, r in zip(hypotheses, references)]
+        assert (
+            edit_distance_utils.batch_edit_operations(hypotheses, references, num_workers=2, chunk_size=64) == ops
+        ).all()
+
+        for (h, r), pair_ops in zip(zip(hypotheses, references), ops.tolist()):
+            numpy_ops = edit_distance_utils._edit_operations_pair_numpy(np.array(r), np.array(h))
+            assert list(numpy_ops) == pair_ops
+
     @pytest.mark.unit
     @pytest.mark.parametrize("batch_dim_index", [0, 1])
     @pytest.mark.parametrize("test_wer_bpe", [False, True])
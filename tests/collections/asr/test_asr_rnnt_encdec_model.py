@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import copy
+import warnings
 from typing import Any, Dict, List, Optional, Tuple
 
 import pytest
@@ -641,6 +642,62 @@ class TestEncDecRNNTModel:
                 partial_hyp = partial_hyp[0]
                 _ = greedy(encoder_output=enc_out, encoded_lengths=enc_len, partial_hypotheses=partial_hyp)
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("decoder_type", [RNNTDecoder, StatelessTransducerDecoder])
+    @pytest.mark.parametrize("max_symbols_per_step", [1, 3])
+    def test_greedy_batch_loop_labels(self, decoder_type, max_symbols_per_step):
+        token_list = [" ", "a", "b", "c"]
+        vocab_size = len(token_list)
+
+        encoder_output_size = 4
+        decoder_output_size = 4
+        joint_output_shape = 4
+
+        if decoder_type is RNNTDecoder:
+            prednet_cfg = {'pred_hidden': decoder_output_size, 'pred_rnn_layers': 2}
+        else:
+            prednet_cfg = {'pred_hidden': decoder_output_size, 'context_size': 2}
+        jointnet_cfg = {
+            'encoder_hidden': encoder_output_size,
+            'pred_hidden': decoder_output_size,
+            'joint_hidden': joint_output_shape,
+            'activation': 'relu',
+        }
+
+        torch.manual_seed(0)
+        decoder = decoder_type(prednet_cfg, vocab_size)
+        joint_net = RNNTJoint(jointnet_cfg, vocab_size, vocabulary=token_list)
+
+        # (B, D, T)
+        enc_out = torch.randn(4, encoder_output_size, 30) * 5
+        enc_len = torch.tensor([30, 11, 0, 29], dtype=torch.int32)
+
+        hyps = {}
+        for loop_labels in [False, True]:
+            greedy = greedy_decode.GreedyBatchedRNNTInfer(
+                decoder,
+                joint_net,
+                blank_index=vocab_size,
+                max_symbols_per_step=max_symbols_per_step,
+                loop_labels=loop_labels,
+            )
+            # packing the hypotheses should not copy-construct tensors from tensors
+            with torch.no_grad(), warnings.catch_warnings():
+                warnings.filterwarnings("error", message="To copy construct from a tensor")
+                hyps[loop_labels] = greedy(encoder_output=enc_out, encoded_lengths=enc_len)[0]
+
+        # decoding by looping over labels should find exactly the same hypotheses as looping over frames
+        for hyp_frames, hyp_labels in zip(hyps[False], hyps[True]):
+            assert hyp_frames.y_sequence.tolist() == hyp_labels.y_sequence.tolist()
+            assert hyp_frames.timestep == hyp_labels.timestep
+            assert hyp_frames.score == pytest.approx(hyp_labels.score, rel=1e-5)
+            if len(hyp_frames.y_sequence) > 0:
+                # LSTM states are (h, c) per layer, stateless decoder states are plain tensors
+                for state_frames, state_labels in zip(hyp_frames.dec_state, hyp_labels.dec_state):
+                    if isinstance(state_frames, tuple):
+                        state_frames, state_labels = torch.stack(state_frames), torch.stack(state_labels)
+                    assert torch.allclose(state_frames, state_labels, atol=1e-5)
+
     @pytest.mark.pleasefixme
     @pytest.mark.skipif(
         not NUMBA_RNNT_LOSS_AVAILABLE, reason='RNNTLoss has not been compiled with appropriate numba version.',
@@ -953,6 +1010,255 @@ class TestEncDecRNNTModel:
                         assert torch.is_tensor(logp)
                         assert torch.is_tensor(label)
 
+    @pytest.mark.skipif(
+        not NUMBA_RNNT_LOSS_AVAILABLE, reason='RNNTLoss has not been compiled with appropriate numba version.',
+    )
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "beam_config",
+        [
+            {"search_type": "default", "score_norm": False},
+            {"search_type": "default", "preserve_alignments": True},
+            {"search_type": "maes", "maes_num_steps": 2, "maes_expansion_beta": 2},
+            {"search_type": "maes", "maes_num_steps": 3, "maes_expansion_beta": 1, "preserve_alignments": True},
+        ],
+    )
+    def test_batched_beam_decoding(self, beam_config):
+        token_list = [" ", "a", "b", "c"]
+        vocab_size = len(token_list)
+
+        encoder_output_size = 4
+        decoder_output_size = 4
+        joint_output_shape = 4
+
+        prednet_cfg = {'pred_hidden': decoder_output_size, 'pred_rnn_layers': 1}
+        jointnet_cfg = {
+            'encoder_hidden': encoder_output_size,
+            'pred_hidden': decoder_output_size,
+            'joint_hidden': joint_output_shape,
+            'activation': 'relu',
+        }
+
+        decoder = RNNTDecoder(prednet_cfg, vocab_size)
+
+        for joint_type in [RNNTJoint, HATJoint]:
+            joint_net = joint_type(jointnet_cfg, vocab_size, vocabulary=token_list)
+
+            # (B, D, T)
+            enc_out = torch.randn(3, encoder_output_size, 30)
+            enc_len = torch.tensor([30, 12, 21], dtype=torch.int32)
+
+            nbest = []
+            for batched_beam_search in [False, True]:
+                beam = beam_decode.BeamRNNTInfer(
+                    decoder,
+                    joint_net,
+                    beam_size=2,
+                    return_best_hypothesis=False,
+                    batched_beam_search=batched_beam_search,
+                    **beam_config,
+                )
+
+                with torch.no_grad():
+                    nbest.append(beam(encoder_output=enc_out, encoded_lengths=enc_len)[0])
+
+            for hyps, batched_hyps in zip(*nbest):
+                assert len(hyps.n_best_hypotheses) == len(batched_hyps.n_best_hypotheses)
+
+                for hyp, batched_hyp in zip(hyps.n_best_hypotheses, batched_hyps.n_best_hypotheses):
+                    assert hyp.y_sequence.tolist() == batched_hyp.y_sequence.tolist()
+                    assert hyp.timestep == batched_hyp.timestep
+                    assert abs(hyp.score - batched_hyp.score) < 1e-4
+
+                    if hyp.alignments is not None:
+                        assert len(hyp.alignments) == len(batched_hyp.alignments)
+                        for t in range(len(hyp.alignments)):
+                            labels = [int(label) for _, label in hyp.alignments[t]]
+                            assert labels == [int(label) for _, label in batched_hyp.alignments[t]]
+
+    @pytest.mark.skipif(
+        not NUMBA_RNNT_LOSS_AVAILABLE, reason='RNNTLoss has not been compiled with appropriate numba version.',
+    )
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "beam_config",
+        [
+            {"search_type": "greedy"},
+            {"search_type": "default", "score_norm": False},
+            {"search_type": "alsd", "alsd_max_target_len": 20},
+            {"search_type": "tsd", "tsd_max_sym_exp_per_step": 3},
+            {"search_type": "maes", "maes_num_steps": 2, "maes_expansion_beta": 2},
+        ],
+    )
+    def test_beam_decoding_decoder_cache(self, beam_config):
+        token_list = [" ", "a", "b", "c"]
+        vocab_size = len(token_list)
+        beam_size = 1 if beam_config["search_type"] == "greedy" else 2
+
+        encoder_output_size = 4
+        decoder_output_size = 4
+        joint_output_shape = 4
+
+        prednet_cfg = {'pred_hidden': decoder_output_size, 'pred_rnn_layers': 1}
+        jointnet_cfg = {
+            'encoder_hidden': encoder_output_size,
+            'pred_hidden': decoder_output_size,
+            'joint_hidden': joint_output_shape,
+            'activation': 'relu',
+        }
+
+        decoder = RNNTDecoder(prednet_cfg, vocab_size)
+        joint_net = RNNTJoint(jointnet_cfg, vocab_size, vocabulary=token_list)
+
+        # (B, D, T)
+        enc_out = torch.randn(2, encoder_output_size, 30)
+        enc_len = torch.tensor([30, 20], dtype=torch.int32)
+
+        nbest = []
+        for decoder_cache_size in [None, 2]:
+            beam = beam_decode.BeamRNNTInfer(
+                decoder,
+                joint_net,
+                beam_size=beam_size,
+                return_best_hypothesis=False,
+                decoder_cache_size=decoder_cache_size,
+                **beam_config,
+            )
+
+            with torch.no_grad():
+                nbest.append(beam(encoder_output=enc_out, encoded_lengths=enc_len)[0])
+
+            # The initial (blank) hypothesis of the second sample is at least found in the unbounded cache
+            if decoder_cache_size is None:
+                assert beam.decoder_cache.hits > 0
+            assert beam.decoder_cache.misses > 0
+            assert len(beam.decoder_cache) == 0
+
+        # Evicted decoder states are recomputed, the hypotheses do not depend on the cache size
+        for hyps, bounded_cache_hyps in zip(*nbest):
+            assert len(hyps.n_best_hypotheses) == len(bounded_cache_hyps.n_best_hypotheses)
+
+            for hyp, bounded_cache_hyp in zip(hyps.n_best_hypotheses, bounded_cache_hyps.n_best_hypotheses):
+                assert hyp.y_sequence.tolist() == bounded_cache_hyp.y_sequence.tolist()
+                assert abs(hyp.score - bounded_cache_hyp.score) < 1e-5
+
+    @pytest.mark.unit
+    def test_beam_decoding_ngram_lm_cache(self, monkeypatch):
+        class _State:
+            def __init__(self):
+                self.history = ()
+
+            def __eq__(self, other):
+                return self.history == other.history
+
+            def __hash__(self):
+                return hash(self.history)
+
+        class _Model:
+            """Bigram-like KenLM stand-in, scores only depend on the previous token."""
+
+            def __init__(self, path):
+                self.num_scored = 0
+                self.on_score = None
+
+            def BeginSentenceWrite(self, state):
+                state.history = ('-1',)
+
+            def BaseScore(self, state, token, next_state):
+                self.num_scored += 1
+                if self.on_score is not None:
+                    self.on_score()
+                next_state.history = (state.history + (token,))[-2:]
+                return -0.1 * (1 + (int(state.history[-1]) + 3 * int(token)) % 7)
+
+        class _NoCache(rnnt_utils.DecoderStateCache):
+            def __setitem__(self, key, value):
+                pass
+
+        kenlm_stub = type('kenlm', (), {'State': _State, 'Model': _Model})
+        monkeypatch.setattr(beam_decode, 'kenlm', kenlm_stub, raising=False)
+        monkeypatch.setattr(beam_decode, 'KENLM_AVAILABLE', True)
+
+        token_list = [" ", "a", "b", "c"]
+        vocab_size = len(token_list)
+        decoder_cache_size = 4
+
+        prednet_cfg = {'pred_hidden': 4, 'pred_rnn_layers': 1}
+        jointnet_cfg = {'encoder_hidden': 4, 'pred_hidden': 4, 'joint_hidden': 4, 'activation': 'relu'}
+
+        torch.manual_seed(0)
+        decoder = RNNTDecoder(prednet_cfg, vocab_size)
+        joint_net = RNNTJoint(jointnet_cfg, vocab_size, vocabulary=token_list)
+
+        # (B, D, T)
+        enc_out = torch.randn(2, 4, 20)
+        enc_len = torch.tensor([20, 15], dtype=torch.int32)
+
+        nbest = []
+        num_scored = []
+        for use_cache in [True, False]:
+            beam = beam_decode.BeamRNNTInfer(
+                decoder,
+                joint_net,
+                beam_size=2,
+                search_type='maes',
+                maes_num_steps=2,
+                maes_expansion_beta=2,
+                return_best_hypothesis=False,
+                decoder_cache_size=decoder_cache_size,
+                ngram_lm_model='stub.arpa',
+                ngram_lm_alpha=0.5,
+            )
+            if not use_cache:
+                beam.ngram_lm_cache = _NoCache(decoder_cache_size)
+
+            cache_sizes = []
+            beam.ngram_lm.on_score = lambda: cache_sizes.append(len(beam.ngram_lm_cache))
+
+            with torch.no_grad():
+                nbest.append(beam(encoder_output=enc_out, encoded_lengths=enc_len)[0])
+            num_scored.append(beam.ngram_lm.num_scored)
+
+            if use_cache:
+                # The cache is bounded by the decoder cache size, hit during the call and emptied after it
+                assert max(cache_sizes) <= decoder_cache_size
+                assert beam.ngram_lm_cache.hits > 0
+                assert len(beam.ngram_lm_cache) == 0
+
+        # Cached scores are only computed once, and give the same hypotheses as recomputing them
+        assert num_scored[0] < num_scored[1]
+        for hyps, uncached_hyps in zip(*nbest):
+            assert len(hyps.n_best_hypotheses) == len(uncached_hyps.n_best_hypotheses)
+
+            for hyp, uncached_hyp in zip(hyps.n_best_hypotheses, uncached_hyps.n_best_hypotheses):
+                assert hyp.y_sequence.tolist() == uncached_hyp.y_sequence.tolist()
+                assert hyp.score == pytest.approx(uncached_hyp.score)
+
+    @pytest.mark.unit
+    def test_decoder_state_cache(self):
+        cache = rnnt_utils.DecoderStateCache(max_size=2)
+
+        assert (1,) not in cache
+        cache[(1,)] = 'a'
+        cache[(1, 2)] = 'b'
+        assert (1,) in cache  # (1,) is now the most recently used
+        cache[(1, 3)] = 'c'
+
+        assert len(cache) == 2
+        assert (1, 2) not in cache
+        assert (1,) in cache and cache[(1,)] == 'a'
+        assert (1, 3) in cache and cache[(1, 3)] == 'c'
+        assert cache.hits == 3 and cache.misses == 2
+        assert cache.hit_rate == pytest.approx(0.6)
+
+        cache.clear()
+        assert len(cache) == 0 and cache.hits == 3
+        cache.reset_stats()
+        assert cache.hits == 0 and cache.misses == 0 and cache.hit_rate == 0.0
+
+        with pytest.raises(ValueError):
+            rnnt_utils.DecoderStateCache(max_size=0)
+
     @pytest.mark.skipif(
         not NUMBA_RNNT_LOSS_AVAILABLE, reason='RNNTLoss has not been compiled with appropriate numba version.',
     )
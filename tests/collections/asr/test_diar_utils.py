@@ -22,10 +22,21 @@ from scipy.optimize import linear_sum_assignment as scipy_linear_sum_assignment
 from nemo.collections.asr.data.audio_to_label import repeat_signal
 from nemo.collections.asr.parts.utils.longform_clustering import LongFormSpeakerClustering
 from nemo.collections.asr.parts.utils.offline_clustering import (
+    NMESC,
+    BlockCosAffinity,
     SpeakerClustering,
+    eigDecompose,
+    eigDecomposeSparse,
     get_scale_interpolated_embs,
+    get_scale_segment_index,
+    get_sorted_argmin,
+    getAffinityGraphMat,
     getCosAffinityMatrix,
     getKneighborsConnections,
+    getLaplacian,
+    getMultiScaleCosAffinityMatrix,
+    getSparseAffinityGraphMat,
+    getSparseLaplacian,
     split_input_data,
 )
 from nemo.collections.asr.parts.utils.online_clustering import (
@@ -564,6 +575,97 @@ class TestClusteringUtilFunctions:
         elif mask_method == 'drop':
             assert all(binarized_affinity_mat.sum(dim=0) <= float(p_value))
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("p_value", [1, 5, 9])
+    @pytest.mark.parametrize("N", [9, 20])
+    @pytest.mark.parametrize("mask_method", ['binary', 'sigmoid', 'drop'])
+    def test_get_k_neighbors_connections_sorted_index(self, p_value: int, N: int, mask_method: str, seed=0):
+        torch.manual_seed(seed)
+        affinity_mat = getCosAffinityMatrix(torch.randn(N, 16))
+        sorted_neighbor_index = torch.argsort(affinity_mat, dim=1, descending=True)[:, :p_value]
+        assert torch.equal(
+            getKneighborsConnections(affinity_mat, p_value, mask_method, sorted_neighbor_index=sorted_neighbor_index),
+            getKneighborsConnections(affinity_mat, p_value, mask_method),
+        )
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("n_spks, sigma, N", [(2, 1.0, 200), (4, 1.5, 300), (6, 2.0, 512)])
+    @pytest.mark.parametrize("sparse_search_volume", [10, 30])
+    @pytest.mark.parametrize("seed", [0, 1])
+    def test_nmesc_coarse_to_fine_search(self, n_spks, sigma, N, sparse_search_volume, seed):
+        torch.manual_seed(seed)
+        centers = torch.randn(n_spks, 192)
+        labels = torch.randint(0, n_spks, (N,))
+        mat = getCosAffinityMatrix(centers[labels] + sigma * torch.randn(N, 192))
+        nmesc_kwargs = dict(max_rp_threshold=0.25, sparse_search_volume=sparse_search_volume, parallelism=False)
+        nmesc = NMESC(mat, **nmesc_kwargs)
+        est_num_of_spk, p_hat_value = nmesc.forward()
+        assert not torch.isinf(nmesc.eig_ratio_list).any()
+
+        coarse_to_fine_nmesc = NMESC(mat, coarse_to_fine_search=True, **nmesc_kwargs)
+        assert coarse_to_fine_nmesc.forward() == (est_num_of_spk, p_hat_value)
+        p_volume = coarse_to_fine_nmesc.p_value_list.shape[0]
+        searched = torch.logical_not(torch.isinf(coarse_to_fine_nmesc.eig_ratio_list))
+        assert searched.sum() < p_volume
+        # The p-values that are examined have the same g_p values as in the full search
+        assert torch.equal(coarse_to_fine_nmesc.eig_ratio_list[searched], nmesc.eig_ratio_list[searched])
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    @pytest.mark.parametrize("N", [1, 5, 30])
+    def test_get_sorted_argmin(self, seed, N):
+        torch.manual_seed(seed)
+        # Integer steps make ties and duplicated anchors likely
+        sorted_anchor = torch.sort(torch.randint(0, 20, (N,)).float() * 0.5)[0]
+        query_anchor = torch.randint(-4, 44, (50,)).float() * 0.25
+        expected = torch.argmin(torch.abs(sorted_anchor.unsqueeze(0) - query_anchor.unsqueeze(1)), dim=1)
+        assert torch.equal(get_sorted_argmin(sorted_anchor, query_anchor), expected)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("n_spks", [1, 3])
+    @pytest.mark.parametrize("block_size", [7, 1024])
+    def test_block_cos_affinity(self, n_spks, block_size, seed=0):
+        em, ts, mc, mw, spk_ts, gt = generate_toy_data(n_spks=n_spks, spk_dur=5, perturb_sigma=0.1, torch_seed=seed)
+        embeddings_in_scales, timestamps_in_scales = split_input_data(em, ts, mc)
+        embeddings_in_scales = [emb.half() for emb in embeddings_in_scales]
+        affinity_mat = getMultiScaleCosAffinityMatrix(mw, embeddings_in_scales, timestamps_in_scales)
+        cos_affinity = BlockCosAffinity(
+            embeddings_in_scales=embeddings_in_scales,
+            segment_index_in_scales=get_scale_segment_index(embeddings_in_scales, timestamps_in_scales),
+            multiscale_weights=mw,
+            block_size=block_size,
+        )
+        segment_index = torch.arange(affinity_mat.shape[0])
+        assert torch.allclose(cos_affinity.getAffinityBlock(segment_index, segment_index), affinity_mat, atol=1e-5)
+        assert torch.allclose(
+            cos_affinity.getAffinityBlock(segment_index[::3], segment_index[1::2]), affinity_mat[::3, 1::2], atol=1e-5,
+        )
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("p_value", [1, 5, 9])
+    @pytest.mark.parametrize("N", [9, 40])
+    def test_sparse_affinity_graph_and_laplacian(self, p_value, N, seed=0):
+        torch.manual_seed(seed)
+        affinity_mat = getCosAffinityMatrix(torch.randn(N, 16))
+        kneighbors_index = torch.sort(affinity_mat, dim=1, descending=True)[1]
+        sparse_affinity_mat = getSparseAffinityGraphMat(kneighbors_index, p_value)
+        dense_affinity_mat = getAffinityGraphMat(affinity_mat, p_value).float()
+        assert torch.equal(sparse_affinity_mat.to_dense(), dense_affinity_mat)
+        assert torch.allclose(getSparseLaplacian(sparse_affinity_mat).to_dense(), getLaplacian(dense_affinity_mat))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("n_eigs", [1, 4])
+    @pytest.mark.parametrize("N", [5, 100])
+    def test_eig_decompose_sparse(self, n_eigs, N, seed=0):
+        torch.manual_seed(seed)
+        affinity_mat = getAffinityGraphMat(getCosAffinityMatrix(torch.randn(N, 16)), max(1, N // 10)).float()
+        lambdas, _ = eigDecompose(getLaplacian(affinity_mat.clone()), cuda=False, device=torch.device('cpu'))
+        sparse_lambdas, diffusion_map = eigDecomposeSparse(
+            getSparseLaplacian(affinity_mat.to_sparse()), n_eigs, cuda=False, device=torch.device('cpu')
+        )
+        assert diffusion_map.shape == (N, n_eigs)
+        assert torch.allclose(sparse_lambdas, lambdas[:n_eigs], atol=1e-4)
+
     @pytest.mark.unit
     @pytest.mark.parametrize("Y_aggr", [torch.tensor([0, 1, 0, 1])])
     @pytest.mark.parametrize("chunk_cluster_count, embeddings_per_chunk", [(2, 50)])
@@ -658,6 +760,79 @@ class TestSpeakerClustering:
     def test_offline_speaker_clustering_cpu(self, n_spks, total_sec, SSV, perturb_sigma, seed, jit_script, cuda=False):
         self.test_offline_speaker_clustering(n_spks, total_sec, SSV, perturb_sigma, seed, jit_script, cuda=cuda)
 
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize("n_spks", [2, 3])
+    @pytest.mark.parametrize("spk_dur, SSV, perturb_sigma, seed", [(140, 10, 0.1, 0)])
+    @pytest.mark.parametrize("jit_script", [False, True])
+    @pytest.mark.parametrize("coarse_to_fine_search", [False, True])
+    def test_offline_speaker_clustering_sparse_cpu(
+        self, n_spks, spk_dur, SSV, perturb_sigma, seed, jit_script, coarse_to_fine_search
+    ):
+        em, ts, mc, mw, spk_ts, gt = generate_toy_data(
+            n_spks=n_spks, spk_dur=spk_dur, perturb_sigma=perturb_sigma, torch_seed=seed
+        )
+        offline_speaker_clustering = SpeakerClustering(
+            maj_vote_spk_count=False, sparse_affinity=True, coarse_to_fine_search=coarse_to_fine_search, cuda=False
+        )
+        if jit_script:
+            offline_speaker_clustering = torch.jit.script(offline_speaker_clustering)
+        # The sparse affinity graph is only used for sessions longer than `nme_mat_size`
+        assert mc[-1] > 512
+        Y_out = offline_speaker_clustering.forward_infer(
+            embeddings_in_scales=em,
+            timestamps_in_scales=ts,
+            multiscale_segment_counts=mc,
+            multiscale_weights=mw,
+            oracle_num_speakers=-1,
+            max_num_speakers=8,
+            enhanced_count_thres=40,
+            sparse_search_volume=SSV,
+            max_rp_threshold=0.15,
+            fixed_thres=-1.0,
+        )
+        permuted_Y = stitch_cluster_labels(Y_old=gt, Y_new=Y_out)
+        permuted_Y = permuted_Y.to(gt.device)
+        # mc[-1] is the number of base scale segments
+        assert len(set(permuted_Y.tolist())) == n_spks
+        assert Y_out.shape[0] == mc[-1]
+        assert all(permuted_Y == gt)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize("n_spks_list", [[1, 2, 3, 4], [5, 3, 2]])
+    @pytest.mark.parametrize("total_sec, SSV, perturb_sigma, seed", [(30, 10, 0.1, 0)])
+    @pytest.mark.parametrize("coarse_to_fine_search", [False, True])
+    def test_offline_speaker_clustering_batch_cpu(
+        self, n_spks_list, total_sec, SSV, perturb_sigma, seed, coarse_to_fine_search
+    ):
+        sessions = [
+            generate_toy_data(n_spks=n_spks, spk_dur=total_sec / n_spks, perturb_sigma=perturb_sigma, torch_seed=seed)
+            for n_spks in n_spks_list
+        ]
+        offline_speaker_clustering = SpeakerClustering(
+            maj_vote_spk_count=False, coarse_to_fine_search=coarse_to_fine_search, cuda=False
+        )
+        Y_out_list = offline_speaker_clustering.forward_batch_infer(
+            embeddings_in_scales_list=[session[0] for session in sessions],
+            timestamps_in_scales_list=[session[1] for session in sessions],
+            multiscale_segment_counts_list=[session[2] for session in sessions],
+            multiscale_weights_list=[session[3] for session in sessions],
+            oracle_num_speakers_list=[-1] * len(sessions),
+            max_num_speakers=8,
+            enhanced_count_thres=40,
+            sparse_search_volume=SSV,
+            max_rp_threshold=0.15,
+            fixed_thres=-1.0,
+        )
+        assert len(Y_out_list) == len(sessions)
+        for n_spks, (em, ts, mc, mw, spk_ts, gt), Y_out in zip(n_spks_list, sessions, Y_out_list):
+            permuted_Y = stitch_cluster_labels(Y_old=gt, Y_new=Y_out)
+            permuted_Y = permuted_Y.to(gt.device)
+            assert len(set(permuted_Y.tolist())) == n_spks
+            assert Y_out.shape[0] == mc[-1]
+            assert all(permuted_Y == gt)
+
     @pytest.mark.run_only_on('CPU')
     @pytest.mark.unit
     @pytest.mark.parametrize("n_spks", [1])
@@ -0,0 +1,118 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from nemo.collections.asr.parts.preprocessing.audio_bank import AudioBank
+from nemo.collections.asr.parts.preprocessing.perturb import ImpulsePerturbation, NoisePerturbation
+from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
+from nemo.collections.common.parts.preprocessing import collections, parsers
+
+
+class TestAudioBank:
+    sample_rate = 16000
+
+    def write_manifest(self, test_dir, items, name='manifest.json'):
+        manifest_file = os.path.join(test_dir, name)
+        with open(manifest_file, 'w') as fout:
+            for item in items:
+                fout.write(f'{json.dumps(item)}\n')
+        return manifest_file
+
+    def write_audio(self, test_dir, name, samples, sample_rate=None):
+        audio_file = os.path.join(test_dir, name)
+        sf.write(audio_file, samples, sample_rate or self.sample_rate, 'float')
+        return audio_file
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("use_bank_dir", [False, True])
+    def test_audio_bank(self, use_bank_dir):
+        with tempfile.TemporaryDirectory() as test_dir:
+            items = []
+            for i, (orig_sr, num_samples) in enumerate([(16000, 8000), (8000, 12000), (16000, 3000)]):
+                audio_file = self.write_audio(test_dir, f'{i}.wav', np.random.rand(num_samples) - 0.5, orig_sr)
+                items.append({'audio_filepath': audio_file, 'duration': 0.1, 'offset': 0.05 * i, 'text': ''})
+            manifest = collections.ASRAudioText(
+                self.write_manifest(test_dir, items), parser=parsers.make_parser([]), index_by_file_id=True
+            )
+            bank_dir = os.path.join(test_dir, 'bank') if use_bank_dir else None
+
+            bank = AudioBank(manifest, self.sample_rate, bank_dir=bank_dir)
+
+            assert len(bank) == len(items)
+            assert bank.sample_rate == self.sample_rate
+            for i, item in enumerate(items):
+                golden = AudioSegment.from_file(
+                    item['audio_filepath'], target_sr=self.sample_rate, offset=item['offset'], duration=0.1
+                )
+                assert np.array_equal(bank[i], golden.samples)
+                assert bank.rms_db(i) == pytest.approx(golden.rms_db)
+
+            if use_bank_dir:
+                assert isinstance(bank[0].base, np.memmap)
+                assert len(os.listdir(bank_dir)) == 2
+                # loaded from the saved bank, and pickled without the samples
+                loaded = pickle.loads(pickle.dumps(AudioBank(manifest, self.sample_rate, bank_dir=bank_dir)))
+                assert len(pickle.dumps(loaded)) < bank[0].nbytes
+                assert len(os.listdir(bank_dir)) == 2
+                for i in range(len(items)):
+                    assert np.array_equal(loaded[i], bank[i])
+
+    @pytest.mark.unit
+    def test_noise_perturb_with_bank(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            noise_file = self.write_audio(test_dir, 'noise.wav', np.random.rand(3 * self.sample_rate) - 0.5)
+            manifest_file = self.write_manifest(test_dir, [{'audio_filepath': noise_file, 'duration': 3.0}])
+            perturber = NoisePerturbation(
+                manifest_file, min_snr_db=10, max_snr_db=10, bank_sample_rate=self.sample_rate
+            )
+            samples = np.random.rand(self.sample_rate) - 0.5
+            audio = AudioSegment(samples, self.sample_rate)
+            data_rms = audio.rms_db
+
+            perturber.perturb(audio)
+
+            # the bank is not modified
+            assert np.array_equal(perturber._bank[0], AudioSegment.from_file(noise_file).samples)
+
+        noise = audio.samples - samples.astype(np.float32)
+        noise_rms = 10 * np.log10(np.mean(noise ** 2))
+        assert data_rms - noise_rms == pytest.approx(10, abs=0.5)
+
+    @pytest.mark.unit
+    def test_impulse_perturb_with_bank(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            impulse = np.zeros(800)
+            impulse[[20, 100, 500]] = [0.5, 1.0, 0.25]
+            impulse_file = self.write_audio(test_dir, 'impulse.wav', impulse)
+            manifest_file = self.write_manifest(test_dir, [{'audio_filepath': impulse_file, 'duration': 0.05}])
+            samples = np.random.rand(self.sample_rate) - 0.5
+
+            perturbed = []
+            for bank_sample_rate in [None, self.sample_rate]:
+                perturber = ImpulsePerturbation(
+                    manifest_file, normalize_impulse=True, shift_impulse=True, bank_sample_rate=bank_sample_rate
+                )
+                audio = AudioSegment(samples, self.sample_rate)
+                perturber.perturb(audio)
+                perturbed.append(audio.samples)
+
+        assert np.array_equal(perturbed[0], perturbed[1])
@@ -0,0 +1,230 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from nemo.collections.asr.parts.preprocessing.batch_perturb import (
+    BatchAudioAugmentor,
+    BatchGainPerturbation,
+    BatchImpulsePerturbation,
+    BatchNoisePerturbation,
+    BatchShiftPerturbation,
+    BatchSilencePerturbation,
+    BatchSpeedPerturbation,
+    BatchWhiteNoisePerturbation,
+    process_batch_augmentations,
+    resample_batch,
+)
+from nemo.collections.asr.parts.preprocessing.perturb import (
+    GainPerturbation,
+    ImpulsePerturbation,
+    ShiftPerturbation,
+    SilencePerturbation,
+)
+from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
+
+
+class TestBatchPerturbation:
+    sample_rate = 16000
+    lengths = [16000, 9000, 0, 12345]
+
+    def get_batch(self):
+        audio = torch.zeros(len(self.lengths), max(self.lengths))
+        for i, length in enumerate(self.lengths):
+            audio[i, :length] = torch.rand(length) - 0.5
+        return audio, torch.tensor(self.lengths)
+
+    def assert_padding_is_zero(self, audio, audio_len):
+        for i in range(audio.shape[0]):
+            assert torch.all(audio[i, audio_len[i] :] == 0)
+
+    def perturb_segments(self, audio, perturber):
+        """Applies a per-sample perturbation to each utterance of the batch."""
+        perturbed = []
+        for i, length in enumerate(self.lengths):
+            segment = AudioSegment(audio[i, :length].numpy().copy(), self.sample_rate)
+            if length > 0:
+                perturber.perturb(segment)
+            perturbed.append(torch.tensor(segment.samples))
+        return perturbed
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("new_sample_rate", [8000, 15200, 22050])
+    def test_resample_batch(self, new_sample_rate):
+        time = torch.arange(self.sample_rate, dtype=torch.float64) / self.sample_rate
+        audio = torch.stack([torch.sin(2 * np.pi * 440 * time), torch.cos(2 * np.pi * 1000 * time)]).float()
+
+        resampled = resample_batch(audio, self.sample_rate, new_sample_rate)
+
+        assert resampled.shape == (2, new_sample_rate)
+        new_time = torch.arange(new_sample_rate, dtype=torch.float64) / new_sample_rate
+        expected = torch.stack([torch.sin(2 * np.pi * 440 * new_time), torch.cos(2 * np.pi * 1000 * new_time)])
+        # ignore the edges, where the filter sees the zero padding
+        edge = new_sample_rate // 100
+        assert torch.allclose(resampled[:, edge:-edge].double(), expected[:, edge:-edge], atol=1e-3)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("num_rates", [5, -1])
+    def test_speed_perturb(self, num_rates):
+        audio, audio_len = self.get_batch()
+        mask = torch.tensor([True, True, True, False])
+        perturber = BatchSpeedPerturbation(self.sample_rate, 'kaiser_fast', num_rates=num_rates, rng=0)
+
+        perturbed, perturbed_len = perturber.perturb(audio, audio_len, mask)
+
+        rates = perturbed_len[:2] / audio_len[:2]
+        assert torch.all((rates > 0.89) & (rates < 1.11))
+        assert perturbed_len[2] == 0
+        assert perturbed_len[3] == audio_len[3]
+        assert torch.equal(perturbed[3, : audio_len[3]], audio[3, : audio_len[3]])
+        assert perturbed.shape[1] == perturbed_len.max()
+        self.assert_padding_is_zero(perturbed, perturbed_len)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("shift_ms", [-5.0, 5.0])
+    def test_shift_perturb(self, shift_ms):
+        audio, audio_len = self.get_batch()
+        mask = torch.tensor([True, True, True, False])
+        perturber = BatchShiftPerturbation(shift_ms, shift_ms, sample_rate=self.sample_rate)
+
+        perturbed, perturbed_len = perturber.perturb(audio, audio_len, mask)
+
+        expected = self.perturb_segments(audio, ShiftPerturbation(shift_ms, shift_ms))
+        assert torch.equal(perturbed_len, audio_len)
+        for i in range(3):
+            assert torch.equal(perturbed[i, : audio_len[i]], expected[i])
+        assert torch.equal(perturbed[3], audio[3])
+        self.assert_padding_is_zero(perturbed, perturbed_len)
+
+    @pytest.mark.unit
+    def test_gain_perturb(self):
+        audio, audio_len = self.get_batch()
+        mask = torch.ones(len(self.lengths), dtype=torch.bool)
+        perturber = BatchGainPerturbation(min_gain_dbfs=6, max_gain_dbfs=6)
+
+        perturbed, _ = perturber.perturb(audio, audio_len, mask)
+
+        expected = self.perturb_segments(audio, GainPerturbation(min_gain_dbfs=6, max_gain_dbfs=6))
+        for i in range(len(self.lengths)):
+            assert torch.allclose(perturbed[i, : audio_len[i]], expected[i])
+
+    @pytest.mark.unit
+    def test_silence_perturb(self):
+        audio, audio_len = self.get_batch()
+        mask = torch.ones(len(self.lengths), dtype=torch.bool)
+        kwargs = dict(min_start_silence_secs=0.1, max_start_silence_secs=0.1, value=0.25)
+        kwargs.update(min_end_silence_secs=0.2, max_end_silence_secs=0.2)
+        perturber = BatchSilencePerturbation(**kwargs, sample_rate=self.sample_rate)
+
+        perturbed, perturbed_len = perturber.perturb(audio, audio_len, mask)
+
+        expected = self.perturb_segments(audio, SilencePerturbation(**kwargs))
+        for i in range(len(self.lengths)):
+            if self.lengths[i] > 0:
+                assert perturbed_len[i] == len(expected[i])
+                assert torch.allclose(perturbed[i, : perturbed_len[i]], expected[i].float())
+        self.assert_padding_is_zero(perturbed, perturbed_len)
+
+    @pytest.mark.unit
+    def test_white_noise_perturb(self):
+        audio, audio_len = self.get_batch()
+        mask = torch.tensor([True, False, True, True])
+        perturber = BatchWhiteNoisePerturbation(min_level=-50, max_level=-40)
+
+        perturbed, _ = perturber.perturb(audio, audio_len, mask)
+
+        noise = perturbed - audio
+        assert torch.all(noise[1] == 0)
+        noise_level_db = 20 * torch.log10(noise[0, : audio_len[0]].std())
+        assert -51 < noise_level_db < -40
+        self.assert_padding_is_zero(perturbed, audio_len)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("normalize_impulse", [False, True])
+    def test_impulse_perturb(self, normalize_impulse):
+        audio, audio_len = self.get_batch()
+        mask = torch.tensor([True, True, True, False])
+        with tempfile.TemporaryDirectory() as test_dir:
+            impulse = np.zeros(800)
+            impulse[[20, 100, 500]] = [0.5, 1.0, 0.25]
+            impulse_file = os.path.join(test_dir, 'impulse.wav')
+            sf.write(impulse_file, impulse, self.sample_rate, 'float')
+            manifest_file = os.path.join(test_dir, 'impulse_manifest.json')
+            with open(manifest_file, 'w') as fout:
+                item = {'audio_filepath': impulse_file, 'duration': 0.05, 'text': ''}
+                fout.write(f'{json.dumps(item)}\n')
+
+            kwargs = dict(manifest_path=manifest_file, normalize_impulse=normalize_impulse, shift_impulse=True)
+            perturber = BatchImpulsePerturbation(**kwargs, sample_rate=self.sample_rate)
+            perturbed, _ = perturber.perturb(audio, audio_len, mask)
+
+            expected = self.perturb_segments(audio, ImpulsePerturbation(**kwargs))
+
+        for i in range(2):
+            assert torch.allclose(perturbed[i, : audio_len[i]], expected[i].float(), atol=1e-5)
+        assert torch.equal(perturbed[3], audio[3])
+        self.assert_padding_is_zero(perturbed, audio_len)
+
+    @pytest.mark.unit
+    def test_noise_perturb(self):
+        audio, audio_len = self.get_batch()
+        mask = torch.tensor([True, True, False, True])
+        with tempfile.TemporaryDirectory() as test_dir:
+            noise_file = os.path.join(test_dir, 'noise.wav')
+            sf.write(noise_file, np.random.rand(10000) - 0.5, self.sample_rate, 'float')
+            manifest_file = os.path.join(test_dir, 'noise_manifest.json')
+            with open(manifest_file, 'w') as fout:
+                item = {'audio_filepath': noise_file, 'duration': 10000 / self.sample_rate, 'text': ''}
+                fout.write(f'{json.dumps(item)}\n')
+
+            perturber = BatchNoisePerturbation(
+                manifest_file, min_snr_db=10, max_snr_db=10, sample_rate=self.sample_rate, rng=0
+            )
+            perturbed, _ = perturber.perturb(audio, audio_len, mask)
+
+        noise = perturbed - audio
+        assert torch.all(noise[2] == 0)
+        for i in [0, 1, 3]:
+            # noise shorter than the utterance is added once, at a random position
+            num_noisy = int((noise[i, : audio_len[i]] != 0).sum())
+            assert num_noisy == min(10000, self.lengths[i])
+        self.assert_padding_is_zero(perturbed, audio_len)
+
+    @pytest.mark.unit
+    def test_process_batch_augmentations(self):
+        config = {
+            'speed': {'prob': 0.5, 'sr': self.sample_rate, 'resample_type': 'kaiser_fast'},
+            'shift': {'prob': 0.5, 'min_shift_ms': -5.0, 'max_shift_ms': 5.0},
+            'white_noise': {'prob': 1.0, 'min_level': -90, 'max_level': -46},
+        }
+        augmentor = process_batch_augmentations(config, sample_rate=self.sample_rate)
+        assert isinstance(augmentor, BatchAudioAugmentor)
+        assert augmentor.max_augmentation_length(1.0) == pytest.approx(1.1)
+
+        audio, audio_len = self.get_batch()
+        perturbed, perturbed_len = augmentor(audio, audio_len)
+        assert perturbed.shape == (len(self.lengths), perturbed_len.max())
+        self.assert_padding_is_zero(perturbed, perturbed_len)
+
+        with pytest.raises(KeyError):
+            process_batch_augmentations({'white_noise': {'min_level': -90}})
+        with pytest.raises(KeyError):
+            process_batch_augmentations({'transcode_aug': {'prob': 1.0}})
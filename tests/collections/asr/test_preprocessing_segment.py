@@ -14,6 +14,7 @@
 
 import json
 import os
+import shutil
 import tempfile
 from typing import List, Type, Union
 
@@ -21,7 +22,15 @@ import numpy as np
 import pytest
 import soundfile as sf
 
-from nemo.collections.asr.parts.preprocessing.perturb import NoisePerturbation, SilencePerturbation
+from nemo.collections.asr.parts.preprocessing import segment
+from nemo.collections.asr.parts.preprocessing.perturb import (
+    HAVE_SF_VORBIS,
+    NoisePerturbation,
+    SilencePerturbation,
+    TranscodePerturbation,
+    g711_alaw,
+)
+from nemo.collections.asr.parts.preprocessing.resample import _polyphase_filter, get_resampler
 from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.asr.parts.utils.audio_utils import select_channels
 
@@ -123,6 +132,144 @@ class TestAudioSegment:
             max_diff = np.max(np.abs(uut.samples - golden_samples))
             assert max_diff < self.max_diff_tol
 
+    @pytest.mark.unit
+    @pytest.mark.skipif(
+        not segment.HAVE_PYDUB or shutil.which(segment.Audio.converter) is None, reason="ffmpeg is not installed"
+    )
+    @pytest.mark.parametrize("decode_cache_mb", [0, 10])
+    def test_from_file_ffmpeg_segments(self, monkeypatch, decode_cache_mb):
+        """Test loading segments of a file decoded with ffmpeg, with and without the decoded audio cache.
+        """
+        with tempfile.TemporaryDirectory() as test_dir:
+            audio_file = os.path.join(test_dir, 'audio.wav')
+            samples = np.random.rand(self.num_samples, 2) - 0.5
+            sf.write(audio_file, samples, self.sample_rate, 'PCM_16')
+            segments = [(0.5, 0.25), (1.0, 0.5), (1.5, 0)]
+            golden = [
+                AudioSegment.from_file(audio_file, offset=offset, duration=duration) for offset, duration in segments
+            ]
+
+            # decode the wav file with ffmpeg instead of soundfile
+            monkeypatch.setattr(segment, 'sf_supported_formats', [])
+            num_decodes = 0
+            decode_with_ffmpeg = segment._decode_with_ffmpeg
+
+            def counting_decode_with_ffmpeg(*args, **kwargs):
+                nonlocal num_decodes
+                num_decodes += 1
+                return decode_with_ffmpeg(*args, **kwargs)
+
+            monkeypatch.setattr(segment, '_decode_with_ffmpeg', counting_decode_with_ffmpeg)
+            monkeypatch.setattr(segment, '_decoded_audio_cache', segment._DecodedAudioCache())
+
+            for (offset, duration), golden_segment in zip(segments, golden):
+                uut = AudioSegment.from_file(
+                    audio_file, offset=offset, duration=duration, decode_cache_mb=decode_cache_mb
+                )
+                assert uut == golden_segment
+
+            assert num_decodes == (1 if decode_cache_mb > 0 else len(segments))
+
+            # file objects are piped to ffmpeg
+            with open(audio_file, 'rb') as f:
+                samples, sample_rate = decode_with_ffmpeg(f, offset=segments[1][0], duration=segments[1][1])
+            assert sample_rate == self.sample_rate
+            assert np.array_equal(samples, golden[1].samples)
+
+    @pytest.mark.unit
+    def test_decoded_audio_cache_eviction(self, monkeypatch):
+        """Test the decoded audio cache evicts the least recently used files.
+        """
+        decoded = []
+        monkeypatch.setattr(
+            segment,
+            '_decode_with_ffmpeg',
+            lambda audio_file: decoded.append(audio_file) or (np.zeros(2 ** 18, dtype=np.int16), self.sample_rate),
+        )
+        cache = segment._DecodedAudioCache()
+        with tempfile.TemporaryDirectory() as test_dir:
+            audio_files = [os.path.join(test_dir, f'{i}.m4a') for i in range(3)]
+            for audio_file in audio_files:
+                open(audio_file, 'w').close()
+            # each file is 0.5 MB
+            for i in [0, 1, 0, 2, 0, 1]:
+                samples, _ = cache.decode(audio_files[i], max_mb=1)
+                assert not samples.flags.writeable
+
+        assert decoded == [audio_files[i] for i in [0, 1, 2, 1]]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("resampler", ['librosa', 'soxr', 'polyphase'])
+    @pytest.mark.parametrize("target_sr", [8000, 22050])
+    def test_resample(self, resampler, target_sr):
+        """Test resampling a two-channel sinusoid with each resampler.
+        """
+        time = np.arange(self.num_samples) / self.sample_rate
+        samples = np.stack([np.sin(2 * np.pi * 440 * time), np.cos(2 * np.pi * 1000 * time)], axis=1)
+
+        uut = AudioSegment(samples, self.sample_rate, target_sr=target_sr, resampler=resampler)
+
+        assert uut.sample_rate == target_sr
+        assert uut.num_channels == 2
+        assert uut.samples.dtype == np.float32
+        assert uut.num_samples == self.signal_duration_sec * target_sr
+        new_time = np.arange(uut.num_samples) / target_sr
+        golden_samples = np.stack([np.sin(2 * np.pi * 440 * new_time), np.cos(2 * np.pi * 1000 * new_time)], axis=1)
+        # ignore the edges, where the filters see the signal boundary
+        edge = target_sr // 50
+        max_diff = np.max(np.abs(uut.samples[edge:-edge] - golden_samples[edge:-edge]))
+        assert max_diff < 1e-2
+
+    @pytest.mark.unit
+    def test_polyphase_filter_cache(self):
+        """Test the polyphase resampler designs its filter once per pair of sample rates.
+        """
+        _polyphase_filter.cache_clear()
+        resampler = get_resampler('polyphase')
+        assert get_resampler('polyphase') is resampler
+        for _ in range(3):
+            resampler(np.random.rand(self.num_samples).astype(np.float32), self.sample_rate, 8000)
+            resampler(np.random.rand(self.num_samples).astype(np.float32), 44100, self.sample_rate)
+        cache_info = _polyphase_filter.cache_info()
+        assert cache_info.misses == 2
+        assert cache_info.hits == 4
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("channel_selector", [None, 'average'])
+    def test_from_file_resample_cache(self, channel_selector):
+        """Test loading resampled audio from the cache gives the same signal as resampling the file.
+        """
+        orig_sr = 22050
+        target_sr = self.sample_rate
+        with tempfile.TemporaryDirectory() as test_dir:
+            audio_file = os.path.join(test_dir, 'audio.wav')
+            sf.write(audio_file, np.random.rand(orig_sr, 2) - 0.5, orig_sr, 'float')
+            cache_dir = os.path.join(test_dir, 'cache')
+            kwargs = dict(target_sr=target_sr, offset=0.1, duration=0.5, channel_selector=channel_selector)
+
+            golden = AudioSegment.from_file(audio_file, **kwargs)
+            uut = AudioSegment.from_file(audio_file, resample_cache_dir=cache_dir, **kwargs)
+            cache_files = [os.path.join(root, f) for root, _, files in os.walk(cache_dir) for f in files]
+            assert len(cache_files) == 1
+            assert uut == golden
+
+            # loaded from the cache
+            cached = AudioSegment.from_file(audio_file, resample_cache_dir=cache_dir, **kwargs)
+            assert cached == golden
+            assert cached.orig_sr == golden.orig_sr
+
+            # a different offset, or a different resampler, is not loaded from the cache
+            AudioSegment.from_file(audio_file, resample_cache_dir=cache_dir, **{**kwargs, 'offset': 0.2})
+            AudioSegment.from_file(audio_file, resample_cache_dir=cache_dir, resampler='polyphase', **kwargs)
+            cache_files = [os.path.join(root, f) for root, _, files in os.walk(cache_dir) for f in files]
+            assert len(cache_files) == 3
+
+            # audio at the target sample rate is not cached
+            sf.write(audio_file, np.random.rand(target_sr, 2) - 0.5, target_sr, 'float')
+            AudioSegment.from_file(audio_file, resample_cache_dir=cache_dir, **kwargs)
+            cache_files = [os.path.join(root, f) for root, _, files in os.walk(cache_dir) for f in files]
+            assert len(cache_files) == 3
+
     @pytest.mark.unit
     @pytest.mark.parametrize("data_channels", [1, 4])
     @pytest.mark.parametrize("noise_channels", [1, 4])
@@ -201,3 +348,45 @@ class TestAudioSegment:
             _ = perturber.perturb(audio)
 
             assert len(audio._samples) == ori_audio_len + 2 * dur * self.sample_rate
+
+    @pytest.mark.unit
+    def test_g711_alaw(self):
+        """Test G.711 A-law encoding and decoding of all 16-bit values.
+        """
+        pcm = np.arange(-(2 ** 15), 2 ** 15)
+        decoded = g711_alaw(pcm / 2 ** 15) * 2 ** 15
+
+        # 256 levels, at the center of each quantization interval
+        levels = np.unique(decoded)
+        assert len(levels) == 256
+        assert np.all(levels == np.round(levels))
+        assert levels[levels > 0].min() == 8 and levels.max() == 32256
+        # the quantization error is below half of the step size, from 16 up to 1024
+        step = np.maximum(16, 2 ** np.floor(np.log2(np.maximum(np.abs(pcm), 1))) / 16)
+        assert np.all(np.abs(decoded - pcm) <= step / 2)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "codec",
+        [
+            "g711",
+            pytest.param("ogg", marks=pytest.mark.skipif(not HAVE_SF_VORBIS, reason="libsndfile without vorbis")),
+        ],
+    )
+    def test_transcode_perturb(self, codec):
+        """Test transcoding keeps the length of the signal, and G711 band-limits it to 300-3400 Hz.
+        """
+        time = np.arange(self.num_samples) / self.sample_rate
+        samples = 0.5 * np.sin(2 * np.pi * 1000 * time) + 0.5 * np.sin(2 * np.pi * 7000 * time)
+        audio = AudioSegment(samples, self.sample_rate)
+
+        TranscodePerturbation(codecs=[codec]).perturb(audio)
+
+        assert audio.num_samples == self.num_samples
+        assert audio.samples.dtype == np.float32
+        spectrum = np.abs(np.fft.rfft(audio.samples))
+        freq = np.fft.rfftfreq(self.num_samples, 1 / self.sample_rate)
+        # the 1 kHz tone is kept, with the amplitude attenuated to avoid saturation
+        assert spectrum[freq == 1000] > 0.1 * self.num_samples
+        if codec == "g711":
+            assert spectrum[freq == 1000] > 100 * spectrum[freq == 7000]
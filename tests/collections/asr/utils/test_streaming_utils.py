@@ -0,0 +1,327 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from omegaconf import DictConfig, OmegaConf
+
+from nemo.collections.asr.models import EncDecCTCModel
+from nemo.collections.asr.parts.utils.streaming_utils import (
+    AsyncCacheAwareStreamingServer,
+    BatchedFeatureFrameBufferer,
+    CacheAwareStreamingAudioBuffer,
+    CacheAwareStreamingSessionManager,
+    FeatureFrameBufferer,
+    _ring_buffer_read,
+    _ring_buffer_write,
+    lcs_alignment_merge_buffer,
+    longest_common_subsequence_merge,
+)
+
+
+def get_common_suffix_lengths(X, Y):
+    table = [[0 for _ in range(len(Y) + 1)] for _ in range(len(X) + 1)]
+    for i in range(1, len(X) + 1):
+        for j in range(1, len(Y) + 1):
+            if X[i - 1] == Y[j - 1]:
+                table[i][j] = table[i - 1][j - 1] + 1
+    return np.array(table)
+
+
+def get_asr_model(n_feat=8, window_stride=0.01):
+    cfg = OmegaConf.create(
+        {'sample_rate': 16000, 'preprocessor': {'window_stride': window_stride, 'features': n_feat}}
+    )
+    return SimpleNamespace(preprocessor=SimpleNamespace(log=True), _cfg=cfg)
+
+
+@pytest.fixture()
+def streaming_asr_model():
+    preprocessor = {
+        '_target_': 'nemo.collections.asr.modules.AudioToMelSpectrogramPreprocessor',
+        'features': 16,
+        'normalize': 'NA',
+    }
+    encoder = {
+        '_target_': 'nemo.collections.asr.modules.ConformerEncoder',
+        'feat_in': 16,
+        'n_layers': 2,
+        'd_model': 32,
+        'n_heads': 2,
+        'subsampling': 'dw_striding',
+        'subsampling_factor': 4,
+        'subsampling_conv_channels': 16,
+        'causal_downsampling': True,
+        'att_context_size': [9, 2],
+        'att_context_style': 'chunked_limited',
+        'conv_kernel_size': 5,
+        'conv_context_size': 'causal',
+        'conv_norm_type': 'layer_norm',
+    }
+    decoder = {
+        '_target_': 'nemo.collections.asr.modules.ConvASRDecoder',
+        'feat_in': 32,
+        'num_classes': 6,
+        'vocabulary': [' ', 'a', 'b', 'c', 'd', 'e'],
+    }
+    modelConfig = DictConfig(
+        {'preprocessor': DictConfig(preprocessor), 'encoder': DictConfig(encoder), 'decoder': DictConfig(decoder)}
+    )
+    return EncDecCTCModel(cfg=modelConfig).eval()
+
+
+def transcribe_with_streaming_buffer(asr_model, audio):
+    streaming_buffer = CacheAwareStreamingAudioBuffer(asr_model, pad_and_drop_preencoded=True)
+    streaming_buffer.append_audio(audio)
+    cache_last_channel, cache_last_time, cache_last_channel_len = asr_model.encoder.get_initial_cache_state()
+    pred_out_stream = None
+    for chunk_audio, chunk_lengths in streaming_buffer:
+        with torch.inference_mode():
+            (
+                pred_out_stream,
+                transcribed_texts,
+                cache_last_channel,
+                cache_last_time,
+                cache_last_channel_len,
+                _,
+            ) = asr_model.conformer_stream_step(
+                processed_signal=chunk_audio,
+                processed_signal_length=chunk_lengths,
+                cache_last_channel=cache_last_channel,
+                cache_last_time=cache_last_time,
+                cache_last_channel_len=cache_last_channel_len,
+                keep_all_outputs=streaming_buffer.is_buffer_empty(),
+                previous_pred_out=pred_out_stream,
+                drop_extra_pre_encoded=asr_model.encoder.streaming_cfg.drop_extra_pre_encoded,
+            )
+    return pred_out_stream[0].tolist()
+
+
+class TestStreamingUtils:
+    @pytest.mark.unit
+    @pytest.mark.parametrize("vocab_size", [2, 5, 100])
+    def test_lcs_alignment_matrix(self, vocab_size):
+        rng = np.random.default_rng(0)
+        for m, n in [(0, 5), (5, 0), (1, 1), (7, 13), (40, 25)]:
+            X = rng.integers(vocab_size, size=m).tolist()
+            Y = rng.integers(vocab_size, size=n).tolist()
+            _, alignment = longest_common_subsequence_merge(X, Y)
+            assert np.array_equal(alignment, get_common_suffix_lengths(X, Y))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        ["buffer", "data", "result_idx", "merged"],
+        [
+            # complete merge
+            ([1, 2, 3, 4], [3, 4, 5, 6], [2, 0, 2], [1, 2, 3, 4, 5, 6]),
+            # complete merge with a mismatch at the start of the new chunk
+            ([1, 2, 3, 4], [7, 3, 4, 5, 6], [2, 1, 2], [1, 2, 3, 4, 5, 6]),
+            # no common tokens
+            ([1, 2], [3, 4], [2, 0, 0], [1, 2, 3, 4]),
+        ],
+    )
+    def test_lcs_merge(self, buffer, data, result_idx, merged):
+        assert longest_common_subsequence_merge(buffer, data)[0] == result_idx
+        assert lcs_alignment_merge_buffer(list(buffer), data, delay=2, model=None) == merged
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("frame_len", [3, 5, 10, 12])
+    def test_ring_buffer(self, frame_len):
+        rng = np.random.default_rng(0)
+        ring = np.zeros([2, 10])
+        shifted = np.zeros([2, 10])
+        pos = 0
+        for _ in range(7):
+            frame = rng.random([2, frame_len])
+            pos = _ring_buffer_write(ring, pos, frame)
+            shifted = np.concatenate([shifted, frame], axis=-1)[:, -10:]
+            assert np.array_equal(_ring_buffer_read(ring, pos), shifted)
+
+    @pytest.mark.unit
+    def test_feature_frame_bufferer(self):
+        n_feat, frame_len, buffer_len = 8, 16, 40
+        bufferer = FeatureFrameBufferer(get_asr_model(n_feat), frame_len=0.16, batch_size=3, total_buffer=0.4)
+        frames = [np.random.rand(n_feat, frame_len).astype(np.float32) for _ in range(7)]
+        bufferer.set_frame_reader(iter(frames))
+
+        buffers = []
+        while True:
+            frame_buffers = bufferer.get_buffers_batch()
+            if len(frame_buffers) == 0:
+                break
+            buffers += frame_buffers
+
+        # buffers of the shifted frames, normalized per feature
+        features = np.full([n_feat, buffer_len], -16.635, dtype=np.float32)
+        assert len(buffers) == len(frames)
+        for frame, frame_buffer in zip(frames, buffers):
+            features = np.concatenate([features, frame], axis=1)[:, -buffer_len:]
+            mean, std = features.mean(axis=1, keepdims=True), features.std(axis=1, keepdims=True)
+            assert np.allclose(frame_buffer, (features - mean) / (std + 1e-5), atol=1e-5)
+
+    @pytest.mark.unit
+    def test_batched_feature_frame_bufferer(self):
+        n_feat, frame_len = 8, 16
+        bufferer = BatchedFeatureFrameBufferer(get_asr_model(n_feat), frame_len=0.16, batch_size=2, total_buffer=0.4)
+        frames = [np.random.rand(n_feat, frame_len).astype(np.float32) for _ in range(7)]
+        single_bufferer = FeatureFrameBufferer(get_asr_model(n_feat), frame_len=0.16, batch_size=1, total_buffer=0.4)
+        single_bufferer.set_frame_reader(iter(frames))
+        bufferer.set_frame_reader(iter(frames), 0)
+        bufferer.set_frame_reader(iter(frames[:3]), 1)
+
+        for i in range(len(frames)):
+            frame_buffers = bufferer.get_buffers_batch()
+            # same buffers as a single stream, up to the normalization constant
+            assert np.allclose(frame_buffers[0][0], single_bufferer.get_buffers_batch()[0], atol=1e-4)
+        assert bufferer.signal_end_index == [None, 3]
+
+    @pytest.mark.unit
+    def test_cache_aware_streaming_session_manager(self, streaming_asr_model):
+        rng = np.random.default_rng(0)
+        audios = [rng.uniform(-0.5, 0.5, num_samples).astype(np.float32) for num_samples in [16000, 23456, 7000, 1200]]
+        expected = [transcribe_with_streaming_buffer(streaming_asr_model, audio) for audio in audios]
+
+        session_manager = CacheAwareStreamingSessionManager(streaming_asr_model, max_streams=2)
+        # streams join when a slot is free, and are fed audio of random sizes
+        streams = {}
+        predictions = {}
+        while len(streams) > 0 or len(predictions) < len(audios):
+            if len(session_manager) < session_manager.max_streams and len(streams) + len(predictions) < len(audios):
+                streams[session_manager.add_stream()] = [len(streams) + len(predictions), 0]
+            for stream_id, (audio_idx, num_fed) in streams.items():
+                if num_fed < len(audios[audio_idx]):
+                    num_samples = int(rng.integers(100, 3000))
+                    session_manager.append_audio(stream_id, audios[audio_idx][num_fed : num_fed + num_samples])
+                    streams[stream_id][1] += num_samples
+                    if streams[stream_id][1] >= len(audios[audio_idx]):
+                        session_manager.end_audio(stream_id)
+            sessions = dict(session_manager.sessions)
+            for stream_id, (_, is_final) in session_manager.step().items():
+                if is_final:
+                    predictions[streams.pop(stream_id)[0]] = sessions[stream_id].previous_pred_out.tolist()
+
+        assert len(session_manager) == 0
+        assert sorted(session_manager.free_slots) == [0, 1]
+        for audio_idx in range(len(audios)):
+            assert predictions[audio_idx] == expected[audio_idx]
+
+    @pytest.mark.unit
+    def test_async_cache_aware_streaming_server(self, streaming_asr_model):
+        rng = np.random.default_rng(0)
+        audios = [rng.uniform(-0.5, 0.5, num_samples).astype(np.float32) for num_samples in [16000, 7000, 9000]]
+
+        async def transcribe(server, audio):
+            stream_id = server.open_stream()
+            for start in range(0, len(audio), 1600):
+                server.feed(stream_id, audio[start : start + 1600])
+                await asyncio.sleep(0)
+            server.close_stream(stream_id)
+            return [result async for result in server.results(stream_id)]
+
+        async def serve():
+            server = AsyncCacheAwareStreamingServer(CacheAwareStreamingSessionManager(streaming_asr_model))
+            serve_task = asyncio.create_task(server.serve())
+            results = await asyncio.gather(*[transcribe(server, audio) for audio in audios])
+            server.stop()
+            await serve_task
+            return results
+
+        for results in asyncio.run(serve()):
+            assert len(results) > 1
+            assert [is_final for _, is_final in results] == [False] * (len(results) - 1) + [True]
+
+    @pytest.mark.unit
+    def test_async_cache_aware_streaming_server_late_consumer(self, streaming_asr_model):
+        rng = np.random.default_rng(0)
+        audio = rng.uniform(-0.5, 0.5, 7000).astype(np.float32)
+
+        async def serve():
+            server = AsyncCacheAwareStreamingServer(CacheAwareStreamingSessionManager(streaming_asr_model))
+            serve_task = asyncio.create_task(server.serve())
+            stream_id = server.open_stream()
+            results_iter = server.results(stream_id)
+            server.feed(stream_id, audio)
+            server.close_stream(stream_id)
+            # the consumer starts iterating after the stream has ended
+            while stream_id in server.queues:
+                await asyncio.sleep(0.01)
+            results = [result async for result in results_iter]
+            server.stop()
+            await serve_task
+            return results
+
+        results = asyncio.run(serve())
+        assert len(results) > 1
+        assert [is_final for _, is_final in results] == [False] * (len(results) - 1) + [True]
+
+    @pytest.mark.unit
+    def test_async_cache_aware_streaming_server_failures(self, streaming_asr_model):
+        rng = np.random.default_rng(0)
+        audio = rng.uniform(-0.5, 0.5, 7000).astype(np.float32)
+        session_manager = CacheAwareStreamingSessionManager(streaming_asr_model)
+        final_step_started, cancelled = threading.Event(), threading.Event()
+        step = session_manager.step
+
+        def final_step():
+            # the step which finalizes a stream waits until the stream is cancelled
+            results = step()
+            if any(is_final for _, is_final in results.values()) and not cancelled.is_set():
+                final_step_started.set()
+                cancelled.wait()
+            return results
+
+        session_manager.step = final_step
+
+        async def serve():
+            server = AsyncCacheAwareStreamingServer(session_manager)
+            serve_task = asyncio.create_task(server.serve())
+
+            cancelled_id = server.open_stream()
+            server.feed(cancelled_id, audio)
+            server.close_stream(cancelled_id)
+            with pytest.raises(ValueError):
+                server.feed(cancelled_id, audio)
+            while not final_step_started.is_set():
+                await asyncio.sleep(0.01)
+            server.cancel_stream(cancelled_id)
+            cancelled.set()
+
+            # a failed operation ends its stream only
+            failed_id = server.open_stream()
+            server.feed(failed_id, "not audio")
+            stream_id = server.open_stream()
+            server.feed(stream_id, audio)
+            server.close_stream(stream_id)
+            with pytest.raises(ValueError):
+                _ = [result async for result in server.results(failed_id)]
+            results = [result async for result in server.results(stream_id)]
+            for unknown_id in [cancelled_id, failed_id, stream_id, 100]:
+                with pytest.raises(ValueError):
+                    server.close_stream(unknown_id)
+
+            # the cancelled stream was removed by its final step before the queued removal
+            assert not serve_task.done()
+            server.stop()
+            await serve_task
+            return results
+
+        results = asyncio.run(serve())
+        assert results[-1][1]
+        assert len(session_manager) == 0
+        assert sorted(session_manager.free_slots) == list(range(session_manager.max_streams))
@@ -12,19 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+
 import numpy as np
 import pytest
+import torch
 from pyannote.core import Annotation, Segment
+from pyannote.metrics.detection import DetectionErrorRate
 
 from nemo.collections.asr.parts.utils.vad_utils import (
     align_labels_to_frames,
+    binarization,
+    binarization_packed,
     convert_labels_to_speech_segments,
+    filtering,
+    filtering_packed,
     frame_vad_construct_pyannote_object_per_file,
+    generate_overlap_vad_seq,
+    generate_overlap_vad_seq_in_memory,
+    generate_overlap_vad_seq_per_tensor,
+    generate_vad_segment_table,
+    generate_vad_segment_table_in_memory,
+    get_detection_error_packed,
     get_frame_labels,
     get_nonspeech_segments,
     load_speech_overlap_segments_from_rttm,
     load_speech_segments_from_rttm,
+    load_tensor_from_file,
+    merge_overlap_segment,
     read_rttm_as_pyannote_object,
+    vad_tune_threshold_on_dev,
 )
 
 
@@ -54,6 +71,22 @@ def get_simple_rttm_with_silence(rttm_file="test3.rttm"):
     return rttm_file, speech_segments, silence_segments
 
 
+def get_overlap_vad_seq_reference(frame, window_length_in_sec, shift_length_in_sec, overlap, smoothing_method):
+    """Smooth the predictions by collecting the predictions of all windows covering each 10ms unit."""
+    shift = int(shift_length_in_sec / 0.01)
+    seg = int(window_length_in_sec / 0.01 + 1)
+    jump_on_frame = int(int(seg * (1 - overlap)) / shift)
+    target_len = len(frame) * shift
+    window_preds = [[] for _ in range(target_len)]
+    for i in range(0, len(frame), jump_on_frame):
+        for j in range(i * shift, min(i * shift + seg, target_len)):
+            window_preds[j].append(frame[i])
+    reduce = torch.mean if smoothing_method == 'mean' else lambda x: torch.quantile(x, q=0.5)
+    preds = [reduce(torch.stack(x)) if x else None for x in window_preds]
+    last_pred = [x for x in preds if x is not None][-1]
+    return torch.stack([last_pred if x is None else x for x in preds])
+
+
 class TestVADUtils:
     @pytest.mark.parametrize(["logits_len", "labels_len"], [(20, 10), (20, 11), (20, 9), (10, 21), (10, 19)])
     @pytest.mark.unit
@@ -124,3 +157,131 @@ class TestVADUtils:
         assert speech_segments_new == speech_segments
         ref, hyp = frame_vad_construct_pyannote_object_per_file(frame_labels, frame_labels, 0.02)
         assert ref == hyp == pyannote_object_gt
+
+    @pytest.mark.unit
+    def test_merge_overlap_segment_padded_to_zero(self):
+        segments = torch.tensor([[0.0, 0.07], [0.0, 0.21], [0.15, 0.4], [0.6, 0.7]])
+        merged = merge_overlap_segment(segments)
+        assert torch.equal(merged, torch.tensor([[0.0, 0.4], [0.6, 0.7]]))
+
+    @pytest.mark.parametrize(["onset", "offset"], [(0.5, 0.5), (0.7, 0.3), (0.3, 0.6), (0.0, 1.0)])
+    @pytest.mark.parametrize("filter_speech_first", [1.0, 0.0])
+    @pytest.mark.unit
+    def test_binarization_filtering_packed(self, onset, offset, filter_speech_first):
+        generator = torch.Generator().manual_seed(0)
+        sequences = [torch.rand(num_frames, generator=generator) for num_frames in [0, 1, 30, 500, 1000]]
+        per_args = {
+            'onset': onset,
+            'offset': offset,
+            'pad_onset': 0.05,
+            'pad_offset': 0.03,
+            'min_duration_on': 0.05,
+            'min_duration_off': 0.1,
+            'filter_speech_first': filter_speech_first,
+            'frame_length_in_sec': 0.02,
+        }
+        frames = torch.cat(sequences)
+        num_frames = torch.tensor([len(sequence) for sequence in sequences])
+        speech_segments, file_index = binarization_packed(frames, num_frames, per_args)
+        filtered_segments, filtered_file_index = filtering_packed(speech_segments, file_index, per_args)
+
+        for i, sequence in enumerate(sequences):
+            speech_segments_single = binarization(sequence, per_args)
+            assert torch.equal(speech_segments_single.reshape(-1, 2), speech_segments[file_index == i])
+            filtered_segments_single = filtering(speech_segments_single, per_args)
+            assert torch.equal(filtered_segments_single.reshape(-1, 2), filtered_segments[filtered_file_index == i])
+
+    @pytest.mark.unit
+    def test_get_detection_error_packed(self):
+        ref_segments_list = [[[0.5, 2.0], [3.0, 4.5], [6.0, 6.2]], [], [[1.0, 5.0]]]
+        hyp_segments_list = [[[0.0, 1.0], [1.5, 3.5], [7.0, 8.0]], [[0.0, 1.0]], [[2.0, 3.0], [4.5, 6.0]]]
+
+        metric = DetectionErrorRate()
+        for ref_segments, hyp_segments in zip(ref_segments_list, hyp_segments_list):
+            reference, hypothesis = Annotation(), Annotation()
+            for start, end in ref_segments:
+                reference[Segment(start, end)] = 'speech'
+            for start, end in hyp_segments:
+                hypothesis[Segment(start, end)] = 'speech'
+            metric(reference, hypothesis)
+
+        def pack(segments_list):
+            file_index = torch.tensor([i for i, segments in enumerate(segments_list) for _ in segments])
+            return torch.tensor(sum(segments_list, []), dtype=torch.float64), file_index
+
+        false_alarm, miss, total = get_detection_error_packed(*pack(hyp_segments_list), *pack(ref_segments_list))
+        assert false_alarm == pytest.approx(metric.accumulated_['false alarm'])
+        assert miss == pytest.approx(metric.accumulated_['miss'])
+        assert total == pytest.approx(metric.accumulated_['total'])
+
+    @pytest.mark.unit
+    def test_vad_tune_threshold_on_dev_no_speech(self, tmp_path):
+        np.savetxt(tmp_path / "audio.frame", np.full(100, 0.9), fmt="%.4f")
+        (tmp_path / "audio.rttm").write_text("SPEAKER audio 1 1.000 0.000 <NA> <NA> speech <NA> <NA>\n")
+        params = {'onset': [0.5], 'offset': [0.4]}
+
+        with pytest.raises(ValueError, match="no speech"):
+            vad_tune_threshold_on_dev(params, str(tmp_path), str(tmp_path), result_file=str(tmp_path / "res"))
+
+    @pytest.mark.parametrize("smoothing_method", ["mean", "median"])
+    @pytest.mark.parametrize(
+        ["window_length_in_sec", "shift_length_in_sec", "overlap"],
+        [(0.63, 0.01, 0.875), (0.63, 0.08, 0.875), (0.15, 0.01, 0.5), (0.31, 0.02, 0.0)],
+    )
+    @pytest.mark.unit
+    def test_generate_overlap_vad_seq_per_tensor(
+        self, smoothing_method, window_length_in_sec, shift_length_in_sec, overlap
+    ):
+        frame = torch.rand(200, generator=torch.Generator().manual_seed(0))
+        per_args = {
+            'overlap': overlap,
+            'window_length_in_sec': window_length_in_sec,
+            'shift_length_in_sec': shift_length_in_sec,
+        }
+        preds = generate_overlap_vad_seq_per_tensor(frame, per_args, smoothing_method)
+        preds_reference = get_overlap_vad_seq_reference(
+            frame, window_length_in_sec, shift_length_in_sec, overlap, smoothing_method
+        )
+        assert torch.allclose(preds, preds_reference, atol=1e-6)
+
+    @pytest.mark.unit
+    def test_generate_vad_segment_table_in_memory(self, tmp_path):
+        generator = torch.Generator().manual_seed(0)
+        frame_preds = {
+            f"audio{i}": torch.rand(num_frames, generator=generator) for i, num_frames in enumerate([1, 50, 500])
+        }
+        frame_dir = tmp_path / "frame"
+        frame_dir.mkdir()
+        for name, frame in frame_preds.items():
+            np.savetxt(frame_dir / f"{name}.frame", frame.numpy(), fmt="%.4f")
+        postprocessing_params = {
+            'onset': 0.5,
+            'offset': 0.4,
+            'pad_onset': 0.1,
+            'pad_offset': 0.1,
+            'min_duration_on': 0.1,
+            'min_duration_off': 0.2,
+            'filter_speech_first': True,
+        }
+
+        smoothing_dir = generate_overlap_vad_seq(str(frame_dir), 'median', 0.875, 0.63, 0.01, num_workers=None)
+        table_dir = generate_vad_segment_table(
+            smoothing_dir, postprocessing_params, 0.01, num_workers=None, out_dir=str(tmp_path / "table")
+        )
+
+        frame_preds = ((name, load_tensor_from_file(str(frame_dir / f"{name}.frame"))[0]) for name in frame_preds)
+        vad_preds = generate_overlap_vad_seq_in_memory(
+            frame_preds, 'median', 0.875, 0.63, 0.01, out_dir=str(tmp_path / "npy")
+        )
+        table_dir_in_memory = generate_vad_segment_table_in_memory(
+            vad_preds, postprocessing_params, 0.01, out_dir=str(tmp_path / "table_in_memory")
+        )
+
+        assert sorted(os.listdir(table_dir)) == sorted(os.listdir(table_dir_in_memory))
+        for filename in os.listdir(table_dir):
+            with open(os.path.join(table_dir, filename)) as f, open(os.path.join(table_dir_in_memory, filename)) as g:
+                assert f.read() == g.read()
+            name = filename.rsplit(".", 1)[0]
+            preds, _ = load_tensor_from_file(os.path.join(smoothing_dir, name + ".median"))
+            preds_npy, _ = load_tensor_from_file(str(tmp_path / "npy" / f"{name}.npy"))
+            assert torch.allclose(preds, preds_npy, atol=1e-4)
@@ -0,0 +1,238 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import collections as py_collections
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from nemo.collections.common.parts.preprocessing import collections, manifest_index, parsers
+from nemo.utils import logging
+
+
+def write_manifest(path, num_items, offset=0):
+    with open(path, 'w') as f:
+        for n in range(num_items):
+            item = {
+                'audio_filepath': f'/data/audio_{offset + n}.wav',
+                'duration': 0.5 + (offset + n) % 7,
+                'text': f'utterance number {n}' if n % 5 else '',
+            }
+            if n % 3 == 0:
+                item['offset'] = 1.5
+                item['speaker'] = n
+            if n % 4 == 0:
+                item['lang'] = 'en'
+            f.write(json.dumps(item) + '\n')
+
+
+@pytest.fixture()
+def manifests(tmpdir):
+    paths = [os.path.join(tmpdir, 'manifest_0.json'), os.path.join(tmpdir, 'manifest_1.json')]
+    write_manifest(paths[0], 23)
+    write_manifest(paths[1], 17, offset=23)
+    return paths
+
+
+class TestManifestIndex:
+    @pytest.mark.unit
+    def test_packed_columns(self):
+        strings = ['a', None, 'ünïcode', '']
+        packed = manifest_index.PackedStrings.from_list(strings)
+        assert [packed[i] for i in range(len(packed))] == strings
+        assert not packed.is_json
+
+        mixed = [1, 'spk', None]
+        packed = manifest_index.PackedStrings.from_list(mixed)
+        assert [packed[i] for i in range(len(packed))] == mixed
+        assert packed.is_json
+
+        sequences = [[1, 2, 3], None, [], [4]]
+        packed = manifest_index.PackedSequences.from_list(sequences)
+        assert [packed[i] for i in range(len(packed))] == sequences
+
+    @pytest.mark.unit
+    def test_packed_entities(self):
+        entity_type = py_collections.namedtuple('Entity', 'id path duration tokens offset extra')
+        entities = [
+            entity_type(0, '/a.wav', 1.5, [1, 2], None, {'key': 1}),
+            entity_type(1, None, 2, [], 0.5, None),
+            entity_type(np.int64(2), '/c.wav', 3.25, None, 1.0, [1, 'a']),
+        ]
+        packed = manifest_index.PackedEntities(entity_type, entities)
+
+        assert len(packed) == len(entities)
+        assert list(packed) == entities
+        assert packed[-1] == entities[-1]
+        assert isinstance(packed.columns[0], manifest_index.PackedScalars)
+        assert isinstance(packed.columns[1], manifest_index.PackedStrings)
+        assert isinstance(packed.columns[3], manifest_index.PackedSequences)
+        assert isinstance(packed.columns[5], list)
+        assert type(packed[0].id) is int and type(packed[0].duration) is float
+        with pytest.raises(IndexError):
+            packed[len(entities)]
+
+    @pytest.mark.unit
+    def test_collection_is_packed(self, manifests):
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        collection = collections.ASRAudioText(manifests, parser=parser)
+
+        assert isinstance(collection.data, manifest_index.PackedEntities)
+        assert len(collection) == 40
+        assert collection[3].text_tokens == parser(collection[3].text_raw)
+        assert collection[3].speaker == 3 and collection[3].offset == 1.5
+        assert collection[1].speaker is None and collection[1].lang is None
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        'kwargs',
+        [
+            {},
+            {'min_duration': 1.0, 'max_duration': 5.0},
+            {'max_number': 30},
+            {'max_number': 5, 'min_duration': 2.0},
+            {'do_sort_by_duration': True, 'max_duration': 6.0},
+            {'index_by_file_id': True},
+        ],
+    )
+    def test_collection_matches_manifest(self, manifests, kwargs):
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        expected = collections.ASRAudioText(manifests, parser=parser, **kwargs)
+
+        for manifest_file in manifests:
+            manifest_index.compile_manifest_index(manifest_file, parser=parser)
+        indexed = collections.ASRAudioText(manifests, parser=parser, **kwargs)
+
+        assert isinstance(indexed.data, manifest_index.ManifestIndexEntities)
+        assert len(indexed) == len(expected)
+        assert list(indexed) == list(expected)
+        assert indexed.data.durations().tolist() == [entity.duration for entity in expected]
+        if kwargs.get('index_by_file_id'):
+            assert indexed.mapping == expected.mapping
+
+    @pytest.mark.unit
+    def test_max_number_log(self, manifests, caplog):
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        for manifest_file in manifests:
+            manifest_index.compile_manifest_index(manifest_file, parser=parser)
+
+        logging._logger.propagate = True
+        caplog.set_level(logging.INFO)
+        try:
+            collections.ASRAudioText(manifests, parser=parser, max_number=5, min_duration=2.0)
+        finally:
+            logging._logger.propagate = False
+
+        # Entries left out by max_number are not reported as filtered
+        assert "12 files were filtered" in caplog.text
+        assert "23 files were left out by max_number" in caplog.text
+
+    @pytest.mark.unit
+    def test_tokens_from_other_parser(self, manifests):
+        manifest_index.compile_manifest_index(manifests[0], parser=parsers.make_parser(labels=list('abc')))
+
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        expected = collections.ASRAudioText(manifests[0], parser=parser, max_number=10)
+        indexed = collections.ASRAudioText(manifests[0], parser=parser, max_number=10)
+
+        assert indexed.data.text_tokens is not None
+        assert list(indexed) == list(expected)
+
+    @pytest.mark.unit
+    def test_outdated_index(self, manifests):
+        manifest_index.compile_manifest_index(manifests[0])
+        assert manifest_index.load_manifest_indexes(manifests) is None
+
+        manifest_index.compile_manifest_index(manifests[1])
+        assert len(manifest_index.load_manifest_indexes(manifests)) == 2
+
+        write_manifest(manifests[1], 3)
+        assert manifest_index.load_manifest_indexes(manifests) is None
+
+    @pytest.mark.unit
+    def test_recompile(self, manifests):
+        index_path = manifest_index.compile_manifest_index(manifests[0])
+        shutil.rmtree(index_path)
+        assert manifest_index.load_manifest_index(manifests[0]) is None
+        assert manifest_index.compile_manifest_index(manifests[0]) == index_path
+        assert len(manifest_index.load_manifest_index(manifests[0])) == 23
+
+    @pytest.mark.unit
+    def test_tokenize_texts_in_workers(self):
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        texts = [f'text number {n}' if n % 3 else '' for n in range(50)]
+        langs = [None] * len(texts)
+
+        tokens = manifest_index.tokenize_texts(parser, texts, langs, num_workers=2, chunk_size=8)
+        assert tokens == [parser(text) if text else [] for text in texts]
+
+    @pytest.mark.unit
+    def test_tokens_cache(self, manifests, tmpdir):
+        cache_dir = os.path.join(tmpdir, 'tokens_cache')
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        expected = collections.ASRAudioText(manifests, parser=parser)
+
+        cached = collections.ASRAudioText(manifests, parser=parser, tokens_cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+        assert list(cached) == list(expected)
+
+        # Second run reads token ids from the cache
+        cached = collections.ASRAudioText(manifests, parser=parser, tokens_cache_dir=cache_dir)
+        assert list(cached) == list(expected)
+
+        # A different parser uses a different cache entry
+        other_parser = parsers.make_parser(labels=list(' abc'), name='en')
+        collections.ASRAudioText(manifests, parser=other_parser, tokens_cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 2
+
+    @pytest.mark.unit
+    def test_tokens_cache_rejected_texts(self, manifests, tmpdir):
+        class RejectingParser(parsers.ENCharParser):
+            calls = []
+
+            def __call__(self, text):
+                RejectingParser.calls.append(text)
+                return None if text.endswith('7') else super().__call__(text)
+
+        cache_dir = os.path.join(tmpdir, 'tokens_cache')
+        parser = RejectingParser(labels=list(' abcdefghijklmnopqrstuvwxyz'))
+        cached = collections.ASRAudioText(manifests, parser=parser, tokens_cache_dir=cache_dir)
+        # 'utterance number 7' of both manifests and 'utterance number 17' of the first one are rejected
+        assert len(cached) == 37
+
+        # Rejected transcripts are filtered out from the cache without parsing them again
+        RejectingParser.calls.clear()
+        assert list(collections.ASRAudioText(manifests, parser=parser, tokens_cache_dir=cache_dir)) == list(cached)
+        assert RejectingParser.calls == []
+
+    @pytest.mark.unit
+    def test_tokens_cache_with_index(self, manifests, tmpdir, monkeypatch):
+        cache_dir = os.path.join(tmpdir, 'tokens_cache')
+        parser = parsers.make_parser(labels=list(' abcdefghijklmnopqrstuvwxyz'), name='en')
+        expected = collections.ASRAudioText(manifests, parser=parser, max_number=30)
+        # Token ids in the indexes are not reused by a different parser
+        for manifest_file in manifests:
+            manifest_index.compile_manifest_index(manifest_file, parser=parsers.make_parser(labels=list('abc')))
+
+        kwargs = dict(parser=parser, max_number=30, tokenization_workers=2, tokens_cache_dir=cache_dir)
+        indexed = collections.ASRAudioText(manifests, **kwargs)
+        assert len(os.listdir(cache_dir)) == 1
+        assert list(indexed) == list(expected)
+
+        # Second run reads token ids from the cache instead of tokenizing rows one by one
+        monkeypatch.setattr(manifest_index, 'tokenize_text', None)
+        indexed = collections.ASRAudioText(manifests, **kwargs)
+        assert list(indexed) == list(expected)
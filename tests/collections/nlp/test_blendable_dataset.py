@@ -0,0 +1,89 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import weakref
+
+import numpy as np
+import pytest
+
+from nemo.collections.nlp.data.language_modeling.megatron import blendable_dataset
+from nemo.collections.nlp.data.language_modeling.megatron.blendable_dataset import BlendableDataset
+
+
+class ConstantDataset:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        return self.name, idx
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("weights", [[1.0], [0.5, 0.5], [0.2, 0.3, 0.5], [0.05, 0.0, 0.7, 0.25], [1, 2, 2, 1]])
+def test_build_blending_indices(weights, monkeypatch):
+    """Test that the NumPy blending indices follow the weights and that any segment of them can be built alone."""
+    monkeypatch.setattr(blendable_dataset, "__blending_segment_size__", 97)
+    weights = np.array(weights, dtype=np.float64) / np.sum(weights)
+    size = 1000
+    dataset_index, dataset_sample_index = blendable_dataset._build_blending_indices(weights, size)
+
+    num_samples = np.zeros(len(weights), dtype=np.int64)
+    for idx in range(size):
+        assert dataset_sample_index[idx] == num_samples[dataset_index[idx]]
+        num_samples[dataset_index[idx]] += 1
+        assert np.all(np.abs(num_samples - weights * (idx + 1)) < 2)
+
+    for start, end in [(0, 1), (0, size), (1, 2), (123, 456), (size - 1, size)]:
+        segment = blendable_dataset._build_blending_indices_segment(weights, start, end)
+        assert np.array_equal(segment[0], dataset_index[start:end])
+        assert np.array_equal(segment[1], dataset_sample_index[start:end])
+
+
+@pytest.mark.unit
+def test_blendable_dataset_index_cache(tmp_path, monkeypatch):
+    """Test that saved, loaded and lazily built blending indices give the same samples."""
+    monkeypatch.setattr(blendable_dataset, "_import_helpers", lambda: None)
+    datasets = [ConstantDataset("a", 100), ConstantDataset("b", 200), ConstantDataset("c", 300)]
+    weights = [0.2, 0.3, 0.5]
+    size = 500
+
+    dataset = BlendableDataset(datasets, weights, size)
+    samples = [dataset[idx] for idx in range(size)]
+    assert [sum(name == n for name, _ in samples) for n in "abc"] == [100, 150, 250]
+
+    cached_dataset = BlendableDataset(datasets, weights, size, index_mapping_dir=str(tmp_path))
+    # indices of the C++ helpers and of NumPy have different orders and are saved under different names
+    assert len(list(tmp_path.glob("blendable_dataset_*_numpy_*.npy"))) == 2
+    assert [cached_dataset[idx] for idx in range(size)] == samples
+
+    # the saved indices are loaded without building them
+    monkeypatch.setattr(BlendableDataset, "_build_indices", None)
+    loaded_dataset = BlendableDataset(datasets, weights, size, index_mapping_dir=str(tmp_path))
+    assert [loaded_dataset[idx] for idx in range(size)] == samples
+
+    lazy_dataset = BlendableDataset(datasets, weights, size, lazy_segment_size=64)
+    assert [lazy_dataset[idx] for idx in range(size)] == samples
+    assert lazy_dataset[-1] == samples[-1]
+    assert len(lazy_dataset._indices_segments) == blendable_dataset.__max_cached_segments__
+
+    # the built segments are released with the dataset
+    lazy_dataset_ref = weakref.ref(lazy_dataset)
+    del lazy_dataset
+    gc.collect()
+    assert lazy_dataset_ref() is None
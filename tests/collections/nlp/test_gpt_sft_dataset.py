@@ -0,0 +1,206 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from collections import Counter
+
+import numpy as np
+import pytest
+import torch
+
+from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
+from nemo.collections.nlp.data.language_modeling.megatron import gpt_sft_dataset
+from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_dataset import (
+    GPTSFTDataset,
+    _first_fit_decreasing,
+)
+
+
+class CharTokenizer(TokenizerSpec):
+    """Tokenizer with one token per character."""
+
+    def __init__(self):
+        self.vocab_size = 256
+        self.bos_id = 1
+        self.eos_id = 2
+
+    def text_to_tokens(self, text):
+        return list(text)
+
+    def tokens_to_text(self, tokens):
+        return ''.join(tokens)
+
+    def tokens_to_ids(self, tokens):
+        return [ord(token) % self.vocab_size for token in tokens]
+
+    def ids_to_tokens(self, ids):
+        return [chr(i) for i in ids]
+
+    def text_to_ids(self, text):
+        return self.tokens_to_ids(self.text_to_tokens(text))
+
+    def ids_to_text(self, ids):
+        return self.tokens_to_text(self.ids_to_tokens(ids))
+
+
+@pytest.fixture
+def sft_jsonl_file(tmp_path):
+    file_path = tmp_path / "sft.jsonl"
+    data = [
+        {"input": "What is the capital of France?", "output": "Paris"},
+        {"input": "Translate to German: good morning", "output": "guten Morgen", "id": 1},
+        {"input": "", "output": "A very long answer that does not fit into the maximum sequence length"},
+        {"input": "Summarize: " + "the fox jumps over the dog. " * 10, "output": "A fox jumps."},
+    ]
+    with open(file_path, mode="w") as file:
+        for item in data:
+            json.dump(item, file)
+            file.write("\n")
+    return str(file_path)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("truncation_method", ["left", "right"])
+def test_gpt_sft_dataset_tokenized_cache(sft_jsonl_file, tmp_path, truncation_method):
+    """Test that examples read from the tokenized cache match the examples tokenized on access."""
+    dataset_kwargs = dict(
+        file_path=sft_jsonl_file,
+        tokenizer=CharTokenizer(),
+        max_seq_length=64,
+        add_bos=True,
+        label_key="output",
+        truncation_field="input",
+        index_mapping_dir=str(tmp_path / "index"),
+        prompt_template="Q: {input}\\nA: {output}",
+        truncation_method=truncation_method,
+    )
+    dataset = GPTSFTDataset(**dataset_kwargs)
+    cached_dataset = GPTSFTDataset(**dataset_kwargs, tokenized_cache=True)
+    assert cached_dataset.tokenized_dataset is not None
+    assert len(cached_dataset) == len(dataset)
+
+    for idx in [*range(len(dataset)), -1]:
+        assert cached_dataset[idx] == dataset[idx]
+    assert cached_dataset[1]['metadata'] == {"id": 1}
+
+    # the cache is reused and rebuilt when the prompt_template changes
+    prefix = cached_dataset._get_cache_prefix('tokenized')
+    assert GPTSFTDataset(**dataset_kwargs, tokenized_cache=True)._get_cache_prefix('tokenized') == prefix
+    # a file modified in place without changing its size gets a new cache
+    mtime_ns = os.stat(sft_jsonl_file).st_mtime_ns
+    os.utime(sft_jsonl_file, ns=(mtime_ns, mtime_ns + 10 ** 9))
+    assert cached_dataset._get_cache_prefix('tokenized') != prefix
+    dataset_kwargs["prompt_template"] = "{input} {output}"
+    assert GPTSFTDataset(**dataset_kwargs, tokenized_cache=True)._get_cache_prefix('tokenized') != prefix
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("capacity", [1, 10, 64])
+def test_first_fit_decreasing(capacity):
+    """Test the bins of first-fit-decreasing against a linear search of the first bin with room."""
+    lengths = np.random.RandomState(capacity).randint(1, capacity + 1, size=200)
+
+    expected_bin_idx = np.empty(len(lengths), dtype=np.int64)
+    bin_rooms = []
+    for item in np.argsort(-lengths, kind='stable'):
+        bin_id = next((i for i, room in enumerate(bin_rooms) if room >= lengths[item]), len(bin_rooms))
+        if bin_id == len(bin_rooms):
+            bin_rooms.append(capacity)
+        bin_rooms[bin_id] -= lengths[item]
+        expected_bin_idx[item] = bin_id
+
+    assert np.array_equal(_first_fit_decreasing(lengths, capacity), expected_bin_idx)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("tokenized_cache", [False, True])
+def test_gpt_sft_dataset_pack_sequences(sft_jsonl_file, tmp_path, tokenized_cache):
+    """Test that packed rows concatenate every example once with reset position ids, loss masks and attention."""
+    dataset_kwargs = dict(
+        file_path=sft_jsonl_file,
+        tokenizer=CharTokenizer(),
+        max_seq_length=128,
+        label_key="output",
+        truncation_field="input",
+        index_mapping_dir=str(tmp_path / "index"),
+        prompt_template="Q: {input}\\nA: {output}",
+        tokenized_cache=tokenized_cache,
+    )
+    dataset = GPTSFTDataset(**dataset_kwargs)
+    packed_dataset = GPTSFTDataset(**dataset_kwargs, pack_sequences=True)
+    assert len(packed_dataset) < len(dataset)
+
+    packed_examples = []
+    for row in [packed_dataset[idx] for idx in range(len(packed_dataset))]:
+        assert len(row['input_ids']) <= packed_dataset.max_seq_length
+        for start, end in zip(row['seq_boundaries'][:-1], row['seq_boundaries'][1:]):
+            assert row['position_ids'][start:end] == list(range(end - start))
+            packed_examples.append(
+                (row['input_ids'][start:end], row['labels'][start:end], row['loss_mask'][start:end])
+            )
+    examples = [
+        (example['input_ids'][:-1], example['input_ids'][1:], dataset._build_loss_mask(example)[1:])
+        for example in [dataset[idx] for idx in range(len(dataset))]
+    ]
+    assert sorted(packed_examples) == sorted(examples)
+
+    batch = packed_dataset.collate_fn([packed_dataset[0], packed_dataset[-1]])
+    max_length = batch['tokens'].shape[1]
+    assert max_length <= packed_dataset.max_seq_length
+    assert batch['attention_mask'].shape == (2, 1, max_length, max_length)
+    boundaries = packed_dataset[0]['seq_boundaries']
+    start, end = boundaries[-2], boundaries[-1]
+    # the last example of a row attends causally to itself only
+    assert not batch['attention_mask'][0, 0, end - 1, start:end].any()
+    assert batch['attention_mask'][0, 0, end - 1, :start].all()
+
+
+@pytest.mark.unit
+def test_gpt_sft_dataset_pack_sequences_epochs(tmp_path, monkeypatch):
+    """Test that packed rows are not sorted by length and never repeat an example of a multi-epoch samples mapping."""
+    rng = np.random.RandomState(0)
+    file_path = tmp_path / "sft.jsonl"
+    with open(file_path, mode="w") as file:
+        for i in range(100):
+            json.dump({"input": "x" * rng.randint(1, 60), "output": str(i)}, file)
+            file.write("\n")
+
+    def get_samples_mapping(indexed_dataset, max_num_samples, seed, **kwargs):
+        # the copies of all epochs are shuffled together, like in the samples mapping of the megatron helpers
+        example_idx = np.tile(np.arange(len(indexed_dataset)), 3)
+        example_idx = np.random.RandomState(seed).permutation(example_idx)[:max_num_samples]
+        return np.stack([example_idx, example_idx + 1, np.zeros_like(example_idx)], axis=1).astype(np.uint32)
+
+    monkeypatch.setattr(gpt_sft_dataset, "get_samples_mapping", get_samples_mapping)
+    packed_dataset = GPTSFTDataset(
+        file_path=str(file_path),
+        tokenizer=CharTokenizer(),
+        max_seq_length=128,
+        label_key="output",
+        truncation_field="input",
+        index_mapping_dir=str(tmp_path / "index"),
+        prompt_template="Q: {input}\\nA: {output}",
+        max_num_samples=250,
+        pack_sequences=True,
+    )
+
+    rows = np.split(packed_dataset.packing_example_idx, packed_dataset.packing_row_offsets[1:-1])
+    assert Counter(packed_dataset.packing_example_idx.tolist()) == Counter(
+        packed_dataset.samples_mapping[:, 0].tolist()
+    )
+    for row in rows:
+        assert len(set(row.tolist())) == len(row)
+    longest = [max(len(packed_dataset._fetch_example(i)['input_ids']) for i in row.tolist()) for row in rows]
+    assert longest != sorted(longest, reverse=True)
@@ -16,6 +16,7 @@ import csv
 import json
 import os
 
+import numpy as np
 import pytest
 
 from nemo.collections.nlp.data.language_modeling import text_memmap_dataset
@@ -131,3 +132,63 @@ def test_mem_map_dataset_index_mapping_dir(
         text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file], header_lines=0)
         assert os.path.isfile(f"{jsonl_file}.idx.npy")
         assert os.path.isfile(f"{jsonl_file}.idx.info")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 2 ** 20])
+@pytest.mark.parametrize("trailing_newlines", [0, 1, 3])
+def test_build_index_files_chunked(tmp_path, chunk_size, trailing_newlines):
+    """Test that indexing a file in chunks gives the same index as indexing it at once."""
+    file_path = str(tmp_path / "data.txt")
+    with open(file_path, mode="w") as file:
+        file.write("first\n\nsecond\nthird" + "\n" * trailing_newlines)
+
+    text_memmap_dataset.build_index_files([file_path], newline_int=10, workers=2, chunk_size=chunk_size)
+    midx = np.load(f"{file_path}.idx.npy")
+    assert np.array_equal(midx, text_memmap_dataset._build_index_from_memdata(file_path, 10))
+
+    indexed_dataset = text_memmap_dataset.TextMemMapDataset(dataset_paths=[file_path])
+    assert [indexed_dataset[i] for i in range(len(indexed_dataset))] == ["first", "", "second", "third"]
+
+
+def test_mem_map_dataset_index_extended(jsonl_file):
+    """Test that the index of a JSONL file is extended when lines are appended to it."""
+    indexed_dataset = text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file], header_lines=0)
+    assert len(indexed_dataset) == 3
+
+    with open(jsonl_file, mode="a") as file:
+        json.dump({"name": "Alice", "age": 40}, file)
+        file.write("\n")
+
+    indexed_dataset = text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file], header_lines=0)
+    assert len(indexed_dataset) == 4
+    assert indexed_dataset[2] == {"name": "Bob", "age": 35}
+    assert indexed_dataset[3] == {"name": "Alice", "age": 40}
+    assert np.array_equal(
+        np.load(f"{jsonl_file}.idx.npy"), text_memmap_dataset._build_index_from_memdata(jsonl_file, 10)
+    )
+
+
+@pytest.mark.unit
+def test_build_index_files_file_grows(jsonl_file, monkeypatch):
+    """Test that lines appended while a file is indexed are left to the next build of its index."""
+    get_index_resume_position = text_memmap_dataset._get_index_resume_position
+
+    def get_index_resume_position_and_append(*args):
+        resume = get_index_resume_position(*args)
+        with open(jsonl_file, mode="a") as file:
+            json.dump({"name": "Alice", "age": 40}, file)
+            file.write("\n")
+        return resume
+
+    monkeypatch.setattr(text_memmap_dataset, "_get_index_resume_position", get_index_resume_position_and_append)
+    file_size = os.path.getsize(jsonl_file)
+    text_memmap_dataset.build_index_files([jsonl_file], newline_int=10, workers=2, chunk_size=7)
+    monkeypatch.undo()
+
+    with open(jsonl_file, "rb") as file:
+        expected = np.flatnonzero(np.frombuffer(file.read(file_size), dtype=np.uint8) == 10)
+    assert np.array_equal(np.load(f"{jsonl_file}.idx.npy"), expected)
+
+    indexed_dataset = text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file], header_lines=0)
+    assert len(indexed_dataset) == 4
+    assert indexed_dataset[3] == {"name": "Alice", "age": 40}